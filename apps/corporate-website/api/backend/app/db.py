@@ -1,16 +1,41 @@
-"""MongoDB connection helpers for the Design Sense API."""
+"""MongoDB connection helpers for the Design Sense API.
+
+Client tuning is read from the environment; unset values keep the driver
+defaults:
+
+- ``MONGODB_MAX_POOL_SIZE`` / ``MONGODB_MIN_POOL_SIZE``: connections per server.
+- ``MONGODB_MAX_IDLE_TIME_MS``: close pooled connections idle for longer.
+- ``MONGODB_WAIT_QUEUE_TIMEOUT_MS``: fail a checkout that waits this long.
+- ``MONGODB_SERVER_SELECTION_TIMEOUT_MS`` / ``MONGODB_CONNECT_TIMEOUT_MS``.
+- ``MONGODB_COMPRESSORS``: comma-separated, e.g. ``zstd,snappy,zlib``
+  (zstd and snappy need the ``compression`` extra).
+- ``MONGODB_READ_PREFERENCE``: e.g. ``primaryPreferred`` or ``secondaryPreferred``.
+"""
 
 import os
-from typing import Optional
+from typing import Any, Optional
 
 from motor.motor_asyncio import (  # type: ignore
     AsyncIOMotorClient,
     AsyncIOMotorCollection,
     AsyncIOMotorDatabase,
 )
+from pymongo import ASCENDING, IndexModel  # type: ignore
+from pymongo.errors import OperationFailure  # type: ignore
+
+from .db_metrics import mongo_metrics
 
 _client: Optional[AsyncIOMotorClient] = None
 
+_INT_OPTIONS = {
+    "MONGODB_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGODB_MIN_POOL_SIZE": "minPoolSize",
+    "MONGODB_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGODB_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGODB_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    "MONGODB_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+}
+
 
 def _get_mongo_uri() -> str:
     """Return the MongoDB connection string or raise if missing."""
@@ -25,11 +50,35 @@ def _get_database_name() -> str:
     return os.getenv("MONGODB_DB", "minkowski_design_test")
 
 
+def _client_options() -> dict[str, Any]:
+    """Collect pool, timeout, compression and read-preference options from the environment."""
+    options: dict[str, Any] = {}
+    for env_name, option in _INT_OPTIONS.items():
+        raw = os.getenv(env_name)
+        if raw:
+            try:
+                options[option] = int(raw)
+            except ValueError as exc:
+                raise RuntimeError(f"{env_name} must be an integer, got {raw!r}.") from exc
+    compressors = os.getenv("MONGODB_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+    read_preference = os.getenv("MONGODB_READ_PREFERENCE")
+    if read_preference:
+        options["readPreference"] = read_preference
+    return options
+
+
 async def get_client() -> AsyncIOMotorClient:
     """Initialize and cache the AsyncIOMotorClient."""
     global _client
     if _client is None:
-        _client = AsyncIOMotorClient(_get_mongo_uri(), uuidRepresentation="standard")
+        _client = AsyncIOMotorClient(
+            _get_mongo_uri(),
+            uuidRepresentation="standard",
+            event_listeners=[mongo_metrics],
+            **_client_options(),
+        )
     return _client
 
 
@@ -75,3 +124,58 @@ async def get_supplemental_questions_collection() -> AsyncIOMotorCollection:
     """Collection for selection/boost metadata for the bonus questions."""
     database = await _get_database()
     return database["supplemental_questions"]
+
+
+async def get_question_bank_meta_collection() -> AsyncIOMotorCollection:
+    """Collection holding the question-bank version stamp written by the seeder."""
+    database = await _get_database()
+    return database["question_bank_meta"]
+
+
+async def get_staging_collection(collection: AsyncIOMotorCollection) -> AsyncIOMotorCollection:
+    """Shadow collection used to stage a full replacement of ``collection``."""
+    return collection.database[f"{collection.name}__staging"]
+
+
+async def ensure_indexes() -> None:
+    """Create the indexes the API relies on for idempotent, indexed writes.
+
+    ``create_indexes`` is a no-op for indexes that already exist, so this is
+    safe to run on every startup. The unique indexes cannot be built over
+    duplicates left by older releases; run
+    ``python -m migrations.dedupe_for_unique_indexes`` once before deploying
+    to a database that may hold them.
+    """
+    attempts = await get_attempts_collection()
+    await _create_unique_indexes(
+        attempts,
+        [
+            IndexModel(
+                [("sessionId", ASCENDING), ("applicantEmail", ASCENDING)],
+                name="attempts_session_email_unique",
+                unique=True,
+            ),
+            IndexModel([("submittedAt", ASCENDING)], name="attempts_submitted_at"),
+        ],
+    )
+    images = await get_images_collection()
+    await images.create_indexes(
+        [IndexModel([("imageId", ASCENDING)], name="images_image_id_unique", unique=True)]
+    )
+    applicants = await get_applicants_collection()
+    await _create_unique_indexes(
+        applicants, [IndexModel([("email", ASCENDING)], name="applicants_email_unique", unique=True)]
+    )
+
+
+async def _create_unique_indexes(collection: AsyncIOMotorCollection, indexes: list) -> None:
+    """``create_indexes``, pointing at the dedupe migration when duplicates block a build."""
+    try:
+        await collection.create_indexes(indexes)
+    except OperationFailure as exc:
+        if exc.code != 11000:
+            raise
+        raise RuntimeError(
+            f"Duplicate documents in {collection.name!r} block its unique index; "
+            "run `python -m migrations.dedupe_for_unique_indexes` before deploying"
+        ) from exc
@@ -0,0 +1,237 @@
+"""Connection-pool and command monitoring for the Motor client.
+
+PyMongo invokes these listeners from its own threads, so every counter is
+guarded by a lock. The collected figures are meant for sizing API workers
+against MongoDB limits: how long requests wait for a pooled connection, how
+many connections are in use, and how long each command takes.
+
+The same figures are exported to ``/metrics`` through :meth:`MongoMetrics.collect`,
+and each command's duration is attached to the request that issued it as a
+``mongo.<command>`` span.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any
+
+from minkowski_instrumentation import MetricFamily, Sample, histogram_samples, record_span
+from pymongo import monitoring  # type: ignore
+
+# Upper bounds (milliseconds) for the latency histograms.
+LATENCY_BUCKETS_MS: tuple[float, ...] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+@dataclass
+class LatencyStats:
+    """Count, total, max and cumulative buckets for one latency series."""
+
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    buckets: list[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS_MS))
+
+    def observe(self, value_ms: float) -> None:
+        """Record one observation."""
+        self.count += 1
+        self.total_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if value_ms <= bound:
+                self.buckets[index] += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a JSON-friendly summary."""
+        return {
+            "count": self.count,
+            "totalMs": round(self.total_ms, 3),
+            "avgMs": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "maxMs": round(self.max_ms, 3),
+            "buckets": {
+                str(bound): hits for bound, hits in zip(LATENCY_BUCKETS_MS, self.buckets)
+            },
+        }
+
+
+class MongoMetrics(monitoring.ConnectionPoolListener, monitoring.CommandListener):
+    """Aggregate pool and command events into in-process counters."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear every counter."""
+        with self._lock:
+            self.open_connections: dict[str, int] = defaultdict(int)
+            self.in_use_connections: dict[str, int] = defaultdict(int)
+            self.checkout_wait = LatencyStats()
+            self.checkout_failures: dict[str, int] = defaultdict(int)
+            self.pool_clears = 0
+            self.commands: dict[str, LatencyStats] = defaultdict(LatencyStats)
+            self.command_failures: dict[str, int] = defaultdict(int)
+
+    @staticmethod
+    def _address(event: Any) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    # Connection pool events.
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        pass
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        with self._lock:
+            address = self._address(event)
+            self.open_connections.pop(address, None)
+            self.in_use_connections.pop(address, None)
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        with self._lock:
+            self.open_connections[self._address(event)] += 1
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        with self._lock:
+            address = self._address(event)
+            self.open_connections[address] = max(self.open_connections[address] - 1, 0)
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        pass
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        with self._lock:
+            self.checkout_failures[str(event.reason)] += 1
+            duration = getattr(event, "duration", None)
+            if duration is not None:
+                self.checkout_wait.observe(duration * 1000)
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        with self._lock:
+            self.in_use_connections[self._address(event)] += 1
+            # ``duration`` (seconds) is reported by PyMongo 4.7+.
+            duration = getattr(event, "duration", None)
+            if duration is not None:
+                self.checkout_wait.observe(duration * 1000)
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        with self._lock:
+            address = self._address(event)
+            self.in_use_connections[address] = max(self.in_use_connections[address] - 1, 0)
+
+    # Command events.
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        with self._lock:
+            self.commands[event.command_name].observe(event.duration_micros / 1000)
+        record_span(f"mongo.{event.command_name}", event.duration_micros / 1e6, observe=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        with self._lock:
+            self.commands[event.command_name].observe(event.duration_micros / 1000)
+            self.command_failures[event.command_name] += 1
+        record_span(f"mongo.{event.command_name}", event.duration_micros / 1e6, observe=False)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return a consistent, JSON-friendly copy of every counter."""
+        with self._lock:
+            return {
+                "pool": {
+                    "openConnections": dict(self.open_connections),
+                    "inUseConnections": dict(self.in_use_connections),
+                    "checkoutWait": self.checkout_wait.as_dict(),
+                    "checkoutFailures": dict(self.checkout_failures),
+                    "poolClears": self.pool_clears,
+                },
+                "commands": {name: stats.as_dict() for name, stats in self.commands.items()},
+                "commandFailures": dict(self.command_failures),
+            }
+
+    def collect(self) -> list[MetricFamily]:
+        """Export the counters as Prometheus metric families."""
+        bounds = [bound / 1000 for bound in LATENCY_BUCKETS_MS]
+
+        def latency(name: str, help: str, series: dict[tuple, LatencyStats]) -> MetricFamily:
+            samples: list[Sample] = []
+            for labels, stats in series.items():
+                samples.extend(
+                    histogram_samples(
+                        name, labels, bounds, stats.buckets, stats.total_ms / 1000, stats.count
+                    )
+                )
+            return MetricFamily(name, "histogram", help, samples)
+
+        def per_key(name: str, kind: str, help: str, label: str, values: dict) -> MetricFamily:
+            sample_name = f"{name}_total" if kind == "counter" else name
+            return MetricFamily(
+                name,
+                kind,
+                help,
+                [Sample(sample_name, ((label, key),), value) for key, value in values.items()],
+            )
+
+        with self._lock:
+            return [
+                per_key(
+                    "mongodb_pool_open_connections",
+                    "gauge",
+                    "Open pooled connections per server.",
+                    "address",
+                    dict(self.open_connections),
+                ),
+                per_key(
+                    "mongodb_pool_in_use_connections",
+                    "gauge",
+                    "Checked-out connections per server.",
+                    "address",
+                    dict(self.in_use_connections),
+                ),
+                latency(
+                    "mongodb_pool_checkout_wait_seconds",
+                    "Time spent waiting to check out a pooled connection.",
+                    {(): self.checkout_wait},
+                ),
+                per_key(
+                    "mongodb_pool_checkout_failures",
+                    "counter",
+                    "Failed connection checkouts by reason.",
+                    "reason",
+                    dict(self.checkout_failures),
+                ),
+                MetricFamily(
+                    "mongodb_pool_clears",
+                    "counter",
+                    "Times a connection pool was cleared.",
+                    [Sample("mongodb_pool_clears_total", (), self.pool_clears)],
+                ),
+                latency(
+                    "mongodb_command_duration_seconds",
+                    "Round-trip time of MongoDB commands.",
+                    {(("command", name),): stats for name, stats in self.commands.items()},
+                ),
+                per_key(
+                    "mongodb_command_failures",
+                    "counter",
+                    "Failed MongoDB commands.",
+                    "command",
+                    dict(self.command_failures),
+                ),
+            ]
+
+
+mongo_metrics = MongoMetrics()
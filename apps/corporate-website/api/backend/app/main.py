@@ -1,13 +1,22 @@
 """FastAPI application for the Design Sense test backend."""
 
 import os
+from typing import Any
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from minkowski_instrumentation import MetricFamily, Sample, instrument, registry
 
 from .db import close_client, get_client
+from .db_metrics import mongo_metrics
+from .question_bank import question_bank
+from .readiness import readiness
+from .routes.admin import require_admin_token
+from .routes.admin import router as admin_router
 from .routes.design_test import router as design_test_router
+from .routes.results import router as results_router
+from .write_behind import attempt_write_behind, write_behind_enabled
 
 load_dotenv()
 
@@ -28,17 +37,41 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+instrument(app, metrics_dependencies=[Depends(require_admin_token)])
+
+
+def _collect_app_metrics() -> list[MetricFamily]:
+    """Expose the write-behind backlog next to the MongoDB figures."""
+    return [
+        MetricFamily(
+            "attempt_write_behind_backlog",
+            "gauge",
+            "Attempts journaled but not yet stored in MongoDB.",
+            [Sample("attempt_write_behind_backlog", (), attempt_write_behind.backlog)],
+        )
+    ]
+
+
+registry.register_collector(mongo_metrics.collect)
+registry.register_collector(_collect_app_metrics)
 
 
 @app.on_event("startup")
 async def startup() -> None:
-    """Warm the MongoDB client on application startup."""
+    """Create the MongoDB client, start the warm-up and follow the question-bank version."""
     await get_client()
+    await readiness.start()
+    await question_bank.start()
+    if write_behind_enabled():
+        await attempt_write_behind.start()
 
 
 @app.on_event("shutdown")
 async def shutdown() -> None:
-    """Tear down the MongoDB client on shutdown."""
+    """Stop background tasks, flush queued attempts and tear down the MongoDB client."""
+    await readiness.stop()
+    await attempt_write_behind.stop()
+    await question_bank.stop()
     await close_client()
 
 
@@ -48,4 +81,21 @@ async def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/ready", tags=["health"])
+async def readiness_probe(response: Response) -> dict[str, Any]:
+    """Readiness probe: MongoDB reachable, indexes bootstrapped, snapshot loaded and warmed."""
+    ready, checks = await readiness.check()
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "ready" if ready else "starting", "checks": checks}
+
+
+@app.get("/health/mongo", tags=["health"], dependencies=[Depends(require_admin_token)])
+async def mongo_pool_metrics() -> dict[str, Any]:
+    """Connection-pool saturation and per-command latency for the Motor client (admin only)."""
+    return mongo_metrics.snapshot()
+
+
 app.include_router(design_test_router)
+app.include_router(admin_router)
+app.include_router(results_router)
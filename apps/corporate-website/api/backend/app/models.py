@@ -154,27 +154,6 @@ class ApplicantSummary(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
 
-class ImageResult(BaseModel):
-    imageId: str
-    selectedScore: int | None = None
-    actualScore: int | None = None
-    error: float | None = None
-    closeness: float | None = None
-    excluded: bool = False
-
-    model_config = ConfigDict(extra="forbid")
-
-
-class QuestionResult(BaseModel):
-    questionNumber: int
-    questionType: QuestionType
-    closeness: float | None
-    mae: float | None
-    images: list[ImageResult]
-
-    model_config = ConfigDict(extra="forbid")
-
-
 class SubmissionBand(str, Enum):
     EXCELLENT = "Excellent"
     GOOD = "Good"
@@ -0,0 +1,273 @@
+"""In-process, versioned cache of the design-test question bank.
+
+The question bank only changes when ``seed/seed_test_items.py`` runs, so the
+validated documents and their public payloads are held in memory and served
+without touching storage. Documents come from the repository selected in
+:mod:`app.repository`. For MongoDB the seeder writes a version stamp into
+``question_bank_meta``; a background watcher follows that stamp through a
+change stream when the deployment supports one and falls back to polling
+otherwise. A new snapshot is only swapped in once it has been fully built.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic import TypeAdapter  # type: ignore
+from pymongo.errors import PyMongoError  # type: ignore
+
+from .models import (
+    BoostQuestionDocument,
+    PublicBoostQuestion,
+    PublicImage,
+    PublicQuestion,
+    PublicSelectionQuestion,
+    QuestionDocument,
+    SelectionQuestionDocument,
+)
+from .repository import QuestionBankRepository, repository_from_env
+from .scoring import ScoringPlan
+
+logger = logging.getLogger(__name__)
+
+SupplementalDocument = SelectionQuestionDocument | BoostQuestionDocument
+PublicSupplementalQuestion = PublicSelectionQuestion | PublicBoostQuestion
+
+_PUBLIC_QUESTIONS_ADAPTER = TypeAdapter(list[PublicQuestion])
+_PUBLIC_SUPPLEMENTAL_ADAPTER = TypeAdapter(list[PublicSupplementalQuestion])
+
+
+def _refresh_interval_seconds() -> float:
+    """Return the polling interval used when change streams are unavailable."""
+    return float(os.getenv("QUESTION_BANK_REFRESH_SECONDS", "30"))
+
+
+def deserialize_question(document: dict[str, Any]) -> QuestionDocument:
+    """Convert a raw MongoDB document into a strongly typed QuestionDocument."""
+    payload = dict(document)
+    object_id = payload.pop("_id", None)
+    if object_id is not None:
+        payload["id"] = str(object_id)
+    return QuestionDocument.model_validate(payload)
+
+
+def deserialize_supplemental(document: dict[str, Any]) -> SupplementalDocument | None:
+    """Validate a supplemental question document, ignoring unknown kinds."""
+    kind = document.get("kind")
+    if kind == "selection":
+        return SelectionQuestionDocument.model_validate(document)
+    if kind == "boost":
+        return BoostQuestionDocument.model_validate(document)
+    return None
+
+
+def question_to_public(question: QuestionDocument) -> PublicQuestion:
+    """Strip private fields to expose a public-friendly question payload."""
+    public_images = [
+        PublicImage(
+            imageId=image.imageId,
+            src=image.src,
+            imageType=image.imageType,
+            displayLabel=image.displayLabel,
+        )
+        for image in question.images
+    ]
+    return PublicQuestion(
+        questionNumber=question.questionNumber,
+        questionType=question.questionType,
+        images=public_images,
+    )
+
+
+def selection_to_public(doc: SelectionQuestionDocument) -> PublicSelectionQuestion:
+    """Expose a selection question in the public API schema."""
+    return PublicSelectionQuestion(
+        questionNumber=doc.questionNumber,
+        kind="selection",
+        prompt=doc.prompt,
+        options=doc.options,
+    )
+
+
+def boost_to_public(doc: BoostQuestionDocument) -> PublicBoostQuestion:
+    """Expose a boost question in the public API schema."""
+    return PublicBoostQuestion(
+        questionNumber=doc.questionNumber,
+        kind="boost",
+        prompt=doc.prompt,
+        options=doc.options,
+    )
+
+
+def supplemental_to_public(doc: SupplementalDocument) -> PublicSupplementalQuestion:
+    """Expose either supplemental question kind in the public API schema."""
+    if isinstance(doc, SelectionQuestionDocument):
+        return selection_to_public(doc)
+    return boost_to_public(doc)
+
+
+@dataclass(frozen=True)
+class EncodedPayload:
+    """JSON response body encoded once per snapshot, with its strong ETag."""
+
+    body: bytes
+    etag: str
+
+    @classmethod
+    def encode(cls, adapter: TypeAdapter[Any], value: Any) -> "EncodedPayload":
+        """Serialize ``value`` and derive the ETag from the encoded bytes."""
+        body = adapter.dump_json(value)
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+@dataclass(frozen=True)
+class QuestionBankSnapshot:
+    """Immutable view of the question bank at a given version."""
+
+    version: str | None
+    questions: tuple[QuestionDocument, ...]
+    supplemental: dict[int, SupplementalDocument]
+    public_questions: tuple[PublicQuestion, ...]
+    public_supplemental: tuple[PublicSupplementalQuestion, ...]
+    questions_payload: EncodedPayload
+    supplemental_payload: EncodedPayload
+    plan: ScoringPlan
+
+    @classmethod
+    def build(
+        cls,
+        *,
+        version: str | None,
+        questions: list[QuestionDocument],
+        supplemental: dict[int, SupplementalDocument],
+    ) -> "QuestionBankSnapshot":
+        """Assemble a snapshot and pre-build every public payload."""
+        ordered_questions = tuple(sorted(questions, key=lambda question: question.questionNumber))
+        ordered_supplemental = [supplemental[number] for number in sorted(supplemental)]
+        public_questions = [question_to_public(question) for question in ordered_questions]
+        public_supplemental = [supplemental_to_public(doc) for doc in ordered_supplemental]
+        return cls(
+            version=version,
+            questions=ordered_questions,
+            supplemental=dict(supplemental),
+            public_questions=tuple(public_questions),
+            public_supplemental=tuple(public_supplemental),
+            questions_payload=EncodedPayload.encode(_PUBLIC_QUESTIONS_ADAPTER, public_questions),
+            supplemental_payload=EncodedPayload.encode(
+                _PUBLIC_SUPPLEMENTAL_ADAPTER, public_supplemental
+            ),
+            plan=ScoringPlan.compile(ordered_questions, supplemental),
+        )
+
+
+async def load_snapshot(repository: QuestionBankRepository) -> QuestionBankSnapshot:
+    """Read and validate the full question bank from ``repository``."""
+    version = await repository.fetch_version()
+    questions = [deserialize_question(document) for document in await repository.fetch_questions()]
+
+    supplemental: dict[int, SupplementalDocument] = {}
+    for raw in await repository.fetch_supplemental():
+        doc = deserialize_supplemental(raw)
+        if doc is not None:
+            supplemental[doc.questionNumber] = doc
+
+    return QuestionBankSnapshot.build(version=version, questions=questions, supplemental=supplemental)
+
+
+class QuestionBankCache:
+    """Serve the question bank from memory and follow the seed version stamp."""
+
+    def __init__(self, repository: QuestionBankRepository | None = None) -> None:
+        self._repository = repository
+        self._snapshot: QuestionBankSnapshot | None = None
+        self._lock = asyncio.Lock()
+        self._watcher: asyncio.Task[None] | None = None
+
+    @property
+    def repository(self) -> QuestionBankRepository:
+        """Return the backing repository, resolving ``QUESTION_BANK_BACKEND`` on first use."""
+        if self._repository is None:
+            self._repository = repository_from_env()
+        return self._repository
+
+    def use_repository(self, repository: QuestionBankRepository) -> None:
+        """Switch to another backend and drop the cached snapshot."""
+        self._repository = repository
+        self.invalidate()
+
+    @property
+    def snapshot(self) -> QuestionBankSnapshot | None:
+        """Return the current snapshot without loading one."""
+        return self._snapshot
+
+    async def get(self) -> QuestionBankSnapshot:
+        """Return the cached snapshot, loading it on first use."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        async with self._lock:
+            if self._snapshot is None:
+                self._snapshot = await load_snapshot(self.repository)
+            return self._snapshot
+
+    async def refresh(self, *, force: bool = False) -> QuestionBankSnapshot:
+        """Reload the snapshot when the stored version differs from the cached one.
+
+        Deployments seeded before version stamps existed have no stamp; their
+        snapshot is reloaded on every refresh so edits are still picked up.
+        """
+        async with self._lock:
+            current = self._snapshot
+            if not force and current is not None and current.version is not None:
+                if await self.repository.fetch_version() == current.version:
+                    return current
+            snapshot = await load_snapshot(self.repository)
+            if current is None or snapshot.version != current.version:
+                logger.info("Loaded question bank version %s", snapshot.version)
+            self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self) -> None:
+        """Drop the cached snapshot so the next read reloads it."""
+        self._snapshot = None
+
+    async def start(self) -> None:
+        """Start the background task that follows the version stamp."""
+        if self._watcher is None and not self.repository.static:
+            self._watcher = asyncio.create_task(self._watch(), name="question-bank-watcher")
+
+    async def stop(self) -> None:
+        """Cancel the background watcher."""
+        watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            watcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await watcher
+
+    async def _watch(self) -> None:
+        """Follow the version stamp via the repository, or poll when it cannot push."""
+        while True:
+            try:
+                if self.repository.can_watch:
+                    async for _change in self.repository.watch_version():
+                        await self.refresh()
+                    if not self.repository.can_watch:
+                        logger.info("Change streams unavailable; polling question bank version")
+                else:
+                    await asyncio.sleep(_refresh_interval_seconds())
+                    await self.refresh()
+            except PyMongoError as exc:
+                logger.warning("Question bank watcher failed: %s", exc)
+                await asyncio.sleep(_refresh_interval_seconds())
+            except Exception:  # noqa: BLE001 - keep serving the last good snapshot
+                logger.exception("Question bank refresh failed")
+                await asyncio.sleep(_refresh_interval_seconds())
+
+
+question_bank = QuestionBankCache()
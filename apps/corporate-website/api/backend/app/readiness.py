@@ -0,0 +1,176 @@
+"""Boot-time warm-up and the readiness checks behind ``/ready``.
+
+Startup launches :func:`warm_up` in the background, so ``/health`` (liveness)
+answers immediately while ``/ready`` reports 503 until the pod can serve at
+steady-state latency:
+
+1. MongoDB answers a ``ping`` (which also opens the first pooled connection).
+2. Indexes are bootstrapped.
+3. The question-bank snapshot is loaded; its public payloads are encoded
+   as part of the snapshot build.
+4. One synthetic submission is run through request validation, scoring,
+   attempt-document building and response encoding, so first-call costs
+   (lazy imports, validator and serializer set-up, NumPy dispatch) are paid
+   before traffic arrives. Nothing is written.
+
+A failed step is retried with backoff instead of crashing the process.
+``/ready`` repeats the ping on every call so a pod that loses MongoDB is
+taken out of rotation. ``READINESS_PING_TIMEOUT_MS`` bounds that ping.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+from pymongo.errors import PyMongoError  # type: ignore
+
+from .db import ensure_indexes, get_client
+from .models import TestSubmissionRequest
+from .question_bank import QuestionBankSnapshot, question_bank
+from .scoring import ScoringError
+from .submissions import build_attempt_document, submission_response
+
+logger = logging.getLogger(__name__)
+
+_MAX_RETRY_DELAY_SECONDS = 30.0
+
+
+class WarmUpError(RuntimeError):
+    """Raised when a warm-up step cannot complete yet."""
+
+
+def _describe(exc: BaseException) -> str:
+    return f"{type(exc).__name__}: {exc}" if str(exc) else type(exc).__name__
+
+
+def _ping_timeout_seconds() -> float:
+    """Return the time budget for the readiness ping."""
+    return int(os.getenv("READINESS_PING_TIMEOUT_MS", "1000")) / 1000
+
+
+async def ping_mongo() -> None:
+    """Round-trip a ``ping`` to MongoDB within the readiness budget."""
+    client = await get_client()
+    await asyncio.wait_for(client.admin.command("ping"), timeout=_ping_timeout_seconds())
+
+
+def exercise_hot_path(snapshot: QuestionBankSnapshot) -> None:
+    """Validate, score and encode one synthetic submission without persisting it."""
+    responses = [
+        {"imageId": image.imageId, "selectedScore": image.actualScore}
+        for question in snapshot.questions
+        for image in question.images
+    ]
+    choices = [
+        {"questionNumber": document.questionNumber, "optionId": document.options[0].optionId}
+        for document in snapshot.supplemental.values()
+        if document.options
+    ]
+    payload = TestSubmissionRequest.model_validate(
+        {
+            "sessionId": "readiness-warm-up",
+            "applicant": {"name": "Warm Up", "email": "warm-up@example.com"},
+            "responses": responses or [{"imageId": "warm-up", "selectedScore": 0}],
+            "choices": choices,
+        }
+    )
+    scored = snapshot.plan.score(
+        {item.imageId: item.selectedScore for item in payload.responses},
+        {item.questionNumber: item.optionId for item in payload.choices},
+    )
+    result, _document = build_attempt_document(
+        payload, scored, attempt_number=1, now=datetime.now(timezone.utc)
+    )
+    submission_response(result)
+
+
+@dataclass
+class Readiness:
+    """Progress of the boot-time warm-up."""
+
+    mongo: bool = False
+    indexes: bool = False
+    snapshot: bool = False
+    warmed: bool = False
+    last_error: str | None = None
+    _task: asyncio.Task[None] | None = field(default=None, repr=False)
+
+    @property
+    def complete(self) -> bool:
+        return self.mongo and self.indexes and self.snapshot and self.warmed
+
+    async def _step(self) -> None:
+        if not self.mongo:
+            await ping_mongo()
+            self.mongo = True
+        if not self.indexes:
+            await ensure_indexes()
+            self.indexes = True
+        # After a failure, re-read in case the bank was seeded in the meantime.
+        snapshot = await (question_bank.refresh() if self.last_error else question_bank.get())
+        if not snapshot.questions:
+            raise WarmUpError("question bank is empty; run the seeder")
+        self.snapshot = True
+        if not self.warmed:
+            exercise_hot_path(snapshot)
+            self.warmed = True
+
+    async def warm_up(self) -> None:
+        """Run every warm-up step, retrying failures with backoff until all succeed."""
+        delay = 1.0
+        while not self.complete:
+            try:
+                await self._step()
+            except (PyMongoError, asyncio.TimeoutError, ScoringError, WarmUpError) as exc:
+                self.last_error = _describe(exc)
+            except Exception as exc:  # noqa: BLE001 - keep retrying; /ready reports it
+                self.last_error = _describe(exc)
+                logger.exception("Warm-up step failed")
+            else:
+                self.last_error = None
+                logger.info("Warm-up complete; ready for traffic")
+                return
+            logger.warning("Warm-up incomplete (%s); retrying in %.0fs", self.last_error, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _MAX_RETRY_DELAY_SECONDS)
+
+    async def start(self) -> None:
+        """Run the warm-up in the background so liveness is not blocked on MongoDB."""
+        if self._task is None and not self.complete:
+            self._task = asyncio.create_task(self.warm_up(), name="readiness-warm-up")
+
+    async def stop(self) -> None:
+        """Cancel an unfinished warm-up."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def check(self) -> tuple[bool, dict[str, Any]]:
+        """Re-check MongoDB and the snapshot; return readiness and per-check detail."""
+        checks: dict[str, Any] = {
+            "mongo": True,
+            "indexes": self.indexes,
+            "snapshot": self.snapshot and question_bank.snapshot is not None,
+            "warmed": self.warmed,
+        }
+        try:
+            await ping_mongo()
+        except (PyMongoError, asyncio.TimeoutError) as exc:
+            checks["mongo"] = False
+            checks["error"] = _describe(exc)
+        else:
+            if self.last_error and not self.complete:
+                checks["error"] = self.last_error
+        ready = all(checks[name] for name in ("mongo", "indexes", "snapshot", "warmed"))
+        return ready, checks
+
+
+readiness = Readiness()
@@ -0,0 +1,172 @@
+"""Storage backends for the read-only question bank.
+
+The question-bank cache reads through a :class:`QuestionBankRepository`.
+``QUESTION_BANK_BACKEND`` selects the implementation:
+
+- ``mongo`` (default): the ``get_*_collection`` helpers in :mod:`app.db`.
+- ``memory``: an immutable in-process snapshot, loaded either from a JSON
+  file (``QUESTION_BANK_SNAPSHOT``, shaped like ``{"questions": [...],
+  "supplemental": [...]}``) or built from the seed assets in
+  ``QUESTION_BANK_PUBLIC_DIR`` exactly as the seeder would store them. Reads
+  never leave the process, which suits tiny deployments and offline
+  benchmarks of the scoring path.
+
+Applicant and attempt data always live in MongoDB.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, AsyncIterator, Protocol
+
+from pymongo.errors import OperationFailure  # type: ignore
+
+from .db import (
+    get_question_bank_meta_collection,
+    get_questions_collection,
+    get_supplemental_questions_collection,
+)
+from .seed_documents import build_seed_documents, build_supplemental_documents
+
+QUESTION_BANK_VERSION_ID = "question_bank"
+
+# Server error codes returned when change streams are unavailable (standalone
+# servers and deployments without a replica set).
+_CHANGE_STREAM_UNSUPPORTED_CODES = {40573, 40324}
+
+
+class QuestionBankRepository(Protocol):
+    """Read access to question and supplemental documents plus their version."""
+
+    #: True when the data can never change for the lifetime of the process.
+    static: bool
+
+    #: True while :meth:`watch_version` can push changes; callers poll
+    #: :meth:`fetch_version` once it is False.
+    can_watch: bool
+
+    async def fetch_version(self) -> str | None:
+        """Return the current version stamp, if the backend keeps one."""
+        ...
+
+    async def fetch_questions(self) -> list[dict[str, Any]]:
+        """Return raw question documents."""
+        ...
+
+    async def fetch_supplemental(self) -> list[dict[str, Any]]:
+        """Return raw supplemental question documents."""
+        ...
+
+    def watch_version(self) -> AsyncIterator[None]:
+        """Yield whenever the version stamp may have changed.
+
+        Ends without yielding, and clears ``can_watch``, when the backend
+        turns out not to support pushing changes.
+        """
+        ...
+
+
+class MotorQuestionBankRepository:
+    """Question bank stored in MongoDB and stamped by the seeder."""
+
+    static = False
+    can_watch = True
+
+    async def fetch_version(self) -> str | None:
+        meta = await get_question_bank_meta_collection()
+        document = await meta.find_one({"_id": QUESTION_BANK_VERSION_ID}, {"version": 1})
+        if not document or document.get("version") is None:
+            return None
+        return str(document["version"])
+
+    async def fetch_questions(self) -> list[dict[str, Any]]:
+        collection = await get_questions_collection()
+        return [document async for document in collection.find()]
+
+    async def fetch_supplemental(self) -> list[dict[str, Any]]:
+        collection = await get_supplemental_questions_collection()
+        return [document async for document in collection.find()]
+
+    async def watch_version(self) -> AsyncIterator[None]:
+        meta = await get_question_bank_meta_collection()
+        pipeline = [{"$match": {"documentKey._id": QUESTION_BANK_VERSION_ID}}]
+        try:
+            async with meta.watch(pipeline) as stream:
+                # Cover stamps written between the caller's last read and the stream opening.
+                yield None
+                async for _change in stream:
+                    yield None
+        except OperationFailure as exc:
+            if exc.code not in _CHANGE_STREAM_UNSUPPORTED_CODES:
+                raise
+            self.can_watch = False
+
+
+class InMemoryQuestionBankRepository:
+    """Immutable question bank held in process memory."""
+
+    static = True
+    can_watch = False
+
+    def __init__(
+        self,
+        questions: list[dict[str, Any]],
+        supplemental: list[dict[str, Any]],
+        *,
+        version: str | None = None,
+    ) -> None:
+        self._questions = copy.deepcopy(questions)
+        self._supplemental = copy.deepcopy(supplemental)
+        if version is None:
+            encoded = json.dumps(
+                {"questions": self._questions, "supplemental": self._supplemental},
+                sort_keys=True,
+                default=str,
+            )
+            version = hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+        self._version = version
+
+    @classmethod
+    def from_json(cls, path: Path) -> "InMemoryQuestionBankRepository":
+        """Load a ``{"questions": [...], "supplemental": [...]}`` snapshot file."""
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        return cls(payload["questions"], payload["supplemental"], version=payload.get("version"))
+
+    @classmethod
+    def from_seed(cls, public_dir: Path) -> "InMemoryQuestionBankRepository":
+        """Build the snapshot from seed assets the same way the seeder stores them."""
+        questions, _images = build_seed_documents(public_dir)
+        return cls(questions, build_supplemental_documents())
+
+    async def fetch_version(self) -> str | None:
+        return self._version
+
+    async def fetch_questions(self) -> list[dict[str, Any]]:
+        return self._questions
+
+    async def fetch_supplemental(self) -> list[dict[str, Any]]:
+        return self._supplemental
+
+    async def watch_version(self) -> AsyncIterator[None]:
+        """Yield nothing: the snapshot never changes."""
+        for _change in ():
+            yield None
+
+
+def repository_from_env() -> QuestionBankRepository:
+    """Build the repository selected by ``QUESTION_BANK_BACKEND``."""
+    backend = os.getenv("QUESTION_BANK_BACKEND", "mongo").strip().lower()
+    if backend == "mongo":
+        return MotorQuestionBankRepository()
+    if backend == "memory":
+        snapshot_path = os.getenv("QUESTION_BANK_SNAPSHOT")
+        if snapshot_path:
+            return InMemoryQuestionBankRepository.from_json(Path(snapshot_path))
+        return InMemoryQuestionBankRepository.from_seed(
+            Path(os.getenv("QUESTION_BANK_PUBLIC_DIR", "public"))
+        )
+    raise RuntimeError(f"Unknown QUESTION_BANK_BACKEND {backend!r}; expected 'mongo' or 'memory'.")
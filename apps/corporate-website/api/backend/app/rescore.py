@@ -0,0 +1,169 @@
+"""Re-score stored attempts against the current answer key.
+
+Run after changing an ``actualScore`` or a boost value and re-seeding::
+
+    python -m app.rescore --chunk-size 2000
+
+Attempts are streamed from MongoDB in chunks, scored as one NumPy batch per
+chunk and written back with a single unordered ``bulk_write`` per chunk, so
+memory stays bounded by the chunk size regardless of collection size.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne  # type: ignore
+
+from .db import close_client, get_attempts_collection
+from .models import SubmissionBand
+from .question_bank import question_bank
+from .scoring import ROLE_QUESTION_NUMBER, SCENARIO_QUESTION_NUMBER, ScoringPlan
+
+DEFAULT_CHUNK_SIZE = 1000
+
+_ATTEMPT_PROJECTION = {
+    "imageQuestions.images.imageId": 1,
+    "imageQuestions.images.selectedScore": 1,
+    "scenarioQuestion.selectedOption": 1,
+    "rolePreference.selectedOption": 1,
+}
+
+
+@dataclass
+class RescoreSummary:
+    """Counters reported by a re-score run."""
+
+    scanned: int = 0
+    updated: int = 0
+    skipped: int = 0
+    dryRun: bool = False
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the summary as a JSON-friendly dict."""
+        return asdict(self)
+
+
+def _submission_from_attempt(attempt: dict[str, Any]) -> tuple[dict[str, int], dict[int, str]]:
+    """Recover the original responses and choices from a stored attempt."""
+    responses = {
+        image["imageId"]: image["selectedScore"]
+        for question in attempt.get("imageQuestions") or []
+        for image in question.get("images") or []
+        if image.get("selectedScore") is not None
+    }
+    choices: dict[int, str] = {}
+    scenario = attempt.get("scenarioQuestion") or {}
+    if scenario.get("selectedOption"):
+        choices[SCENARIO_QUESTION_NUMBER] = scenario["selectedOption"]
+    role = attempt.get("rolePreference") or {}
+    if role.get("selectedOption"):
+        choices[ROLE_QUESTION_NUMBER] = role["selectedOption"]
+    return responses, choices
+
+
+def _build_updates(
+    plan: ScoringPlan,
+    attempts: list[dict[str, Any]],
+    *,
+    now: datetime,
+) -> tuple[list[UpdateOne], int]:
+    """Score a chunk of attempts and return update operations plus the skip count."""
+    selected, scenario_choice, role_choice = plan.encode(
+        _submission_from_attempt(attempt) for attempt in attempts
+    )
+    scores = plan.score_batch(selected, scenario_choice, role_choice)
+    correct_value = int(plan.correct_selection_value())
+
+    operations: list[UpdateOne] = []
+    skipped = 0
+    for row, attempt in enumerate(attempts):
+        if not scores.valid[row]:
+            skipped += 1
+            continue
+        overall = float(scores.overall_closeness[row])
+        operations.append(
+            UpdateOne(
+                {"_id": attempt["_id"]},
+                {
+                    "$set": {
+                        "overallCloseness": overall,
+                        "overallClosenessPct": round(overall * 100, 1),
+                        "baseCloseness": float(scores.base_closeness[row]),
+                        "mae": float(scores.mae[row]),
+                        "band": SubmissionBand.from_score(overall).value,
+                        "imageQuestions": plan.image_questions_document(scores, row),
+                        "scenarioQuestion.selectedValue": int(
+                            plan.selection_values[scenario_choice[row]]
+                        ),
+                        "scenarioQuestion.correctValue": correct_value,
+                        "scenarioQuestion.error": int(scores.scenario_error[row]),
+                        "scenarioQuestion.closeness": float(scores.scenario_closeness[row]),
+                        "rolePreference.boost": float(plan.boost_values[role_choice[row]]),
+                        "boostMultiplier": float(scores.boost_multiplier[row]),
+                        "rescoredAt": now,
+                    }
+                },
+            )
+        )
+    return operations, skipped
+
+
+async def rescore_attempts(
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    dry_run: bool = False,
+) -> RescoreSummary:
+    """Re-score every stored attempt against the latest question bank."""
+    snapshot = await question_bank.refresh(force=True)
+    plan = snapshot.plan
+    attempts_collection = await get_attempts_collection()
+    now = datetime.now(timezone.utc)
+    summary = RescoreSummary(dryRun=dry_run)
+
+    async def flush(chunk: list[dict[str, Any]]) -> None:
+        operations, skipped = _build_updates(plan, chunk, now=now)
+        summary.scanned += len(chunk)
+        summary.skipped += skipped
+        if operations and not dry_run:
+            result = await attempts_collection.bulk_write(operations, ordered=False)
+            summary.updated += result.modified_count
+        elif dry_run:
+            summary.updated += len(operations)
+
+    chunk: list[dict[str, Any]] = []
+    cursor = attempts_collection.find({}, _ATTEMPT_PROJECTION, batch_size=chunk_size)
+    async for attempt in cursor:
+        chunk.append(attempt)
+        if len(chunk) >= chunk_size:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+    return summary
+
+
+async def _main(chunk_size: int, dry_run: bool) -> None:
+    """CLI body: run the re-score and print the summary."""
+    try:
+        summary = await rescore_attempts(chunk_size=chunk_size, dry_run=dry_run)
+        print(
+            f"Scanned {summary.scanned} attempts, updated {summary.updated}, "
+            f"skipped {summary.skipped}{' (dry run)' if dry_run else ''}."
+        )
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(_main(args.chunk_size, args.dry_run))
@@ -0,0 +1,37 @@
+"""Administrative routes for the Design Sense assessment API."""
+
+from __future__ import annotations
+
+import os
+import secrets
+from typing import Any
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+
+from ..rescore import DEFAULT_CHUNK_SIZE, rescore_attempts
+
+
+def require_admin_token(x_admin_token: str | None = Header(default=None)) -> None:
+    """Gate admin routes behind ADMIN_API_TOKEN; they are hidden when it is unset."""
+    expected = os.getenv("ADMIN_API_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin token.")
+
+
+router = APIRouter(
+    prefix="/api/design-test/admin",
+    tags=["design-test-admin"],
+    dependencies=[Depends(require_admin_token)],
+)
+
+
+@router.post("/rescore")
+async def rescore(
+    chunk_size: int = Query(default=DEFAULT_CHUNK_SIZE, alias="chunkSize", ge=1, le=10_000),
+    dry_run: bool = Query(default=False, alias="dryRun"),
+) -> dict[str, Any]:
+    """Re-score every stored attempt against the current answer key."""
+    summary = await rescore_attempts(chunk_size=chunk_size, dry_run=dry_run)
+    return summary.as_dict()
@@ -2,386 +2,248 @@
 
 from __future__ import annotations
 
+import asyncio
+import logging
+import os
 from datetime import datetime, timezone
-from statistics import mean
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from minkowski_instrumentation import span
+from pymongo import ReturnDocument  # type: ignore
+from pymongo.errors import DuplicateKeyError  # type: ignore
 
-from ..db import (
-    get_applicants_collection,
-    get_attempts_collection,
-    get_images_collection,
-    get_questions_collection,
-    get_supplemental_questions_collection,
-)
+from ..db import get_applicants_collection, get_attempts_collection
 from ..models import (
     ApplicantInput,
     ApplicantSummary,
-    ImageDocument,
-    ImageResult,
     PublicBoostQuestion,
-    PublicImage,
     PublicQuestion,
-    QuestionDocument,
-    QuestionResult,
-    QuestionType,
-    BoostQuestionDocument,
     PublicSelectionQuestion,
-    SelectionQuestionDocument,
     SubmissionBand,
-    SubmissionMetadata,
     SubmissionResult,
     TestSubmissionRequest,
 )
+from ..question_bank import EncodedPayload, question_bank
+from ..scoring import ScoringError
+from ..submissions import build_attempt_document, submission_response
+from ..write_behind import attempt_write_behind, mongo_timeout, write_behind_enabled
 
-router = APIRouter(prefix="/api/design-test", tags=["design-test"])
-
+logger = logging.getLogger(__name__)
 
-def _deserialize_question(document: dict[str, Any]) -> QuestionDocument:
-    """Convert a raw MongoDB document into a strongly typed QuestionDocument."""
-    payload = dict(document)
-    object_id = payload.pop("_id", None)
-    if object_id is not None:
-        payload["id"] = str(object_id)
-    return QuestionDocument.model_validate(payload)
+router = APIRouter(prefix="/api/design-test", tags=["design-test"])
 
 
-def _question_to_public(question: QuestionDocument) -> PublicQuestion:
-    """Strip private fields to expose a public-friendly question payload."""
-    public_images = [
-        PublicImage(
-            imageId=image.imageId,
-            src=image.src,
-            imageType=image.imageType,
-            displayLabel=image.displayLabel,
-        )
-        for image in question.images
-    ]
-    return PublicQuestion(
-        questionNumber=question.questionNumber,
-        questionType=question.questionType,
-        images=public_images,
+def _cache_control() -> str:
+    """Return the Cache-Control policy for the shared question-bank payloads."""
+    return os.getenv(
+        "QUESTION_BANK_CACHE_CONTROL",
+        "public, max-age=60, stale-while-revalidate=300",
     )
 
 
-async def _fetch_supplemental_docs() -> dict[int, SelectionQuestionDocument | BoostQuestionDocument]:
-    """Load supplemental selection/boost questions keyed by question number."""
-    collection = await get_supplemental_questions_collection()
-    supplemental: dict[int, SelectionQuestionDocument | BoostQuestionDocument] = {}
-    async for raw in collection.find():
-        kind = raw.get("kind")
-        if kind == "selection":
-            doc = SelectionQuestionDocument.model_validate(raw)
-        elif kind == "boost":
-            doc = BoostQuestionDocument.model_validate(raw)
-        else:
-            continue
-        supplemental[doc.questionNumber] = doc
-    return supplemental
-
-
-def _selection_to_public(doc: SelectionQuestionDocument) -> PublicSelectionQuestion:
-    """Expose a selection question in the public API schema."""
-    return PublicSelectionQuestion(
-        questionNumber=doc.questionNumber,
-        kind="selection",
-        prompt=doc.prompt,
-        options=doc.options,
-    )
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Apply the weak comparison RFC 9110 prescribes for If-None-Match."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
 
 
-def _boost_to_public(doc: BoostQuestionDocument) -> PublicBoostQuestion:
-    """Expose a boost question in the public API schema."""
-    return PublicBoostQuestion(
-        questionNumber=doc.questionNumber,
-        kind="boost",
-        prompt=doc.prompt,
-        options=doc.options,
-    )
+def _cached_json_response(request: Request, payload: EncodedPayload) -> Response:
+    """Send pre-encoded JSON, or 304 when the client already holds this version."""
+    headers = {"ETag": payload.etag, "Cache-Control": _cache_control()}
+    if _etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
 
 
 @router.get("/questions", response_model=list[PublicQuestion])
-async def list_questions() -> list[PublicQuestion]:
+async def list_questions(request: Request) -> Response:
     """Return all assessment questions in display order."""
-    collection = await get_questions_collection()
-    cursor = collection.find().sort("questionNumber", 1)
-    questions: list[PublicQuestion] = []
-    async for doc in cursor:
-        question = _deserialize_question(doc)
-        questions.append(_question_to_public(question))
-    return questions
+    snapshot = await question_bank.get()
+    return _cached_json_response(request, snapshot.questions_payload)
 
 
 @router.get("/supplemental", response_model=list[PublicSelectionQuestion | PublicBoostQuestion])
-async def list_supplemental_questions() -> list[PublicSelectionQuestion | PublicBoostQuestion]:
+async def list_supplemental_questions(request: Request) -> Response:
     """Return supplemental questions (selection + boost) in order."""
-    docs = await _fetch_supplemental_docs()
-    result: list[PublicSelectionQuestion | PublicBoostQuestion] = []
-    for question_number in sorted(docs.keys()):
-        doc = docs[question_number]
-        if isinstance(doc, SelectionQuestionDocument):
-            result.append(_selection_to_public(doc))
-        elif isinstance(doc, BoostQuestionDocument):
-            result.append(_boost_to_public(doc))
-    return result
-
-
-async def _ensure_applicant(applicant: ApplicantInput, *, now: datetime) -> tuple[dict[str, Any] | None, int]:
-    """Fetch an existing applicant by email and return their next attempt number."""
-    applicants = await get_applicants_collection()
-    normalized_email = applicant.email.lower()
-    existing = await applicants.find_one({"email": normalized_email})
-    if existing:
-        attempt_number = int(existing.get("attemptCount", 0)) + 1
-        return existing, attempt_number
-    return None, 1
-
-
-async def _update_applicant(
+    snapshot = await question_bank.get()
+    return _cached_json_response(request, snapshot.supplemental_payload)
+
+
+async def _find_existing_attempt(session_id: str, normalized_email: str) -> dict[str, Any] | None:
+    """Return a previously stored (or still queued) attempt for this session, if any.
+
+    In write-behind mode the MongoDB read is bounded by ``mongo_timeout()``.
+    A lookup that times out is skipped: the idempotent claim and the unique
+    index still keep a retried session to one attempt.
+    """
+    if write_behind_enabled():
+        queued = attempt_write_behind.pending(session_id, normalized_email)
+        if queued is not None:
+            return queued
+    attempts = await get_attempts_collection()
+    lookup = attempts.find_one({"sessionId": session_id, "applicantEmail": normalized_email})
+    if not write_behind_enabled():
+        return await lookup
+    try:
+        return await asyncio.wait_for(lookup, mongo_timeout())
+    except asyncio.TimeoutError:
+        logger.warning("Attempt dedupe lookup timed out; relying on the unique index")
+        return None
+
+
+async def _claim_attempt_number(
     applicant: ApplicantInput,
-    attempt_number: int,
+    session_id: str,
     *,
     now: datetime,
-) -> None:
-    """Upsert applicant metadata with the latest attempt information."""
+) -> int | None:
+    """Atomically assign the applicant's next attempt number to this session.
+
+    The claim is idempotent per session: the ``lastSessionId`` guard makes a
+    second claim by the same session miss the filter, the upsert collides
+    with the unique email index, and the number already claimed is returned
+    instead of a new one. A retry after a failed attempt insert therefore
+    reuses its number, and a concurrent duplicate is resolved by the unique
+    ``(sessionId, applicantEmail)`` index on insert. ``None`` means another
+    session took over the applicant document in between.
+    """
     applicants = await get_applicants_collection()
     normalized_email = applicant.email.lower()
-    update_payload = {
-        "name": applicant.name,
-        "updatedAt": now,
-        "attemptCount": attempt_number,
-    }
-    result = await applicants.update_one(
-        {"email": normalized_email},
-        {
-            "$set": update_payload,
-            "$setOnInsert": {
-                "email": normalized_email,
-                "createdAt": now,
-            },
-        },
-        upsert=True,
+    # Two first-time sessions for one applicant can race on the upsert; the
+    # retry matches the winner's document, while a duplicate of this session
+    # collides again.
+    for _ in range(2):
+        try:
+            document = await applicants.find_one_and_update(
+                {"email": normalized_email, "lastSessionId": {"$ne": session_id}},
+                {
+                    "$inc": {"attemptCount": 1},
+                    "$set": {
+                        "name": applicant.name,
+                        "updatedAt": now,
+                        "lastSessionId": session_id,
+                    },
+                    "$setOnInsert": {"createdAt": now},
+                },
+                projection={"attemptCount": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            claimed = await applicants.find_one(
+                {"email": normalized_email, "lastSessionId": session_id},
+                projection={"attemptCount": 1},
+            )
+            if claimed is not None:
+                return int(claimed["attemptCount"])
+            continue
+        return int(document["attemptCount"])
+    return None
+
+
+async def _insert_attempt(document: dict[str, Any]) -> dict[str, Any] | None:
+    """Persist a scored attempt, returning the stored one if the session already exists.
+
+    In write-behind mode the attempt is only journaled here; duplicates are
+    resolved by the unique index when the journal is drained.
+    """
+    if write_behind_enabled():
+        await attempt_write_behind.enqueue(document)
+        return None
+    attempts = await get_attempts_collection()
+    try:
+        await attempts.insert_one(document)
+    except DuplicateKeyError:
+        return await _find_existing_attempt(document["sessionId"], document["applicantEmail"])
+    return None
+
+
+def _result_from_attempt(attempt: dict[str, Any]) -> SubmissionResult:
+    """Rebuild the public summary from a stored attempt document.
+
+    Stored attempts were validated on the way in, so the models are
+    constructed without validating again.
+    """
+    return SubmissionResult.model_construct(
+        applicant=ApplicantSummary.model_construct(
+            name=attempt.get("applicantName"),
+            email=attempt.get("applicantEmail"),
+        ),
+        attemptNumber=attempt.get("attemptNumber", 1),
+        sessionId=attempt.get("sessionId"),
+        overallCloseness=attempt.get("overallCloseness", 0.0),
+        overallClosenessPct=attempt.get("overallClosenessPct", 0.0),
+        band=SubmissionBand(attempt.get("band", SubmissionBand.NEEDS_WORK.value)),
     )
-    if result.matched_count == 0 and result.upserted_id is None:
-        raise RuntimeError("Failed to upsert applicant document")
-
-
-def _compute_band(score: float) -> SubmissionBand:
-    """Translate a score into a qualitative band."""
-    return SubmissionBand.from_score(score)
-
-
-def _mean(values: list[float]) -> float:
-    """Safe mean helper that tolerates empty lists."""
-    return float(mean(values)) if values else 0.0
 
 
 @router.post("/submit", response_model=SubmissionResult, status_code=status.HTTP_201_CREATED)
-async def submit_results(payload: TestSubmissionRequest) -> SubmissionResult:
-    """Compute the applicant's score, persist the attempt, and return the summary."""
+async def submit_results(payload: TestSubmissionRequest) -> Response:
+    """Compute the applicant's score, persist the attempt, and return the summary.
+
+    Idempotency rests on the unique ``(sessionId, applicantEmail)`` and
+    ``email`` indexes: the dedupe lookup is a single indexed read, attempt
+    numbers come from one atomic ``$inc``, and a racing duplicate that slips
+    past the lookup is resolved by the insert's duplicate-key error.
+
+    With write-behind only the insert leaves the request path; the lookup
+    and the ``$inc`` still wait on MongoDB, each for at most
+    ``mongo_timeout()``, and a claim that times out answers 503.
+    """
     now = datetime.now(timezone.utc)
     normalized_email = payload.applicant.email.lower()
-    attempts_collection = await get_attempts_collection()
 
-    existing_attempt = await attempts_collection.find_one(
-        {"sessionId": payload.sessionId, "applicantEmail": normalized_email}
-    )
+    with span("submit.dedupe"):
+        existing_attempt = await _find_existing_attempt(payload.sessionId, normalized_email)
     if existing_attempt:
-        return SubmissionResult.model_validate(
-            {
-                "applicant": {
-                    "name": existing_attempt.get("applicantName"),
-                    "email": existing_attempt.get("applicantEmail"),
-                },
-                "attemptNumber": existing_attempt.get("attemptNumber", 1),
-                "sessionId": existing_attempt.get("sessionId"),
-                "overallCloseness": existing_attempt.get("overallCloseness", 0.0),
-                "overallClosenessPct": existing_attempt.get("overallClosenessPct", 0.0),
-                "band": existing_attempt.get("band", SubmissionBand.NEEDS_WORK.value),
-            }
-        )
-
-    applicant_doc, attempt_number = await _ensure_applicant(payload.applicant, now=now)
+        return submission_response(_result_from_attempt(existing_attempt))
 
+    snapshot = await question_bank.get()
     response_map = {item.imageId: item.selectedScore for item in payload.responses}
     choice_map = {item.questionNumber: item.optionId for item in payload.choices}
 
-    if 9 not in choice_map or 10 not in choice_map:
-        raise HTTPException(status_code=400, detail="Additional questions 9 and 10 are required.")
-
-    supplemental_docs = await _fetch_supplemental_docs()
-
-    questions_collection = await get_questions_collection()
-    question_cursor = questions_collection.find().sort("questionNumber", 1)
-    questions: list[QuestionDocument] = []
-    async for document in question_cursor:
-        questions.append(_deserialize_question(document))
-
-    image_ids = list(response_map.keys())
-    images_collection = await get_images_collection()
-    images_cursor = images_collection.find({"imageId": {"$in": image_ids}})
-    actual_score_map: dict[str, ImageDocument] = {}
-    async for image_doc in images_cursor:
-        actual_image = ImageDocument.model_validate(image_doc)
-        actual_score_map[actual_image.imageId] = actual_image
-
-    question_results: list[QuestionResult] = []
-    all_closeness: list[float] = []
-    all_errors: list[float] = []
-    scenario_summary: dict[str, Any] | None = None
-
-    for question in questions:
-        images: list[ImageResult] = []
-        question_closeness: list[float] = []
-        question_errors: list[float] = []
-
-        for image in question.images:
-            response = response_map.get(image.imageId)
-            actual = actual_score_map.get(image.imageId)
-
-            if response is None or actual is None:
-                images.append(
-                    ImageResult(
-                        imageId=image.imageId,
-                        selectedScore=response,
-                        actualScore=actual.actualScore if actual else None,
-                        excluded=True,
-                    )
-                )
-                continue
-
-            error = abs(response - actual.actualScore)
-            closeness = 1 - (error / 2)
-            images.append(
-                ImageResult(
-                    imageId=image.imageId,
-                    selectedScore=response,
-                    actualScore=actual.actualScore,
-                    error=error,
-                    closeness=closeness,
-                    excluded=False,
-                )
-            )
-            question_closeness.append(closeness)
-            question_errors.append(error)
-            all_closeness.append(closeness)
-            all_errors.append(error)
-
-        question_results.append(
-            QuestionResult(
-                questionNumber=question.questionNumber,
-                questionType=question.questionType,
-                closeness=_mean(question_closeness) if question_closeness else None,
-                mae=_mean(question_errors) if question_errors else None,
-                images=images,
-            )
-        )
+    try:
+        with span("submit.score"):
+            scored = snapshot.plan.score(response_map, choice_map)
+    except ScoringError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail) from exc
 
-    selection_doc_raw = supplemental_docs.get(9)
-    if not isinstance(selection_doc_raw, SelectionQuestionDocument):
-        raise HTTPException(status_code=500, detail="Selection question metadata missing.")
-
-    selection_option_map = {option.optionId: option for option in selection_doc_raw.options}
-    scenario_option_id = choice_map[9]
-    selected_option = selection_option_map.get(scenario_option_id)
-    correct_option = selection_option_map.get(selection_doc_raw.correctOptionId)
-    if selected_option is None or correct_option is None:
-        raise HTTPException(status_code=400, detail="Invalid selection for question 9.")
-
-    selected_value = selected_option.value
-    correct_value = correct_option.value
-    scenario_error = abs(selected_value - correct_value)
-    scenario_closeness = 1 - (scenario_error / 2)
-    all_errors.append(scenario_error)
-    all_closeness.append(scenario_closeness)
-    scenario_summary = {
-        "questionNumber": 9,
-        "selectedOption": scenario_option_id,
-        "selectedLabel": selected_option.label,
-        "selectedValue": selected_value,
-        "correctValue": correct_value,
-        "error": scenario_error,
-        "closeness": scenario_closeness,
-    }
-
-    base_closeness = _mean(all_closeness)
-    mae = _mean(all_errors)
-
-    boost_doc_raw = supplemental_docs.get(10)
-    if not isinstance(boost_doc_raw, BoostQuestionDocument):
-        raise HTTPException(status_code=500, detail="Boost question metadata missing.")
-
-    boost_option_map = {option.optionId: option for option in boost_doc_raw.options}
-    boost_option_id = choice_map[10]
-    boost_option = boost_option_map.get(boost_option_id)
-    if boost_option is None:
-        raise HTTPException(status_code=400, detail="Invalid selection for question 10.")
-
-    boost_multiplier = 1 + boost_option.boost
-    boosted_closeness = min(base_closeness * boost_multiplier, 1.0)
-    overall_closeness = boosted_closeness
-    band = _compute_band(overall_closeness)
-
-    metadata_dict = payload.metadata.model_dump() if payload.metadata else None
-    overall_closeness_pct = round(overall_closeness * 100, 1)
-
-    result = SubmissionResult(
-        applicant=ApplicantSummary(name=payload.applicant.name, email=payload.applicant.email),
-        attemptNumber=attempt_number,
-        sessionId=payload.sessionId,
-        overallCloseness=overall_closeness,
-        overallClosenessPct=overall_closeness_pct,
-        band=band,
-    )
+    with span("submit.claim_attempt"):
+        claim = _claim_attempt_number(payload.applicant, payload.sessionId, now=now)
+        if not write_behind_enabled():
+            attempt_number = await claim
+        else:
+            try:
+                attempt_number = await asyncio.wait_for(claim, mongo_timeout())
+            except asyncio.TimeoutError:
+                # The claim may still land; it is idempotent, so a retry gets the same number.
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="The attempt store is slow; retry the submission.",
+                    headers={"Retry-After": "1"},
+                ) from None
+    if attempt_number is None:
+        existing_attempt = await _find_existing_attempt(payload.sessionId, normalized_email)
+        if existing_attempt:
+            return submission_response(_result_from_attempt(existing_attempt))
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This session is already being submitted.",
+        )
 
-    role_summary = {
-        "questionNumber": 10,
-        "selectedOption": boost_option_id,
-        "selectedLabel": boost_option.label,
-        "boost": boost_option.boost,
-    }
-
-    await attempts_collection.insert_one(
-        {
-            "applicantEmail": normalized_email,
-            "applicantName": payload.applicant.name,
-            "attemptNumber": attempt_number,
-            "sessionId": payload.sessionId,
-            "submittedAt": now,
-            "overallCloseness": result.overallCloseness,
-            "overallClosenessPct": result.overallClosenessPct,
-            "baseCloseness": base_closeness,
-            "mae": mae,
-            "band": result.band.value,
-            "imageQuestions": [
-                {
-                    "questionNumber": question.questionNumber,
-                    "questionType": question.questionType.value,
-                    "closeness": question.closeness,
-                    "mae": question.mae,
-                    "images": [
-                        {
-                            "imageId": image.imageId,
-                            "selectedScore": image.selectedScore,
-                            "actualScore": image.actualScore,
-                            "error": image.error,
-                            "closeness": image.closeness,
-                            "excluded": image.excluded,
-                        }
-                        for image in question.images
-                    ],
-                }
-                for question in question_results
-            ],
-            "scenarioQuestion": scenario_summary,
-            "rolePreference": role_summary,
-            "boostMultiplier": boost_multiplier,
-            "metadata": metadata_dict,
-            "submittedAtIso": now.isoformat(),
-        }
+    result, attempt_document = build_attempt_document(
+        payload, scored, attempt_number=attempt_number, now=now
     )
 
-    await _update_applicant(payload.applicant, attempt_number, now=now)
+    with span("submit.insert"):
+        stored_attempt = await _insert_attempt(attempt_document)
+    if stored_attempt:
+        return submission_response(_result_from_attempt(stored_attempt))
 
-    return result
+    return submission_response(result)
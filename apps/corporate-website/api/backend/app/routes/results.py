@@ -0,0 +1,286 @@
+"""Export and analytics routes over stored attempts.
+
+Both routes run server-side aggregation pipelines. The export streams the
+cursor batch by batch through a ``StreamingResponse``, so the next batch is
+only requested once the previous chunk has been sent and memory use does not
+grow with the number of attempts.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator
+
+from bson import json_util  # type: ignore
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from ..db import get_attempts_collection
+from ..question_bank import question_bank
+from .admin import require_admin_token
+
+router = APIRouter(
+    prefix="/api/design-test/admin/results",
+    tags=["design-test-admin"],
+    dependencies=[Depends(require_admin_token)],
+)
+
+# Roughly how many encoded bytes to buffer before handing a chunk to the server.
+_CHUNK_BYTES = 64 * 1024
+_CURSOR_BATCH_SIZE = 500
+_CLOSENESS_BUCKETS = [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0000001]
+
+_NESTED_EXPORT_FIELDS = {
+    "scenarioOption": "$scenarioQuestion.selectedOption",
+    "roleOption": "$rolePreference.selectedOption",
+}
+_EXPORT_FIELDS = [
+    "applicantEmail",
+    "applicantName",
+    "attemptNumber",
+    "sessionId",
+    "submittedAt",
+    "overallCloseness",
+    "overallClosenessPct",
+    "baseCloseness",
+    "mae",
+    "band",
+    "boostMultiplier",
+    "scenarioOption",
+    "roleOption",
+]
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+def _match_stage(since: datetime | None, until: datetime | None) -> dict[str, Any]:
+    """Build the ``$match`` stage for an optional submission window."""
+    window: dict[str, Any] = {}
+    if since is not None:
+        window["$gte"] = since
+    if until is not None:
+        window["$lt"] = until
+    return {"$match": {"submittedAt": window} if window else {}}
+
+
+def _export_pipeline(since: datetime | None, until: datetime | None) -> list[dict[str, Any]]:
+    """Flatten each attempt into one export row on the server."""
+    return [
+        _match_stage(since, until),
+        {"$sort": {"submittedAt": 1}},
+        {
+            "$project": {
+                "_id": 0,
+                **{field: _NESTED_EXPORT_FIELDS.get(field, 1) for field in _EXPORT_FIELDS},
+                "questionCloseness": {
+                    "$map": {
+                        "input": {"$ifNull": ["$imageQuestions", []]},
+                        "as": "question",
+                        "in": {
+                            "k": {"$toString": "$$question.questionNumber"},
+                            "v": "$$question.closeness",
+                        },
+                    }
+                },
+            }
+        },
+    ]
+
+
+async def _iter_rows(
+    since: datetime | None,
+    until: datetime | None,
+) -> AsyncIterator[dict[str, Any]]:
+    """Yield flattened attempt rows from a batched aggregation cursor.
+
+    ``submittedAt`` becomes an ISO-8601 string here, so both formats carry
+    the same plain timestamp.
+    """
+    attempts = await get_attempts_collection()
+    cursor = attempts.aggregate(
+        _export_pipeline(since, until),
+        allowDiskUse=True,
+        batchSize=_CURSOR_BATCH_SIZE,
+    )
+    async for row in cursor:
+        pairs = row.get("questionCloseness", [])
+        row["questionCloseness"] = {item["k"]: item["v"] for item in pairs}
+        submitted_at = row.get("submittedAt")
+        row["submittedAt"] = submitted_at.isoformat() if submitted_at else None
+        yield row
+
+
+async def _ndjson_chunks(rows: AsyncIterator[dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Encode rows as newline-delimited JSON in bounded chunks."""
+    buffer: list[str] = []
+    size = 0
+    async for row in rows:
+        line = json_util.dumps(row, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= _CHUNK_BYTES:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+async def _csv_chunks(
+    rows: AsyncIterator[dict[str, Any]],
+    question_numbers: list[int],
+) -> AsyncIterator[bytes]:
+    """Encode rows as CSV with one closeness column per image question."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(_EXPORT_FIELDS + [f"q{number}Closeness" for number in question_numbers])
+    async for row in rows:
+        closeness = row["questionCloseness"]
+        writer.writerow(
+            [row.get(field) for field in _EXPORT_FIELDS]
+            + [closeness.get(str(number)) for number in question_numbers]
+        )
+        if buffer.tell() >= _CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+@router.get("/export")
+async def export_attempts(
+    export_format: ExportFormat = Query(default=ExportFormat.NDJSON, alias="format"),
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> StreamingResponse:
+    """Stream every attempt in the window as NDJSON or CSV."""
+    rows = _iter_rows(since, until)
+    if export_format is ExportFormat.CSV:
+        snapshot = await question_bank.get()
+        numbers = [question.questionNumber for question in snapshot.questions]
+        return StreamingResponse(
+            _csv_chunks(rows, numbers),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="attempts.csv"'},
+        )
+    return StreamingResponse(_ndjson_chunks(rows), media_type="application/x-ndjson")
+
+
+def _analytics_pipeline(since: datetime | None, until: datetime | None) -> list[dict[str, Any]]:
+    """Compute score distributions, per-question closeness and role boosts in one pass."""
+    return [
+        _match_stage(since, until),
+        {
+            "$facet": {
+                "totals": [
+                    {
+                        "$group": {
+                            "_id": None,
+                            "attempts": {"$sum": 1},
+                            "avgOverallCloseness": {"$avg": "$overallCloseness"},
+                            "avgBaseCloseness": {"$avg": "$baseCloseness"},
+                            "avgMae": {"$avg": "$mae"},
+                        }
+                    },
+                    {
+                        "$project": {
+                            "_id": 0,
+                            "attempts": 1,
+                            "avgOverallCloseness": 1,
+                            "avgBaseCloseness": 1,
+                            "avgMae": 1,
+                        }
+                    },
+                ],
+                # Grouping by email first keeps memory bounded per group, unlike
+                # an $addToSet array that holds every distinct email at once.
+                "applicants": [
+                    {"$group": {"_id": "$applicantEmail"}},
+                    {"$group": {"_id": None, "count": {"$sum": 1}}},
+                ],
+                "bands": [
+                    {
+                        "$group": {
+                            "_id": "$band",
+                            "count": {"$sum": 1},
+                            "avgOverallCloseness": {"$avg": "$overallCloseness"},
+                            "minOverallCloseness": {"$min": "$overallCloseness"},
+                            "maxOverallCloseness": {"$max": "$overallCloseness"},
+                        }
+                    },
+                    {"$sort": {"_id": 1}},
+                ],
+                "distribution": [
+                    {
+                        "$bucket": {
+                            "groupBy": "$overallCloseness",
+                            "boundaries": _CLOSENESS_BUCKETS,
+                            "default": "other",
+                            "output": {"count": {"$sum": 1}},
+                        }
+                    }
+                ],
+                "questions": [
+                    {"$unwind": "$imageQuestions"},
+                    {
+                        "$group": {
+                            "_id": "$imageQuestions.questionNumber",
+                            "questionType": {"$first": "$imageQuestions.questionType"},
+                            "avgCloseness": {"$avg": "$imageQuestions.closeness"},
+                            "avgMae": {"$avg": "$imageQuestions.mae"},
+                            "answered": {
+                                "$sum": {
+                                    "$cond": [{"$ne": ["$imageQuestions.closeness", None]}, 1, 0]
+                                }
+                            },
+                        }
+                    },
+                    {"$sort": {"_id": 1}},
+                ],
+                "roles": [
+                    {
+                        "$group": {
+                            "_id": "$rolePreference.selectedOption",
+                            "label": {"$first": "$rolePreference.selectedLabel"},
+                            "count": {"$sum": 1},
+                            "boost": {"$avg": "$rolePreference.boost"},
+                            "avgBaseCloseness": {"$avg": "$baseCloseness"},
+                            "avgOverallCloseness": {"$avg": "$overallCloseness"},
+                        }
+                    },
+                    {"$sort": {"_id": 1}},
+                ],
+            }
+        },
+    ]
+
+
+def _rename_id(rows: list[dict[str, Any]], key: str) -> list[dict[str, Any]]:
+    """Expose the ``$group`` key under a descriptive name."""
+    return [{key: row.pop("_id"), **row} for row in rows]
+
+
+@router.get("/analytics")
+async def attempt_analytics(
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> dict[str, Any]:
+    """Aggregate score distributions per band, per question and per role boost."""
+    attempts = await get_attempts_collection()
+    cursor = attempts.aggregate(_analytics_pipeline(since, until), allowDiskUse=True)
+    facets = (await cursor.to_list(length=1) or [{}])[0]
+    totals = (facets.get("totals") or [{"attempts": 0}])[0]
+    applicants = facets.get("applicants") or [{"count": 0}]
+    return {
+        "totals": {"attempts": totals.pop("attempts"), "applicants": applicants[0]["count"], **totals},
+        "bands": _rename_id(facets.get("bands", []), "band"),
+        "distribution": _rename_id(facets.get("distribution", []), "lowerBound"),
+        "questions": _rename_id(facets.get("questions", []), "questionNumber"),
+        "roles": _rename_id(facets.get("roles", []), "optionId"),
+    }
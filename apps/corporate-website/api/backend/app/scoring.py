@@ -0,0 +1,336 @@
+"""Precompiled, vectorized scoring for Design Sense submissions.
+
+The plan is compiled once per question-bank snapshot. The answer key is laid
+out as NumPy arrays in display order (images grouped by question), so one
+submission or thousands of stored attempts are scored with the same array
+operations: a batch is a ``(submissions, images)`` matrix of selected scores
+with ``NaN`` for unanswered images, plus the option index chosen for the
+scenario (question 9) and role boost (question 10) questions.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+import numpy as np
+
+from .models import (
+    BoostOptionModel,
+    BoostQuestionDocument,
+    QuestionDocument,
+    SelectionOption,
+    SelectionQuestionDocument,
+)
+
+SCENARIO_QUESTION_NUMBER = 9
+ROLE_QUESTION_NUMBER = 10
+MISSING_OPTION = -1
+
+
+class ScoringError(ValueError):
+    """Raised when a submission cannot be scored against the plan."""
+
+    def __init__(self, detail: str, *, status_code: int = 400) -> None:
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+@dataclass(frozen=True, slots=True)
+class ImageAnswer:
+    """Answer key entry for a single image."""
+
+    imageId: str
+    actualScore: int
+    question: QuestionDocument
+    column: int
+
+
+@dataclass(frozen=True, slots=True)
+class ScoredSubmission:
+    """Outcome of scoring one submission, ready to persist.
+
+    ``image_questions`` is already in the stored ``imageQuestions`` shape, so
+    no per-image model is built or re-serialized on the submit path.
+    """
+
+    image_questions: list[dict[str, Any]]
+    base_closeness: float
+    mae: float
+    overall_closeness: float
+    boost_multiplier: float
+    scenario_summary: dict[str, Any]
+    role_summary: dict[str, Any]
+
+
+@dataclass(frozen=True)
+class BatchScores:
+    """Array results for a batch of submissions; rows follow the input order."""
+
+    selected: np.ndarray
+    error: np.ndarray
+    closeness: np.ndarray
+    question_closeness: np.ndarray
+    question_mae: np.ndarray
+    scenario_error: np.ndarray
+    scenario_closeness: np.ndarray
+    base_closeness: np.ndarray
+    mae: np.ndarray
+    boost_multiplier: np.ndarray
+    overall_closeness: np.ndarray
+    valid: np.ndarray
+
+
+def _optional_float(value: float) -> float | None:
+    """Convert a NaN cell into ``None`` for storage."""
+    return None if value != value else value
+
+
+@dataclass(frozen=True)
+class ScoringPlan:
+    """In-memory answer key compiled from a question-bank snapshot."""
+
+    questions: tuple[QuestionDocument, ...]
+    answers: dict[str, ImageAnswer]
+    image_ids: tuple[str, ...]
+    actual_scores: np.ndarray
+    question_index: np.ndarray
+    selection: SelectionQuestionDocument | None
+    selection_options: dict[str, SelectionOption]
+    selection_option_ids: tuple[str, ...]
+    selection_values: np.ndarray
+    boost: BoostQuestionDocument | None
+    boost_options: dict[str, BoostOptionModel]
+    boost_option_ids: tuple[str, ...]
+    boost_values: np.ndarray
+
+    @classmethod
+    def compile(
+        cls,
+        questions: tuple[QuestionDocument, ...],
+        supplemental: dict[int, SelectionQuestionDocument | BoostQuestionDocument],
+    ) -> "ScoringPlan":
+        """Lay the answer key out as lookup tables and contiguous arrays."""
+        answers: dict[str, ImageAnswer] = {}
+        question_index: list[int] = []
+        for position, question in enumerate(questions):
+            for image in question.images:
+                question_index.append(position)
+                answers[image.imageId] = ImageAnswer(
+                    imageId=image.imageId,
+                    actualScore=image.actualScore,
+                    question=question,
+                    column=len(answers),
+                )
+
+        selection = supplemental.get(SCENARIO_QUESTION_NUMBER)
+        if not isinstance(selection, SelectionQuestionDocument):
+            selection = None
+        boost = supplemental.get(ROLE_QUESTION_NUMBER)
+        if not isinstance(boost, BoostQuestionDocument):
+            boost = None
+        selection_options = list(selection.options) if selection else []
+        boost_options = list(boost.options) if boost else []
+
+        return cls(
+            questions=questions,
+            answers=answers,
+            image_ids=tuple(answers),
+            actual_scores=np.array(
+                [answer.actualScore for answer in answers.values()], dtype=np.float64
+            ),
+            question_index=np.array(question_index, dtype=np.intp),
+            selection=selection,
+            selection_options={option.optionId: option for option in selection_options},
+            selection_option_ids=tuple(option.optionId for option in selection_options),
+            selection_values=np.array(
+                [option.value for option in selection_options], dtype=np.float64
+            ),
+            boost=boost,
+            boost_options={option.optionId: option for option in boost_options},
+            boost_option_ids=tuple(option.optionId for option in boost_options),
+            boost_values=np.array([option.boost for option in boost_options], dtype=np.float64),
+        )
+
+    def correct_selection_value(self) -> float:
+        """Return the value of the correct scenario option."""
+        if self.selection is None:
+            raise ScoringError("Selection question metadata missing.", status_code=500)
+        correct = self.selection_options.get(self.selection.correctOptionId)
+        if correct is None:
+            raise ScoringError("Invalid selection for question 9.")
+        return float(correct.value)
+
+    def encode(
+        self,
+        submissions: Iterable[tuple[dict[str, int], dict[int, str]]],
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Lay out ``(responses, choices)`` pairs as score and option-index arrays.
+
+        Responses for images outside the plan are ignored, matching how the
+        API has always scored them. Unknown or missing options map to
+        ``MISSING_OPTION``.
+        """
+        rows: list[list[float]] = []
+        scenario: list[int] = []
+        role: list[int] = []
+        selection_index = {option_id: i for i, option_id in enumerate(self.selection_option_ids)}
+        boost_index = {option_id: i for i, option_id in enumerate(self.boost_option_ids)}
+        for responses, choices in submissions:
+            row = [np.nan] * len(self.image_ids)
+            for image_id, selected in responses.items():
+                answer = self.answers.get(image_id)
+                if answer is not None and selected is not None:
+                    row[answer.column] = selected
+            rows.append(row)
+            scenario.append(
+                selection_index.get(choices.get(SCENARIO_QUESTION_NUMBER, ""), MISSING_OPTION)
+            )
+            role.append(boost_index.get(choices.get(ROLE_QUESTION_NUMBER, ""), MISSING_OPTION))
+        selected = np.array(rows, dtype=np.float64).reshape(len(rows), len(self.image_ids))
+        return selected, np.array(scenario, dtype=np.intp), np.array(role, dtype=np.intp)
+
+    def score_batch(
+        self,
+        selected: np.ndarray,
+        scenario_choice: np.ndarray,
+        role_choice: np.ndarray,
+    ) -> BatchScores:
+        """Score a batch of encoded submissions in one pass over the arrays."""
+        if self.selection is None:
+            raise ScoringError("Selection question metadata missing.", status_code=500)
+        if self.boost is None:
+            raise ScoringError("Boost question metadata missing.", status_code=500)
+        correct_value = self.correct_selection_value()
+
+        answered = ~np.isnan(selected)
+        error = np.abs(selected - self.actual_scores)
+        closeness = 1 - error / 2
+
+        answered_error = np.where(answered, error, 0.0)
+        answered_closeness = np.where(answered, closeness, 0.0)
+        counts = self._sum_by_question(answered.astype(np.float64))
+        error_sums = self._sum_by_question(answered_error)
+        closeness_sums = self._sum_by_question(answered_closeness)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            question_closeness = np.where(counts > 0, closeness_sums / counts, np.nan)
+            question_mae = np.where(counts > 0, error_sums / counts, np.nan)
+
+        valid = (scenario_choice != MISSING_OPTION) & (role_choice != MISSING_OPTION)
+        scenario_values = self.selection_values[np.where(valid, scenario_choice, 0)]
+        scenario_error = np.abs(scenario_values - correct_value)
+        scenario_closeness = 1 - scenario_error / 2
+
+        # The scenario question counts as one more answered item in the base score.
+        answered_total = answered.sum(axis=1) + 1
+        base_closeness = (answered_closeness.sum(axis=1) + scenario_closeness) / answered_total
+        mae = (answered_error.sum(axis=1) + scenario_error) / answered_total
+
+        boost_multiplier = 1 + self.boost_values[np.where(valid, role_choice, 0)]
+        overall_closeness = np.minimum(base_closeness * boost_multiplier, 1.0)
+
+        return BatchScores(
+            selected=selected,
+            error=error,
+            closeness=closeness,
+            question_closeness=question_closeness,
+            question_mae=question_mae,
+            scenario_error=scenario_error,
+            scenario_closeness=scenario_closeness,
+            base_closeness=base_closeness,
+            mae=mae,
+            boost_multiplier=boost_multiplier,
+            overall_closeness=overall_closeness,
+            valid=valid,
+        )
+
+    def _sum_by_question(self, values: np.ndarray) -> np.ndarray:
+        """Sum each row's image columns per question; a question without images sums to 0."""
+        rows, questions = values.shape[0], len(self.questions)
+        bins = (np.arange(rows, dtype=np.intp)[:, None] * questions + self.question_index).ravel()
+        sums = np.bincount(bins, weights=values.ravel(), minlength=rows * questions)
+        return sums.reshape(rows, questions)
+
+    def image_questions_document(self, scores: BatchScores, row: int) -> list[dict[str, Any]]:
+        """Build the stored ``imageQuestions`` payload for one scored row."""
+        # One ``tolist`` per array turns the row into plain floats up front;
+        # indexing NumPy cell by cell would box a scalar per image.
+        selected = scores.selected[row].tolist()
+        error = scores.error[row].tolist()
+        closeness = scores.closeness[row].tolist()
+        question_closeness = scores.question_closeness[row].tolist()
+        question_mae = scores.question_mae[row].tolist()
+        documents: list[dict[str, Any]] = []
+        for position, question in enumerate(self.questions):
+            images: list[dict[str, Any]] = []
+            for image in question.images:
+                column = self.answers[image.imageId].column
+                value = selected[column]
+                excluded = value != value
+                images.append(
+                    {
+                        "imageId": image.imageId,
+                        "selectedScore": None if excluded else int(value),
+                        "actualScore": image.actualScore,
+                        "error": None if excluded else error[column],
+                        "closeness": None if excluded else closeness[column],
+                        "excluded": excluded,
+                    }
+                )
+            documents.append(
+                {
+                    "questionNumber": question.questionNumber,
+                    "questionType": question.questionType.value,
+                    "closeness": _optional_float(question_closeness[position]),
+                    "mae": _optional_float(question_mae[position]),
+                    "images": images,
+                }
+            )
+        return documents
+
+    def score(self, responses: dict[str, int], choices: dict[int, str]) -> ScoredSubmission:
+        """Score image responses plus the scenario and role choices."""
+        if SCENARIO_QUESTION_NUMBER not in choices or ROLE_QUESTION_NUMBER not in choices:
+            raise ScoringError("Additional questions 9 and 10 are required.")
+        if self.selection is None:
+            raise ScoringError("Selection question metadata missing.", status_code=500)
+
+        scenario_option_id = choices[SCENARIO_QUESTION_NUMBER]
+        selected_option = self.selection_options.get(scenario_option_id)
+        correct_value = self.correct_selection_value()
+        if selected_option is None:
+            raise ScoringError("Invalid selection for question 9.")
+        if self.boost is None:
+            raise ScoringError("Boost question metadata missing.", status_code=500)
+        boost_option_id = choices[ROLE_QUESTION_NUMBER]
+        boost_option = self.boost_options.get(boost_option_id)
+        if boost_option is None:
+            raise ScoringError("Invalid selection for question 10.")
+
+        scores = self.score_batch(*self.encode([(responses, choices)]))
+
+        scenario_error = float(scores.scenario_error[0])
+        return ScoredSubmission(
+            image_questions=self.image_questions_document(scores, 0),
+            base_closeness=float(scores.base_closeness[0]),
+            mae=float(scores.mae[0]),
+            overall_closeness=float(scores.overall_closeness[0]),
+            boost_multiplier=float(scores.boost_multiplier[0]),
+            scenario_summary={
+                "questionNumber": SCENARIO_QUESTION_NUMBER,
+                "selectedOption": scenario_option_id,
+                "selectedLabel": selected_option.label,
+                "selectedValue": selected_option.value,
+                "correctValue": int(correct_value),
+                "error": int(scenario_error),
+                "closeness": float(scores.scenario_closeness[0]),
+            },
+            role_summary={
+                "questionNumber": ROLE_QUESTION_NUMBER,
+                "selectedOption": boost_option_id,
+                "selectedLabel": boost_option.label,
+                "boost": boost_option.boost,
+            },
+        )
+
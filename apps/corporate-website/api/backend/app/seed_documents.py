@@ -0,0 +1,156 @@
+"""Question-bank documents exactly as the seeder stores them.
+
+Shared by ``seed/seed_test_items.py``, which writes them to MongoDB, and the
+in-memory repository, which serves them without a database. Nothing here
+touches the environment or the network.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+PUBLIC_DIR = Path("public")
+IMAGE_PATTERN = re.compile(r"^(?P<question>\d+?)_(?P<score>[0-2])_(?P<kind>[a-zA-Z0-9-]+)$")
+
+SUPPLEMENTAL_DATA = [
+    {
+        "questionNumber": 9,
+        "kind": "selection",
+        "prompt": "Which item would you add to the Minkowski catalogue if you joined the product team?",
+        "correctOptionId": "B",
+        "options": [
+            {"optionId": "A", "label": "A. A white matte vase made of plastic", "value": 0},
+            {
+                "optionId": "B",
+                "label": "B. A black glossy vase made with 60% corn-based bioplastic and 40% recycled wood fibers",
+                "value": 2,
+            },
+            {
+                "optionId": "C",
+                "label": "C. A matte off-white clean and minimal Avengers figurine",
+                "value": 0,
+            },
+            {
+                "optionId": "D",
+                "label": "D. A minimal burgundy sofa Japandi style",
+                "value": 1,
+            },
+        ],
+    },
+    {
+        "questionNumber": 10,
+        "kind": "boost",
+        "prompt": "If you join Minkowski, which role excites you the most?",
+        "options": [
+            {
+                "optionId": "A",
+                "label": "A. Product Selection · Curation · Writing Descriptions",
+                "boost": 0.08,
+            },
+            {
+                "optionId": "B",
+                "label": "B. Write Ad copies · Create content · Post on Social",
+                "boost": 0.10,
+            },
+            {
+                "optionId": "C",
+                "label": "C. Ads and sales · Data analysis (requires Data Test)",
+                "boost": 0.20,
+            },
+            {
+                "optionId": "D",
+                "label": "D. Bookkeeping · Accounts (no openings currently)",
+                "boost": 0.10,
+            },
+        ],
+    },
+]
+
+
+def _hash_file(path: Path) -> str:
+    """Return the SHA-256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def seed_hash(document: dict[str, Any]) -> str:
+    """Hash the seeded fields of a document so unchanged entries can be skipped."""
+    encoded = json.dumps(document, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def build_seed_documents(public_dir: Path = PUBLIC_DIR) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Scan ``public_dir`` and return ``(questions, images)`` with content hashes.
+
+    Files are hashed in parallel; each image carries a ``contentHash`` of its
+    bytes and a ``seedHash`` over every seeded field, which is what the
+    incremental seeder compares against stored documents.
+    """
+    if not public_dir.exists():
+        raise FileNotFoundError("public directory not found; nothing to seed")
+
+    matches: list[tuple[Path, re.Match[str]]] = []
+    for path in public_dir.iterdir():
+        if not path.is_file():
+            continue
+        match = IMAGE_PATTERN.match(path.stem)
+        if match:
+            matches.append((path, match))
+
+    with ThreadPoolExecutor() as executor:
+        content_hashes = list(executor.map(_hash_file, [path for path, _ in matches]))
+
+    grouped: dict[int, dict[str, Any]] = defaultdict(lambda: {"images": []})
+    for (path, match), content_hash in zip(matches, content_hashes):
+        question_number = int(match.group("question"))
+        score = int(match.group("score"))
+        kind = match.group("kind").lower()
+
+        grouped_entry = grouped[question_number]
+        grouped_entry.setdefault("questionType", kind if kind in {"homestyle", "product"} else "homestyle")
+
+        grouped_entry["images"].append(
+            {
+                "imageId": path.stem,
+                "src": f"/{path.name}",
+                "actualScore": score,
+                "imageType": kind if kind in {"homestyle", "product"} else "homestyle",
+                "displayLabel": None,
+                "filename": path.name,
+                "contentHash": content_hash,
+            }
+        )
+
+    if not grouped:
+        raise RuntimeError("No matching image assets found in public/ directory")
+
+    questions: list[dict[str, Any]] = []
+    images: list[dict[str, Any]] = []
+    for question_number, payload in sorted(grouped.items()):
+        question_images = sorted(payload["images"], key=lambda img: img["imageId"])
+        for image in question_images:
+            image_payload = {**image, "questionNumber": question_number}
+            image_payload["seedHash"] = seed_hash(image_payload)
+            images.append(image_payload)
+        questions.append(
+            {
+                "questionNumber": question_number,
+                "questionType": payload["questionType"],
+                "images": question_images,
+            }
+        )
+    return questions, images
+
+
+def build_supplemental_documents() -> list[dict[str, Any]]:
+    """Return the supplemental questions with their seed hashes."""
+    return [{**doc, "seedHash": seed_hash(doc)} for doc in SUPPLEMENTAL_DATA]
@@ -0,0 +1,69 @@
+"""Turning a scored submission into the stored attempt and the API response.
+
+Shared by the submit route and by the readiness warm-up, which runs one
+synthetic submission through the same code without writing anything.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from fastapi import Response, status
+
+from .models import ApplicantSummary, SubmissionBand, SubmissionResult, TestSubmissionRequest
+from .scoring import ScoredSubmission
+
+
+def submission_response(result: SubmissionResult) -> Response:
+    """Serialize the summary directly, skipping FastAPI's response-model re-validation."""
+    return Response(
+        content=result.model_dump_json(),
+        media_type="application/json",
+        status_code=status.HTTP_201_CREATED,
+    )
+
+
+def build_attempt_document(
+    payload: TestSubmissionRequest,
+    scored: ScoredSubmission,
+    *,
+    attempt_number: int,
+    now: datetime,
+) -> tuple[SubmissionResult, dict[str, Any]]:
+    """Return the public summary and the BSON-ready attempt document for a scored submission.
+
+    ``payload`` has already been validated, so the summary models are
+    constructed without a second validation pass.
+    """
+    overall_closeness = scored.overall_closeness
+    result = SubmissionResult.model_construct(
+        applicant=ApplicantSummary.model_construct(
+            name=payload.applicant.name,
+            email=payload.applicant.email,
+        ),
+        attemptNumber=attempt_number,
+        sessionId=payload.sessionId,
+        overallCloseness=overall_closeness,
+        overallClosenessPct=round(overall_closeness * 100, 1),
+        band=SubmissionBand.from_score(overall_closeness),
+    )
+    attempt_document = {
+        "applicantEmail": payload.applicant.email.lower(),
+        "applicantName": payload.applicant.name,
+        "attemptNumber": attempt_number,
+        "sessionId": payload.sessionId,
+        "submittedAt": now,
+        "overallCloseness": result.overallCloseness,
+        "overallClosenessPct": result.overallClosenessPct,
+        "baseCloseness": scored.base_closeness,
+        "mae": scored.mae,
+        "band": result.band.value,
+        "imageQuestions": scored.image_questions,
+        "scenarioQuestion": scored.scenario_summary,
+        "rolePreference": scored.role_summary,
+        "boostMultiplier": scored.boost_multiplier,
+        "metadata": payload.metadata.model_dump() if payload.metadata else None,
+        "submittedAtIso": now.isoformat(),
+    }
+    return result, attempt_document
@@ -0,0 +1,298 @@
+"""Optional write-behind persistence for scored attempts.
+
+With ``ATTEMPT_WRITE_BEHIND=true`` the submit route returns as soon as the
+attempt has been appended and fsynced to a local journal instead of waiting
+for its insert. Only the insert is decoupled: the dedupe lookup and the
+applicant ``$inc`` that assigns the attempt number still go to MongoDB on the
+request path, bounded by ``ATTEMPT_WRITE_BEHIND_MONGO_TIMEOUT_MS`` (see
+``mongo_timeout``), so a slow MongoDB costs a submit at most that long per
+call before it fails fast with 503. A background task drains the journal
+with ``insert_many``:
+
+- Appends go to the active segment (``attempts-<ns>-<pid>.jsonl``). Each
+  drain cycle seals it and starts a new one, so the drainer only reads
+  segments nobody is writing to.
+- Every worker holds an exclusive ``flock`` on its active and sealed
+  segments until it has drained them, so workers sharing the directory never
+  read or delete each other's segments. The kernel drops the locks of a
+  worker that dies; any worker then adopts its segments on its next drain,
+  and on startup, which covers crashes between the append and the insert.
+- A sealed segment is deleted once every document in it is stored. Inserts
+  are unordered and duplicate-key errors count as success, because the
+  unique ``(sessionId, applicantEmail)`` index makes a replay idempotent.
+  Documents MongoDB rejects for any other reason are moved to ``failed/``
+  and logged, so one bad attempt cannot hold up the segments behind it.
+
+``ATTEMPT_JOURNAL_DIR`` (default ``var/attempt-journal``),
+``ATTEMPT_WRITE_BEHIND_BATCH_SIZE`` and
+``ATTEMPT_WRITE_BEHIND_FLUSH_SECONDS`` tune the journal and the drainer. A
+drain that fails for any reason is logged and retried with backoff.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import fcntl
+import logging
+import os
+import time
+from pathlib import Path
+from typing import IO, Any
+
+from bson import json_util  # type: ignore
+from pymongo.errors import BulkWriteError, PyMongoError  # type: ignore
+
+from .db import get_attempts_collection
+
+logger = logging.getLogger(__name__)
+
+_DUPLICATE_KEY = 11000
+_MAX_RETRY_DELAY_SECONDS = 30.0
+
+
+def write_behind_enabled() -> bool:
+    """Return True when attempts should be persisted through the journal."""
+    return os.getenv("ATTEMPT_WRITE_BEHIND", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def mongo_timeout() -> float:
+    """Seconds a write-behind submit waits on each MongoDB call it still makes."""
+    return float(os.getenv("ATTEMPT_WRITE_BEHIND_MONGO_TIMEOUT_MS", "250")) / 1000
+
+
+def _pending_key(document: dict[str, Any]) -> tuple[str, str]:
+    return document["sessionId"], document["applicantEmail"]
+
+
+class AttemptWriteBehind:
+    """Durably queue attempts on local disk and drain them to MongoDB."""
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+    ) -> None:
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._active: IO[str] | None = None
+        self._active_path: Path | None = None
+        # Sealed segments this worker has locked and will drain, with their lock handles.
+        self._owned: dict[Path, IO[str]] = {}
+        self._append_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._pending: dict[tuple[str, str], dict[str, Any]] = {}
+        self._drainer: asyncio.Task[None] | None = None
+
+    @classmethod
+    def from_env(cls) -> "AttemptWriteBehind":
+        """Build the journal from ``ATTEMPT_JOURNAL_DIR`` and friends."""
+        return cls(
+            Path(os.getenv("ATTEMPT_JOURNAL_DIR", "var/attempt-journal")),
+            batch_size=int(os.getenv("ATTEMPT_WRITE_BEHIND_BATCH_SIZE", "500")),
+            flush_interval=float(os.getenv("ATTEMPT_WRITE_BEHIND_FLUSH_SECONDS", "0.5")),
+        )
+
+    @property
+    def backlog(self) -> int:
+        """Number of attempts accepted but not yet confirmed in MongoDB."""
+        return len(self._pending)
+
+    def pending(self, session_id: str, normalized_email: str) -> dict[str, Any] | None:
+        """Return a queued attempt for this session, if it has not been stored yet."""
+        return self._pending.get((session_id, normalized_email))
+
+    async def start(self) -> None:
+        """Load leftover segments and start the drainer."""
+        if self._drainer is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in await asyncio.to_thread(self._adopt_unlocked_segments):
+            for document in await asyncio.to_thread(self._read_segment, path):
+                self._pending[_pending_key(document)] = document
+        if self._pending:
+            logger.info("Replaying %d journaled attempts", len(self._pending))
+        self._drainer = asyncio.create_task(self._drain_forever(), name="attempt-write-behind")
+
+    async def stop(self) -> None:
+        """Stop the drainer after one last best-effort drain."""
+        drainer, self._drainer = self._drainer, None
+        if drainer is None:
+            return
+        drainer.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await drainer
+        with contextlib.suppress(PyMongoError):
+            await self.drain()
+        await self._seal_active()
+        # Leave what is left for the next start, or for another worker, to replay.
+        owned, self._owned = self._owned, {}
+        for handle in owned.values():
+            handle.close()
+
+    async def enqueue(self, document: dict[str, Any]) -> None:
+        """Append an attempt to the journal; returns once it is on disk."""
+        line = json_util.dumps(document, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n"
+        async with self._append_lock:
+            await asyncio.to_thread(self._append, line)
+            self._pending[_pending_key(document)] = document
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def _append(self, line: str) -> None:
+        if self._active is None:
+            path = self.directory / f"attempts-{time.time_ns()}-{os.getpid()}.jsonl"
+            # Lock the segment before it becomes visible to other workers' drainers.
+            temp_path = path.with_suffix(".tmp")
+            handle = temp_path.open("a", encoding="utf-8")
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            temp_path.rename(path)
+            _fsync_directory(self.directory)
+            self._active, self._active_path = handle, path
+        self._active.write(line)
+        self._active.flush()
+        os.fsync(self._active.fileno())
+
+    async def _seal_active(self) -> None:
+        """Stop appending to the active segment so the drainer can pick it up; it stays locked."""
+        async with self._append_lock:
+            if self._active is not None and self._active_path is not None:
+                self._owned[self._active_path] = self._active
+                self._active = None
+                self._active_path = None
+
+    def _adopt_unlocked_segments(self) -> list[Path]:
+        """Lock the segments no live worker holds (left by a crash or restart); return them."""
+        adopted = []
+        for path in sorted(self.directory.glob("attempts-*.jsonl")):
+            if path in self._owned or path == self._active_path:
+                continue
+            try:
+                handle = path.open("r", encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handle.close()
+                continue
+            if os.fstat(handle.fileno()).st_nlink == 0:
+                # Drained and deleted by another worker while we were waiting.
+                handle.close()
+                continue
+            self._owned[path] = handle
+            adopted.append(path)
+        return adopted
+
+    def _release(self, path: Path) -> None:
+        """Delete a drained segment, then drop its lock."""
+        with contextlib.suppress(FileNotFoundError):
+            path.unlink()
+        handle = self._owned.pop(path, None)
+        if handle is not None:
+            handle.close()
+
+    def _quarantine(self, path: Path, documents: list[dict[str, Any]]) -> None:
+        failed_dir = self.directory / "failed"
+        failed_dir.mkdir(exist_ok=True)
+        with (failed_dir / path.name).open("a", encoding="utf-8") as handle:
+            for document in documents:
+                handle.write(json_util.dumps(document, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    @staticmethod
+    def _read_segment(path: Path) -> list[dict[str, Any]]:
+        documents: list[dict[str, Any]] = []
+        with path.open("r", encoding="utf-8") as handle:
+            for line_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    documents.append(json_util.loads(line))
+                except ValueError:
+                    # A torn final line from a crash mid-append was never acknowledged.
+                    logger.warning("Skipping unreadable journal line %s:%d", path.name, line_number)
+        return documents
+
+    async def _insert(self, documents: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Insert a batch, treating duplicate keys as already stored.
+
+        Returns the documents rejected for any other reason; connection and
+        server errors still raise, so the segment is retried.
+        """
+        attempts = await get_attempts_collection()
+        try:
+            # Copies keep the driver's generated _id out of the pending entries.
+            await attempts.insert_many([dict(document) for document in documents], ordered=False)
+        except BulkWriteError as exc:
+            errors = exc.details.get("writeErrors", [])
+            return [documents[error["index"]] for error in errors if error.get("code") != _DUPLICATE_KEY]
+        return []
+
+    async def drain(self) -> int:
+        """Seal the active segment and store every sealed segment; return documents written."""
+        await self._seal_active()
+        await asyncio.to_thread(self._adopt_unlocked_segments)
+        written = 0
+        for path in sorted(self._owned):
+            documents = await asyncio.to_thread(self._read_segment, path)
+            rejected: list[dict[str, Any]] = []
+            for start in range(0, len(documents), self.batch_size):
+                rejected += await self._insert(documents[start : start + self.batch_size])
+            if rejected:
+                await asyncio.to_thread(self._quarantine, path, rejected)
+                logger.error(
+                    "MongoDB rejected %d journaled attempts from %s; moved them to %s",
+                    len(rejected),
+                    path.name,
+                    self.directory / "failed" / path.name,
+                )
+            await asyncio.to_thread(self._release, path)
+            for document in documents:
+                self._pending.pop(_pending_key(document), None)
+            written += len(documents) - len(rejected)
+        return written
+
+    async def _drain_forever(self) -> None:
+        delay = self.flush_interval
+        while True:
+            # Not asyncio.wait_for: before Python 3.12 it can swallow stop()'s cancellation.
+            wakeup = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                await asyncio.wait([wakeup], timeout=delay)
+            finally:
+                wakeup.cancel()
+            self._wakeup.clear()
+            try:
+                await self.drain()
+            except PyMongoError as exc:
+                delay = min(max(delay * 2, 1.0), _MAX_RETRY_DELAY_SECONDS)
+                logger.warning(
+                    "Attempt write-behind drain failed (%s); %d queued, retrying in %.1fs",
+                    exc,
+                    self.backlog,
+                    delay,
+                )
+            except Exception:
+                # Journal I/O errors (a full disk, say) must not end the drainer for good.
+                delay = min(max(delay * 2, 1.0), _MAX_RETRY_DELAY_SECONDS)
+                logger.exception(
+                    "Attempt write-behind drain failed; %d queued, retrying in %.1fs", self.backlog, delay
+                )
+            else:
+                delay = self.flush_interval
+
+
+def _fsync_directory(directory: Path) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+attempt_write_behind = AttemptWriteBehind.from_env()
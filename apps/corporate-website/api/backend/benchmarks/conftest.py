@@ -0,0 +1,45 @@
+"""Shared fixtures for the micro-benchmarks."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+from typing import Any
+
+import pytest
+
+from app.question_bank import QuestionBankSnapshot, load_snapshot
+
+from .workload import random_submission, synthetic_repository
+
+
+@pytest.fixture(scope="session")
+def raw_bank() -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Raw question and supplemental documents as the repository returns them."""
+    repository = synthetic_repository()
+    return asyncio.run(repository.fetch_questions()), asyncio.run(repository.fetch_supplemental())
+
+
+@pytest.fixture(scope="session")
+def snapshot() -> QuestionBankSnapshot:
+    """A fully built question-bank snapshot."""
+    return asyncio.run(load_snapshot(synthetic_repository()))
+
+
+@pytest.fixture(scope="session")
+def submissions(
+    raw_bank: tuple[list[dict[str, Any]], list[dict[str, Any]]],
+) -> list[tuple[dict[str, int], dict[int, str]]]:
+    """Response and choice maps in the form ``submit_results`` hands to the scorer."""
+    questions, supplemental = raw_bank
+    rng = random.Random(1234)
+    maps = []
+    for _ in range(1000):
+        body = random_submission(questions, supplemental, rng)
+        maps.append(
+            (
+                {item["imageId"]: item["selectedScore"] for item in body["responses"]},
+                {item["questionNumber"]: item["optionId"] for item in body["choices"]},
+            )
+        )
+    return maps
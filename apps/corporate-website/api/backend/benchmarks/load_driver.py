@@ -0,0 +1,207 @@
+"""Replay applicant sessions against the Design Sense API and report latency.
+
+Each session does what the frontend does: fetch the questions, fetch the
+supplemental questions, then submit a full set of answers. Sessions run on
+``--concurrency`` workers, and the driver reports throughput and
+p50/p95/p99 latency per endpoint::
+
+    # In process: synthetic question bank in memory, attempts in mongomock.
+    python -m benchmarks.load_driver --sessions 2000 --concurrency 64
+
+    # Against a running server.
+    python -m benchmarks.load_driver --base-url http://localhost:8000 --sessions 500
+
+``--revisit-ratio`` is the share of sessions that already hold the question
+payloads and send ``If-None-Match``; ``--json`` writes the report for
+comparison between runs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+import httpx
+
+from .workload import install_fake_mongo, random_submission, synthetic_repository
+
+QUESTIONS = "GET /api/design-test/questions"
+SUPPLEMENTAL = "GET /api/design-test/supplemental"
+SUBMIT = "POST /api/design-test/submit"
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+@dataclass
+class EndpointStats:
+    """Latencies and status codes collected for one endpoint."""
+
+    latencies_ms: list[float] = field(default_factory=list)
+    statuses: Counter[int] = field(default_factory=Counter)
+    failures: int = 0
+
+    def summary(self, elapsed_seconds: float) -> dict[str, Any]:
+        """Return throughput and latency percentiles."""
+        ordered = sorted(self.latencies_ms)
+        return {
+            "requests": len(ordered),
+            "failures": self.failures,
+            "statuses": {str(code): count for code, count in sorted(self.statuses.items())},
+            "throughputRps": round(len(ordered) / elapsed_seconds, 1) if elapsed_seconds else 0.0,
+            "p50Ms": round(percentile(ordered, 0.50), 3),
+            "p95Ms": round(percentile(ordered, 0.95), 3),
+            "p99Ms": round(percentile(ordered, 0.99), 3),
+            "maxMs": round(ordered[-1], 3) if ordered else 0.0,
+        }
+
+
+class SessionReplayer:
+    """Run applicant sessions and record per-endpoint timings."""
+
+    def __init__(self, client: httpx.AsyncClient, *, revisit_ratio: float, seed: int) -> None:
+        self.client = client
+        self.revisit_ratio = revisit_ratio
+        self.rng = random.Random(seed)
+        self.stats: dict[str, EndpointStats] = {
+            name: EndpointStats() for name in (QUESTIONS, SUPPLEMENTAL, SUBMIT)
+        }
+        # Payloads and ETags from earlier sessions, standing in for the browser cache.
+        self._cached: dict[str, tuple[str, Any]] = {}
+
+    async def _request(self, name: str, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        stats = self.stats[name]
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            stats.failures += 1
+            raise
+        stats.latencies_ms.append((time.perf_counter() - started) * 1000)
+        stats.statuses[response.status_code] += 1
+        if response.status_code >= 400:
+            stats.failures += 1
+        return response
+
+    async def _fetch(self, name: str, url: str) -> Any:
+        headers = {}
+        cached = self._cached.get(url)
+        if cached and self.rng.random() < self.revisit_ratio:
+            headers["If-None-Match"] = cached[0]
+        response = await self._request(name, "GET", url, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        response.raise_for_status()
+        payload = response.json()
+        self._cached[url] = (response.headers.get("ETag", ""), payload)
+        return payload
+
+    async def run_session(self) -> None:
+        """Fetch both question sets and submit a random set of answers."""
+        questions = await self._fetch(QUESTIONS, "/api/design-test/questions")
+        supplemental = await self._fetch(SUPPLEMENTAL, "/api/design-test/supplemental")
+        body = random_submission(questions, supplemental, self.rng)
+        await self._request(SUBMIT, "POST", "/api/design-test/submit", json=body)
+
+    async def run(self, sessions: int, concurrency: int) -> float:
+        """Run ``sessions`` sessions on ``concurrency`` workers; return wall time in seconds."""
+        remaining = iter(range(sessions))
+
+        async def worker() -> None:
+            for _ in remaining:
+                with contextlib.suppress(httpx.HTTPError):
+                    await self.run_session()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+
+@contextlib.asynccontextmanager
+async def in_process_client() -> AsyncIterator[httpx.AsyncClient]:
+    """Serve the app in process with a synthetic question bank and mongomock storage."""
+    install_fake_mongo()
+
+    from app.db import ensure_indexes
+    from app.main import app
+    from app.question_bank import question_bank
+
+    question_bank.use_repository(synthetic_repository())
+    await ensure_indexes()
+    await question_bank.get()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://design-test") as client:
+        yield client
+
+
+def _client(base_url: str | None, concurrency: int) -> contextlib.AbstractAsyncContextManager:
+    if base_url is None:
+        return in_process_client()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0)
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    print(
+        f"{report['sessions']} sessions on {report['concurrency']} workers in "
+        f"{report['elapsedSeconds']:.2f}s ({report['sessionsPerSecond']:.1f} sessions/s)"
+    )
+    header = f"{'endpoint':<34}{'reqs':>7}{'fail':>6}{'req/s':>9}" + "".join(
+        f"{column:>9}" for column in ("p50", "p95", "p99", "max")
+    )
+    print(header)
+    print("-" * len(header))
+    for name, stats in report["endpoints"].items():
+        print(
+            f"{name:<34}{stats['requests']:>7}{stats['failures']:>6}{stats['throughputRps']:>9.1f}"
+            + "".join(f"{stats[key]:>9.2f}" for key in ("p50Ms", "p95Ms", "p99Ms", "maxMs"))
+        )
+    print("latencies in ms")
+
+
+async def main(args: argparse.Namespace) -> dict[str, Any]:
+    """Run the warm-up and the measured sessions and build the report."""
+    async with _client(args.base_url, args.concurrency) as client:
+        replayer = SessionReplayer(client, revisit_ratio=args.revisit_ratio, seed=args.seed)
+        if args.warmup:
+            await replayer.run(args.warmup, args.concurrency)
+            replayer.stats = {name: EndpointStats() for name in replayer.stats}
+        elapsed = await replayer.run(args.sessions, args.concurrency)
+    return {
+        "target": args.base_url or "in-process",
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "elapsedSeconds": round(elapsed, 3),
+        "sessionsPerSecond": round(args.sessions / elapsed, 1) if elapsed else 0.0,
+        "endpoints": {name: stats.summary(elapsed) for name, stats in replayer.stats.items()},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="target server; omit to run the app in process")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=20, help="sessions to run before measuring")
+    parser.add_argument("--revisit-ratio", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    args = parser.parse_args()
+    report = asyncio.run(main(args))
+    _print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
@@ -0,0 +1,114 @@
+"""Micro-benchmarks for question-bank validation and scoring.
+
+Run from ``apps/corporate-website/api/backend`` with the ``bench`` extra::
+
+    pytest benchmarks --benchmark-autosave
+    pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:15%
+"""
+
+from __future__ import annotations
+
+import random
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any
+
+import pytest
+
+from app import models
+from app.question_bank import (
+    QuestionBankSnapshot,
+    deserialize_question,
+    deserialize_supplemental,
+    question_to_public,
+)
+from app.submissions import build_attempt_document, submission_response
+
+from .workload import random_submission
+
+pytest.importorskip("pytest_benchmark")
+
+
+def test_deserialize_question(benchmark: Any, raw_bank: tuple[list, list]) -> None:
+    questions, _ = raw_bank
+    benchmark(lambda: [deserialize_question(document) for document in questions])
+
+
+def test_question_to_public(benchmark: Any, snapshot: QuestionBankSnapshot) -> None:
+    benchmark(lambda: [question_to_public(question) for question in snapshot.questions])
+
+
+def test_build_snapshot(benchmark: Any, raw_bank: tuple[list, list]) -> None:
+    questions, supplemental = raw_bank
+
+    def build() -> QuestionBankSnapshot:
+        documents = [deserialize_supplemental(raw) for raw in supplemental]
+        return QuestionBankSnapshot.build(
+            version=None,
+            questions=[deserialize_question(document) for document in questions],
+            supplemental={doc.questionNumber: doc for doc in documents if doc is not None},
+        )
+
+    benchmark(build)
+
+
+def test_validate_submission(benchmark: Any, raw_bank: tuple[list, list]) -> None:
+    body = random_submission(*raw_bank, random.Random(7))
+    benchmark(models.TestSubmissionRequest.model_validate, body)
+
+
+def test_score_submission(
+    benchmark: Any,
+    snapshot: QuestionBankSnapshot,
+    submissions: list[tuple[dict[str, int], dict[int, str]]],
+) -> None:
+    responses, choices = submissions[0]
+    benchmark(snapshot.plan.score, responses, choices)
+
+
+def _peak_allocation(func: Any) -> int:
+    """Return the peak bytes allocated by one call of ``func``."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_submission_hot_path(
+    benchmark: Any,
+    raw_bank: tuple[list, list],
+    snapshot: QuestionBankSnapshot,
+) -> None:
+    """Everything ``submit_results`` does per request apart from MongoDB round trips."""
+    body = random_submission(*raw_bank, random.Random(7))
+    now = datetime.now(timezone.utc)
+
+    def submit() -> Any:
+        payload = models.TestSubmissionRequest.model_validate(body)
+        scored = snapshot.plan.score(
+            {item.imageId: item.selectedScore for item in payload.responses},
+            {item.questionNumber: item.optionId for item in payload.choices},
+        )
+        result, document = build_attempt_document(payload, scored, attempt_number=1, now=now)
+        return submission_response(result), document
+
+    submit()
+    benchmark.extra_info["peak_allocated_bytes"] = _peak_allocation(submit)
+    benchmark(submit)
+
+
+@pytest.mark.parametrize("batch_size", [100, 1000])
+def test_score_batch(
+    benchmark: Any,
+    snapshot: QuestionBankSnapshot,
+    submissions: list[tuple[dict[str, int], dict[int, str]]],
+    batch_size: int,
+) -> None:
+    plan = snapshot.plan
+
+    def score() -> Any:
+        return plan.score_batch(*plan.encode(submissions[:batch_size]))
+
+    benchmark(score)
@@ -0,0 +1,105 @@
+"""Synthetic question banks, applicant sessions and a fake MongoDB for benchmarks.
+
+Nothing here needs a running MongoDB or the seed images: the question bank is
+generated in the shape ``app.seed_documents`` builds and served through
+the in-memory repository, while applicant and attempt writes go to
+mongomock-motor.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import uuid
+from typing import Any
+
+from app.repository import InMemoryQuestionBankRepository
+from app.seed_documents import build_supplemental_documents
+
+_IMAGE_TYPES = ("product", "homestyle")
+
+
+def synthetic_questions(
+    question_count: int = 8,
+    images_per_question: int = 4,
+) -> list[dict[str, Any]]:
+    """Return question documents shaped like the seeder's output."""
+    questions: list[dict[str, Any]] = []
+    for question_number in range(1, question_count + 1):
+        image_type = _IMAGE_TYPES[question_number % 2]
+        images = []
+        for index in range(images_per_question):
+            score = index % 3
+            image_id = f"{question_number}_{score}_{image_type}-{index}"
+            images.append(
+                {
+                    "imageId": image_id,
+                    "src": f"/{image_id}.jpg",
+                    "actualScore": score,
+                    "imageType": image_type,
+                    "displayLabel": None,
+                    "filename": f"{image_id}.jpg",
+                }
+            )
+        questions.append(
+            {"questionNumber": question_number, "questionType": image_type, "images": images}
+        )
+    return questions
+
+
+def synthetic_repository(
+    question_count: int = 8,
+    images_per_question: int = 4,
+) -> InMemoryQuestionBankRepository:
+    """Return an in-memory repository holding a synthetic question bank."""
+    return InMemoryQuestionBankRepository(
+        synthetic_questions(question_count, images_per_question),
+        build_supplemental_documents(),
+    )
+
+
+def random_submission(
+    questions: list[dict[str, Any]],
+    supplemental: list[dict[str, Any]],
+    rng: random.Random,
+    *,
+    applicant_pool: int = 1000,
+) -> dict[str, Any]:
+    """Build a ``/submit`` body answering every image and supplemental question.
+
+    ``questions`` and ``supplemental`` may be either stored documents or the
+    public payloads returned by the API. Applicants are drawn from a bounded
+    pool so repeat attempts exercise the attempt counter.
+    """
+    applicant = rng.randrange(applicant_pool)
+    return {
+        "sessionId": uuid.UUID(int=rng.getrandbits(128)).hex,
+        "applicant": {
+            "name": f"Applicant {applicant}",
+            "email": f"applicant{applicant}@example.com",
+        },
+        "responses": [
+            {"imageId": image["imageId"], "selectedScore": rng.randint(0, 2)}
+            for question in questions
+            for image in question["images"]
+        ],
+        "choices": [
+            {
+                "questionNumber": item["questionNumber"],
+                "optionId": rng.choice(item["options"])["optionId"],
+            }
+            for item in supplemental
+        ],
+    }
+
+
+def install_fake_mongo() -> Any:
+    """Point :mod:`app.db` at an in-process mongomock-motor client and return it."""
+    from mongomock_motor import AsyncMongoMockClient  # type: ignore
+
+    from app import db
+
+    os.environ.setdefault("MONGODB_URI", "mongodb://benchmarks.invalid")
+    client = AsyncMongoMockClient()
+    db._client = client
+    return client
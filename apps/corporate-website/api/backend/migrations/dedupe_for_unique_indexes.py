@@ -0,0 +1,108 @@
+"""Remove the duplicates that block the API's unique indexes, then create them.
+
+Before attempt numbering became atomic (see ``app.db.ensure_indexes``),
+concurrent submissions could store the same ``(sessionId, applicantEmail)``
+attempt twice and create two ``applicants`` documents for one email. Building
+the unique indexes fails on such data, so run this once against every
+existing database before deploying a build that creates them:
+
+    cd apps/corporate-website/api/backend
+    python -m migrations.dedupe_for_unique_indexes --dry-run
+    python -m migrations.dedupe_for_unique_indexes
+
+For each duplicated attempt the first submitted copy is kept. For each
+duplicated applicant the oldest document is kept, with ``attemptCount``
+raised to the highest count or attempt number seen for that email, so the
+next attempt number cannot repeat one already stored. Removed documents are
+copied to ``<collection>__duplicates`` first. Re-running is a no-op.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from typing import Any
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorCollection  # type: ignore
+
+from app.db import close_client, ensure_indexes, get_applicants_collection, get_attempts_collection
+
+
+async def _duplicate_groups(
+    collection: AsyncIOMotorCollection, key: dict[str, str], sort: dict[str, int]
+) -> list[list[Any]]:
+    """``_id``s of every group of documents sharing ``key``, in ``sort`` order."""
+    pipeline = [
+        {"$sort": sort},
+        {"$group": {"_id": key, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    cursor = collection.aggregate(pipeline, allowDiskUse=True)
+    return [group["ids"] async for group in cursor]
+
+
+async def _archive_and_delete(collection: AsyncIOMotorCollection, ids: list[Any]) -> None:
+    archive = collection.database[f"{collection.name}__duplicates"]
+    documents = await collection.find({"_id": {"$in": ids}}).to_list(length=None)
+    if documents:
+        await archive.insert_many(documents, ordered=False)
+    await collection.delete_many({"_id": {"$in": ids}})
+
+
+async def dedupe_attempts(*, dry_run: bool = False) -> int:
+    """Keep the first submitted attempt per session and email; return how many were removed."""
+    attempts = await get_attempts_collection()
+    groups = await _duplicate_groups(
+        attempts,
+        {"sessionId": "$sessionId", "applicantEmail": "$applicantEmail"},
+        {"submittedAt": 1, "_id": 1},
+    )
+    extra = [duplicate for ids in groups for duplicate in ids[1:]]
+    if extra and not dry_run:
+        await _archive_and_delete(attempts, extra)
+    return len(extra)
+
+
+async def dedupe_applicants(*, dry_run: bool = False) -> int:
+    """Keep the oldest applicant document per email; return how many were removed."""
+    applicants = await get_applicants_collection()
+    attempts = await get_attempts_collection()
+    groups = await _duplicate_groups(applicants, "$email", {"createdAt": 1, "_id": 1})
+    removed = 0
+    for ids in groups:
+        documents = await applicants.find({"_id": {"$in": ids}}).to_list(length=None)
+        keep = next(document for document in documents if document["_id"] == ids[0])
+        highest = max(int(document.get("attemptCount") or 0) for document in documents)
+        latest = await attempts.find_one(
+            {"applicantEmail": keep["email"]}, sort=[("attemptNumber", -1)], projection={"attemptNumber": 1}
+        )
+        if latest is not None:
+            highest = max(highest, int(latest.get("attemptNumber") or 0))
+        removed += len(ids) - 1
+        if dry_run:
+            continue
+        await _archive_and_delete(applicants, ids[1:])
+        await applicants.update_one({"_id": keep["_id"]}, {"$set": {"attemptCount": highest}})
+    return removed
+
+
+async def main(dry_run: bool = False) -> None:
+    try:
+        attempts_removed = await dedupe_attempts(dry_run=dry_run)
+        applicants_removed = await dedupe_applicants(dry_run=dry_run)
+        verb = "Would remove" if dry_run else "Removed"
+        print(f"{verb} {attempts_removed} duplicate attempts and {applicants_removed} duplicate applicants.")
+        if not dry_run:
+            await ensure_indexes()
+            print("Unique indexes are in place.")
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be removed")
+    args = parser.parse_args()
+    asyncio.run(main(args.dry_run))
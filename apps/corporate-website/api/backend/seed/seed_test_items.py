@@ -1,169 +1,136 @@
 """Seed MongoDB collections with design test questions, images, and supplemental metadata."""
 
+import argparse
 import asyncio
-import re
-from collections import defaultdict
+import uuid
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any
 
 from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorCollection  # type: ignore
+from pymongo import DeleteMany, UpdateOne  # type: ignore
 
 from app.db import (
     close_client,
+    ensure_indexes,
     get_client,
     get_images_collection,
+    get_question_bank_meta_collection,
     get_questions_collection,
+    get_staging_collection,
     get_supplemental_questions_collection,
 )
+from app.repository import QUESTION_BANK_VERSION_ID
+from app.seed_documents import PUBLIC_DIR, build_seed_documents, build_supplemental_documents, seed_hash
 
 load_dotenv()
 
-PUBLIC_DIR = Path("public")
-IMAGE_PATTERN = re.compile(r"^(?P<question>\d+?)_(?P<score>[0-2])_(?P<kind>[a-zA-Z0-9-]+)$")
-
-SUPPLEMENTAL_DATA = [
-    {
-        "questionNumber": 9,
-        "kind": "selection",
-        "prompt": "Which item would you add to the Minkowski catalogue if you joined the product team?",
-        "correctOptionId": "B",
-        "options": [
-            {"optionId": "A", "label": "A. A white matte vase made of plastic", "value": 0},
-            {
-                "optionId": "B",
-                "label": "B. A black glossy vase made with 60% corn-based bioplastic and 40% recycled wood fibers",
-                "value": 2,
-            },
-            {
-                "optionId": "C",
-                "label": "C. A matte off-white clean and minimal Avengers figurine",
-                "value": 0,
-            },
-            {
-                "optionId": "D",
-                "label": "D. A minimal burgundy sofa Japandi style",
-                "value": 1,
-            },
-        ],
-    },
-    {
-        "questionNumber": 10,
-        "kind": "boost",
-        "prompt": "If you join Minkowski, which role excites you the most?",
-        "options": [
-            {
-                "optionId": "A",
-                "label": "A. Product Selection · Curation · Writing Descriptions",
-                "boost": 0.08,
-            },
-            {
-                "optionId": "B",
-                "label": "B. Write Ad copies · Create content · Post on Social",
-                "boost": 0.10,
-            },
-            {
-                "optionId": "C",
-                "label": "C. Ads and sales · Data analysis (requires Data Test)",
-                "boost": 0.20,
-            },
-            {
-                "optionId": "D",
-                "label": "D. Bookkeeping · Accounts (no openings currently)",
-                "boost": 0.10,
-            },
-        ],
-    },
-]
-
-
-async def seed() -> None:
-    if not PUBLIC_DIR.exists():
-        raise FileNotFoundError("public directory not found; nothing to seed")
+
+async def _stored_hashes(collection: AsyncIOMotorCollection, key: str) -> dict[Any, str | None]:
+    """Map each stored document's key to its ``seedHash`` (``None`` for legacy documents)."""
+    return {
+        document[key]: document.get("seedHash")
+        async for document in collection.find({}, {"_id": 0, key: 1, "seedHash": 1})
+    }
+
+
+async def _swap_in(collection: AsyncIOMotorCollection, documents: list[dict[str, Any]]) -> None:
+    """Stage ``documents`` in a shadow collection and rename it over ``collection``.
+
+    The rename replaces the live collection atomically, so readers see either
+    the old set or the new one, never an empty or partial collection.
+    """
+    staging = await get_staging_collection(collection)
+    await staging.drop()
+    await staging.insert_many(documents, ordered=False)
+    await staging.rename(collection.name, dropTarget=True)
+
+
+async def seed(*, public_dir: Path = PUBLIC_DIR, force: bool = False) -> None:
+    """Apply the difference between ``public_dir`` and the stored question bank."""
+    questions, images = await asyncio.to_thread(build_seed_documents, public_dir)
+    supplemental = build_supplemental_documents()
 
     await get_client()
+    await ensure_indexes()
     questions_collection = await get_questions_collection()
     images_collection = await get_images_collection()
     supplemental_collection = await get_supplemental_questions_collection()
 
-    await images_collection.delete_many({})
-    await questions_collection.delete_many({})
-    await supplemental_collection.delete_many({})
-
-    grouped: dict[int, dict[str, any]] = defaultdict(lambda: {"images": []})
-
-    for path in PUBLIC_DIR.iterdir():
-        if not path.is_file():
-            continue
-        stem = path.stem
-        match = IMAGE_PATTERN.match(stem)
-        if not match:
-            continue
-
-        question_number = int(match.group("question"))
-        score = int(match.group("score"))
-        kind = match.group("kind").lower()
-
-        grouped_entry = grouped[question_number]
-        grouped_entry.setdefault("questionType", kind if kind in {"homestyle", "product"} else "homestyle")
-
-        grouped_entry["images"].append(
-            {
-                "imageId": stem,
-                "src": f"/{path.name}",
-                "actualScore": score,
-                "imageType": kind if kind in {"homestyle", "product"} else "homestyle",
-                "displayLabel": None,
-                "filename": path.name,
-            }
-        )
-
-    if not grouped:
-        raise RuntimeError("No matching image assets found in public/ directory")
+    meta_collection = await get_question_bank_meta_collection()
+    stored_images = await _stored_hashes(images_collection, "imageId")
+    stored_supplemental = await _stored_hashes(supplemental_collection, "questionNumber")
+    # The version stamp records the bank it published; anything else means a
+    # previous run stopped part-way (e.g. after the images, before the swap).
+    bank_hash = seed_hash({"questions": questions, "supplemental": supplemental})
+    stamp = await meta_collection.find_one({"_id": QUESTION_BANK_VERSION_ID}, {"seedHash": 1})
+    bank_published = stamp is not None and stamp.get("seedHash") == bank_hash
+
+    changed_images = [
+        image for image in images if force or stored_images.get(image["imageId"]) != image["seedHash"]
+    ]
+    seeded_ids = {image["imageId"] for image in images}
+    removed_images = [image_id for image_id in stored_images if image_id not in seeded_ids]
+    supplemental_changed = force or stored_supplemental != {
+        doc["questionNumber"]: doc["seedHash"] for doc in supplemental
+    }
+
+    if not changed_images and not removed_images and not supplemental_changed and bank_published:
+        print(f"Question bank already matches {public_dir}; nothing to do.")
+        return
 
     now = datetime.now(timezone.utc)
 
-    total_images = 0
-    for question_number, payload in sorted(grouped.items()):
-        images = sorted(payload["images"], key=lambda img: img["imageId"])
-        for image in images:
-            image_payload = {
-                **image,
-                "questionNumber": question_number,
-                "createdAt": now,
-                "updatedAt": now,
-            }
-            await images_collection.insert_one(image_payload)
-            total_images += 1
-
-        question_payload = {
-            "questionNumber": question_number,
-            "questionType": payload["questionType"],
-            "images": images,
-            "createdAt": now,
-            "updatedAt": now,
-        }
-        await questions_collection.insert_one(question_payload)
-
-    await supplemental_collection.insert_many([
-        {
-            **doc,
-            "createdAt": now,
-            "updatedAt": now,
-        }
-        for doc in SUPPLEMENTAL_DATA
-    ])
+    operations: list[Any] = [
+        UpdateOne(
+            {"imageId": image["imageId"]},
+            {"$set": {**image, "updatedAt": now}, "$setOnInsert": {"createdAt": now}},
+            upsert=True,
+        )
+        for image in changed_images
+    ]
+    if removed_images:
+        operations.append(DeleteMany({"imageId": {"$in": removed_images}}))
+    if operations:
+        await images_collection.bulk_write(operations, ordered=False)
+
+    # Questions embed their images and are what the API reads, so the full set
+    # is always rebuilt and swapped in whenever anything changed.
+    await _swap_in(
+        questions_collection,
+        [{**question, "createdAt": now, "updatedAt": now} for question in questions],
+    )
+    if supplemental_changed:
+        await _swap_in(
+            supplemental_collection,
+            [{**doc, "createdAt": now, "updatedAt": now} for doc in supplemental],
+        )
+
+    # Bump the version stamp last so running APIs reload the complete bank.
+    await meta_collection.update_one(
+        {"_id": QUESTION_BANK_VERSION_ID},
+        {"$set": {"version": uuid.uuid4().hex, "seedHash": bank_hash, "updatedAt": now}},
+        upsert=True,
+    )
 
     print(
-        f"Seeded {len(grouped)} image questions, {total_images} images, and {len(SUPPLEMENTAL_DATA)} supplemental questions from {PUBLIC_DIR}."
+        f"Seeded {len(questions)} image questions from {public_dir}: "
+        f"{len(changed_images)} images upserted, {len(removed_images)} removed, "
+        f"supplemental questions {'replaced' if supplemental_changed else 'unchanged'}."
     )
 
 
-async def main() -> None:
+async def main(public_dir: Path = PUBLIC_DIR, force: bool = False) -> None:
     try:
-        await seed()
+        await seed(public_dir=public_dir, force=force)
     finally:
         await close_client()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--public-dir", type=Path, default=PUBLIC_DIR)
+    parser.add_argument("--force", action="store_true", help="rewrite everything even if unchanged")
+    args = parser.parse_args()
+    asyncio.run(main(args.public_dir, args.force))
@@ -0,0 +1,47 @@
+"""Shared fixtures: the app served in process on mongomock-motor storage."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import httpx
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from benchmarks.workload import install_fake_mongo, synthetic_repository
+
+
+@pytest.fixture
+def fake_mongo() -> Any:
+    """A fresh mongomock-motor client behind ``app.db``, with the API's indexes."""
+    from app import db
+
+    client = install_fake_mongo()
+    asyncio.run(db.ensure_indexes())
+    yield client
+    db._client = None
+
+
+@pytest.fixture
+def api(fake_mongo: Any) -> Any:
+    """Return a runner for ``async def test(client)`` against the in-process app.
+
+    App exceptions become 500 responses, as they would behind uvicorn.
+    """
+    from app.main import app
+    from app.question_bank import question_bank
+
+    def run(test: Any) -> Any:
+        async def main() -> Any:
+            question_bank.use_repository(synthetic_repository())
+            await question_bank.get()
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            client: httpx.AsyncClient
+            async with httpx.AsyncClient(transport=transport, base_url="http://design-test") as client:
+                return await test(client)
+
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,75 @@
+"""The dedupe migration that must run before the unique indexes are deployed."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+
+from app import db
+from benchmarks.workload import install_fake_mongo
+from migrations import dedupe_for_unique_indexes as migration
+
+
+@pytest.fixture
+def legacy_db():
+    """Collections written by a release that had no unique indexes."""
+    client = install_fake_mongo()
+    yield client
+    db._client = None
+
+
+def test_removes_duplicates_so_the_unique_indexes_build(legacy_db):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    async def main():
+        attempts = await db.get_attempts_collection()
+        applicants = await db.get_applicants_collection()
+        await attempts.insert_many(
+            [
+                {"sessionId": "s1", "applicantEmail": "a@x.io", "attemptNumber": 1, "submittedAt": start},
+                {
+                    "sessionId": "s1",
+                    "applicantEmail": "a@x.io",
+                    "attemptNumber": 2,
+                    "submittedAt": start + timedelta(seconds=1),
+                },
+                {
+                    "sessionId": "s2",
+                    "applicantEmail": "a@x.io",
+                    "attemptNumber": 3,
+                    "submittedAt": start + timedelta(days=1),
+                },
+            ]
+        )
+        await applicants.insert_many(
+            [
+                {"email": "a@x.io", "attemptCount": 1, "createdAt": start},
+                {"email": "a@x.io", "attemptCount": 2, "createdAt": start + timedelta(seconds=1)},
+            ]
+        )
+        with pytest.raises(RuntimeError, match="dedupe_for_unique_indexes"):
+            await db.ensure_indexes()
+
+        assert await migration.dedupe_attempts(dry_run=True) == 1
+        assert await attempts.count_documents({}) == 3
+        removed = (await migration.dedupe_attempts(), await migration.dedupe_applicants())
+        await db.ensure_indexes()
+        again = (await migration.dedupe_attempts(), await migration.dedupe_applicants())
+
+        kept = await attempts.find({}, sort=[("attemptNumber", 1)]).to_list(length=None)
+        applicant = await applicants.find_one({"email": "a@x.io"})
+        archived = await attempts.database["attempts__duplicates"].count_documents({})
+        return removed, again, [a["attemptNumber"] for a in kept], applicant, archived
+
+    removed, again, kept, applicant, archived = asyncio.run(main())
+    assert removed == (1, 1)
+    assert again == (0, 0)
+    assert kept == [1, 3]
+    assert archived == 1
+    # The survivor is the oldest document, and the next attempt number is 4.
+    assert applicant["createdAt"].replace(tzinfo=timezone.utc) == start
+    assert applicant["attemptCount"] == 3
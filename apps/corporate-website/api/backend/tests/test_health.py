@@ -0,0 +1,34 @@
+"""Operational endpoints that must not be public."""
+
+from __future__ import annotations
+
+from typing import Any
+
+
+def test_mongo_pool_metrics_require_the_admin_token(api: Any, monkeypatch: Any) -> None:
+    async def test(client: Any) -> Any:
+        hidden = await client.get("/health/mongo")
+        monkeypatch.setenv("ADMIN_API_TOKEN", "s3cret")
+        anonymous = await client.get("/health/mongo")
+        wrong = await client.get("/health/mongo", headers={"X-Admin-Token": "guess"})
+        admin = await client.get("/health/mongo", headers={"X-Admin-Token": "s3cret"})
+        return [r.status_code for r in (hidden, anonymous, wrong, admin)], admin.json()
+
+    statuses, body = api(test)
+    assert statuses == [404, 401, 401, 200]
+    assert isinstance(body, dict)
+
+
+def test_metrics_require_the_admin_token_and_server_timing_is_off(api: Any, monkeypatch: Any) -> None:
+    async def test(client: Any) -> Any:
+        hidden = await client.get("/metrics")
+        monkeypatch.setenv("ADMIN_API_TOKEN", "s3cret")
+        anonymous = await client.get("/metrics")
+        admin = await client.get("/metrics", headers={"X-Admin-Token": "s3cret"})
+        questions = await client.get("/api/design-test/questions")
+        return [r.status_code for r in (hidden, anonymous, admin)], admin.text, questions.headers
+
+    statuses, metrics, headers = api(test)
+    assert statuses == [404, 401, 200]
+    assert "http_request_duration_seconds" in metrics
+    assert "server-timing" not in headers
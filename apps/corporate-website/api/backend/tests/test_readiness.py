@@ -0,0 +1,94 @@
+"""The boot-time warm-up and ``/ready``, against mongomock-motor."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import httpx
+from pymongo.errors import ServerSelectionTimeoutError  # type: ignore
+
+from app import db, main, readiness as readiness_module
+from app.question_bank import question_bank
+from app.readiness import Readiness
+from app.repository import MotorQuestionBankRepository
+from benchmarks.workload import synthetic_repository
+
+
+async def _seed_bank() -> None:
+    bank = synthetic_repository()
+    await (await db.get_questions_collection()).insert_many(await bank.fetch_questions())
+    await (await db.get_supplemental_questions_collection()).insert_many(await bank.fetch_supplemental())
+
+
+def _probe(monkeypatch: Any, test: Any) -> Any:
+    """Run ``test(client, readiness)`` with a fresh warm-up over the MongoDB-backed bank."""
+    readiness = Readiness()
+    monkeypatch.setattr(main, "readiness", readiness)
+    question_bank.use_repository(MotorQuestionBankRepository())
+
+    async def run() -> Any:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://design-test") as client:
+            try:
+                return await test(client, readiness)
+            finally:
+                await readiness.stop()
+
+    return asyncio.run(run())
+
+
+def test_ready_reports_starting_until_the_warm_up_completes(fake_mongo: Any, monkeypatch: Any) -> None:
+    async def test(client: Any, readiness: Readiness) -> Any:
+        await _seed_bank()
+        before = await client.get("/ready")
+        await readiness.warm_up()
+        after = await client.get("/ready")
+        return before, after
+
+    before, after = _probe(monkeypatch, test)
+    assert before.status_code == 503
+    assert before.json()["status"] == "starting"
+    assert before.json()["checks"]["warmed"] is False
+    assert after.status_code == 200
+    assert after.json() == {
+        "status": "ready",
+        "checks": {"mongo": True, "indexes": True, "snapshot": True, "warmed": True},
+    }
+
+
+def test_ready_stays_unavailable_while_the_bank_is_empty(fake_mongo: Any, monkeypatch: Any) -> None:
+    async def test(client: Any, readiness: Readiness) -> Any:
+        await readiness.start()
+        for _ in range(100):
+            if readiness.last_error:
+                break
+            await asyncio.sleep(0.01)
+        return await client.get("/ready")
+
+    response = _probe(monkeypatch, test)
+    assert response.status_code == 503
+    body = response.json()
+    assert body["status"] == "starting"
+    assert body["checks"]["snapshot"] is False
+    assert body["checks"]["error"].startswith("WarmUpError")
+
+
+def test_ready_drops_out_when_mongo_stops_answering(fake_mongo: Any, monkeypatch: Any) -> None:
+    async def unreachable() -> None:
+        raise ServerSelectionTimeoutError("no servers available")
+
+    async def test(client: Any, readiness: Readiness) -> Any:
+        await _seed_bank()
+        await readiness.warm_up()
+        ready = await client.get("/ready")
+        monkeypatch.setattr(readiness_module, "ping_mongo", unreachable)
+        lost = await client.get("/ready")
+        return ready, lost
+
+    ready, lost = _probe(monkeypatch, test)
+    assert ready.status_code == 200
+    assert lost.status_code == 503
+    assert lost.json()["status"] == "starting"
+    assert lost.json()["checks"]["mongo"] is False
+    assert lost.json()["checks"]["error"].startswith("ServerSelectionTimeoutError")
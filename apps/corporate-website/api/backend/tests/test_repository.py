@@ -0,0 +1,72 @@
+"""Question-bank repositories and the watcher that follows them."""
+
+from __future__ import annotations
+
+import asyncio
+import subprocess
+import sys
+from typing import Any, AsyncIterator
+
+from app.question_bank import QuestionBankCache
+from benchmarks.workload import synthetic_repository
+
+
+def test_importing_the_repository_does_not_load_the_seed_script() -> None:
+    code = "import sys, app.repository; print('seed.seed_test_items' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+
+def test_in_memory_repository_never_pushes_changes() -> None:
+    repository = synthetic_repository()
+
+    async def changes() -> list[None]:
+        return [change async for change in repository.watch_version()]
+
+    assert repository.can_watch is False
+    assert asyncio.run(changes()) == []
+
+
+class _StandaloneRepository:
+    """Mutable bank on a server without change streams."""
+
+    static = False
+
+    def __init__(self) -> None:
+        self.can_watch = True
+        self.version = "v1"
+        self._bank = synthetic_repository()
+
+    async def fetch_version(self) -> str | None:
+        return self.version
+
+    async def fetch_questions(self) -> list[dict[str, Any]]:
+        return await self._bank.fetch_questions()
+
+    async def fetch_supplemental(self) -> list[dict[str, Any]]:
+        return await self._bank.fetch_supplemental()
+
+    async def watch_version(self) -> AsyncIterator[None]:
+        self.can_watch = False
+        for _change in ():
+            yield None
+
+
+def test_watcher_falls_back_to_polling_without_change_streams(monkeypatch: Any) -> None:
+    monkeypatch.setenv("QUESTION_BANK_REFRESH_SECONDS", "0.01")
+    repository = _StandaloneRepository()
+    cache = QuestionBankCache(repository)
+
+    async def main() -> list[str | None]:
+        versions = [(await cache.get()).version]
+        await cache.start()
+        repository.version = "v2"
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if cache.snapshot is not None and cache.snapshot.version == "v2":
+                break
+        versions.append(cache.snapshot.version if cache.snapshot else None)
+        await cache.stop()
+        return versions
+
+    assert asyncio.run(main()) == ["v1", "v2"]
@@ -0,0 +1,114 @@
+"""Admin export and analytics over stored attempts."""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import random
+from datetime import datetime
+from typing import Any
+
+from app.question_bank import question_bank
+from app.routes import design_test
+from tests.test_submit import _submission
+
+EXPORT = "/api/design-test/admin/results/export"
+
+
+def test_analytics_count_distinct_applicants(api: Any, monkeypatch: Any) -> None:
+    monkeypatch.setenv("ADMIN_API_TOKEN", "s3cret")
+    rng = random.Random(3)
+    bodies = [_submission(seed) for seed in range(4)]
+    for body, email in zip(bodies, ["a@example.com", "b@example.com", "a@example.com", "A@example.com"]):
+        body["applicant"]["email"] = email
+        body["sessionId"] = f"session-{rng.random()}"
+
+    async def test(client: Any) -> Any:
+        for body in bodies:
+            assert (await client.post("/api/design-test/submit", json=body)).status_code == 201
+        response = await client.get(
+            "/api/design-test/admin/results/analytics", headers={"X-Admin-Token": "s3cret"}
+        )
+        empty = await client.get(
+            "/api/design-test/admin/results/analytics",
+            params={"since": "2999-01-01T00:00:00Z"},
+            headers={"X-Admin-Token": "s3cret"},
+        )
+        return response.json()["totals"], empty.json()["totals"]
+
+    totals, empty = api(test)
+    assert (totals["attempts"], totals["applicants"]) == (4, 2)
+    assert 0 <= totals["avgOverallCloseness"] <= 1
+    assert (empty["attempts"], empty["applicants"]) == (0, 0)
+
+
+def _export_fixture(api: Any, monkeypatch: Any, test: Any) -> Any:
+    """Store three attempts submitted a day apart, then run ``test(client, headers)``."""
+    monkeypatch.setenv("ADMIN_API_TOKEN", "s3cret")
+    bodies = [_submission(seed) for seed in range(3)]
+
+    async def run(client: Any) -> Any:
+        attempts = await design_test.get_attempts_collection()
+        for day, body in enumerate(bodies, start=1):
+            assert (await client.post("/api/design-test/submit", json=body)).status_code == 201
+            await attempts.update_one(
+                {"sessionId": body["sessionId"]}, {"$set": {"submittedAt": datetime(2026, 3, day, 12)}}
+            )
+        snapshot = await question_bank.get()
+        numbers = [question.questionNumber for question in snapshot.questions]
+        return await test(client, {"X-Admin-Token": "s3cret"}), bodies, numbers
+
+    return api(run)
+
+
+def test_export_streams_ndjson_rows(api: Any, monkeypatch: Any) -> None:
+    async def test(client: Any, headers: dict[str, str]) -> Any:
+        everything = await client.get(EXPORT, headers=headers)
+        window = await client.get(
+            EXPORT, params={"since": "2026-03-02T00:00:00", "until": "2026-03-03T00:00:00"}, headers=headers
+        )
+        return everything, window
+
+    (everything, window), bodies, numbers = _export_fixture(api, monkeypatch, test)
+    assert everything.status_code == 200
+    assert everything.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in everything.text.splitlines()]
+    assert [row["sessionId"] for row in rows] == [body["sessionId"] for body in bodies]
+    assert rows[0]["submittedAt"] == "2026-03-01T12:00:00"
+    assert sorted(rows[0]["questionCloseness"], key=int) == [str(number) for number in numbers]
+    assert all(0 <= value <= 1 for value in rows[0]["questionCloseness"].values())
+    assert [json.loads(line)["sessionId"] for line in window.text.splitlines()] == [bodies[1]["sessionId"]]
+
+
+def test_export_writes_csv_with_a_column_per_question(api: Any, monkeypatch: Any) -> None:
+    async def test(client: Any, headers: dict[str, str]) -> Any:
+        everything = await client.get(EXPORT, params={"format": "csv"}, headers=headers)
+        since = await client.get(EXPORT, params={"format": "csv", "since": "2026-03-02T00:00:00"}, headers=headers)
+        return everything, since
+
+    (everything, since), bodies, numbers = _export_fixture(api, monkeypatch, test)
+    assert everything.status_code == 200
+    assert everything.headers["content-type"].startswith("text/csv")
+    header, *rows = list(csv.reader(io.StringIO(everything.text)))
+    closeness_columns = [f"q{number}Closeness" for number in numbers]
+    assert header[-len(numbers) :] == closeness_columns
+    assert len(rows) == 3
+    first = dict(zip(header, rows[0]))
+    assert first["sessionId"] == bodies[0]["sessionId"]
+    assert first["submittedAt"] == "2026-03-01T12:00:00"
+    assert all(0 <= float(first[column]) <= 1 for column in closeness_columns)
+    since_rows = list(csv.DictReader(io.StringIO(since.text)))
+    assert [row["sessionId"] for row in since_rows] == [body["sessionId"] for body in bodies[1:]]
+
+
+def test_export_requires_the_admin_token(api: Any, monkeypatch: Any) -> None:
+    async def test(client: Any) -> list[int]:
+        monkeypatch.delenv("ADMIN_API_TOKEN", raising=False)
+        unset = await client.get(EXPORT, headers={"X-Admin-Token": "s3cret"})
+        monkeypatch.setenv("ADMIN_API_TOKEN", "s3cret")
+        missing = await client.get(EXPORT)
+        wrong = await client.get(EXPORT, params={"format": "csv"}, headers={"X-Admin-Token": "nope"})
+        return [unset.status_code, missing.status_code, wrong.status_code]
+
+    assert api(test) == [404, 401, 401]
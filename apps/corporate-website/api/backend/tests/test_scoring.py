@@ -0,0 +1,99 @@
+"""The vectorized scorer against the per-image loop it replaced."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+from typing import Any
+
+import numpy as np
+
+from app.models import QuestionDocument
+from app.question_bank import load_snapshot
+from app.scoring import ROLE_QUESTION_NUMBER, SCENARIO_QUESTION_NUMBER, ScoringPlan
+from benchmarks.workload import synthetic_repository
+
+
+def _loop_score(plan: ScoringPlan, responses: dict[str, int], choices: dict[int, str]) -> dict[str, Any]:
+    """The scorer as it was before vectorization: one Python pass per image."""
+    questions = []
+    all_closeness: list[float] = []
+    all_errors: list[float] = []
+    for question in plan.questions:
+        closeness: list[float] = []
+        errors: list[float] = []
+        for image in question.images:
+            response = responses.get(image.imageId)
+            if response is None:
+                continue
+            error = abs(response - image.actualScore)
+            closeness.append(1 - error / 2)
+            errors.append(error)
+        all_closeness += closeness
+        all_errors += errors
+        questions.append(
+            (
+                sum(closeness) / len(closeness) if closeness else None,
+                sum(errors) / len(errors) if errors else None,
+            )
+        )
+    selected = plan.selection_options[choices[SCENARIO_QUESTION_NUMBER]].value
+    scenario_error = abs(selected - plan.correct_selection_value())
+    all_errors.append(scenario_error)
+    all_closeness.append(1 - scenario_error / 2)
+    base = sum(all_closeness) / len(all_closeness)
+    multiplier = 1 + plan.boost_options[choices[ROLE_QUESTION_NUMBER]].boost
+    return {
+        "questions": questions,
+        "base": base,
+        "mae": sum(all_errors) / len(all_errors),
+        "overall": min(base * multiplier, 1.0),
+    }
+
+
+def _randomized_plan(rng: random.Random) -> ScoringPlan:
+    snapshot = asyncio.run(load_snapshot(synthetic_repository(rng.randint(1, 8), rng.randint(1, 6))))
+    questions = list(snapshot.questions)
+    # Questions without images (e.g. a half-seeded bank), including in last place.
+    for position in (rng.randint(0, len(questions)), len(questions) + 1):
+        empty = QuestionDocument.model_construct(
+            questionNumber=100 + position, questionType=questions[0].questionType, images=[]
+        )
+        questions.insert(position, empty)
+    return ScoringPlan.compile(tuple(questions), snapshot.supplemental)
+
+
+def _random_answers(plan: ScoringPlan, rng: random.Random) -> tuple[dict[str, int], dict[int, str]]:
+    responses = {image_id: rng.randint(0, 2) for image_id in plan.image_ids if rng.random() < 0.7}
+    choices = {
+        SCENARIO_QUESTION_NUMBER: rng.choice(plan.selection_option_ids),
+        ROLE_QUESTION_NUMBER: rng.choice(plan.boost_option_ids),
+    }
+    return responses, choices
+
+
+def _same(left: float | None, right: float | None) -> bool:
+    if left is None or right is None:
+        return left is right
+    return math.isclose(left, right, rel_tol=1e-12, abs_tol=1e-12)
+
+
+def test_vectorized_scoring_matches_the_loop_on_random_submissions() -> None:
+    rng = random.Random(20240611)
+    for _ in range(25):
+        plan = _randomized_plan(rng)
+        submissions = [_random_answers(plan, rng) for _ in range(rng.randint(1, 20))]
+        batch = plan.score_batch(*plan.encode(submissions))
+        for row, (responses, choices) in enumerate(submissions):
+            expected = _loop_score(plan, responses, choices)
+            scored = plan.score(responses, choices)
+            actual = [(question["closeness"], question["mae"]) for question in scored.image_questions]
+
+            assert len(actual) == len(expected["questions"])
+            for (closeness, mae), (expected_closeness, expected_mae) in zip(actual, expected["questions"]):
+                assert _same(closeness, expected_closeness) and _same(mae, expected_mae)
+            assert _same(scored.base_closeness, expected["base"])
+            assert _same(scored.mae, expected["mae"])
+            assert _same(scored.overall_closeness, expected["overall"])
+            assert np.isclose(batch.overall_closeness[row], expected["overall"], rtol=1e-12)
@@ -0,0 +1,50 @@
+"""Incremental seeding against mongomock-motor."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app import db
+from app.repository import QUESTION_BANK_VERSION_ID
+from app.seed_documents import build_seed_documents, build_supplemental_documents
+from seed import seed_test_items
+
+
+@pytest.fixture
+def public_dir(tmp_path: Path) -> Path:
+    for question in (1, 2):
+        for score, kind in ((0, "homestyle"), (1, "homestyle"), (2, "product")):
+            (tmp_path / f"{question}_{score}_{kind}.jpg").write_bytes(f"{question}-{score}".encode())
+    return tmp_path
+
+
+async def _version() -> Any:
+    meta = await db.get_question_bank_meta_collection()
+    return (await meta.find_one({"_id": QUESTION_BANK_VERSION_ID}) or {}).get("version")
+
+
+def test_a_run_interrupted_after_the_images_is_completed_by_the_next(
+    fake_mongo: Any, public_dir: Path, capsys: Any
+) -> None:
+    async def main() -> Any:
+        # What a seeder killed between the images bulk_write and the swap leaves behind.
+        _, images = build_seed_documents(public_dir)
+        await (await db.get_images_collection()).insert_many(images)
+        supplemental = build_supplemental_documents()
+        await (await db.get_supplemental_questions_collection()).insert_many(supplemental)
+
+        await seed_test_items.seed(public_dir=public_dir)
+        questions = await (await db.get_questions_collection()).count_documents({})
+        version = await _version()
+
+        await seed_test_items.seed(public_dir=public_dir)
+        return questions, version, await _version()
+
+    questions, version, version_after_rerun = asyncio.run(main())
+    assert questions == 2 and version is not None
+    assert version_after_rerun == version
+    assert capsys.readouterr().out.strip().endswith("nothing to do.")
@@ -0,0 +1,137 @@
+"""Submission idempotency against mongomock-motor."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+from pathlib import Path
+from typing import Any
+
+from pymongo.errors import AutoReconnect  # type: ignore
+
+from app.routes import design_test
+from app.write_behind import AttemptWriteBehind
+from benchmarks.workload import random_submission, synthetic_repository
+
+
+def _submission(seed: int = 7) -> dict[str, Any]:
+    repository = synthetic_repository()
+    questions = asyncio.run(repository.fetch_questions())
+    supplemental = asyncio.run(repository.fetch_supplemental())
+    return random_submission(questions, supplemental, random.Random(seed))
+
+
+class _FlakyAttempts:
+    """Attempts collection whose first ``insert_one`` fails like a dropped connection."""
+
+    def __init__(self, collection: Any) -> None:
+        self._collection = collection
+        self.failures = 1
+
+    async def insert_one(self, document: dict[str, Any]) -> Any:
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("connection reset")
+        return await self._collection.insert_one(document)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._collection, name)
+
+
+def test_retry_after_failed_insert_reuses_the_claimed_attempt_number(api: Any, monkeypatch: Any) -> None:
+    original = design_test.get_attempts_collection
+    flaky: list[_FlakyAttempts] = []
+
+    async def attempts() -> Any:
+        if not flaky:
+            flaky.append(_FlakyAttempts(await original()))
+        return flaky[0]
+
+    monkeypatch.setattr(design_test, "get_attempts_collection", attempts)
+    body = _submission()
+
+    async def test(client: Any) -> Any:
+        responses = [await client.post("/api/design-test/submit", json=body) for _ in range(3)]
+        applicant = await (await design_test.get_applicants_collection()).find_one(
+            {"email": body["applicant"]["email"]}
+        )
+        stored = await (await original()).count_documents({"sessionId": body["sessionId"]})
+        return responses, applicant, stored
+
+    responses, applicant, stored = api(test)
+    assert [response.status_code for response in responses] == [500, 201, 201]
+    assert responses[1].json() == responses[2].json()
+    assert responses[1].json()["attemptNumber"] == 1
+    assert applicant["attemptCount"] == 1
+    assert stored == 1
+
+
+def test_next_session_gets_the_next_attempt_number(api: Any) -> None:
+    first, second = _submission(1), _submission(2)
+    second["applicant"] = first["applicant"]
+
+    async def test(client: Any) -> list[int]:
+        numbers = []
+        for body in (first, second, first):
+            response = await client.post("/api/design-test/submit", json=body)
+            assert response.status_code == 201
+            numbers.append(response.json()["attemptNumber"])
+        return numbers
+
+    assert api(test) == [1, 2, 1]
+
+
+class _Slow:
+    """Collection whose reads and updates stall like an overloaded primary."""
+
+    def __init__(self, collection: Any, delay: float) -> None:
+        self._collection = collection
+        self._delay = delay
+
+    async def find_one(self, *args: Any, **kwargs: Any) -> Any:
+        await asyncio.sleep(self._delay)
+        return await self._collection.find_one(*args, **kwargs)
+
+    async def find_one_and_update(self, *args: Any, **kwargs: Any) -> Any:
+        await asyncio.sleep(self._delay)
+        return await self._collection.find_one_and_update(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._collection, name)
+
+
+def test_write_behind_bounds_the_mongo_calls_left_on_the_request_path(
+    api: Any, monkeypatch: Any, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("ATTEMPT_WRITE_BEHIND", "true")
+    monkeypatch.setenv("ATTEMPT_WRITE_BEHIND_MONGO_TIMEOUT_MS", "50")
+    monkeypatch.setattr(design_test, "attempt_write_behind", AttemptWriteBehind(tmp_path))
+    attempts, applicants = design_test.get_attempts_collection, design_test.get_applicants_collection
+    slow_applicants = False
+
+    async def slow_attempts() -> Any:
+        return _Slow(await attempts(), 5.0)
+
+    async def maybe_slow_applicants() -> Any:
+        collection = await applicants()
+        return _Slow(collection, 5.0) if slow_applicants else collection
+
+    monkeypatch.setattr(design_test, "get_attempts_collection", slow_attempts)
+    monkeypatch.setattr(design_test, "get_applicants_collection", maybe_slow_applicants)
+    first, second = _submission(1), _submission(2)
+
+    async def test(client: Any) -> Any:
+        nonlocal slow_applicants
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        # A stalled dedupe read is skipped; the claim still numbers the attempt.
+        accepted = await client.post("/api/design-test/submit", json=first)
+        slow_applicants = True
+        # A stalled claim fails fast instead of holding the request.
+        rejected = await client.post("/api/design-test/submit", json=second)
+        return accepted, rejected, loop.time() - started
+
+    accepted, rejected, elapsed = api(test)
+    assert accepted.status_code == 201 and accepted.json()["attemptNumber"] == 1
+    assert rejected.status_code == 503 and rejected.headers["Retry-After"] == "1"
+    assert elapsed < 2.0
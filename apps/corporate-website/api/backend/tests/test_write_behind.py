@@ -0,0 +1,122 @@
+"""The attempt journal shared by several workers, against mongomock-motor."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Any
+
+from bson import json_util  # type: ignore
+from pymongo.errors import BulkWriteError  # type: ignore
+
+from app import db, write_behind
+from app.write_behind import AttemptWriteBehind
+
+
+def _attempt(session: str) -> dict[str, Any]:
+    return {"sessionId": session, "applicantEmail": f"{session}@example.com", "attemptNumber": 1}
+
+
+async def _stored_sessions() -> list[str]:
+    attempts = await db.get_attempts_collection()
+    return sorted(document["sessionId"] for document in await attempts.find({}).to_list(length=None))
+
+
+def test_a_worker_never_drains_another_workers_segments(fake_mongo: Any, tmp_path: Path) -> None:
+    async def main() -> Any:
+        first, second = AttemptWriteBehind(tmp_path), AttemptWriteBehind(tmp_path)
+        await first.enqueue(_attempt("s1"))
+        drained_active = await second.drain()
+        await first._seal_active()
+        drained_sealed = await second.drain()
+        segments_left = len(list(tmp_path.glob("attempts-*.jsonl")))
+        stored_before = await _stored_sessions()
+        drained_own = await first.drain()
+        return drained_active, drained_sealed, segments_left, stored_before, drained_own, first.backlog
+
+    assert asyncio.run(main()) == (0, 0, 1, [], 1, 0)
+    assert list(tmp_path.glob("attempts-*.jsonl")) == []
+    assert asyncio.run(_stored_sessions()) == ["s1"]
+
+
+def test_segments_of_a_dead_worker_are_adopted(fake_mongo: Any, tmp_path: Path) -> None:
+    async def main() -> Any:
+        crashed, survivor = AttemptWriteBehind(tmp_path), AttemptWriteBehind(tmp_path)
+        await crashed.enqueue(_attempt("s1"))
+        assert crashed._active is not None
+        crashed._active.close()  # the kernel drops a dead process's locks
+        drained = await survivor.drain()
+        return drained, await _stored_sessions()
+
+    assert asyncio.run(main()) == (1, ["s1"])
+
+
+def test_rejected_documents_are_quarantined_and_the_drain_continues(
+    fake_mongo: Any, tmp_path: Path, monkeypatch: Any
+) -> None:
+    original = write_behind.get_attempts_collection
+
+    class _Validating:
+        """Attempts collection that rejects sessions starting with ``bad``, like a schema validator."""
+
+        def __init__(self, collection: Any) -> None:
+            self._collection = collection
+
+        async def insert_many(self, documents: list[dict[str, Any]], ordered: bool = True) -> None:
+            errors = [
+                {"index": index, "code": 121, "errmsg": "Document failed validation"}
+                for index, document in enumerate(documents)
+                if document["sessionId"].startswith("bad")
+            ]
+            good = [document for document in documents if not document["sessionId"].startswith("bad")]
+            if good:
+                await self._collection.insert_many(good, ordered=ordered)
+            if errors:
+                raise BulkWriteError({"writeErrors": errors, "nInserted": len(good)})
+
+    async def attempts() -> Any:
+        return _Validating(await original())
+
+    monkeypatch.setattr(write_behind, "get_attempts_collection", attempts)
+
+    async def main() -> Any:
+        journal = AttemptWriteBehind(tmp_path, batch_size=2)
+        for session in ("s1", "bad1", "s2"):
+            await journal.enqueue(_attempt(session))
+        await journal._seal_active()
+        await journal.enqueue(_attempt("s3"))
+        drained = await journal.drain()
+        return drained, journal.backlog, await _stored_sessions()
+
+    assert asyncio.run(main()) == (3, 0, ["s1", "s2", "s3"])
+    assert list(tmp_path.glob("attempts-*.jsonl")) == []
+    (failed,) = (tmp_path / "failed").iterdir()
+    assert [json_util.loads(line)["sessionId"] for line in failed.read_text().splitlines()] == ["bad1"]
+
+
+def test_the_drainer_survives_a_journal_error(fake_mongo: Any, tmp_path: Path, monkeypatch: Any) -> None:
+    async def main() -> Any:
+        journal = AttemptWriteBehind(tmp_path, flush_interval=0.01)
+        original = journal.drain
+        calls = 0
+
+        async def drain() -> int:
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise OSError(28, "No space left on device")
+            return await original()
+
+        monkeypatch.setattr(journal, "drain", drain)
+        monkeypatch.setattr(write_behind, "_MAX_RETRY_DELAY_SECONDS", 0.05)
+        await journal.start()
+        await journal.enqueue(_attempt("s1"))
+        for _ in range(200):
+            if calls > 1 and journal.backlog == 0:
+                break
+            await asyncio.sleep(0.01)
+        drainer_alive = journal._drainer is not None and not journal._drainer.done()
+        await journal.stop()
+        return calls > 1, drainer_alive, await _stored_sessions()
+
+    assert asyncio.run(main()) == (True, True, ["s1"])
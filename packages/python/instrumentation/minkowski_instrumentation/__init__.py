@@ -0,0 +1,164 @@
+"""Shared request instrumentation for Minkowski FastAPI services.
+
+``instrument(app)`` wires everything a service needs:
+
+- :class:`InstrumentationMiddleware`: per-route latency histograms, status
+  counters and an in-flight gauge. With ``SERVER_TIMING=true`` responses also
+  carry a ``Server-Timing`` header listing the request's spans; it is off by
+  default because it tells any client how the service spends its time.
+  Requests slower than ``SLOW_REQUEST_MS`` are logged with their span
+  breakdown.
+- ``GET /metrics``: every registered metric in the Prometheus text format.
+  It is hidden unless ``METRICS_TOKEN`` is set, and scrapers must send that
+  token in ``X-Metrics-Token``; a service can pass its own auth dependencies
+  instead (``instrument(app, metrics_dependencies=[...])``).
+- ``GET /debug/profile``: an opt-in sampling profiler returning folded
+  stacks for flame graphs. It is hidden unless ``PROFILER_TOKEN`` is set, and
+  callers must send that token in ``X-Profiler-Token``.
+
+Code on the request path times its sections with :func:`span`; driver
+callbacks attach externally measured durations with :func:`record_span`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import secrets
+from typing import Any, Sequence
+
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Query, Response, status
+
+from .metrics import (
+    CONTENT_TYPE,
+    Counter,
+    Gauge,
+    Histogram,
+    MetricFamily,
+    MetricsRegistry,
+    Sample,
+    histogram_samples,
+    registry,
+)
+from .middleware import InstrumentationMiddleware, collect_in_flight, in_flight_routes
+from .profiler import SamplingProfiler
+from .tracing import RequestTrace, current_trace, record_span, span
+
+__all__ = [
+    "CONTENT_TYPE",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "InstrumentationMiddleware",
+    "MetricFamily",
+    "MetricsRegistry",
+    "RequestTrace",
+    "Sample",
+    "SamplingProfiler",
+    "current_trace",
+    "histogram_samples",
+    "instrument",
+    "record_span",
+    "registry",
+    "require_metrics_token",
+    "span",
+]
+
+MAX_PROFILE_SECONDS = 60.0
+
+_profile_lock = asyncio.Lock()
+
+
+def _slow_request_seconds() -> float | None:
+    raw = os.getenv("SLOW_REQUEST_MS")
+    return float(raw) / 1000 if raw else None
+
+
+def _server_timing_enabled() -> bool:
+    return os.getenv("SERVER_TIMING", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def require_metrics_token(x_metrics_token: str | None = Header(default=None)) -> None:
+    """Gate ``/metrics`` behind METRICS_TOKEN; it is hidden when the variable is unset."""
+    expected = os.getenv("METRICS_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_metrics_token or not secrets.compare_digest(x_metrics_token, expected):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token."
+        )
+
+
+def require_profiler_token(x_profiler_token: str | None = Header(default=None)) -> None:
+    """Gate the profiler behind PROFILER_TOKEN; it is hidden when the variable is unset."""
+    expected = os.getenv("PROFILER_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_profiler_token or not secrets.compare_digest(x_profiler_token, expected):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid profiler token."
+        )
+
+
+def _router(metrics: MetricsRegistry, metrics_dependencies: Sequence[Any]) -> APIRouter:
+    router = APIRouter(tags=["instrumentation"])
+
+    @router.get("/metrics", include_in_schema=False, dependencies=list(metrics_dependencies))
+    async def prometheus_metrics() -> Response:
+        """Prometheus scrape endpoint."""
+        return Response(content=metrics.render(), media_type=CONTENT_TYPE)
+
+    @router.get(
+        "/debug/profile",
+        include_in_schema=False,
+        dependencies=[Depends(require_profiler_token)],
+    )
+    async def sample_profile(
+        seconds: float = Query(default=10.0, gt=0, le=MAX_PROFILE_SECONDS),
+        interval_ms: float = Query(default=5.0, alias="intervalMs", ge=1, le=1000),
+        route: str | None = Query(default=None),
+    ) -> Response:
+        """Sample every thread for ``seconds`` and return folded stacks.
+
+        With ``route`` (a path template such as ``/api/design-test/submit``)
+        only samples taken while that route is in flight are kept.
+        """
+        if _profile_lock.locked():
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A profile is already being captured.",
+            )
+        async with _profile_lock:
+            profiler = SamplingProfiler(
+                interval=interval_ms / 1000,
+                route=route,
+                in_flight_routes=in_flight_routes,
+            )
+            await asyncio.to_thread(profiler.run, seconds)
+        return Response(
+            content=profiler.folded(),
+            media_type="text/plain",
+            headers={"X-Profile-Samples": str(profiler.samples)},
+        )
+
+    return router
+
+
+def instrument(
+    app: FastAPI,
+    *,
+    metrics: MetricsRegistry = registry,
+    metrics_dependencies: Sequence[Any] = (Depends(require_metrics_token),),
+) -> None:
+    """Add the instrumentation middleware, ``/metrics`` and the profiler to ``app``.
+
+    ``metrics_dependencies`` guard ``/metrics``; by default it needs ``METRICS_TOKEN``.
+    """
+    app.add_middleware(
+        InstrumentationMiddleware,
+        metrics=metrics,
+        slow_request_seconds=_slow_request_seconds(),
+        server_timing=_server_timing_enabled(),
+    )
+    metrics.register_collector(collect_in_flight)
+    app.include_router(_router(metrics, metrics_dependencies))
@@ -0,0 +1,290 @@
+"""In-process counters, gauges and histograms in the Prometheus text format.
+
+Every metric is guarded by a lock so it can be updated from event-loop code
+and from driver threads alike. Services add metrics they do not own (for
+example MongoDB pool figures) by registering a collector that returns
+:class:`MetricFamily` objects at scrape time.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Sequence
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds (seconds) for latency histograms.
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)  # fmt: skip
+
+
+@dataclass(frozen=True)
+class Sample:
+    """One exposition line: a metric name, its labels and a value."""
+
+    name: str
+    labels: tuple[tuple[str, str], ...]
+    value: float
+
+
+@dataclass
+class MetricFamily:
+    """A named metric with its type, help text and samples."""
+
+    name: str
+    kind: str
+    help: str
+    samples: list[Sample] = field(default_factory=list)
+
+
+Collector = Callable[[], Iterable[MetricFamily]]
+
+
+def histogram_samples(
+    name: str,
+    labels: tuple[tuple[str, str], ...],
+    bounds: Sequence[float],
+    cumulative_counts: Sequence[int],
+    total: float,
+    count: int,
+) -> list[Sample]:
+    """Expand one histogram series into its ``_bucket``, ``_sum`` and ``_count`` samples."""
+    samples = [
+        Sample(f"{name}_bucket", labels + (("le", _format_value(bound)),), hits)
+        for bound, hits in zip(bounds, cumulative_counts)
+    ]
+    samples.append(Sample(f"{name}_bucket", labels + (("le", "+Inf"),), count))
+    samples.append(Sample(f"{name}_sum", labels, total))
+    samples.append(Sample(f"{name}_count", labels, count))
+    return samples
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _labels(self, values: Sequence[str]) -> tuple[tuple[str, str], ...]:
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(values)}")
+        return tuple(zip(self.label_names, values))
+
+    def collect(self) -> MetricFamily:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()) -> None:
+        super().__init__(name, help, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, labels: Sequence[str] = ()) -> None:
+        """Add ``amount`` to the series identified by ``labels``."""
+        key = tuple(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            items = list(self._values.items())
+        return MetricFamily(
+            self.name,
+            self.kind,
+            self.help,
+            [Sample(f"{self.name}_total", self._labels(key), value) for key, value in items],
+        )
+
+
+class Gauge(_Metric):
+    """Value that can go up and down per label set."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()) -> None:
+        super().__init__(name, help, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, labels: Sequence[str] = ()) -> None:
+        """Replace the value of one series."""
+        with self._lock:
+            self._values[tuple(labels)] = value
+
+    def inc(self, amount: float = 1.0, labels: Sequence[str] = ()) -> None:
+        """Add ``amount`` (which may be negative) to one series."""
+        key = tuple(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, labels: Sequence[str] = ()) -> None:
+        """Subtract ``amount`` from one series."""
+        self.inc(-amount, labels)
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            items = list(self._values.items())
+        return MetricFamily(
+            self.name,
+            self.kind,
+            self.help,
+            [Sample(self.name, self._labels(key), value) for key, value in items],
+        )
+
+
+@dataclass
+class _HistogramSeries:
+    buckets: list[int]
+    total: float = 0.0
+    count: int = 0
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations per label set."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, label_names)
+        self.bounds = tuple(sorted(buckets))
+        self._series: dict[tuple[str, ...], _HistogramSeries] = {}
+
+    def observe(self, value: float, labels: Sequence[str] = ()) -> None:
+        """Record one observation in the series identified by ``labels``."""
+        key = tuple(labels)
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries([0] * len(self.bounds))
+            if index < len(self.bounds):
+                series.buckets[index] += 1
+            series.total += value
+            series.count += 1
+
+    def collect(self) -> MetricFamily:
+        with self._lock:
+            items = [
+                (key, list(series.buckets), series.total, series.count)
+                for key, series in self._series.items()
+            ]
+        samples: list[Sample] = []
+        for key, buckets, total, count in items:
+            cumulative, running = [], 0
+            for hits in buckets:
+                running += hits
+                cumulative.append(running)
+            labels = self._labels(key)
+            samples.extend(
+                histogram_samples(self.name, labels, self.bounds, cumulative, total, count)
+            )
+        return MetricFamily(self.name, self.kind, self.help, samples)
+
+
+class MetricsRegistry:
+    """Owns a service's metrics and external collectors and renders them for scraping."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Collector] = []
+
+    def _get_or_create(self, cls: type[_Metric], name: str, *args: object) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)  # type: ignore[arg-type]
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> Counter:
+        """Return the counter ``name``, creating it on first use."""
+        return self._get_or_create(Counter, name, help, label_names)  # type: ignore[return-value]
+
+    def gauge(self, name: str, help: str, label_names: Sequence[str] = ()) -> Gauge:
+        """Return the gauge ``name``, creating it on first use."""
+        return self._get_or_create(Gauge, name, help, label_names)  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Return the histogram ``name``, creating it on first use."""
+        return self._get_or_create(  # type: ignore[return-value]
+            Histogram, name, help, label_names, buckets
+        )
+
+    def register_collector(self, collector: Collector) -> None:
+        """Add a callable that produces extra metric families at scrape time."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collect(self) -> list[MetricFamily]:
+        """Return every metric family, owned metrics first."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        families = [metric.collect() for metric in metrics]
+        for collector in collectors:
+            families.extend(collector())
+        return families
+
+    def render(self) -> str:
+        """Render every metric family in the Prometheus text exposition format."""
+        lines: list[str] = []
+        for family in self.collect():
+            lines.append(f"# HELP {family.name} {_escape_help(family.help)}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for sample in family.samples:
+                lines.append(
+                    f"{sample.name}{_format_labels(sample.labels)} {_format_value(sample.value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape_label_value(str(value))}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
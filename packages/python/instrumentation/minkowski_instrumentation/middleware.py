@@ -0,0 +1,129 @@
+"""ASGI middleware recording per-route latency, status counts and in-flight requests."""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Awaitable, Callable, Iterable
+
+from .metrics import MetricFamily, MetricsRegistry, Sample, registry
+from .tracing import end_trace, start_trace
+
+logger = logging.getLogger(__name__)
+
+Scope = dict[str, Any]
+Message = dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Scopes of the requests currently being handled, keyed by ``id(scope)``.
+_active: dict[int, Scope] = {}
+
+
+def route_template(scope: Scope) -> str:
+    """Return the matched route's path template, which keeps label cardinality bounded."""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path if isinstance(path, str) else UNMATCHED_ROUTE
+
+
+def in_flight_routes() -> list[str]:
+    """Return the route template of every request currently being handled."""
+    return [route_template(scope) for scope in list(_active.values())]
+
+
+def collect_in_flight() -> Iterable[MetricFamily]:
+    """Collector exposing the in-flight gauge per route."""
+    counts: dict[str, int] = {}
+    for route in in_flight_routes():
+        counts[route] = counts.get(route, 0) + 1
+    yield MetricFamily(
+        "http_requests_in_flight",
+        "gauge",
+        "Requests currently being handled, by route.",
+        [
+            Sample("http_requests_in_flight", (("route", route),), count)
+            for route, count in counts.items()
+        ],
+    )
+
+
+class InstrumentationMiddleware:
+    """Time every HTTP request, optionally exposing its spans in a ``Server-Timing`` header.
+
+    Requests slower than ``slow_request_seconds`` are logged with their span
+    breakdown. Paths in ``exclude_paths`` (the scrape endpoint by default)
+    are passed through untouched.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        metrics: MetricsRegistry = registry,
+        slow_request_seconds: float | None = None,
+        server_timing: bool = False,
+        exclude_paths: Iterable[str] = ("/metrics",),
+    ) -> None:
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+        self.server_timing = server_timing
+        self.exclude_paths = frozenset(exclude_paths)
+        self._duration = metrics.histogram(
+            "http_request_duration_seconds",
+            "Time from receiving a request to finishing its response.",
+            ("method", "route"),
+        )
+        self._requests = metrics.counter(
+            "http_requests",
+            "Completed HTTP requests by status code.",
+            ("method", "route", "status"),
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        trace, token = start_trace()
+        status_code = 500
+        _active[id(scope)] = scope
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    timing = ", ".join(
+                        filter(None, [trace.server_timing(), f"app;dur={elapsed_ms:.2f}"])
+                    )
+                    headers = [*message.get("headers", []), (b"server-timing", timing.encode())]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - started
+            _active.pop(id(scope), None)
+            end_trace(token)
+            route = route_template(scope)
+            self._duration.observe(elapsed, (scope["method"], route))
+            self._requests.inc(1, (scope["method"], route, str(status_code)))
+            if self.slow_request_seconds is not None and elapsed >= self.slow_request_seconds:
+                breakdown = ", ".join(
+                    f"{name}={total * 1000:.1f}ms" + (f" x{count}" if count > 1 else "")
+                    for name, (count, total) in trace.totals().items()
+                )
+                logger.warning(
+                    "Slow request %s %s took %.1fms (%s)",
+                    scope["method"],
+                    route,
+                    elapsed * 1000,
+                    breakdown or "no spans",
+                )
@@ -0,0 +1,90 @@
+"""Per-request span timings.
+
+The middleware opens a :class:`RequestTrace` for every HTTP request and
+keeps it in a context variable, so code on the request path can time its
+sections with :func:`span` without threading anything through. Context
+variables are copied into ``asyncio.to_thread`` workers and Motor's executor
+threads, which lets driver callbacks attach timings with :func:`record_span`.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from .metrics import registry
+
+_SPAN_SECONDS = registry.histogram(
+    "span_duration_seconds",
+    "Duration of named sections on the request path.",
+    ("span",),
+)
+
+_current_trace: ContextVar["RequestTrace | None"] = ContextVar("request_trace", default=None)
+
+
+@dataclass
+class RequestTrace:
+    """Named durations recorded while handling one request."""
+
+    spans: list[tuple[str, float]] = field(default_factory=list)
+
+    def add(self, name: str, seconds: float) -> None:
+        """Record one span; safe to call from driver threads."""
+        self.spans.append((name, seconds))
+
+    def totals(self) -> dict[str, tuple[int, float]]:
+        """Return ``{name: (count, total seconds)}`` in first-seen order."""
+        totals: dict[str, tuple[int, float]] = {}
+        for name, seconds in list(self.spans):
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, total + seconds)
+        return totals
+
+    def server_timing(self) -> str:
+        """Format the spans as a ``Server-Timing`` header value."""
+        return ", ".join(
+            f"{name.replace(' ', '_')};dur={total * 1000:.2f}"
+            for name, (_count, total) in self.totals().items()
+        )
+
+
+def current_trace() -> RequestTrace | None:
+    """Return the trace of the request being handled, if any."""
+    return _current_trace.get()
+
+
+def start_trace() -> tuple[RequestTrace, object]:
+    """Open a trace for the current context; returns it with a reset token."""
+    trace = RequestTrace()
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token: object) -> None:
+    """Close the trace opened by :func:`start_trace`."""
+    _current_trace.reset(token)  # type: ignore[arg-type]
+
+
+def record_span(name: str, seconds: float, *, observe: bool = True) -> None:
+    """Attach a measured duration to the current request and, optionally, the span histogram.
+
+    Pass ``observe=False`` for timings another metric already aggregates.
+    """
+    if observe:
+        _SPAN_SECONDS.observe(seconds, (name,))
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the enclosed block as span ``name``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started)
@@ -0,0 +1,168 @@
+"""Forward the event write-ahead log to the downstream sink.
+
+Reads committed records from the checkpoint in ``<EVENT_WAL_DIR>/checkpoint.json``
+onwards, writes them to the sink configured by ``EVENT_SINK`` (see
+``pipeline``) in batches of ``EVENT_BATCH_SIZE``, and only once the sink has
+made a batch durable advances and fsyncs the checkpoint. A crash between the two re-sends the last batch, so
+delivery is at-least-once; the sequence numbers in the checkpoint let
+consumers spot the replay. Segments wholly behind the checkpoint are deleted.
+
+The collector runs a forwarder in-process unless ``EVENT_WAL_FORWARDER`` is
+``external``; then run this module next to it::
+
+    python forwarder.py --wal-dir var/event-wal
+    python forwarder.py --once           # forward the backlog and exit
+    python forwarder.py --from-start     # replay every retained segment
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+from pipeline import EventSink, sink_from_env, wait_for_event
+from wal import CHECKPOINT_NAME, WalReader
+
+logger = logging.getLogger(__name__)
+
+_MAX_RETRY_DELAY_SECONDS = 30.0
+
+
+class Forwarder:
+    """Move committed log records to a sink and advance the checkpoint."""
+
+    def __init__(
+        self,
+        reader: WalReader,
+        sink: EventSink,
+        *,
+        batch_size: int = 1000,
+        poll_interval: float = 0.05,
+        wakeup: asyncio.Event | None = None,
+    ) -> None:
+        self.reader = reader
+        self.sink = sink
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.forwarded = 0
+        self.batches = 0
+        self.failures = 0
+        self._wakeup = wakeup or asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    @classmethod
+    def from_env(cls, directory: Path, wakeup: asyncio.Event | None = None) -> "Forwarder":
+        """Build a forwarder for the log in ``directory`` from ``EVENT_*`` settings."""
+        return cls(
+            WalReader(directory),
+            sink_from_env(),
+            batch_size=int(os.getenv("EVENT_BATCH_SIZE", "1000")),
+            poll_interval=float(os.getenv("EVENT_FLUSH_INTERVAL_MS", "50")) / 1000,
+            wakeup=wakeup,
+        )
+
+    async def forward_once(self) -> int:
+        """Forward one batch; returns the number of events sent."""
+        payloads, checkpoint = await asyncio.to_thread(self.reader.read, self.batch_size)
+        if payloads:
+            await self.sink.write(payloads)
+            self.forwarded += len(payloads)
+            self.batches += 1
+        if checkpoint != self.reader.checkpoint:
+            await asyncio.to_thread(self.reader.commit, checkpoint)
+        return len(payloads)
+
+    async def forward_backlog(self) -> int:
+        """Forward until the log is caught up."""
+        total = 0
+        while True:
+            sent = await self.forward_once()
+            total += sent
+            if sent < self.batch_size:
+                return total
+
+    async def run(self) -> None:
+        delay = self.poll_interval
+        while True:
+            self._wakeup.clear()
+            forwarding = asyncio.ensure_future(self.forward_once())
+            try:
+                sent = await asyncio.shield(forwarding)
+            except asyncio.CancelledError:
+                # The sink write or commit may be running in a worker thread; let it
+                # finish so stop() resumes from the checkpoint it leaves behind.
+                with contextlib.suppress(Exception):
+                    await forwarding
+                raise
+            except Exception as exc:
+                self.failures += 1
+                delay = min(max(delay * 2, 0.5), _MAX_RETRY_DELAY_SECONDS)
+                logger.warning("Forwarding failed (%s); retrying from the checkpoint in %.1fs", exc, delay)
+                await asyncio.sleep(delay)
+                continue
+            delay = self.poll_interval
+            if sent < self.batch_size:
+                # Caught up: wait for the next append, or poll for an external writer.
+                await wait_for_event(self._wakeup, self.poll_interval)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name="event-wal-forwarder")
+
+    async def stop(self) -> None:
+        """Stop forwarding after a last best-effort pass, and close the sink."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        try:
+            await self.forward_backlog()
+        except Exception:
+            logger.exception("Events left in the write-ahead log; they are forwarded on the next start")
+        await self.sink.close()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "forwarded": self.forwarded,
+            "forwardedBatches": self.batches,
+            "forwardFailures": self.failures,
+            "checkpointSequence": self.reader.checkpoint.sequence,
+        }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Forward the event write-ahead log to the configured sink.")
+    parser.add_argument("--wal-dir", type=Path, default=Path(os.getenv("EVENT_WAL_DIR", "var/event-wal")))
+    parser.add_argument("--once", action="store_true", help="Forward the current backlog and exit")
+    parser.add_argument("--from-start", action="store_true", help="Forget the checkpoint and replay retained segments")
+    return parser.parse_args(argv)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    if args.from_start:
+        with contextlib.suppress(FileNotFoundError):
+            (args.wal_dir / CHECKPOINT_NAME).unlink()
+    forwarder = Forwarder.from_env(args.wal_dir)
+    try:
+        if args.once:
+            logger.info("Forwarded %d events", await forwarder.forward_backlog())
+        else:
+            await forwarder.run()
+    finally:
+        await forwarder.sink.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(_main(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
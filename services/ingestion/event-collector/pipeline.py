@@ -0,0 +1,319 @@
+"""Batching between the collector's HTTP handlers and its event sink.
+
+Handlers only validate, encode and ``offer`` events to an in-process
+``EventQueue``; they never wait on the sink. ``BatchFlusher`` takes batches
+off the queue, bounded by ``EVENT_BATCH_SIZE`` events or
+``EVENT_FLUSH_INTERVAL_MS`` after the oldest queued event, whichever comes
+first, and writes them to the configured sink:
+
+- ``segments`` (default): NDJSON segment files under ``EVENT_SEGMENT_DIR``,
+  rotated by size and age. The active segment ends in ``.open``; sealed
+  segments are renamed to ``.ndjson``, so consumers only read whole files.
+  A write returns once the batch is fsynced, and the directory is fsynced
+  whenever a segment is created or sealed, so the forwarder may advance its
+  checkpoint as soon as ``write`` returns.
+- ``broker``: an in-memory stand-in for a Kafka producer, with an optional
+  simulated round trip (``EVENT_BROKER_LATENCY_MS``).
+- ``stdout``: one write per batch, for local debugging.
+
+The queue holds at most ``EVENT_QUEUE_CAPACITY`` events. A batch that does
+not fit is rejected as a whole, and the handler answers 429, so a slow or
+failing sink turns into backpressure instead of unbounded memory. Failed
+writes are retried with backoff and keep their place in line.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Protocol
+
+logger = logging.getLogger(__name__)
+
+_MAX_RETRY_DELAY_SECONDS = 30.0
+
+
+def fsync_directory(directory: Path) -> None:
+    """Make file creations, renames and deletions in ``directory`` durable."""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+async def wait_for_event(event: asyncio.Event, timeout: float) -> None:
+    """Wait until ``event`` is set or ``timeout`` passes.
+
+    Unlike ``asyncio.wait_for`` before Python 3.12, this never swallows a
+    cancellation that arrives just as the event is set, which would leave
+    ``stop()`` waiting on a task that keeps running.
+    """
+    waiter = asyncio.ensure_future(event.wait())
+    try:
+        await asyncio.wait([waiter], timeout=timeout)
+    finally:
+        waiter.cancel()
+
+
+class EventSink(Protocol):
+    """Destination of flushed batches; each event is one encoded JSON object."""
+
+    async def write(self, batch: list[bytes]) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+class EventQueue:
+    """Bounded FIFO of encoded events, filled by handlers and drained in batches."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._events: deque[bytes] = deque()
+        self._oldest_at: float | None = None
+        self._not_empty = asyncio.Event()
+        self._batch_ready = asyncio.Event()
+        self._batch_size = 1
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def offer(self, events: list[bytes]) -> bool:
+        """Queue all of ``events``, or none of them when they do not fit."""
+        if len(self._events) + len(events) > self.capacity:
+            return False
+        if not events:
+            return True
+        if not self._events:
+            self._oldest_at = time.monotonic()
+        self._events.extend(events)
+        self._not_empty.set()
+        if len(self._events) >= self._batch_size:
+            self._batch_ready.set()
+        return True
+
+    async def take(self, max_events: int, max_delay: float) -> list[bytes]:
+        """Wait for a full batch, or for ``max_delay`` after the oldest event."""
+        self._batch_size = max_events
+        while not self._events:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        if len(self._events) < max_events:
+            self._batch_ready.clear()
+            remaining = max_delay - (time.monotonic() - (self._oldest_at or 0.0))
+            if remaining > 0:
+                await wait_for_event(self._batch_ready, remaining)
+        return self.drain(max_events)
+
+    def requeue(self, batch: list[bytes]) -> None:
+        """Return a taken batch to the front of the queue, ignoring the capacity."""
+        if batch:
+            self._events.extendleft(reversed(batch))
+            self._oldest_at = time.monotonic()
+            self._not_empty.set()
+
+    def drain(self, max_events: int | None = None) -> list[bytes]:
+        """Remove and return up to ``max_events`` events without waiting."""
+        count = len(self._events) if max_events is None else min(max_events, len(self._events))
+        batch = [self._events.popleft() for _ in range(count)]
+        self._oldest_at = time.monotonic() if self._events else None
+        return batch
+
+
+class SegmentFileSink:
+    """Append batches to NDJSON segment files, rotating by size and age."""
+
+    def __init__(self, directory: Path, *, max_bytes: int = 64 * 1024 * 1024, max_age: float = 300.0) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._file: Any = None
+        self._path: Path | None = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._recovered = False
+
+    async def write(self, batch: list[bytes]) -> None:
+        await asyncio.to_thread(self._write, b"\n".join(batch) + b"\n")
+
+    def _write(self, data: bytes) -> None:
+        if self._file is not None and (
+            self._size >= self.max_bytes or time.monotonic() - self._opened_at >= self.max_age
+        ):
+            self._seal()
+        if self._file is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if not self._recovered:
+                # Segments left open by a crash hold complete batches up to a torn last line.
+                for stale in self.directory.glob("events-*.open"):
+                    stale.rename(stale.with_suffix(".ndjson"))
+                self._recovered = True
+            self._path = self.directory / f"events-{time.time_ns()}.open"
+            self._file = self._path.open("ab")
+            self._size = 0
+            self._opened_at = time.monotonic()
+            fsync_directory(self.directory)
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._size += len(data)
+
+    def _seal(self) -> None:
+        if self._file is None or self._path is None:
+            return
+        self._file.close()
+        self._path.rename(self._path.with_suffix(".ndjson"))
+        fsync_directory(self.directory)
+        self._file = None
+        self._path = None
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._seal)
+
+
+class BrokerStandInSink:
+    """In-memory stand-in for a Kafka producer: one send per batch."""
+
+    def __init__(self, *, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.batches: list[list[bytes]] = []
+
+    async def write(self, batch: list[bytes]) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.batches.append(batch)
+
+    async def close(self) -> None:
+        return None
+
+
+class StdoutSink:
+    """Write each batch to stdout in one call."""
+
+    async def write(self, batch: list[bytes]) -> None:
+        sys.stdout.buffer.write(b"\n".join(batch) + b"\n")
+        sys.stdout.buffer.flush()
+
+    async def close(self) -> None:
+        return None
+
+
+def sink_from_env() -> EventSink:
+    """Build the sink named by ``EVENT_SINK``."""
+    kind = os.getenv("EVENT_SINK", "segments").strip().lower()
+    if kind == "segments":
+        return SegmentFileSink(
+            Path(os.getenv("EVENT_SEGMENT_DIR", "var/events")),
+            max_bytes=int(os.getenv("EVENT_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024))),
+            max_age=float(os.getenv("EVENT_SEGMENT_MAX_SECONDS", "300")),
+        )
+    if kind == "broker":
+        return BrokerStandInSink(latency=float(os.getenv("EVENT_BROKER_LATENCY_MS", "0")) / 1000)
+    if kind == "stdout":
+        return StdoutSink()
+    raise ValueError(f"Unknown EVENT_SINK {kind!r}; expected segments, broker or stdout")
+
+
+class BatchFlusher:
+    """Move batches from an ``EventQueue`` to a sink in the background."""
+
+    def __init__(
+        self,
+        queue: EventQueue,
+        sink: EventSink,
+        *,
+        batch_size: int = 1000,
+        flush_interval: float = 0.05,
+    ) -> None:
+        self.queue = queue
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self._task: asyncio.Task[None] | None = None
+
+    @classmethod
+    def from_env(cls) -> "BatchFlusher":
+        """Build the queue, sink and flusher from ``EVENT_*`` settings."""
+        return cls(
+            EventQueue(int(os.getenv("EVENT_QUEUE_CAPACITY", "100000"))),
+            sink_from_env(),
+            batch_size=int(os.getenv("EVENT_BATCH_SIZE", "1000")),
+            flush_interval=float(os.getenv("EVENT_FLUSH_INTERVAL_MS", "50")) / 1000,
+        )
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_forever(), name="event-flusher")
+
+    async def stop(self) -> None:
+        """Stop taking new batches, write what is queued and close the sink."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        while len(self.queue):
+            try:
+                await self._write(self.queue.drain(self.batch_size))
+            except Exception:
+                logger.exception("Dropping %d queued events at shutdown", len(self.queue))
+                break
+        await self.sink.close()
+
+    async def _write(self, batch: list[bytes]) -> None:
+        await self.sink.write(batch)
+        self.flushed += len(batch)
+        self.batches += 1
+
+    async def _flush_forever(self) -> None:
+        while True:
+            batch = await self.queue.take(self.batch_size, self.flush_interval)
+            await self._write_with_retry(batch)
+
+    async def _write_with_retry(self, batch: list[bytes]) -> None:
+        """Write ``batch`` until it succeeds; when cancelled, requeue it unless it was written."""
+        delay = self.flush_interval
+        while True:
+            attempt = asyncio.ensure_future(self._write(batch))
+            try:
+                await asyncio.shield(attempt)
+                return
+            except asyncio.CancelledError:
+                # A write already running (e.g. in a worker thread) cannot be called
+                # back: let it finish, and put the batch back for stop() only if it failed.
+                await asyncio.wait([attempt])
+                if attempt.cancelled() or attempt.exception() is not None:
+                    self.queue.requeue(batch)
+                raise
+            except Exception as exc:
+                self.failures += 1
+                delay = min(max(delay * 2, 0.5), _MAX_RETRY_DELAY_SECONDS)
+                logger.warning(
+                    "Event sink write failed (%s); %d queued, retrying in %.1fs",
+                    exc,
+                    len(self.queue) + len(batch),
+                    delay,
+                )
+                try:
+                    await asyncio.sleep(delay)
+                except asyncio.CancelledError:
+                    self.queue.requeue(batch)
+                    raise
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queued": len(self.queue),
+            "capacity": self.queue.capacity,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "sinkFailures": self.failures,
+        }
@@ -1,17 +1,158 @@
-"""Placeholder high-throughput event collector using FastAPI."""
-from datetime import datetime
-from fastapi import FastAPI
-from pydantic import BaseModel
+"""High-throughput event collector using FastAPI.
+
+``POST /events`` accepts one event and ``POST /events/batch`` many, as a JSON
+array or as NDJSON (``Content-Type: application/x-ndjson``). Handlers only
+validate, encode and queue; the batching flusher in ``pipeline`` writes to the
+configured sink in the background, so response times do not depend on the
+sink. When the queue is full a request is rejected with 429 and ``Retry-After``.
+
+By default (``EVENT_DURABILITY=wal``) accepted events are instead appended to
+the write-ahead log in ``wal`` before the response, so a restart loses nothing
+that was acknowledged, and ``forwarder`` moves them to the sink (in-process
+unless ``EVENT_WAL_FORWARDER=external``). Requests then get 429 once the
+forwarder is more than ``EVENT_WAL_MAX_BACKLOG_BYTES`` behind. The log
+directory is locked by one process, so run a single uvicorn worker per
+``EVENT_WAL_DIR``; another worker fails at startup.
+``EVENT_DURABILITY=memory`` keeps the in-memory queue.
+
+A batch is all-or-nothing: one invalid event rejects it with 422, listing the
+failing indexes, and none of it is queued.
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime, timezone
+from typing import Any
+
+from fastapi import FastAPI, HTTPException, Request, status
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+from forwarder import Forwarder
+from pipeline import BatchFlusher
+from wal import WriteAheadLog
+
+MAX_BATCH_EVENTS = int(os.getenv("EVENT_MAX_BATCH_EVENTS", "10000"))
+_MAX_REPORTED_ERRORS = 20
 
 app = FastAPI(title="Event Collector")
 
+if os.getenv("EVENT_DURABILITY", "wal").strip().lower() == "memory":
+    wal: WriteAheadLog | None = None
+    flusher: BatchFlusher | None = BatchFlusher.from_env()
+else:
+    wal = WriteAheadLog.from_env()
+    flusher = None
+forwarder: Forwarder | None = None
+
+
 class Event(BaseModel):
     name: str
     user_id: str
-    at: datetime = datetime.utcnow()
+    at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+_event_adapter = TypeAdapter(Event)
+_event_list_adapter = TypeAdapter(list[Event])
+
+
+def _validation_error(errors: list[dict[str, Any]]) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors[:_MAX_REPORTED_ERRORS])
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"A batch may hold at most {MAX_BATCH_EVENTS} events",
+    )
+
+
+def _parse_batch(body: bytes, content_type: str) -> list[Event]:
+    """Validate a JSON array or NDJSON body."""
+    if "ndjson" not in content_type and body.lstrip().startswith(b"["):
+        try:
+            events = _event_list_adapter.validate_json(body)
+        except ValidationError as exc:
+            raise _validation_error(exc.errors(include_url=False, include_input=False))
+        if len(events) > MAX_BATCH_EVENTS:
+            raise _too_large()
+        return events
+
+    lines = [line for line in body.splitlines() if line.strip()]
+    if len(lines) > MAX_BATCH_EVENTS:
+        raise _too_large()
+    events: list[Event] = []
+    errors: list[dict[str, Any]] = []
+    for index, line in enumerate(lines):
+        try:
+            events.append(Event.model_validate_json(line))
+        except ValidationError as exc:
+            errors.append({"index": index, "errors": exc.errors(include_url=False, include_input=False)})
+    if errors:
+        raise _validation_error(errors)
+    return events
+
+
+def _queue_full() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Event queue is full; retry later",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _enqueue(events: list[Event]) -> None:
+    encoded = [_event_adapter.dump_json(event) for event in events]
+    if wal is not None:
+        if wal.overloaded:
+            raise _queue_full()
+        await wal.append(encoded)
+    elif flusher is not None and not flusher.queue.offer(encoded):
+        raise _queue_full()
+
+
+@app.on_event("startup")
+async def startup() -> None:
+    """Open the write-ahead log and start forwarding, or start the in-memory flusher."""
+    global forwarder
+    if wal is not None:
+        await wal.start()
+        if os.getenv("EVENT_WAL_FORWARDER", "inline").strip().lower() != "external":
+            forwarder = Forwarder.from_env(wal.directory, wakeup=wal.subscribe())
+            await forwarder.start()
+    if flusher is not None:
+        await flusher.start()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    """Make accepted events durable (or write them out) and close the sink."""
+    if wal is not None:
+        await wal.stop()
+    if forwarder is not None:
+        await forwarder.stop()
+    if flusher is not None:
+        await flusher.stop()
+
 
 @app.post("/events")
 async def ingest(event: Event) -> dict[str, str]:
-    # In production this would push to Pub/Sub or Kafka.
-    print(f"received {event.name} for {event.user_id}")
+    await _enqueue([event])
     return {"status": "queued"}
+
+
+@app.post("/events/batch")
+async def ingest_batch(request: Request) -> dict[str, Any]:
+    events = _parse_batch(await request.body(), request.headers.get("content-type", ""))
+    await _enqueue(events)
+    return {"status": "queued", "accepted": len(events)}
+
+
+@app.get("/health")
+async def healthcheck() -> dict[str, Any]:
+    """Liveness probe with log, queue and delivery counters."""
+    stats: dict[str, Any] = {"status": "ok"}
+    for component in (wal, forwarder, flusher):
+        if component is not None:
+            stats.update(component.stats())
+    return stats
@@ -0,0 +1,9 @@
+"""Make the collector's flat modules (``wal``, ``pipeline``, ...) importable from tests."""
+
+import sys
+from pathlib import Path
+
+COLLECTOR_ROOT = Path(__file__).resolve().parents[1]
+
+if str(COLLECTOR_ROOT) not in sys.path:
+    sys.path.insert(0, str(COLLECTOR_ROOT))
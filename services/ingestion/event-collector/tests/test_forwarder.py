@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from forwarder import Forwarder
+from pipeline import BrokerStandInSink, SegmentFileSink
+from wal import Checkpoint, WalReader, WriteAheadLog, list_segments
+
+
+def events(start, stop):
+    return [f'{{"n":{n}}}'.encode() for n in range(start, stop)]
+
+
+def append(directory, payloads, **options):
+    async def main():
+        log = WriteAheadLog(directory, fsync="always", **options)
+        await log.start()
+        await log.append(payloads)
+        await log.stop()
+
+    asyncio.run(main())
+
+
+def forwarder(directory, sink, batch_size=3):
+    return Forwarder(WalReader(directory), sink, batch_size=batch_size)
+
+
+def delivered(sink):
+    return [payload for batch in sink.batches for payload in batch]
+
+
+def test_resumes_from_the_checkpoint_after_a_crash(tmp_path):
+    append(tmp_path, events(0, 8))
+    before_crash = BrokerStandInSink()
+    asyncio.run(forwarder(tmp_path, before_crash).forward_once())
+    assert Checkpoint.load(tmp_path).sequence == 3
+
+    after_restart = BrokerStandInSink()
+    sent = asyncio.run(forwarder(tmp_path, after_restart).forward_backlog())
+    assert sent == 5
+    assert delivered(before_crash) + delivered(after_restart) == events(0, 8)
+
+
+def test_a_crash_before_the_commit_resends_the_batch(tmp_path, monkeypatch):
+    append(tmp_path, events(0, 5))
+    sink = BrokerStandInSink()
+    crashing = forwarder(tmp_path, sink)
+    monkeypatch.setattr(crashing.reader, "commit", lambda checkpoint: (_ for _ in ()).throw(OSError("power loss")))
+    with pytest.raises(OSError):
+        asyncio.run(crashing.forward_once())
+    assert Checkpoint.load(tmp_path).sequence == 0
+
+    asyncio.run(forwarder(tmp_path, sink).forward_backlog())
+    assert delivered(sink) == events(0, 3) + events(0, 5)  # at-least-once
+
+
+def test_a_failed_sink_write_keeps_the_checkpoint(tmp_path):
+    append(tmp_path, events(0, 2))
+
+    class FailingSink(BrokerStandInSink):
+        async def write(self, batch):
+            raise ConnectionError("broker down")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(forwarder(tmp_path, FailingSink()).forward_once())
+    assert Checkpoint.load(tmp_path).sequence == 0
+
+
+def test_forwarding_deletes_segments_and_writes_sealed_sink_files(tmp_path):
+    wal_dir, sink_dir = tmp_path / "wal", tmp_path / "events"
+    for start in (0, 3, 6):
+        append(wal_dir, events(start, start + 3))
+    sink = SegmentFileSink(sink_dir)
+
+    async def main():
+        moving = forwarder(wal_dir, sink, batch_size=4)
+        await moving.forward_backlog()
+        await sink.close()
+
+    asyncio.run(main())
+    assert [base for base, _ in list_segments(wal_dir)] == [6]
+    (segment,) = sink_dir.glob("events-*.ndjson")
+    assert segment.read_bytes().splitlines() == events(0, 9)
+    assert not list(sink_dir.glob("*.open"))
+
+
+def test_stop_forwards_the_backlog_while_appends_keep_waking_it(tmp_path):
+    async def main():
+        log = WriteAheadLog(tmp_path / "wal", fsync="never")
+        await log.start()
+        sink = BrokerStandInSink()
+        moving = Forwarder(WalReader(log.directory), sink, batch_size=2, poll_interval=60.0, wakeup=log.subscribe())
+        await moving.start()
+        for start in range(0, 40, 4):
+            await log.append(events(start, start + 4))
+            await asyncio.sleep(0)
+        await log.stop()
+        await asyncio.wait_for(moving.stop(), timeout=5)
+        return delivered(sink)
+
+    assert asyncio.run(main()) == events(0, 40)
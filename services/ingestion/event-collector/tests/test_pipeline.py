@@ -0,0 +1,176 @@
+import asyncio
+import importlib
+import threading
+import time
+
+import pytest
+
+from pipeline import BatchFlusher, BrokerStandInSink, EventQueue
+
+
+def events(start, stop):
+    return [f'{{"n":{n}}}'.encode() for n in range(start, stop)]
+
+
+def delivered(sink):
+    return [payload for batch in sink.batches for payload in batch]
+
+
+async def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+class FlakySink(BrokerStandInSink):
+    """Fails its first ``failures`` writes."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+        self.closed = False
+
+    async def write(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("broker down")
+        await super().write(batch)
+
+    async def close(self):
+        self.closed = True
+
+
+class ThreadedSink(BrokerStandInSink):
+    """Writes in a worker thread, like ``SegmentFileSink``; the thread is slow to return."""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+
+    async def write(self, batch):
+        await asyncio.to_thread(self._write, batch)
+
+    def _write(self, batch):
+        self.started.set()
+        time.sleep(0.2)
+        self.batches.append(batch)
+
+
+def test_offer_rejects_a_batch_that_does_not_fit():
+    queue = EventQueue(capacity=3)
+    assert queue.offer(events(0, 2))
+    assert not queue.offer(events(2, 4))
+    assert queue.offer(events(2, 3))
+    assert queue.drain() == events(0, 3)
+
+
+def test_full_queue_answers_429(tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setenv("EVENT_DURABILITY", "memory")
+    monkeypatch.setenv("EVENT_QUEUE_CAPACITY", "2")
+    monkeypatch.setenv("EVENT_SINK", "broker")
+    import server
+
+    server = importlib.reload(server)
+    with TestClient(server.app) as client:
+        response = client.post("/events/batch", json=[{"name": "a", "user_id": str(n)} for n in range(3)])
+        accepted = client.post("/events/batch", json=[{"name": "a", "user_id": str(n)} for n in range(2)])
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert accepted.status_code == 200
+    assert len(delivered(server.flusher.sink)) == 2
+
+
+def test_a_full_batch_is_flushed_without_waiting_for_the_interval():
+    async def main():
+        sink = BrokerStandInSink()
+        flusher = BatchFlusher(EventQueue(100), sink, batch_size=3, flush_interval=60.0)
+        await flusher.start()
+        flusher.queue.offer(events(0, 2))
+        await asyncio.sleep(0.05)
+        assert sink.batches == []
+        flusher.queue.offer(events(2, 4))
+        await wait_until(lambda: sink.batches)
+        await flusher.stop()
+        return sink.batches
+
+    assert asyncio.run(main()) == [events(0, 3), events(3, 4)]
+
+
+def test_a_partial_batch_is_flushed_after_the_interval():
+    async def main():
+        sink = BrokerStandInSink()
+        flusher = BatchFlusher(EventQueue(100), sink, batch_size=100, flush_interval=0.05)
+        await flusher.start()
+        offered_at = time.monotonic()
+        flusher.queue.offer(events(0, 2))
+        await wait_until(lambda: sink.batches)
+        waited = time.monotonic() - offered_at
+        await flusher.stop()
+        return sink.batches, waited
+
+    batches, waited = asyncio.run(main())
+    assert batches == [events(0, 2)]
+    assert waited >= 0.04
+
+
+def test_failed_writes_are_retried_in_order():
+    async def main():
+        sink = FlakySink(failures=1)
+        flusher = BatchFlusher(EventQueue(100), sink, batch_size=2, flush_interval=0.01)
+        await flusher.start()
+        flusher.queue.offer(events(0, 5))
+        await wait_until(lambda: len(delivered(sink)) == 4)
+        await flusher.stop()
+        return delivered(sink), flusher.stats()
+
+    sent, stats = asyncio.run(main())
+    assert sent == events(0, 5)
+    assert (stats["sinkFailures"], stats["flushed"], stats["queued"]) == (1, 5, 0)
+
+
+def test_stop_writes_a_batch_that_was_waiting_to_be_retried():
+    async def main():
+        sink = FlakySink(failures=1)
+        flusher = BatchFlusher(EventQueue(100), sink, batch_size=2, flush_interval=0.01)
+        await flusher.start()
+        flusher.queue.offer(events(0, 3))
+        await wait_until(lambda: flusher.failures)
+        await flusher.stop()
+        return delivered(sink), sink.closed
+
+    assert asyncio.run(main()) == (events(0, 3), True)
+
+
+def test_stop_drains_the_queue_and_closes_the_sink():
+    async def main():
+        sink = FlakySink(failures=0)
+        flusher = BatchFlusher(EventQueue(100), sink, batch_size=2, flush_interval=60.0)
+        await flusher.start()
+        flusher.queue.offer(events(0, 1))
+        await asyncio.sleep(0.01)
+        flusher.queue.offer(events(1, 6))
+        await flusher.stop()
+        return sink.batches, sink.closed
+
+    batches, closed = asyncio.run(main())
+    assert [payload for batch in batches for payload in batch] == events(0, 6)
+    assert closed
+
+
+def test_stop_does_not_rewrite_a_batch_whose_write_already_ran():
+    async def main():
+        sink = ThreadedSink()
+        flusher = BatchFlusher(EventQueue(100), sink, batch_size=2, flush_interval=60.0)
+        await flusher.start()
+        flusher.queue.offer(events(0, 2))
+        await asyncio.to_thread(sink.started.wait, 1.0)
+        await flusher.stop()
+        return sink.batches
+
+    assert asyncio.run(main()) == [events(0, 2)]
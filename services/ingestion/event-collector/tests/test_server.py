@@ -0,0 +1,65 @@
+import importlib
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def load_server(tmp_path, monkeypatch):
+    """Import ``server`` afresh with ``EVENT_*`` settings; its globals are read at import."""
+
+    def load(**settings):
+        monkeypatch.setenv("EVENT_WAL_DIR", str(tmp_path / "wal"))
+        monkeypatch.setenv("EVENT_SINK", "broker")
+        for name, value in settings.items():
+            monkeypatch.setenv(name, value)
+        import server
+
+        return importlib.reload(server)
+
+    return load
+
+
+def test_accepted_events_are_logged_and_forwarded(load_server):
+    server = load_server(EVENT_WAL_FSYNC="always")
+    with TestClient(server.app) as client:
+        single = client.post("/events", json={"name": "view", "user_id": "u1"})
+        batch = client.post(
+            "/events/batch",
+            content=b'{"name":"a","user_id":"u2"}\n{"name":"b","user_id":"u3"}\n',
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        health = client.get("/health").json()
+    forwarded = [payload for sent in server.forwarder.sink.batches for payload in sent]
+
+    assert single.json() == {"status": "queued"}
+    assert batch.json() == {"status": "queued", "accepted": 2}
+    assert health["appended"] == 3 and health["fsyncPolicy"] == "always"
+    assert [json.loads(payload)["user_id"] for payload in forwarded] == ["u1", "u2", "u3"]
+
+
+def test_invalid_batches_are_rejected_whole(load_server):
+    server = load_server(EVENT_WAL_FORWARDER="external")
+    with TestClient(server.app) as client:
+        response = client.post("/events/batch", json=[{"name": "a", "user_id": "u"}, {"name": "b"}])
+        appended = client.get("/health").json()["appended"]
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == [1, "user_id"]
+    assert appended == 0
+
+
+def test_a_forwarder_backlog_turns_into_429(load_server):
+    server = load_server(EVENT_WAL_FORWARDER="external", EVENT_WAL_MAX_BACKLOG_BYTES="0")
+    with TestClient(server.app) as client:
+        first = client.post("/events", json={"name": "a", "user_id": "u"})
+        second = client.post("/events", json={"name": "b", "user_id": "u"})
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "1"
@@ -0,0 +1,107 @@
+import asyncio
+import os
+
+import pytest
+
+import wal
+from wal import MAGIC, Checkpoint, WalLockedError, WalReader, WriteAheadLog, list_segments
+
+
+def events(start, stop):
+    return [f'{{"n":{n}}}'.encode() for n in range(start, stop)]
+
+
+def write(directory, payloads, **options):
+    async def main():
+        log = WriteAheadLog(directory, fsync="always", **options)
+        await log.start()
+        for payload in payloads:
+            await log.append([payload])
+        await log.stop()
+
+    asyncio.run(main())
+
+
+def read_all(directory):
+    return WalReader(directory).read(10_000)[0]
+
+
+def test_reopen_cuts_a_torn_tail_and_keeps_numbering(tmp_path):
+    write(tmp_path, events(0, 3))
+    (_, segment), = list_segments(tmp_path)
+    intact = segment.stat().st_size
+    with segment.open("ab") as handle:
+        handle.write(wal.encode_record(b'{"n":3}')[:-2])  # crashed mid-record
+
+    assert read_all(tmp_path) == events(0, 3)
+    write(tmp_path, events(3, 5))
+
+    assert segment.stat().st_size == intact
+    assert [base for base, _ in list_segments(tmp_path)] == [0, 3]
+    assert read_all(tmp_path) == events(0, 5)
+
+
+def test_checksum_mismatch_ends_the_active_segment(tmp_path):
+    write(tmp_path, events(0, 3))
+    (_, segment), = list_segments(tmp_path)
+    data = bytearray(segment.read_bytes())
+    data[-2] ^= 0xFF  # flip a byte in the last payload
+    segment.write_bytes(bytes(data))
+
+    assert read_all(tmp_path) == events(0, 2)
+    write(tmp_path, events(2, 3))
+    assert read_all(tmp_path) == events(0, 3)
+
+
+def test_reader_skips_the_corrupt_rest_of_a_sealed_segment(tmp_path, caplog):
+    write(tmp_path, events(0, 3))
+    (_, first), = list_segments(tmp_path)
+    write(tmp_path, events(3, 5))
+    data = bytearray(first.read_bytes())
+    data[len(MAGIC) + 8] ^= 0xFF  # first payload of the sealed segment
+    first.write_bytes(bytes(data))
+
+    payloads, checkpoint = WalReader(tmp_path).read(100)
+    assert payloads == events(3, 5)
+    assert checkpoint.sequence == 5
+    assert "Corrupt record in sealed segment" in caplog.text
+
+
+def test_segments_roll_over_and_are_deleted_behind_the_checkpoint(tmp_path):
+    record = len(wal.encode_record(events(0, 1)[0]))
+    write(tmp_path, events(0, 10), segment_bytes=len(MAGIC) + 3 * record)
+    assert [base for base, _ in list_segments(tmp_path)] == [0, 3, 6, 9]
+
+    reader = WalReader(tmp_path)
+    payloads, checkpoint = reader.read(7)
+    assert payloads == events(0, 7)
+    assert (checkpoint.segment, checkpoint.sequence) == (6, 7)
+
+    reader.commit(checkpoint)
+    assert [base for base, _ in list_segments(tmp_path)] == [6, 9]
+    assert Checkpoint.load(tmp_path) == checkpoint
+    assert WalReader(tmp_path).read(100)[0] == events(7, 10)
+
+
+def test_a_second_writer_fails_fast_while_the_directory_is_locked(tmp_path):
+    async def main():
+        first = WriteAheadLog(tmp_path)
+        await first.start()
+        try:
+            with pytest.raises(WalLockedError):
+                await WriteAheadLog(tmp_path).start()
+        finally:
+            await first.stop()
+        second = WriteAheadLog(tmp_path)
+        await second.start()
+        await second.stop()
+
+    asyncio.run(main())
+
+
+def test_short_writes_are_completed(tmp_path, monkeypatch):
+    real_write = os.write
+    monkeypatch.setattr(wal.os, "write", lambda fd, data: real_write(fd, bytes(data[:5])))
+
+    write(tmp_path, events(0, 4))
+    assert read_all(tmp_path) == events(0, 4)
@@ -0,0 +1,429 @@
+"""Segmented write-ahead log of accepted events.
+
+The collector appends every accepted batch to the log before answering, so a
+restart loses nothing it acknowledged; ``forwarder`` reads the log and moves
+it downstream at its own pace.
+
+On-disk layout (``EVENT_WAL_DIR``, default ``var/event-wal``)::
+
+    wal-<first sequence number, 20 digits>.log   # segments, oldest first
+    checkpoint.json                              # forwarder position
+    writer.lock                                  # flock held by the writer
+
+A segment starts with an 8-byte magic and then holds length-prefixed
+records: ``<u32 length><u32 crc32>`` (little endian) followed by the encoded
+event. The writer rolls to a new segment after ``EVENT_WAL_SEGMENT_BYTES``.
+Sequence numbers are implicit: a segment's name plus the record's position.
+
+``EVENT_WAL_FSYNC`` picks the durability of an acknowledged event:
+
+- ``always``: the response waits for an fsync; concurrent requests share one
+  (group commit), so the cost is one fsync per burst, not per request;
+- ``interval`` (default): fsync every ``EVENT_WAL_FSYNC_MS``; survives a
+  process crash immediately and a power loss after at most that interval;
+- ``never``: leave flushing to the OS.
+
+A record is committed once it is complete and its checksum matches; a torn
+tail left by a crash is cut off when the writer reopens the log.
+
+Only one process may append to a directory: the writer holds an exclusive
+``flock`` on ``writer.lock`` while the log is open, and a second writer fails
+at startup with ``WalLockedError`` instead of truncating live segments. Run
+one collector worker per ``EVENT_WAL_DIR``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator
+
+from pipeline import fsync_directory
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"EVWAL1\n\x00"
+_HEADER = struct.Struct("<II")
+FSYNC_POLICIES = ("always", "interval", "never")
+CHECKPOINT_NAME = "checkpoint.json"
+LOCK_NAME = "writer.lock"
+READ_CHUNK_BYTES = 1024 * 1024
+
+
+def segment_name(base_seq: int) -> str:
+    return f"wal-{base_seq:020d}.log"
+
+
+def list_segments(directory: Path) -> list[tuple[int, Path]]:
+    """``(first sequence number, path)`` of every segment, oldest first."""
+    segments = []
+    for path in directory.glob("wal-*.log"):
+        with contextlib.suppress(ValueError):
+            segments.append((int(path.stem[4:]), path))
+    return sorted(segments)
+
+
+def encode_record(payload: bytes) -> bytes:
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def scan_records(data: bytes, offset: int) -> Iterator[tuple[int, bytes]]:
+    """Complete, intact records of ``data`` from ``offset``, as ``(end offset, payload)``.
+
+    Stops at the first incomplete or corrupt record.
+    """
+    size = len(data)
+    while offset + _HEADER.size <= size:
+        length, crc = _HEADER.unpack_from(data, offset)
+        end = offset + _HEADER.size + length
+        if end > size:
+            return
+        payload = data[offset + _HEADER.size : end]
+        if zlib.crc32(payload) != crc:
+            return
+        yield end, payload
+        offset = end
+
+
+def write_all(fd: int, data: bytes) -> None:
+    """``os.write`` until all of ``data`` is written; a short write would tear the record."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+class WalLockedError(RuntimeError):
+    """Another process is already writing to the log directory."""
+
+
+class WriteAheadLog:
+    """Append side of the log, owned by the collector process."""
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        segment_bytes: int = 64 * 1024 * 1024,
+        fsync: str = "interval",
+        fsync_interval: float = 0.2,
+        max_backlog_bytes: int = 4 * 1024 * 1024 * 1024,
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}; expected one of {', '.join(FSYNC_POLICIES)}")
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_backlog_bytes = max_backlog_bytes
+        self.appended = 0
+        self.fsyncs = 0
+        self._fd: int | None = None
+        self._lock_fd: int | None = None
+        self._segment_size = 0
+        self._next_seq = 0
+        # Bytes appended overall, and how many of them are known to be on disk.
+        self._written = 0
+        self._synced = 0
+        self._sync_task: asyncio.Task[None] | None = None
+        self._retired: list[int] = []
+        self._syncer: asyncio.Task[None] | None = None
+        self._backlog = 0
+        self._backlog_checked = 0.0
+        self._listeners: list[asyncio.Event] = []
+
+    @classmethod
+    def from_env(cls) -> "WriteAheadLog":
+        """Build the log from ``EVENT_WAL_*`` settings."""
+        return cls(
+            Path(os.getenv("EVENT_WAL_DIR", "var/event-wal")),
+            segment_bytes=int(os.getenv("EVENT_WAL_SEGMENT_BYTES", str(64 * 1024 * 1024))),
+            fsync=os.getenv("EVENT_WAL_FSYNC", "interval").strip().lower(),
+            fsync_interval=float(os.getenv("EVENT_WAL_FSYNC_MS", "200")) / 1000,
+            max_backlog_bytes=int(os.getenv("EVENT_WAL_MAX_BACKLOG_BYTES", str(4 * 1024 * 1024 * 1024))),
+        )
+
+    def open(self) -> None:
+        """Lock the directory, cut a torn tail off the last segment and start a new one after it."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock()
+        segments = list_segments(self.directory)
+        if segments:
+            base_seq, path = segments[-1]
+            data = path.read_bytes()
+            end, count = 0, 0
+            if data.startswith(MAGIC):
+                end = len(MAGIC)
+                for end, _ in scan_records(data, len(MAGIC)):
+                    count += 1
+            if end < len(data):
+                logger.warning("Truncating %d torn bytes from %s", len(data) - end, path.name)
+                with path.open("r+b") as handle:
+                    handle.truncate(end)
+                    os.fsync(handle.fileno())
+            # An empty last segment is reused: the new one would get the same name.
+            self._next_seq = base_seq + count
+        self._open_segment()
+        self._refresh_backlog(force=True)
+
+    def _lock(self) -> None:
+        if self._lock_fd is not None:
+            return
+        fd = os.open(self.directory / LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise WalLockedError(
+                f"{self.directory} is locked by another event collector process; "
+                "give each worker its own EVENT_WAL_DIR or run a single worker"
+            ) from None
+        self._lock_fd = fd
+
+    def _unlock(self) -> None:
+        fd, self._lock_fd = self._lock_fd, None
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    async def start(self) -> None:
+        """Open the log and, for ``interval``, start the periodic fsync."""
+        if self._fd is None:
+            await asyncio.to_thread(self.open)
+        if self.fsync == "interval" and self._syncer is None:
+            self._syncer = asyncio.create_task(self._sync_forever(), name="event-wal-fsync")
+
+    async def stop(self) -> None:
+        """Make everything appended durable and close the log."""
+        syncer, self._syncer = self._syncer, None
+        if syncer is not None:
+            syncer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await syncer
+        if self._sync_task is not None:
+            await asyncio.shield(self._sync_task)
+        if self._fd is not None:
+            if self.fsync != "never":
+                await asyncio.to_thread(os.fsync, self._fd)
+            os.close(self._fd)
+            self._fd = None
+        self._unlock()
+
+    def _open_segment(self) -> None:
+        path = self.directory / segment_name(self._next_seq)
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._segment_size = os.fstat(self._fd).st_size
+        if self._segment_size == 0:
+            write_all(self._fd, MAGIC)
+            self._segment_size = len(MAGIC)
+        if self.fsync != "never":
+            fsync_directory(self.directory)
+
+    def _roll(self) -> None:
+        assert self._fd is not None
+        if self.fsync != "never":
+            os.fsync(self._fd)
+            self._synced = self._written
+        if self._sync_task is not None:
+            # A background fsync may still be using this descriptor.
+            self._retired.append(self._fd)
+        else:
+            os.close(self._fd)
+        self._open_segment()
+
+    @property
+    def overloaded(self) -> bool:
+        """True when the forwarder has fallen too far behind to accept more."""
+        self._refresh_backlog()
+        return self._backlog > self.max_backlog_bytes
+
+    def _refresh_backlog(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._backlog_checked < 1.0:
+            return
+        self._backlog_checked = now
+        checkpoint = Checkpoint.load(self.directory)
+        total = 0
+        for base, path in list_segments(self.directory):
+            if base >= checkpoint.segment:
+                with contextlib.suppress(FileNotFoundError):
+                    total += path.stat().st_size
+        self._backlog = max(0, total - checkpoint.position)
+
+    async def append(self, payloads: list[bytes]) -> None:
+        """Append encoded events; returns once they are as durable as the policy asks."""
+        if self._fd is None:
+            raise RuntimeError("The write-ahead log is not open")
+        if not payloads:
+            return
+        data = b"".join(encode_record(payload) for payload in payloads)
+        if self._segment_size + len(data) > self.segment_bytes and self._segment_size > len(MAGIC):
+            self._roll()
+        write_all(self._fd, data)
+        self._segment_size += len(data)
+        self._written += len(data)
+        self._backlog += len(data)
+        self._next_seq += len(payloads)
+        self.appended += len(payloads)
+        for listener in self._listeners:
+            listener.set()
+        if self.fsync == "always":
+            await self.sync()
+
+    def subscribe(self) -> asyncio.Event:
+        """An event set after every append, for an in-process forwarder."""
+        listener = asyncio.Event()
+        self._listeners.append(listener)
+        return listener
+
+    async def sync(self) -> None:
+        """Wait until everything appended so far is on disk (group commit)."""
+        target = self._written
+        while self._synced < target:
+            if self._sync_task is None:
+                self._sync_task = asyncio.create_task(self._fsync())
+            await asyncio.shield(self._sync_task)
+
+    async def _fsync(self) -> None:
+        target, fd = self._written, self._fd
+        try:
+            if fd is not None:
+                await asyncio.to_thread(os.fsync, fd)
+                self.fsyncs += 1
+            self._synced = max(self._synced, target)
+        finally:
+            self._sync_task = None
+            retired, self._retired = self._retired, []
+            for old_fd in retired:
+                os.close(old_fd)
+
+    async def _sync_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            if self._synced < self._written:
+                try:
+                    await self.sync()
+                except OSError:
+                    logger.exception("Write-ahead log fsync failed")
+
+    def stats(self) -> dict[str, int | str]:
+        self._refresh_backlog()
+        return {
+            "fsyncPolicy": self.fsync,
+            "appended": self.appended,
+            "nextSequence": self._next_seq,
+            "fsyncs": self.fsyncs,
+            "unsyncedBytes": self._written - self._synced,
+            "backlogBytes": self._backlog,
+        }
+
+
+@dataclass
+class Checkpoint:
+    """Forwarder position: the byte ``position`` of the next record in ``segment``.
+
+    ``sequence`` is that record's sequence number.
+    """
+
+    segment: int = 0
+    position: int = len(MAGIC)
+    sequence: int = 0
+
+    @classmethod
+    def load(cls, directory: Path) -> "Checkpoint":
+        path = directory / CHECKPOINT_NAME
+        try:
+            return cls(**json.loads(path.read_text(encoding="utf-8")))
+        except FileNotFoundError:
+            segments = list_segments(directory)
+            first = segments[0][0] if segments else 0
+            return cls(segment=first, sequence=first)
+
+    def save(self, directory: Path) -> None:
+        """Replace the checkpoint file atomically and durably."""
+        path = directory / CHECKPOINT_NAME
+        temp_path = path.with_suffix(".tmp")
+        with temp_path.open("w", encoding="utf-8") as handle:
+            json.dump(asdict(self), handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, path)
+        fsync_directory(directory)
+
+
+def _read_chunk(path: Path, position: int) -> bytes:
+    """Bytes of ``path`` from ``position``: about ``READ_CHUNK_BYTES``, and at least one whole record."""
+    with path.open("rb") as handle:
+        handle.seek(position)
+        data = handle.read(READ_CHUNK_BYTES)
+        if len(data) >= _HEADER.size:
+            needed = _HEADER.size + _HEADER.unpack_from(data)[0]
+            if needed > len(data):
+                data += handle.read(needed - len(data))
+    return data
+
+
+class WalReader:
+    """Read committed records from a checkpoint onwards."""
+
+    def __init__(self, directory: Path, checkpoint: Checkpoint | None = None) -> None:
+        self.directory = directory
+        self.checkpoint = checkpoint or Checkpoint.load(directory)
+
+    def read(self, max_records: int) -> tuple[list[bytes], Checkpoint]:
+        """Up to ``max_records`` payloads and the checkpoint just after them.
+
+        Moves on to the next segment once the current one is exhausted and a
+        newer one exists, i.e. the writer has sealed it.
+        """
+        payloads: list[bytes] = []
+        position = Checkpoint(**asdict(self.checkpoint))
+        while len(payloads) < max_records:
+            segments = list_segments(self.directory)
+            current = next((path for base, path in segments if base == position.segment), None)
+            newer = [base for base, _ in segments if base > position.segment]
+            if current is None:
+                if not newer:
+                    break
+                logger.warning("Segment %s is missing; skipping to the next one", segment_name(position.segment))
+                position = Checkpoint(segment=newer[0], sequence=newer[0])
+                continue
+            end = 0
+            for end, payload in scan_records(_read_chunk(current, position.position), 0):
+                payloads.append(payload)
+                position.sequence += 1
+                if len(payloads) >= max_records:
+                    break
+            position.position += end
+            if len(payloads) >= max_records:
+                break
+            if end:
+                continue
+            if not newer:
+                break
+            if position.position < current.stat().st_size:
+                logger.error(
+                    "Corrupt record in sealed segment %s at byte %d; skipping the rest of it",
+                    current.name,
+                    position.position,
+                )
+            position = Checkpoint(segment=newer[0], sequence=newer[0])
+        return payloads, position
+
+    def commit(self, checkpoint: Checkpoint) -> None:
+        """Persist ``checkpoint`` and delete the segments entirely before it."""
+        checkpoint.save(self.directory)
+        self.checkpoint = checkpoint
+        for base, path in list_segments(self.directory):
+            if base >= checkpoint.segment:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                path.unlink()
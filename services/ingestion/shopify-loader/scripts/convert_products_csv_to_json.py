@@ -5,23 +5,42 @@ Convert Shopify products CSV export to structured JSON format.
 This script processes the raw CSV export from Shopify and converts it into
 a well-structured JSON format that groups products with their variants,
 images, and metadata.
+
+Two output modes are available:
+
+- ``json`` (default): the whole catalog is collected, sorted by handle and
+  written as one pretty-printed document.
+- ``ndjson`` / ``json-stream``: Shopify writes every row of a product next to
+  each other, so each product is emitted as soon as its handle changes. Memory
+  stays bounded by the largest single product instead of the whole export.
+  Products keep their export order.
 """
 
+import argparse
 import csv
 import json
 import os
 import sys
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional, TextIO, Tuple
 from datetime import datetime
+from functools import partial
 import re
 
+from raw_archive import add_archive_arguments, open_archive
+
+OUTPUT_FORMATS = ('json', 'ndjson', 'json-stream')
+
+HTML_TAG_PATTERN = re.compile('<.*?>')
+
+# (column name, namespace, field name) for every metafield column in a header.
+MetafieldPlan = List[Tuple[str, str, str]]
+
 def clean_html_tags(text: str) -> str:
     """Remove HTML tags from text content."""
     if not text:
         return ""
     # Simple HTML tag removal
-    clean = re.compile('<.*?>')
-    return re.sub(clean, '', text)
+    return HTML_TAG_PATTERN.sub('', text)
 
 def parse_boolean(value: str) -> bool:
     """Parse string boolean values to Python boolean."""
@@ -38,161 +57,313 @@ def parse_number(value: str) -> Optional[float]:
     except ValueError:
         return None
 
-def extract_metafields(row: Dict[str, str]) -> Dict[str, Any]:
-    """Extract and organize metafields from the row."""
+def metafield_target(key: str) -> Optional[Tuple[str, str]]:
+    """Return the (namespace, field) a metafield column maps to, or None."""
+    # Handle different metafield patterns
+    if key.startswith("product.metafields."):
+        # Extract the metafield name
+        parts = key.split(".")
+        if len(parts) >= 3:
+            namespace = parts[2]
+            field_name = ".".join(parts[3:]) if len(parts) > 3 else "value"
+            return namespace, field_name
+    elif "metafields" in key.lower():
+        # Handle other metafield patterns
+        clean_key = key.replace(" (product.metafields.", ".").replace(")", "")
+        if "." in clean_key:
+            parts = clean_key.split(".")
+            if len(parts) >= 2:
+                namespace = parts[1]
+                field_name = ".".join(parts[2:]) if len(parts) > 2 else "value"
+                return namespace, field_name
+    return None
+
+def build_metafield_plan(fieldnames: List[str]) -> MetafieldPlan:
+    """Map the metafield columns of a header row once, in column order."""
+    plan = []
+    for key in fieldnames:
+        target = metafield_target(key) if key else None
+        if target:
+            plan.append((key, target[0], target[1]))
+    return plan
+
+def extract_metafields(row: Dict[str, str], plan: Optional[MetafieldPlan] = None) -> Dict[str, Any]:
+    """Extract and organize metafields from the row.
+
+    Pass the header's ``plan`` to avoid re-parsing every column name per row.
+    """
+    if plan is None:
+        plan = build_metafield_plan(list(row))
+
     metafields = {}
-    
-    # Extract metafields that start with specific patterns
-    for key, value in row.items():
+    for key, namespace, field_name in plan:
+        value = row.get(key)
         if not value or value.strip() == "":
             continue
-            
-        # Handle different metafield patterns
-        if key.startswith("product.metafields."):
-            # Extract the metafield name
-            parts = key.split(".")
-            if len(parts) >= 3:
-                namespace = parts[2]
-                field_name = ".".join(parts[3:]) if len(parts) > 3 else "value"
-                if namespace not in metafields:
-                    metafields[namespace] = {}
-                metafields[namespace][field_name] = value
-        elif "metafields" in key.lower():
-            # Handle other metafield patterns
-            clean_key = key.replace(" (product.metafields.", ".").replace(")", "")
-            if "." in clean_key:
-                parts = clean_key.split(".")
-                if len(parts) >= 2:
-                    namespace = parts[1]
-                    field_name = ".".join(parts[2:]) if len(parts) > 2 else "value"
-                    if namespace not in metafields:
-                        metafields[namespace] = {}
-                    metafields[namespace][field_name] = value
-    
+        if namespace not in metafields:
+            metafields[namespace] = {}
+        metafields[namespace][field_name] = value
+
     return metafields
 
-def process_csv_to_json(csv_file_path: str, output_file_path: str) -> None:
-    """Convert CSV file to structured JSON format."""
+def split_tags(value: str) -> List[str]:
+    """Split Shopify's comma-separated tag list."""
+    return [tag.strip() for tag in value.split(',') if tag.strip()]
+
+# Declarative layout of a converted product. Leaves are (CSV column, kind);
+# ``ProductColumnPlan`` resolves them into index-based field lists.
+NEW_LIST = 'new-list'
+METAFIELDS = 'metafields'
+
+FIELD_KINDS: Dict[str, Callable[[str], Any]] = {
+    'text': str.strip,
+    'html': clean_html_tags,
+    'bool': parse_boolean,
+    'number': parse_number,
+    'tags': split_tags,
+}
+
+PRODUCT_SPEC: Dict[str, Any] = {
+    'handle': ('Handle', 'text'),
+    'title': ('Title', 'text'),
+    'body_html': ('Body (HTML)', 'html'),
+    'vendor': ('Vendor', 'text'),
+    'product_category': ('Product Category', 'text'),
+    'type': ('Type', 'text'),
+    'tags': ('Tags', 'tags'),
+    'published': ('Published', 'bool'),
+    'seo_title': ('SEO Title', 'text'),
+    'seo_description': ('SEO Description', 'text'),
+    'gift_card': ('Gift Card', 'bool'),
+    'status': ('Status', 'text'),
+    'variants': NEW_LIST,
+    'images': NEW_LIST,
+    'metafields': METAFIELDS,
+    'google_shopping': {
+        'product_category': ('Google Shopping / Google Product Category', 'text'),
+        'gender': ('Google Shopping / Gender', 'text'),
+        'age_group': ('Google Shopping / Age Group', 'text'),
+        'mpn': ('Google Shopping / MPN', 'text'),
+        'condition': ('Google Shopping / Condition', 'text'),
+        'custom_product': ('Google Shopping / Custom Product', 'text'),
+        'custom_labels': {
+            f'label_{n}': (f'Google Shopping / Custom Label {n}', 'text') for n in range(5)
+        },
+    },
+    'reviews': {
+        f'review_{n}': {
+            'author': (f'Review #{n} Author Name (product.metafields.custom.review_{n}_author_name)', 'text'),
+            'text': (f'Review #{n} Text (product.metafields.custom.review_{n}_text)', 'text'),
+        }
+        for n in range(1, 4)
+    },
+    'collapsible_rows': {
+        f'heading_{n}': (f'Collapsible row - heading {n} (product.metafields.custom.collapsible_row_heading_{n})', 'text')
+        for n in range(1, 4)
+    },
+}
+
+# A row carries a variant when any of these columns is non-blank.
+VARIANT_PRESENCE_COLUMNS = (
+    'Variant SKU',
+    'Option1 Value',
+    'Option2 Value',
+    'Option3 Value',
+    'Variant Price',
+    'Variant Compare At Price',
+    'Variant Grams',
+    'Cost per item',
+)
+
+VARIANT_SPEC: Dict[str, Any] = {
+    'sku': ('Variant SKU', 'text'),
+    'grams': ('Variant Grams', 'number'),
+    'inventory_tracker': ('Variant Inventory Tracker', 'text'),
+    'inventory_policy': ('Variant Inventory Policy', 'text'),
+    'fulfillment_service': ('Variant Fulfillment Service', 'text'),
+    'price': ('Variant Price', 'number'),
+    'compare_at_price': ('Variant Compare At Price', 'number'),
+    'requires_shipping': ('Variant Requires Shipping', 'bool'),
+    'taxable': ('Variant Taxable', 'bool'),
+    'barcode': ('Variant Barcode', 'text'),
+    'weight_unit': ('Variant Weight Unit', 'text'),
+    'tax_code': ('Variant Tax Code', 'text'),
+    'cost_per_item': ('Cost per item', 'number'),
+    'options': {
+        f'option{n}': {
+            'name': (f'Option{n} Name', 'text'),
+            'value': (f'Option{n} Value', 'text'),
+            'linked_to': (f'Option{n} Linked To', 'text'),
+        }
+        for n in range(1, 4)
+    },
+}
+
+IMAGE_SPEC: Dict[str, Any] = {
+    'src': ('Image Src', 'text'),
+    'position': ('Image Position', 'number'),
+    'alt_text': ('Image Alt Text', 'text'),
+    'variant_image': ('Variant Image', 'text'),
+}
+
+# (key, column index, converter) for one field of a built dict. With a
+# ``None`` index the converter gets the whole row (nested dicts, lists,
+# metafields) instead of one cell.
+FieldPlan = List[Tuple[str, Optional[int], Callable[[Any], Any]]]
+
+def build_fields(fields: FieldPlan, values: List[str]) -> Dict[str, Any]:
+    """Build one dict of a prepared row from its field plan."""
+    built = {}
+    for key, index, convert in fields:
+        built[key] = convert(values if index is None else values[index])
+    return built
+
+def _new_list(_values: List[str]) -> List[Any]:
+    return []
+
+class ProductColumnPlan:
+    """A products export header resolved into index-based row builders.
+
+    Column positions are resolved once per file into ``(key, index,
+    converter)`` field plans that :meth:`new_product` and :meth:`add_row`
+    apply to a ``csv.reader`` row. Every row must go through :meth:`prepare`
+    first: it pads short rows and appends an empty sentinel cell that columns
+    missing from this export point at.
+    """
+
+    def __init__(self, header: List[str]):
+        header = list(header)
+        if header:
+            header[0] = header[0].lstrip('\ufeff')
+        self.header = header
+        self.width = len(header)
+
+        # Later duplicates win, as they do for csv.DictReader.
+        self.positions = {name: index for index, name in enumerate(header)}
+        self.handle_index = self._index('Handle')
+        self.metafield_plan = [
+            (self.positions[column], namespace, field_name)
+            for column, namespace, field_name in build_metafield_plan(header)
+        ]
+
+        self.product_fields = self._fields(PRODUCT_SPEC)
+        self.variant_fields = self._fields(VARIANT_SPEC)
+        self.image_fields = self._fields(IMAGE_SPEC)
+        self.variant_indexes = tuple(self._index(column) for column in VARIANT_PRESENCE_COLUMNS)
+        self.image_index = self._index('Image Src')
+
+    def _index(self, column: str) -> int:
+        return self.positions.get(column, self.width)
+
+    def _fields(self, spec: Dict[str, Any]) -> FieldPlan:
+        fields: FieldPlan = []
+        for key, node in spec.items():
+            if isinstance(node, dict):
+                fields.append((key, None, partial(build_fields, self._fields(node))))
+            elif node == NEW_LIST:
+                fields.append((key, None, _new_list))
+            elif node == METAFIELDS:
+                fields.append((key, None, self._metafields))
+            else:
+                column, kind = node
+                fields.append((key, self._index(column), FIELD_KINDS[kind]))
+        return fields
+
+    def new_product(self, values: List[str]) -> Dict[str, Any]:
+        """Build a product, without variants or images, from its first prepared row."""
+        return build_fields(self.product_fields, values)
+
+    def add_row(self, product: Dict[str, Any], values: List[str]) -> None:
+        """Append the variant and image a prepared row carries, if any."""
+        if any(values[index].strip() for index in self.variant_indexes):
+            product['variants'].append(build_fields(self.variant_fields, values))
+        if values[self.image_index].strip():
+            product['images'].append(build_fields(self.image_fields, values))
+
+    def _metafields(self, values: List[str]) -> Dict[str, Any]:
+        metafields = {}
+        for index, namespace, field_name in self.metafield_plan:
+            value = values[index]
+            if not value or value.strip() == "":
+                continue
+            if namespace not in metafields:
+                metafields[namespace] = {}
+            metafields[namespace][field_name] = value
+        return metafields
+
+    def prepare(self, values: List[str]) -> List[str]:
+        """Fit a raw row to the header and append the missing-column sentinel."""
+        missing = self.width - len(values)
+        if missing > 0:
+            values.extend([''] * missing)
+        elif missing < 0:
+            del values[self.width:]
+        values.append('')
+        return values
+
+    def handle(self, values: List[str]) -> str:
+        """Return the prepared row's handle."""
+        return values[self.handle_index].strip()
+
+def group_products(rows: Iterable[List[str]], plan: ProductColumnPlan) -> Iterator[Dict[str, Any]]:
+    """Yield one product per run of rows that share a Handle.
+
+    Only the product being assembled is held in memory. Raises ``ValueError``
+    if a handle reappears after its group ended, which means the export is not
+    grouped and must be converted with the buffered ``json`` format.
+    """
+    finished = set()
+    current = None
+    add_row = plan.add_row
+
+    for values in rows:
+        values = plan.prepare(values)
+        handle = plan.handle(values)
+        if not handle:
+            continue
+
+        if current is None or handle != current['handle']:
+            if current is not None:
+                finished.add(current['handle'])
+                yield current
+            if handle in finished:
+                line = getattr(rows, 'line_num', None)
+                where = f" (line {line})" if line else ""
+                raise ValueError(
+                    f"Rows for handle '{handle}' are not contiguous{where}; "
+                    f"convert with --format json"
+                )
+            current = plan.new_product(values)
+
+        add_row(current, values)
+
+    if current is not None:
+        yield current
+
+def process_csv_to_json(csv_file_path: str, output_file_path: str, parquet_dir: Optional[str] = None) -> None:
+    """Convert CSV file to structured JSON format.
+
+    With ``parquet_dir`` the products are also written as normalized Parquet
+    tables (see ``products_columnar``).
+    """
     
     products = {}
     
-    with open(csv_file_path, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
+    with open(csv_file_path, 'r', encoding='utf-8', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        plan = ProductColumnPlan(next(reader, []))
         
-        for row in reader:
-            handle = row.get('Handle', '').strip()
+        for values in reader:
+            values = plan.prepare(values)
+            handle = plan.handle(values)
             if not handle:
                 continue
             
             # Initialize product if not exists
             if handle not in products:
-                products[handle] = {
-                    'handle': handle,
-                    'title': row.get('Title', '').strip(),
-                    'body_html': clean_html_tags(row.get('Body (HTML)', '')),
-                    'vendor': row.get('Vendor', '').strip(),
-                    'product_category': row.get('Product Category', '').strip(),
-                    'type': row.get('Type', '').strip(),
-                    'tags': [tag.strip() for tag in row.get('Tags', '').split(',') if tag.strip()],
-                    'published': parse_boolean(row.get('Published', '')),
-                    'seo_title': row.get('SEO Title', '').strip(),
-                    'seo_description': row.get('SEO Description', '').strip(),
-                    'gift_card': parse_boolean(row.get('Gift Card', '')),
-                    'status': row.get('Status', '').strip(),
-                    'variants': [],
-                    'images': [],
-                    'metafields': extract_metafields(row),
-                    'google_shopping': {
-                        'product_category': row.get('Google Shopping / Google Product Category', '').strip(),
-                        'gender': row.get('Google Shopping / Gender', '').strip(),
-                        'age_group': row.get('Google Shopping / Age Group', '').strip(),
-                        'mpn': row.get('Google Shopping / MPN', '').strip(),
-                        'condition': row.get('Google Shopping / Condition', '').strip(),
-                        'custom_product': row.get('Google Shopping / Custom Product', '').strip(),
-                        'custom_labels': {
-                            'label_0': row.get('Google Shopping / Custom Label 0', '').strip(),
-                            'label_1': row.get('Google Shopping / Custom Label 1', '').strip(),
-                            'label_2': row.get('Google Shopping / Custom Label 2', '').strip(),
-                            'label_3': row.get('Google Shopping / Custom Label 3', '').strip(),
-                            'label_4': row.get('Google Shopping / Custom Label 4', '').strip(),
-                        }
-                    },
-                    'reviews': {
-                        'review_1': {
-                            'author': row.get('Review #1 Author Name (product.metafields.custom.review_1_author_name)', '').strip(),
-                            'text': row.get('Review #1 Text (product.metafields.custom.review_1_text)', '').strip(),
-                        },
-                        'review_2': {
-                            'author': row.get('Review #2 Author Name (product.metafields.custom.review_2_author_name)', '').strip(),
-                            'text': row.get('Review #2 Text (product.metafields.custom.review_2_text)', '').strip(),
-                        },
-                        'review_3': {
-                            'author': row.get('Review #3 Author Name (product.metafields.custom.review_3_author_name)', '').strip(),
-                            'text': row.get('Review #3 Text (product.metafields.custom.review_3_text)', '').strip(),
-                        }
-                    },
-                    'collapsible_rows': {
-                        'heading_1': row.get('Collapsible row - heading 1 (product.metafields.custom.collapsible_row_heading_1)', '').strip(),
-                        'heading_2': row.get('Collapsible row - heading 2 (product.metafields.custom.collapsible_row_heading_2)', '').strip(),
-                        'heading_3': row.get('Collapsible row - heading 3 (product.metafields.custom.collapsible_row_heading_3)', '').strip(),
-                    }
-                }
-            
-            # Add variant if it has variant-specific data
-            variant_sku = row.get('Variant SKU', '').strip()
-            if variant_sku or any([
-                row.get('Option1 Value', '').strip(),
-                row.get('Option2 Value', '').strip(),
-                row.get('Option3 Value', '').strip(),
-                row.get('Variant Price', '').strip(),
-                row.get('Variant Compare At Price', '').strip(),
-                row.get('Variant Grams', '').strip(),
-                row.get('Cost per item', '').strip()
-            ]):
-                variant = {
-                    'sku': variant_sku,
-                    'grams': parse_number(row.get('Variant Grams', '')),
-                    'inventory_tracker': row.get('Variant Inventory Tracker', '').strip(),
-                    'inventory_policy': row.get('Variant Inventory Policy', '').strip(),
-                    'fulfillment_service': row.get('Variant Fulfillment Service', '').strip(),
-                    'price': parse_number(row.get('Variant Price', '')),
-                    'compare_at_price': parse_number(row.get('Variant Compare At Price', '')),
-                    'requires_shipping': parse_boolean(row.get('Variant Requires Shipping', '')),
-                    'taxable': parse_boolean(row.get('Variant Taxable', '')),
-                    'barcode': row.get('Variant Barcode', '').strip(),
-                    'weight_unit': row.get('Variant Weight Unit', '').strip(),
-                    'tax_code': row.get('Variant Tax Code', '').strip(),
-                    'cost_per_item': parse_number(row.get('Cost per item', '')),
-                    'options': {
-                        'option1': {
-                            'name': row.get('Option1 Name', '').strip(),
-                            'value': row.get('Option1 Value', '').strip(),
-                            'linked_to': row.get('Option1 Linked To', '').strip()
-                        },
-                        'option2': {
-                            'name': row.get('Option2 Name', '').strip(),
-                            'value': row.get('Option2 Value', '').strip(),
-                            'linked_to': row.get('Option2 Linked To', '').strip()
-                        },
-                        'option3': {
-                            'name': row.get('Option3 Name', '').strip(),
-                            'value': row.get('Option3 Value', '').strip(),
-                            'linked_to': row.get('Option3 Linked To', '').strip()
-                        }
-                    }
-                }
-                products[handle]['variants'].append(variant)
+                products[handle] = plan.new_product(values)
             
-            # Add image if it has image data
-            image_src = row.get('Image Src', '').strip()
-            if image_src:
-                image = {
-                    'src': image_src,
-                    'position': parse_number(row.get('Image Position', '')),
-                    'alt_text': row.get('Image Alt Text', '').strip(),
-                    'variant_image': row.get('Variant Image', '').strip()
-                }
-                products[handle]['images'].append(image)
+            plan.add_row(products[handle], values)
     
     # Convert to list and sort by handle
     products_list = list(products.values())
@@ -213,6 +384,13 @@ def process_csv_to_json(csv_file_path: str, output_file_path: str) -> None:
     # Write to JSON file
     with open(output_file_path, 'w', encoding='utf-8') as jsonfile:
         json.dump(output_data, jsonfile, indent=2, ensure_ascii=False)
+
+    if parquet_dir:
+        # Imported here: products_columnar builds its schemas from this module.
+        from products_columnar import source_name, write_product_tables
+
+        rows = write_product_tables(products_list, parquet_dir, source_name(csv_file_path))
+        print(f"🧱 Parquet tables written to: {parquet_dir} ({rows})")
     
     print(f"✅ Successfully converted {len(products_list)} products to JSON")
     print(f"📁 Output saved to: {output_file_path}")
@@ -221,11 +399,141 @@ def process_csv_to_json(csv_file_path: str, output_file_path: str) -> None:
     print(f"   - Total variants: {sum(len(p['variants']) for p in products_list)}")
     print(f"   - Total images: {sum(len(p['images']) for p in products_list)}")
 
-def main():
+def iter_products(csv_file_path: str) -> Iterator[Dict[str, Any]]:
+    """Yield products one at a time from an export grouped by Handle."""
+    with open(csv_file_path, 'r', encoding='utf-8', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        plan = ProductColumnPlan(next(reader, []))
+        yield from group_products(reader, plan)
+
+def write_products_stream(
+    products: Iterator[Dict[str, Any]],
+    output: TextIO,
+    output_format: str,
+    source_file: str,
+) -> Dict[str, Any]:
+    """Write products as they arrive and return the run's metadata.
+
+    ``ndjson`` writes one product per line. ``json-stream`` writes the same
+    ``{"products": [...], "metadata": {...}}`` document as the ``json`` format,
+    one product per line, with the metadata after the products because the
+    totals are only known at the end.
+    """
+    metadata = {
+        'conversion_date': datetime.now().isoformat(),
+        'source_file': source_file,
+        'total_products': 0,
+        'total_variants': 0,
+        'total_images': 0,
+    }
+
+    if output_format == 'json-stream':
+        output.write('{"products": [\n')
+
+    for product in products:
+        line = json.dumps(product, ensure_ascii=False)
+        if output_format == 'json-stream' and metadata['total_products']:
+            output.write(',\n')
+        output.write(line)
+        if output_format == 'ndjson':
+            output.write('\n')
+
+        metadata['total_products'] += 1
+        metadata['total_variants'] += len(product['variants'])
+        metadata['total_images'] += len(product['images'])
+
+    if output_format == 'json-stream':
+        output.write('\n],\n"metadata": ')
+        output.write(json.dumps(metadata, ensure_ascii=False))
+        output.write('}\n')
+
+    return metadata
+
+def stream_csv_to_json(
+    csv_file_path: str,
+    output_file_path: str,
+    output_format: str = 'ndjson',
+    parquet_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Convert a CSV export product by product in constant memory.
+
+    With ``parquet_dir`` the same stream is also written as normalized Parquet
+    tables, one row group at a time.
+    """
+    if output_format not in ('ndjson', 'json-stream'):
+        raise ValueError(f"Unsupported streaming format: {output_format}")
+
+    products = iter_products(csv_file_path)
+    table_writer = None
+    if parquet_dir:
+        # Imported here: products_columnar builds its schemas from this module.
+        from products_columnar import ProductTableWriter, reset_partitions, source_name
+
+        source = source_name(csv_file_path)
+        reset_partitions(parquet_dir, source)
+        table_writer = ProductTableWriter(parquet_dir, source)
+        products = table_writer.write_all(products)
+
+    # Write next to the target and rename, so a failed run never leaves a
+    # truncated file where the previous output used to be.
+    temp_path = f"{output_file_path}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as output:
+            metadata = write_products_stream(
+                products,
+                output,
+                output_format,
+                os.path.basename(csv_file_path),
+            )
+        if table_writer is not None:
+            table_writer.close()
+            table_writer = None
+        os.replace(temp_path, output_file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        if table_writer is not None:
+            # Failed part-way: drop the half-written partition.
+            table_writer.abort()
+            reset_partitions(parquet_dir, source)
+
+    print(f"✅ Successfully streamed {metadata['total_products']} products to {output_format}")
+    print(f"📁 Output saved to: {output_file_path}")
+    print(f"📊 Summary:")
+    print(f"   - Products: {metadata['total_products']}")
+    print(f"   - Total variants: {metadata['total_variants']}")
+    print(f"   - Total images: {metadata['total_images']}")
+    return metadata
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--input',
+        default="data/raw_manual/products_export_05082025.csv",
+        help="Shopify products CSV export",
+    )
+    parser.add_argument('--output', help="Output path (default: data/products.json or .ndjson)")
+    parser.add_argument(
+        '--format',
+        choices=OUTPUT_FORMATS,
+        default='json',
+        help="json buffers and sorts the catalog; ndjson and json-stream emit products as they complete",
+    )
+    parser.add_argument(
+        '--parquet-dir',
+        help="Also write products/variants/images/metafields Parquet tables under this directory",
+    )
+    add_archive_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
     """Main function to run the conversion."""
-    # Define file paths
-    csv_file = "data/raw_manual/products_export_05082025.csv"
-    output_file = "data/products.json"
+    args = parse_args(argv)
+    csv_file = args.input
+    output_file = args.output or (
+        "data/products.ndjson" if args.format == 'ndjson' else "data/products.json"
+    )
     
     # Check if input file exists
     if not os.path.exists(csv_file):
@@ -233,13 +541,39 @@ def main():
         sys.exit(1)
     
     # Create output directory if it doesn't exist
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
     
+    # Identical input and options: the outputs from the last run still stand.
+    archive = open_archive(args, os.path.dirname(output_file))
+    params = {
+        'format': args.format,
+        'parquet_dir': os.path.abspath(args.parquet_dir) if args.parquet_dir else None,
+    }
     try:
-        process_csv_to_json(csv_file, output_file)
+        if archive is not None:
+            blob = archive.put_file(csv_file)
+            if not args.force and archive.is_fresh(output_file, 'convert_products', [blob], params):
+                print(f"⏭️  {output_file} is up to date with {csv_file}; nothing to do")
+                return
+
+        if args.format == 'json':
+            process_csv_to_json(csv_file, output_file, args.parquet_dir)
+        else:
+            stream_csv_to_json(csv_file, output_file, args.format, args.parquet_dir)
+
+        if archive is not None:
+            outputs = [output_file]
+            if args.parquet_dir:
+                from products_columnar import partition_files, source_name
+
+                outputs.extend(partition_files(args.parquet_dir, [source_name(csv_file)]))
+            archive.record_run(output_file, 'convert_products', [blob], outputs, params)
     except Exception as e:
         print(f"❌ Error during conversion: {str(e)}")
         sys.exit(1)
+    finally:
+        if archive is not None:
+            archive.close()
 
 if __name__ == "__main__":
     main()
@@ -1,4 +1,25 @@
-"""Generate thumbnails for product images.
+#!/usr/bin/env python3
+"""
+Generate thumbnails for product images.
+
+Runs the ``resize_images`` pipeline for the profiles marked ``thumbnail: true``
+in ``config/resize_settings.yaml``. Thumbnails share the derived-asset cache
+and manifest with the other profiles, so images that ``resize_images.py``
+already rendered are not decoded again.
 
-Implement image resizing and upload to storage before enabling this job.
+Usage:
+    python scripts/generate_thumbnails.py --catalog data/products.ndjson
 """
+
+from typing import List, Optional
+
+from resize_images import run
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main function to generate thumbnails."""
+    return run(argv, thumbnails=True, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+Serve responsive image variants, resized on demand.
+
+``GET /images/<path>?w=<width>&fmt=<format>&q=<quality>`` returns ``<path>``
+(looked up under the ``--root`` directories, e.g. the frontend's ``public/``
+that ``seed_test_items.py`` stores ``src`` paths relative to) resized to
+``w`` pixels wide, using the decode/resize/encode helpers of the batch
+pipeline (``utils.image_helpers``):
+
+- ``w`` is rounded up to the next width of ``--widths``, so arbitrary widths
+  cannot fill the cache; images are never upscaled. Without ``w`` the
+  largest width is used.
+- ``fmt`` is ``avif``, ``webp``, ``jpeg`` or ``auto`` (the default), which
+  picks the best format the client's ``Accept`` header allows.
+- ``q`` overrides the encoder quality from ``config/resize_settings.yaml``.
+
+Rendered variants are kept in a size-bounded LRU cache on disk (``--cache-dir``)
+with a smaller in-memory LRU tier in front of it. Concurrent requests for the
+same variant share a single render. A variant's ETag is derived from the
+source's size and mtime plus the parameters, so a conditional request is
+answered without touching the image at all.
+
+Responses carry long-lived cache headers: a year and ``immutable`` when the
+URL is versioned with the source's current content hash (``v=<sha256>``, the
+``contentHash`` the seeder stores, or a prefix of at least 8 characters of
+it), otherwise ``--max-age`` with revalidation through the ETag. A stale or
+made-up ``v`` therefore cannot pin an outdated variant in browser caches.
+
+Sources Pillow refuses to decode answer 415, sources over Pillow's
+decompression-bomb limit 422, and formats this Pillow build cannot encode 406.
+
+Usage:
+    python scripts/image_server.py --root ../../../apps/corporate-website/frontend/public
+    python scripts/image_server.py --root public --root data/images/originals --port 8090 --cache-mb 2048
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+LOADER_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LOADER_ROOT not in sys.path:
+    sys.path.insert(0, LOADER_ROOT)
+
+from utils.image_helpers import (  # noqa: E402
+    DEFAULT_SETTINGS,
+    FORMATS,
+    Image,
+    Profile,
+    ResizeSettings,
+    content_type,
+    decode,
+    encode,
+    load_settings,
+    require_pillow,
+    resize,
+)
+
+try:
+    from aiohttp import web
+except ImportError:  # pragma: no cover - exercised only without aiohttp
+    web = None
+
+DEFAULT_WIDTHS = (160, 320, 480, 640, 768, 1024, 1280, 1600, 2048)
+# Bound on the output height, so a very tall source cannot produce a huge image.
+MAX_HEIGHT = 4096
+
+# Preference order of ``fmt=auto``; JPEG is the fallback every client accepts.
+AUTO_FORMATS = ('avif', 'webp')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Shortest ``v`` accepted as a prefix of the source's SHA-256.
+MIN_VERSION_LENGTH = 8
+DEFAULT_MAX_AGE = 86400
+
+
+def require_aiohttp() -> None:
+    """Raise a helpful error when aiohttp is not installed."""
+    if web is None:
+        raise RuntimeError("The image server requires aiohttp: pip install aiohttp")
+
+
+class VariantCache:
+    """Two-tier LRU cache of rendered variants.
+
+    The disk tier keeps files under ``directory`` and evicts the least
+    recently used ones beyond ``max_bytes``; recency survives restarts
+    through the files' mtimes, which are bumped on every hit. The memory
+    tier holds the most recently used variants up to ``memory_bytes``.
+    Methods are thread-safe, so disk reads and writes can run off the event
+    loop.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, memory_bytes: int = 0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._lock = threading.Lock()
+        self._disk: 'OrderedDict[str, int]' = OrderedDict()
+        self._disk_size = 0
+        self._memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._memory_size = 0
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _load(self) -> None:
+        """Index the files left by a previous run, oldest first."""
+        entries: List[Tuple[int, str, int]] = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            for name in filenames:
+                if name.endswith('.tmp'):
+                    continue
+                stat = os.stat(os.path.join(dirpath, name))
+                entries.append((stat.st_mtime_ns, name, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+        with self._lock:
+            self._evict_disk()
+
+    def get_memory(self, key: str) -> Optional[bytes]:
+        """The variant if it is in the memory tier."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+            return data
+
+    def get(self, key: str) -> Optional[bytes]:
+        """The variant from either tier, promoting a disk hit into memory."""
+        data = self.get_memory(key)
+        if data is not None:
+            return data
+        with self._lock:
+            if key not in self._disk:
+                self.counters['misses'] += 1
+                return None
+            self._disk.move_to_end(key)
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._disk_size -= self._disk.pop(key, 0)
+                self.counters['misses'] += 1
+            return None
+        with self._lock:
+            self.counters['disk_hits'] += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store a variant in both tiers."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._disk_size += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._evict_disk()
+            self._remember(key, data)
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.memory_bytes:
+            return
+        self._memory_size += len(data) - len(self._memory.pop(key, b''))
+        self._memory[key] = data
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _evict_disk(self) -> None:
+        while self._disk_size > self.max_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            self.counters['evictions'] += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_size,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_size,
+                **self.counters,
+            }
+
+
+def render_variant(data: bytes, width: int, fmt: str, options: Dict[str, Any]) -> bytes:
+    """Resize a source image to ``width`` (at most) and encode it as ``fmt``."""
+    profile = Profile(f"w{width}", width, MAX_HEIGHT, 'contain', (fmt,))
+    return encode(resize(decode(data, [profile]), profile), fmt, options)
+
+
+def negotiate_format(accept: str) -> str:
+    """Best format for ``fmt=auto`` given the request's Accept header."""
+    accepted = {part.split(';')[0].strip() for part in accept.split(',')}
+    for fmt in AUTO_FORMATS:
+        if content_type(fmt) in accepted:
+            return fmt
+    return 'jpeg'
+
+
+def snap_width(width: Optional[int], widths: Sequence[int]) -> int:
+    """The smallest allowed width covering ``width`` (the largest if none does)."""
+    if width is None:
+        return widths[-1]
+    for allowed in widths:
+        if allowed >= width:
+            return allowed
+    return widths[-1]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak If-None-Match comparison."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+class ImageServer:
+    """Resolves, renders and caches variants for the HTTP handlers."""
+
+    def __init__(
+        self,
+        roots: Sequence[str],
+        settings: ResizeSettings,
+        cache: VariantCache,
+        *,
+        widths: Sequence[int] = DEFAULT_WIDTHS,
+        workers: Optional[int] = None,
+        max_age: int = DEFAULT_MAX_AGE,
+    ):
+        require_pillow()
+        self.roots = [os.path.realpath(root) for root in roots]
+        self.settings = settings
+        self.cache = cache
+        self.widths = sorted(set(widths))
+        self.max_age = max_age
+        self.renders = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        self._inflight: Dict[str, 'asyncio.Future[bytes]'] = {}
+        self._source_hashes: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+    def resolve(self, path: str) -> Optional[str]:
+        """The file ``path`` names under the first root that has it."""
+        for root in self.roots:
+            candidate = os.path.realpath(os.path.join(root, path.lstrip('/')))
+            if os.path.commonpath([root, candidate]) == root and os.path.isfile(candidate):
+                return candidate
+        return None
+
+    def variant_key(self, source: str, width: int, fmt: str, quality: Optional[int]) -> str:
+        """Cache key of a variant; changes when the source file is replaced."""
+        stat = os.stat(source)
+        spec = f"{source}\0{stat.st_size}\0{stat.st_mtime_ns}\0{width}\0{fmt}\0{quality}"
+        digest = hashlib.blake2b(spec.encode('utf-8'), digest_size=16).hexdigest()
+        return f"{digest}.{FORMATS[fmt][1]}"
+
+    def source_hash(self, source: str) -> str:
+        """SHA-256 of the source file, reused until its size or mtime changes."""
+        stat = os.stat(source)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        cached = self._source_hashes.get(source)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self._source_hashes[source] = (signature, digest.hexdigest())
+        return digest.hexdigest()
+
+    async def is_current_version(self, source: str, version: Optional[str]) -> bool:
+        """Whether ``version`` (the ``v`` parameter) names the source's current content."""
+        if not version or len(version) < MIN_VERSION_LENGTH:
+            return False
+        loop = asyncio.get_running_loop()
+        current = await loop.run_in_executor(self._executor, self.source_hash, source)
+        return current.startswith(version.lower())
+
+    def encoder_options(self, fmt: str, quality: Optional[int]) -> Dict[str, Any]:
+        options = dict(self.settings.formats.get(fmt, {}))
+        if quality is not None:
+            options['quality'] = quality
+        return options
+
+    async def variant(self, key: str, source: str, width: int, fmt: str, quality: Optional[int]) -> bytes:
+        """The encoded variant, from cache or from a (shared) render."""
+        data = self.cache.get_memory(key)
+        if data is not None:
+            return data
+        pending = self._inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._produce(key, source, width, fmt, quality))
+            self._inflight[key] = pending
+            pending.add_done_callback(lambda done: self._finish(key, done))
+        # A client that disconnects must not cancel the render other requests wait for.
+        return await asyncio.shield(pending)
+
+    def _finish(self, key: str, done: 'asyncio.Future[bytes]') -> None:
+        self._inflight.pop(key, None)
+        if not done.cancelled():
+            done.exception()  # retrieved here in case every waiter went away
+
+    async def _produce(self, key: str, source: str, width: int, fmt: str, quality: Optional[int]) -> bytes:
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(self._executor, self.cache.get, key)
+        if data is not None:
+            return data
+        self.renders += 1
+        data = await loop.run_in_executor(self._executor, self._render, source, width, fmt, quality)
+        await loop.run_in_executor(self._executor, self.cache.put, key, data)
+        return data
+
+    def _render(self, source: str, width: int, fmt: str, quality: Optional[int]) -> bytes:
+        with open(source, 'rb') as f:
+            data = f.read()
+        return render_variant(data, width, fmt, self.encoder_options(fmt, quality))
+
+    def cache_control(self, versioned: bool) -> str:
+        if versioned:
+            return IMMUTABLE_CACHE_CONTROL
+        return f"public, max-age={self.max_age}, stale-while-revalidate={self.max_age * 7}"
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+SERVER_KEY = web.AppKey('image_server', ImageServer) if web is not None else 'image_server'
+
+
+def _int_param(query, name: str, low: int, high: int) -> Optional[int]:
+    raw = query.get(name)
+    if raw is None or raw == '':
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"'{name}' must be an integer")
+    if not low <= value <= high:
+        raise web.HTTPBadRequest(text=f"'{name}' must be between {low} and {high}")
+    return value
+
+
+async def handle_image(request: 'web.Request') -> 'web.StreamResponse':
+    """``GET /images/{path}``: one resized variant of a source image."""
+    server: ImageServer = request.app[SERVER_KEY]
+    query = request.query
+
+    width = snap_width(_int_param(query, 'w', 1, 100000), server.widths)
+    quality = _int_param(query, 'q', 1, 100)
+    requested = query.get('fmt', 'auto').lower()
+    if requested != 'auto' and requested not in FORMATS:
+        raise web.HTTPBadRequest(text=f"'fmt' must be auto or one of {', '.join(FORMATS)}")
+    fmt = negotiate_format(request.headers.get('Accept', '')) if requested == 'auto' else requested
+
+    source = server.resolve(request.match_info['path'])
+    if source is None:
+        raise web.HTTPNotFound(text="Image not found")
+
+    key = server.variant_key(source, width, fmt, quality)
+    headers = {
+        'ETag': f'"{key}"',
+        'Cache-Control': server.cache_control(await server.is_current_version(source, query.get('v'))),
+    }
+    if requested == 'auto':
+        headers['Vary'] = 'Accept'
+    if etag_matches(request.headers.get('If-None-Match'), headers['ETag']):
+        return web.Response(status=304, headers=headers)
+
+    try:
+        body = await server.variant(key, source, width, fmt, quality)
+    except Image.DecompressionBombError:
+        raise web.HTTPUnprocessableEntity(text="Source image exceeds the decoder's pixel limit")
+    except KeyError:
+        # Pillow has no save handler for the format (e.g. built without AVIF).
+        raise web.HTTPNotAcceptable(text=f"This server cannot encode {fmt}")
+    except (OSError, ValueError):
+        raise web.HTTPUnsupportedMediaType(text="Source is not a supported image")
+    return web.Response(body=body, content_type=content_type(fmt), headers=headers)
+
+
+async def handle_health(request: 'web.Request') -> 'web.Response':
+    """Liveness plus cache figures."""
+    server: ImageServer = request.app[SERVER_KEY]
+    return web.json_response({'status': 'ok', 'renders': server.renders, **server.cache.stats()})
+
+
+def create_app(server: ImageServer) -> 'web.Application':
+    """aiohttp application serving ``server``."""
+    require_aiohttp()
+    app = web.Application()
+    app[SERVER_KEY] = server
+    app.router.add_get('/images/{path:.+}', handle_image)
+    app.router.add_get('/health', handle_health)
+
+    async def close_server(_app):
+        server.close()
+
+    app.on_cleanup.append(close_server)
+    return app
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Serve responsive image variants resized on demand")
+    parser.add_argument('--root', action='append', required=True,
+                        help="Directory source images are served from (repeatable; first match wins)")
+    parser.add_argument('--settings', default=DEFAULT_SETTINGS, help="Resize settings YAML (encoder options)")
+    parser.add_argument('--cache-dir', default='data/images/variants', help="Disk cache of rendered variants")
+    parser.add_argument('--cache-mb', type=int, default=1024, help="Disk cache size limit in MiB")
+    parser.add_argument('--memory-mb', type=int, default=64, help="In-memory cache size limit in MiB")
+    parser.add_argument('--widths', type=int, nargs='+', default=list(DEFAULT_WIDTHS),
+                        help="Widths requests are rounded up to")
+    parser.add_argument('--workers', type=int, help="Render threads (default: CPU count)")
+    parser.add_argument('--max-age', type=int, default=DEFAULT_MAX_AGE,
+                        help="Cache-Control max-age for unversioned URLs, in seconds")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main function to run the image server."""
+    args = parse_args(argv)
+    try:
+        require_aiohttp()
+        missing = [root for root in args.root if not os.path.isdir(root)]
+        if missing:
+            print(f"❌ Error: Image root not found: {', '.join(missing)}")
+            sys.exit(1)
+        cache = VariantCache(args.cache_dir, args.cache_mb * 1024 * 1024, args.memory_mb * 1024 * 1024)
+        server = ImageServer(
+            args.root,
+            load_settings(args.settings),
+            cache,
+            widths=args.widths,
+            workers=args.workers,
+            max_age=args.max_age,
+        )
+    except (RuntimeError, ValueError, OSError) as e:
+        print(f"❌ Error starting image server: {str(e)}")
+        sys.exit(1)
+
+    stats = cache.stats()
+    print(f"🖼️  Serving {', '.join(server.roots)} on http://{args.host}:{args.port}/images/")
+    print(f"📦 Cache: {stats['disk_entries']} variant(s), {stats['disk_bytes'] / 1024 / 1024:.1f} MiB in {args.cache_dir}")
+    started = time.perf_counter()
+    web.run_app(create_app(server), host=args.host, port=args.port, print=None)
+    print(f"⏱️  Stopped after {time.perf_counter() - started:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
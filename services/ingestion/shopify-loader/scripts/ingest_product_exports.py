@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Convert many Shopify products CSV exports to NDJSON in parallel.
+
+Each input is scanned once in binary to find record boundaries (quote parity
+keeps multi-line ``Body (HTML)`` cells intact). It is then cut into shards
+that start on a new Handle, so no product is ever split between workers.
+Shards are converted by a process pool with the index-based
+``ProductColumnPlan`` and ``csv.reader``, and the shard outputs are merged
+in input order: files in the order given (globs sorted), and export order
+within a file. The same inputs therefore always produce the same output.
+
+With ``--parquet-dir`` every worker also writes its shard as Parquet parts of
+the normalized tables (see ``products_columnar``), partitioned by export.
+
+Usage:
+    python scripts/ingest_product_exports.py 'data/raw_manual/products_export_*.csv' \\
+        --output data/products.ndjson --workers 8
+"""
+
+import argparse
+import contextlib
+import csv
+import glob
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from convert_products_csv_to_json import ProductColumnPlan, group_products
+from products_columnar import (
+    ProductTableWriter,
+    partition_files,
+    require_pyarrow,
+    reset_partitions,
+    source_name,
+)
+from raw_archive import add_archive_arguments, open_archive
+
+DEFAULT_SHARD_MB = 8.0
+
+
+@dataclass(frozen=True)
+class ShardTask:
+    """A byte range of one export that starts and ends on product boundaries."""
+
+    path: str
+    header: List[str]
+    start: int
+    end: int
+    rows: int
+    output_path: str
+    parquet_dir: Optional[str] = None
+    source: str = ''
+    part: str = ''
+
+
+@dataclass
+class ShardResult:
+    """What one shard produced; ``handles`` lists its products in output order."""
+
+    products: int = 0
+    variants: int = 0
+    images: int = 0
+    handles: List[str] = field(default_factory=list)
+
+
+@dataclass
+class FileScan:
+    """Header and shard layout of one export."""
+
+    path: str
+    header: List[str]
+    size: int
+    rows: int = 0
+    shards: List[Tuple[int, int, int]] = field(default_factory=list)
+
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """Expand globs (sorted per pattern) and drop repeats, keeping first occurrence."""
+    paths: List[str] = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def _iter_records(lines: Iterator[bytes], offset: int) -> Iterator[Tuple[int, bytes]]:
+    """Yield (byte offset, raw bytes) for each CSV record.
+
+    A physical line ends a record only when the quotes seen so far balance;
+    escaped quotes (``""``) leave the parity unchanged.
+    """
+    parts: List[bytes] = []
+    start = offset
+    in_quotes = False
+    for line in lines:
+        if not parts:
+            start = offset
+        parts.append(line)
+        offset += len(line)
+        if line.count(b'"') % 2:
+            in_quotes = not in_quotes
+        if not in_quotes:
+            yield start, b''.join(parts)
+            parts = []
+    if parts:
+        yield start, b''.join(parts)
+
+
+def _parse_record(record: bytes) -> List[str]:
+    return next(csv.reader(io.StringIO(record.decode('utf-8'), newline='')), [])
+
+
+def scan_export(path: str, shard_bytes: int) -> FileScan:
+    """Find the header and product-aligned shard boundaries of one export.
+
+    Raises ``ValueError`` if a handle's rows are not contiguous, since the
+    shards could then split one product between workers.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as export:
+        records = _iter_records(iter(export), 0)
+        first = next(records, None)
+        if first is None:
+            return FileScan(path, [], size)
+        header_record = first[1]
+        if header_record.startswith(b'\xef\xbb\xbf'):
+            header_record = header_record[3:]
+        header = _parse_record(header_record)
+        scan = FileScan(path, header, size)
+
+        handle_index = ProductColumnPlan(header).handle_index
+        shard_start = len(first[1])
+        shard_rows = 0
+        previous = ''
+        finished = set()
+
+        for start, record in records:
+            if handle_index == 0 and not record.startswith(b'"'):
+                handle = record.split(b',', 1)[0].decode('utf-8').strip()
+            else:
+                values = _parse_record(record)
+                handle = values[handle_index].strip() if handle_index < len(values) else ''
+
+            if handle and handle != previous:
+                if previous:
+                    finished.add(previous)
+                if handle in finished:
+                    raise ValueError(
+                        f"{path}: rows for handle '{handle}' are not contiguous "
+                        f"(byte {start}); convert this file with --format json"
+                    )
+                if shard_rows and start - shard_start >= shard_bytes:
+                    scan.shards.append((shard_start, start, shard_rows))
+                    shard_start, shard_rows = start, 0
+                previous = handle
+
+            shard_rows += 1
+            scan.rows += 1
+
+        if shard_rows:
+            scan.shards.append((shard_start, size, shard_rows))
+    return scan
+
+
+def convert_shard(task: ShardTask) -> ShardResult:
+    """Convert one shard to an NDJSON file (runs in a worker process)."""
+    with open(task.path, 'rb') as export:
+        export.seek(task.start)
+        text = export.read(task.end - task.start).decode('utf-8')
+
+    plan = ProductColumnPlan(task.header)
+    result = ShardResult()
+    products = group_products(csv.reader(io.StringIO(text, newline='')), plan)
+    with contextlib.ExitStack() as stack:
+        if task.parquet_dir:
+            tables = stack.enter_context(
+                ProductTableWriter(task.parquet_dir, task.source, part=task.part)
+            )
+            products = tables.write_all(products)
+        output = stack.enter_context(open(task.output_path, 'w', encoding='utf-8'))
+        for product in products:
+            output.write(json.dumps(product, ensure_ascii=False))
+            output.write('\n')
+            result.products += 1
+            result.variants += len(product['variants'])
+            result.images += len(product['images'])
+            result.handles.append(product['handle'])
+    return result
+
+
+class _InlineExecutor(Executor):
+    """Runs tasks in the calling process; used for ``--workers 1``."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+
+def _merge(
+    shards: List[Tuple[int, ShardTask, ShardResult]],
+    output_path: str,
+    output_format: str,
+    keep: str,
+    metadata: Dict[str, Any],
+) -> None:
+    # With ``keep=last`` a handle is written only from the last input file
+    # that contains it; shard handle lists make that decidable without
+    # decoding any JSON.
+    last_file: Dict[str, int] = {}
+    if keep == 'last':
+        for file_index, _task, result in shards:
+            for handle in result.handles:
+                last_file[handle] = file_index
+        for key in ('total_products', 'total_variants', 'total_images'):
+            metadata[key] = 0
+
+    temp_path = f"{output_path}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as output:
+            if output_format == 'json-stream':
+                output.write('{"products": [\n')
+            written = 0
+            for file_index, task, result in shards:
+                if keep == 'all' and output_format == 'ndjson':
+                    with open(task.output_path, 'r', encoding='utf-8') as shard:
+                        shutil.copyfileobj(shard, output)
+                    written += result.products
+                    continue
+                with open(task.output_path, 'r', encoding='utf-8') as shard:
+                    for line, handle in zip(shard, result.handles):
+                        if keep == 'last':
+                            if last_file[handle] != file_index:
+                                continue
+                            product = json.loads(line)
+                            metadata['total_products'] += 1
+                            metadata['total_variants'] += len(product['variants'])
+                            metadata['total_images'] += len(product['images'])
+                        if output_format == 'json-stream':
+                            if written:
+                                output.write(',\n')
+                            output.write(line.rstrip('\n'))
+                        else:
+                            output.write(line)
+                        written += 1
+            if output_format == 'json-stream':
+                output.write('\n],\n"metadata": ')
+                output.write(json.dumps(metadata, ensure_ascii=False))
+                output.write('}\n')
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def ingest_exports(
+    inputs: List[str],
+    output_path: str,
+    *,
+    workers: Optional[int] = None,
+    shard_bytes: int = int(DEFAULT_SHARD_MB * 1024 * 1024),
+    output_format: str = 'ndjson',
+    keep: str = 'all',
+    parquet_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Convert ``inputs`` into one merged output and return the run's metadata."""
+    if output_format not in ('ndjson', 'json-stream'):
+        raise ValueError(f"Unsupported output format: {output_format}")
+    if keep not in ('all', 'last'):
+        raise ValueError(f"Unsupported keep policy: {keep}")
+    if parquet_dir:
+        require_pyarrow()
+        # Reset every partition up front: two inputs may share a file stem.
+        for source in {source_name(path) for path in inputs}:
+            reset_partitions(parquet_dir, source)
+
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    metadata: Dict[str, Any] = {
+        'conversion_date': datetime.now().isoformat(),
+        'source_files': [os.path.basename(path) for path in inputs],
+        'total_rows': 0,
+        'total_products': 0,
+        'total_variants': 0,
+        'total_images': 0,
+    }
+    total_bytes = 0
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    shard_dir = tempfile.mkdtemp(prefix='.ingest-', dir=os.path.dirname(output_path) or '.')
+    executor: Executor = (
+        ProcessPoolExecutor(max_workers=workers) if workers > 1 else _InlineExecutor()
+    )
+    try:
+        pending: List[Tuple[int, ShardTask, Future]] = []
+        with executor:
+            # Scanning file N overlaps with workers converting earlier shards.
+            for file_index, path in enumerate(inputs):
+                scan = scan_export(path, shard_bytes)
+                total_bytes += scan.size
+                metadata['total_rows'] += scan.rows
+                for shard_index, (start, end, rows) in enumerate(scan.shards):
+                    task = ShardTask(
+                        path=path,
+                        header=scan.header,
+                        start=start,
+                        end=end,
+                        rows=rows,
+                        output_path=os.path.join(
+                            shard_dir, f"{file_index:05d}-{shard_index:05d}.ndjson"
+                        ),
+                        parquet_dir=parquet_dir,
+                        source=source_name(path),
+                        part=f"part-{file_index:05d}-{shard_index:05d}",
+                    )
+                    pending.append((file_index, task, executor.submit(convert_shard, task)))
+
+            shards = []
+            for file_index, task, future in pending:
+                result = future.result()
+                metadata['total_products'] += result.products
+                metadata['total_variants'] += result.variants
+                metadata['total_images'] += result.images
+                shards.append((file_index, task, result))
+
+        _merge(shards, output_path, output_format, keep, metadata)
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - started
+    metadata['elapsed_seconds'] = round(elapsed, 3)
+    metadata['rows_per_second'] = round(metadata['total_rows'] / elapsed) if elapsed else 0
+    metadata['megabytes_per_second'] = (
+        round(total_bytes / 1024 / 1024 / elapsed, 1) if elapsed else 0.0
+    )
+    metadata['shards'] = len(shards)
+    metadata['workers'] = workers
+    return metadata
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help="Export files or glob patterns")
+    parser.add_argument('--output', default="data/products.ndjson", help="Merged output path")
+    parser.add_argument(
+        '--format',
+        choices=('ndjson', 'json-stream'),
+        default='ndjson',
+        help="ndjson (one product per line) or a streamed {products, metadata} document",
+    )
+    parser.add_argument(
+        '--keep',
+        choices=('all', 'last'),
+        default='all',
+        help="all: keep every file's products; last: keep a handle only from the last file it appears in",
+    )
+    parser.add_argument(
+        '--workers', type=int, default=None, help="Worker processes (default: CPU count)"
+    )
+    parser.add_argument(
+        '--shard-mb',
+        type=float,
+        default=DEFAULT_SHARD_MB,
+        help="Target shard size; shards always end on a product boundary",
+    )
+    parser.add_argument(
+        '--parquet-dir',
+        help="Also write products/variants/images/metafields Parquet tables under this directory",
+    )
+    add_archive_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main function to run the ingest."""
+    args = parse_args(argv)
+    inputs = expand_inputs(args.inputs)
+    missing = [path for path in inputs if not os.path.exists(path)]
+    if not inputs or missing:
+        print(f"❌ Error: Input file not found: {', '.join(missing) or ' '.join(args.inputs)}")
+        sys.exit(1)
+
+    # Shard size and worker count do not change the output, so they are not part of it.
+    archive = open_archive(args, os.path.dirname(args.output))
+    params = {
+        'format': args.format,
+        'keep': args.keep,
+        'parquet_dir': os.path.abspath(args.parquet_dir) if args.parquet_dir else None,
+    }
+    try:
+        if archive is not None:
+            blobs = [archive.put_file(path) for path in inputs]
+            if not args.force and archive.is_fresh(args.output, 'ingest_products', blobs, params):
+                print(f"⏭️  {args.output} is up to date with its {len(inputs)} export(s); nothing to do")
+                return
+
+        metadata = ingest_exports(
+            inputs,
+            args.output,
+            workers=args.workers,
+            shard_bytes=int(args.shard_mb * 1024 * 1024),
+            output_format=args.format,
+            keep=args.keep,
+            parquet_dir=args.parquet_dir,
+        )
+
+        if archive is not None:
+            outputs = [args.output]
+            if args.parquet_dir:
+                outputs.extend(partition_files(args.parquet_dir, sorted({source_name(path) for path in inputs})))
+            archive.record_run(args.output, 'ingest_products', blobs, outputs, params)
+    except Exception as e:
+        print(f"❌ Error during ingest: {str(e)}")
+        sys.exit(1)
+    finally:
+        if archive is not None:
+            archive.close()
+
+    print(f"✅ Ingested {len(inputs)} export(s) into {args.output}")
+    print(f"📊 Summary:")
+    print(f"   - Rows: {metadata['total_rows']}")
+    print(f"   - Products: {metadata['total_products']}")
+    print(f"   - Total variants: {metadata['total_variants']}")
+    print(f"   - Total images: {metadata['total_images']}")
+    print(f"⏱️  {metadata['elapsed_seconds']}s with {metadata['workers']} worker(s), "
+          f"{metadata['shards']} shard(s): {metadata['rows_per_second']:,} rows/s, "
+          f"{metadata['megabytes_per_second']} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Normalized Parquet tables for the products layer of the data lake.
+
+Converted products are split into four tables that share ``handle`` as their
+join key:
+
+- ``products``: one row per product, nested groups flattened into columns
+  (``google_shopping_custom_labels_label_0``, ``reviews_review_1_text``, ...)
+- ``variants``: one row per variant, with ``variant_index`` for its order
+- ``images``: one row per image, with ``image_index`` for its order
+- ``metafields``: one row per ``namespace`` / ``key`` / ``value``
+
+Each table is Hive-partitioned by the export it came from::
+
+    <root>/<table>/source=<export file stem>/part-*.parquet
+
+Low-cardinality text columns use Arrow dictionary types, so they stay
+dictionary-encoded both in Parquet and in memory after reading back. Column
+layouts are derived from the converter's ``PRODUCT_SPEC``/``VARIANT_SPEC``/
+``IMAGE_SPEC``, which keeps the JSON and columnar layers in step.
+
+Requires ``pyarrow``.
+"""
+
+import os
+import re
+import shutil
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from convert_products_csv_to_json import IMAGE_SPEC, PRODUCT_SPEC, VARIANT_SPEC
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - exercised only without pyarrow
+    pa = None
+    pq = None
+
+TABLES = ('products', 'variants', 'images', 'metafields')
+
+# Products buffered before a Parquet row group is written.
+DEFAULT_ROW_GROUP_PRODUCTS = 10_000
+
+DICTIONARY_COLUMNS = {
+    'vendor',
+    'product_category',
+    'type',
+    'status',
+    'google_shopping_product_category',
+    'google_shopping_gender',
+    'google_shopping_age_group',
+    'google_shopping_condition',
+    'google_shopping_custom_product',
+    *(f'google_shopping_custom_labels_label_{n}' for n in range(5)),
+    'inventory_tracker',
+    'inventory_policy',
+    'fulfillment_service',
+    'weight_unit',
+    'tax_code',
+    *(f'options_option{n}_{part}' for n in range(1, 4) for part in ('name', 'value', 'linked_to')),
+    'namespace',
+    'key',
+}
+
+# (path into the nested product, column name, spec kind) for every leaf.
+Leaf = Tuple[Tuple[str, ...], str, str]
+
+
+def require_pyarrow() -> None:
+    """Raise a helpful error when pyarrow is not installed."""
+    if pa is None:
+        raise RuntimeError("Parquet output requires pyarrow: pip install pyarrow")
+
+
+def _leaves(spec: Dict[str, Any], prefix: Tuple[str, ...] = ()) -> List[Leaf]:
+    leaves = []
+    for key, node in spec.items():
+        path = prefix + (key,)
+        if isinstance(node, dict):
+            leaves.extend(_leaves(node, path))
+        elif isinstance(node, tuple):
+            leaves.append((path, '_'.join(path), node[1]))
+    return leaves
+
+
+PRODUCT_LEAVES = _leaves(PRODUCT_SPEC)
+VARIANT_LEAVES = _leaves(VARIANT_SPEC)
+IMAGE_LEAVES = _leaves(IMAGE_SPEC)
+
+
+def _arrow_type(name: str, kind: str):
+    if kind == 'bool':
+        return pa.bool_()
+    if kind == 'number':
+        return pa.float64()
+    if kind == 'tags':
+        return pa.list_(pa.string())
+    if name in DICTIONARY_COLUMNS or name == 'handle':
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
+
+
+def table_schemas() -> Dict[str, Any]:
+    """Return the Arrow schema of every table (without the ``source`` partition column)."""
+    require_pyarrow()
+    handle = pa.field('handle', pa.dictionary(pa.int32(), pa.string()))
+    return {
+        # Handles are unique per product, so they are plain strings there.
+        'products': pa.schema(
+            [pa.field('handle', pa.string())]
+            + [pa.field(name, _arrow_type(name, kind)) for _, name, kind in PRODUCT_LEAVES[1:]]
+        ),
+        'variants': pa.schema(
+            [handle, pa.field('variant_index', pa.int32())]
+            + [pa.field(name, _arrow_type(name, kind)) for _, name, kind in VARIANT_LEAVES]
+        ),
+        'images': pa.schema(
+            [handle, pa.field('image_index', pa.int32())]
+            + [pa.field(name, _arrow_type(name, kind)) for _, name, kind in IMAGE_LEAVES]
+        ),
+        'metafields': pa.schema(
+            [
+                handle,
+                pa.field('namespace', pa.dictionary(pa.int32(), pa.string())),
+                pa.field('key', pa.dictionary(pa.int32(), pa.string())),
+                pa.field('value', pa.string()),
+            ]
+        ),
+    }
+
+
+def _getter(path: Tuple[str, ...]):
+    """Return a function reading ``path`` from a nested dict."""
+    if len(path) == 1:
+        (key,) = path
+        return lambda node: node[key]
+
+    def get(node: Dict[str, Any]) -> Any:
+        for key in path:
+            node = node[key]
+        return node
+
+    return get
+
+
+def source_name(path: str) -> str:
+    """Partition value for an export: its file stem, restricted to safe characters."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r'[^A-Za-z0-9._-]', '_', stem) or 'unknown'
+
+
+def partition_dir(root: str, table: str, source: str) -> str:
+    """Directory holding one table's files for one export."""
+    return os.path.join(root, table, f"source={source}")
+
+
+def partition_files(root: str, sources: Iterable[str]) -> List[str]:
+    """Parquet files currently stored for the given exports."""
+    files = []
+    for source in sources:
+        for table in TABLES:
+            directory = partition_dir(root, table, source)
+            if os.path.isdir(directory):
+                files.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory)))
+    return files
+
+
+def reset_partitions(root: str, source: str) -> None:
+    """Remove an export's existing partitions so a re-run replaces them."""
+    for table in TABLES:
+        shutil.rmtree(partition_dir(root, table, source), ignore_errors=True)
+
+
+class ProductTableWriter:
+    """Split products into the normalized tables and write them as Parquet.
+
+    Products are buffered column-wise and flushed as one row group every
+    ``row_group_products`` products, so memory stays bounded while streaming.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        source: str,
+        *,
+        part: str = 'part-00000',
+        row_group_products: int = DEFAULT_ROW_GROUP_PRODUCTS,
+        compression: str = 'zstd',
+    ):
+        require_pyarrow()
+        self.root = root
+        self.source = source
+        self.part = part
+        self.row_group_products = row_group_products
+        self.compression = compression
+        self.schemas = table_schemas()
+        self.rows = {table: 0 for table in TABLES}
+        self._getters = {
+            'products': [(name, _getter(path)) for path, name, _ in PRODUCT_LEAVES],
+            'variants': [(name, _getter(path)) for path, name, _ in VARIANT_LEAVES],
+            'images': [(name, _getter(path)) for path, name, _ in IMAGE_LEAVES],
+        }
+        self._buffers = {table: self._empty_buffer(table) for table in TABLES}
+        self._writers: Dict[str, Any] = {}
+        self._pending = 0
+
+    def _empty_buffer(self, table: str) -> Dict[str, List[Any]]:
+        return {name: [] for name in self.schemas[table].names}
+
+    def write(self, product: Dict[str, Any]) -> None:
+        """Add one converted product."""
+        handle = product['handle']
+
+        columns = self._buffers['products']
+        for name, get in self._getters['products']:
+            columns[name].append(get(product))
+
+        for table, index_column in (('variants', 'variant_index'), ('images', 'image_index')):
+            columns = self._buffers[table]
+            getters = self._getters[table]
+            for index, child in enumerate(product[table]):
+                columns['handle'].append(handle)
+                columns[index_column].append(index)
+                for name, get in getters:
+                    columns[name].append(get(child))
+
+        columns = self._buffers['metafields']
+        for namespace, fields in product['metafields'].items():
+            for key, value in fields.items():
+                columns['handle'].append(handle)
+                columns['namespace'].append(namespace)
+                columns['key'].append(key)
+                columns['value'].append(value)
+
+        self._pending += 1
+        if self._pending >= self.row_group_products:
+            self.flush()
+
+    def write_all(self, products: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Write products while passing them through, for teeing a stream."""
+        for product in products:
+            self.write(product)
+            yield product
+
+    def _writer(self, table: str):
+        writer = self._writers.get(table)
+        if writer is None:
+            directory = partition_dir(self.root, table, self.source)
+            os.makedirs(directory, exist_ok=True)
+            writer = self._writers[table] = pq.ParquetWriter(
+                os.path.join(directory, f"{self.part}.parquet"),
+                self.schemas[table],
+                compression=self.compression,
+                use_dictionary=True,
+            )
+        return writer
+
+    def flush(self) -> None:
+        """Write buffered rows as one row group per table."""
+        for table in TABLES:
+            buffer = self._buffers[table]
+            count = len(next(iter(buffer.values())))
+            if not count:
+                continue
+            batch = pa.RecordBatch.from_pydict(buffer, schema=self.schemas[table])
+            self._writer(table).write_batch(batch)
+            self.rows[table] += count
+            self._buffers[table] = self._empty_buffer(table)
+        self._pending = 0
+
+    def close(self) -> Dict[str, int]:
+        """Flush, close every file and return the rows written per table.
+
+        Tables that received no rows still get an empty file, so every
+        partition carries the full schema.
+        """
+        self.flush()
+        for table in TABLES:
+            self._writer(table).close()
+        self._writers.clear()
+        return dict(self.rows)
+
+    def abort(self) -> None:
+        """Close open files without writing buffered rows."""
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    def __enter__(self) -> 'ProductTableWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_product_tables(
+    products: Iterable[Dict[str, Any]],
+    root: str,
+    source: str,
+    **options: Any,
+) -> Dict[str, int]:
+    """Replace ``source``'s partitions with ``products`` and return row counts."""
+    reset_partitions(root, source)
+    with ProductTableWriter(root, source, **options) as writer:
+        for product in products:
+            writer.write(product)
+    return dict(writer.rows)
+
+
+def has_product_tables(root: str) -> bool:
+    """Whether ``root`` holds a products table."""
+    return os.path.isdir(os.path.join(root, 'products'))
+
+
+def read_product_tables(
+    root: str,
+    tables: Iterable[str] = TABLES,
+    columns: Optional[Dict[str, List[str]]] = None,
+) -> Dict[str, Any]:
+    """Read tables back as Arrow tables, memory-mapping the Parquet files.
+
+    ``columns`` optionally restricts each table to the named columns, so an
+    analysis that needs only prices never decodes descriptions.
+    """
+    require_pyarrow()
+    columns = columns or {}
+    return {
+        table: pq.read_table(
+            os.path.join(root, table),
+            columns=columns.get(table),
+            memory_map=True,
+            partitioning='hive',
+        )
+        for table in tables
+    }
+
+
+def _nest(row: Dict[str, Any], leaves: List[Leaf]) -> Dict[str, Any]:
+    nested: Dict[str, Any] = {}
+    for path, name, _kind in leaves:
+        node = nested
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = row[name]
+    return nested
+
+
+def products_from_tables(tables: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Rebuild JSON-shaped products (as the converter emits them) from the tables."""
+    children: Dict[Tuple[str, str], Dict[str, list]] = defaultdict(
+        lambda: {'variants': [], 'images': [], 'metafields': []}
+    )
+    for row in tables['variants'].to_pylist():
+        children[(row['source'], row['handle'])]['variants'].append(row)
+    for row in tables['images'].to_pylist():
+        children[(row['source'], row['handle'])]['images'].append(row)
+    for row in tables['metafields'].to_pylist():
+        children[(row['source'], row['handle'])]['metafields'].append(row)
+
+    products = []
+    for row in tables['products'].to_pylist():
+        related = children.get((row['source'], row['handle']), {})
+        nested = _nest(row, PRODUCT_LEAVES)
+        product: Dict[str, Any] = {}
+        for key, node in PRODUCT_SPEC.items():
+            if key in ('variants', 'images'):
+                rows = sorted(related.get(key, []), key=lambda r: r[f'{key[:-1]}_index'])
+                leaves = VARIANT_LEAVES if key == 'variants' else IMAGE_LEAVES
+                product[key] = [_nest(child, leaves) for child in rows]
+            elif key == 'metafields':
+                metafields: Dict[str, Dict[str, str]] = {}
+                for entry in related.get('metafields', []):
+                    metafields.setdefault(entry['namespace'], {})[entry['key']] = entry['value']
+                product[key] = metafields
+            else:
+                product[key] = nested[key]
+        products.append(product)
+    return products
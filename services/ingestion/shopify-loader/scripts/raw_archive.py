@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+Content-addressed archive for the raw layer.
+
+Raw exports and API pages are stored as *blobs*. A blob is split into
+content-defined chunks: a chunk ends after a line whose CRC-32 matches
+``BOUNDARY_MASK`` (within ``MIN_CHUNK``..``MAX_CHUNK`` bytes), so an edit to
+one part of an export changes only the chunks around it. Every chunk is
+zstd-compressed once under its BLAKE2b hash::
+
+    <root>/objects/<first 2 hex digits>/<remaining 62 digits>
+    <root>/manifest.sqlite3
+
+The manifest lists each blob's chunks, the paths a blob was archived from
+(the raw files themselves are overwritten in place, the archive keeps every
+version), and lineage: which input blobs and parameters produced each
+processed artifact. ``is_fresh`` uses lineage to skip a step whose inputs,
+parameters and outputs are unchanged, so identical re-runs do no work and
+storage grows with the amount of change, not the number of runs.
+
+Requires ``zstandard``.
+
+Usage:
+    python scripts/raw_archive.py put data/raw_manual/*.csv
+    python scripts/raw_archive.py lineage data/products.json
+    python scripts/raw_archive.py stats
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import zlib
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sync_state import utc_now
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - exercised only without zstandard
+    zstandard = None
+
+DEFAULT_ROOT = "data/archive"
+DEFAULT_LEVEL = 9
+
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 1024 * 1024
+# One line in 256, on average, closes a chunk once MIN_CHUNK is reached.
+BOUNDARY_MASK = 0xFF
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS blob_chunks (
+    blob TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    chunk TEXT NOT NULL,
+    PRIMARY KEY (blob, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    archived_at TEXT NOT NULL,
+    UNIQUE (path, blob)
+);
+CREATE TABLE IF NOT EXISTS runs (
+    target TEXT PRIMARY KEY,
+    step TEXT NOT NULL,
+    params TEXT NOT NULL,
+    finished_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_inputs (
+    target TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    blob TEXT NOT NULL,
+    PRIMARY KEY (target, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS run_outputs (
+    target TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (target, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS run_outputs_path ON run_outputs (path);
+"""
+
+
+def require_zstandard() -> None:
+    """Raise a helpful error when zstandard is not installed."""
+    if zstandard is None:
+        raise RuntimeError("The raw archive requires zstandard: pip install zstandard")
+
+
+def _hasher():
+    return hashlib.blake2b(digest_size=32)
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """BLAKE2b hash of a file's content, as used for blobs."""
+    digest = _hasher()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_chunks(
+    stream: BinaryIO,
+    min_size: int = MIN_CHUNK,
+    max_size: int = MAX_CHUNK,
+    mask: int = BOUNDARY_MASK,
+) -> Iterator[bytes]:
+    """Split a binary stream into content-defined chunks at line boundaries."""
+    parts: List[bytes] = []
+    size = 0
+    while True:
+        line = stream.readline(max_size)
+        if not line:
+            break
+        parts.append(line)
+        size += len(line)
+        if size >= max_size or (size >= min_size and zlib.crc32(line) & mask == 0):
+            yield b''.join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b''.join(parts)
+
+
+def params_key(params: Optional[Dict[str, Any]]) -> str:
+    """Canonical JSON of a step's parameters."""
+    return json.dumps(params or {}, sort_keys=True, separators=(',', ':'))
+
+
+class RawArchive:
+    """Chunked, deduplicated blob store with a SQLite manifest."""
+
+    def __init__(self, root: str = DEFAULT_ROOT, *, level: int = DEFAULT_LEVEL):
+        require_zstandard()
+        self.root = root
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(root, 'manifest.sqlite3'))
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> 'RawArchive':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, 'objects', digest[:2], digest[2:])
+
+    def _store_chunk(self, digest: str, data: bytes) -> bool:
+        """Compress and write a chunk unless it is already stored."""
+        if self.connection.execute('SELECT 1 FROM chunks WHERE hash = ?', (digest,)).fetchone():
+            return False
+        path = self._object_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = self._compressor.compress(data)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(temp_path, path)
+        self.connection.execute(
+            'INSERT INTO chunks (hash, size, stored_size) VALUES (?, ?, ?)',
+            (digest, len(data), len(compressed)),
+        )
+        return True
+
+    def has_blob(self, blob: str) -> bool:
+        return self.connection.execute('SELECT 1 FROM blobs WHERE hash = ?', (blob,)).fetchone() is not None
+
+    def put_stream(self, stream: BinaryIO) -> str:
+        """Archive a binary stream and return its blob hash."""
+        digest = _hasher()
+        size = 0
+        chunk_ids: List[str] = []
+        with self.connection:
+            for chunk in iter_chunks(stream):
+                chunk_id = _hasher()
+                chunk_id.update(chunk)
+                chunk_ids.append(chunk_id.hexdigest())
+                self._store_chunk(chunk_ids[-1], chunk)
+                digest.update(chunk)
+                size += len(chunk)
+            blob = digest.hexdigest()
+            if not self.has_blob(blob):
+                self.connection.execute(
+                    'INSERT INTO blobs (hash, size, chunk_count, created_at) VALUES (?, ?, ?, ?)',
+                    (blob, size, len(chunk_ids), utc_now()),
+                )
+                self.connection.executemany(
+                    'INSERT INTO blob_chunks (blob, seq, chunk) VALUES (?, ?, ?)',
+                    [(blob, seq, chunk) for seq, chunk in enumerate(chunk_ids)],
+                )
+        return blob
+
+    def put_bytes(self, data: bytes) -> str:
+        """Archive an in-memory payload, such as an API page."""
+        blob = _hasher()
+        blob.update(data)
+        if self.has_blob(blob.hexdigest()):
+            return blob.hexdigest()
+        return self.put_stream(io.BytesIO(data))
+
+    def put_file(self, path: str) -> str:
+        """Archive a raw file and return its blob hash.
+
+        A file whose size and modification time match its last archived
+        version is not read again.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.connection.execute(
+            'SELECT blob, size, mtime_ns FROM sources WHERE path = ? ORDER BY rowid DESC LIMIT 1',
+            (path,),
+        ).fetchone()
+        if row and row[1:] == (stat.st_size, stat.st_mtime_ns) and self.has_blob(row[0]):
+            return row[0]
+
+        with open(path, 'rb') as f:
+            blob = self.put_stream(f)
+        with self.connection:
+            # Replacing moves the row to the end, so the newest version is found first.
+            self.connection.execute(
+                'INSERT OR REPLACE INTO sources (path, blob, size, mtime_ns, archived_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (path, blob, stat.st_size, stat.st_mtime_ns, utc_now()),
+            )
+        return blob
+
+    def iter_blob(self, blob: str) -> Iterator[bytes]:
+        """Yield a blob's content chunk by chunk."""
+        if not self.has_blob(blob):
+            raise KeyError(f"Unknown blob: {blob}")
+        for (chunk,) in self.connection.execute(
+            'SELECT chunk FROM blob_chunks WHERE blob = ? ORDER BY seq', (blob,)
+        ).fetchall():
+            with open(self._object_path(chunk), 'rb') as f:
+                yield self._decompressor.decompress(f.read())
+
+    def read_blob(self, blob: str) -> bytes:
+        return b''.join(self.iter_blob(blob))
+
+    def restore(self, blob: str, destination: str) -> None:
+        """Write a blob's content to ``destination``."""
+        temp_path = f"{destination}.tmp"
+        with open(temp_path, 'wb') as f:
+            for data in self.iter_blob(blob):
+                f.write(data)
+        os.replace(temp_path, destination)
+
+    def verify(self, blob: str) -> bool:
+        """Whether a blob's chunks are present and hash to the blob's id."""
+        digest = _hasher()
+        try:
+            for data in self.iter_blob(blob):
+                digest.update(data)
+        except (OSError, zstandard.ZstdError):
+            return False
+        return digest.hexdigest() == blob
+
+    def blob_paths(self, blob: str) -> List[str]:
+        """Paths a blob was archived from."""
+        return [
+            path
+            for (path,) in self.connection.execute(
+                'SELECT path FROM sources WHERE blob = ? ORDER BY rowid', (blob,)
+            )
+        ]
+
+    def is_fresh(
+        self,
+        target: str,
+        step: str,
+        inputs: Sequence[str],
+        params: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """Whether ``target`` was produced by ``step`` from exactly these inputs and params,
+        and every output it recorded is still on disk unchanged."""
+        target = os.path.abspath(target)
+        row = self.connection.execute(
+            'SELECT step, params FROM runs WHERE target = ?', (target,)
+        ).fetchone()
+        if row != (step, params_key(params)):
+            return False
+        recorded = [
+            blob
+            for (blob,) in self.connection.execute(
+                'SELECT blob FROM run_inputs WHERE target = ? ORDER BY seq', (target,)
+            )
+        ]
+        if recorded != list(inputs):
+            return False
+        outputs = self.connection.execute(
+            'SELECT path, size, mtime_ns, content_hash FROM run_outputs WHERE target = ?', (target,)
+        ).fetchall()
+        for path, size, mtime_ns, content_hash in outputs:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                return False
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns) and file_hash(path) != content_hash:
+                return False
+        return bool(outputs)
+
+    def record_run(
+        self,
+        target: str,
+        step: str,
+        inputs: Sequence[str],
+        outputs: Iterable[str],
+        params: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Record that ``step`` turned ``inputs`` into ``outputs`` (``target`` first among them)."""
+        target = os.path.abspath(target)
+        rows = []
+        for path in dict.fromkeys([target, *(os.path.abspath(path) for path in outputs)]):
+            stat = os.stat(path)
+            rows.append((target, path, stat.st_size, stat.st_mtime_ns, file_hash(path)))
+        with self.connection:
+            self.connection.execute('DELETE FROM run_inputs WHERE target = ?', (target,))
+            self.connection.execute('DELETE FROM run_outputs WHERE target = ?', (target,))
+            self.connection.execute(
+                'INSERT OR REPLACE INTO runs (target, step, params, finished_at) VALUES (?, ?, ?, ?)',
+                (target, step, params_key(params), utc_now()),
+            )
+            self.connection.executemany(
+                'INSERT INTO run_inputs (target, seq, blob) VALUES (?, ?, ?)',
+                [(target, seq, blob) for seq, blob in enumerate(inputs)],
+            )
+            self.connection.executemany(
+                'INSERT INTO run_outputs (target, path, size, mtime_ns, content_hash) '
+                'VALUES (?, ?, ?, ?, ?)',
+                rows,
+            )
+
+    def lineage(self, path: str) -> Optional[Dict[str, Any]]:
+        """Describe the run that produced ``path``: step, params and input blobs."""
+        path = os.path.abspath(path)
+        row = self.connection.execute(
+            'SELECT r.target, r.step, r.params, r.finished_at, o.content_hash '
+            'FROM run_outputs o JOIN runs r ON r.target = o.target WHERE o.path = ?',
+            (path,),
+        ).fetchone()
+        if row is None:
+            return None
+        target, step, params, finished_at, content_hash = row
+        blobs = [
+            blob
+            for (blob,) in self.connection.execute(
+                'SELECT blob FROM run_inputs WHERE target = ? ORDER BY seq', (target,)
+            )
+        ]
+        return {
+            'path': path,
+            'content_hash': content_hash,
+            'target': target,
+            'step': step,
+            'params': json.loads(params),
+            'finished_at': finished_at,
+            'inputs': [{'blob': blob, 'paths': self.blob_paths(blob)} for blob in blobs],
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """Logical versus stored size of the archive."""
+        blobs, logical = self.connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs'
+        ).fetchone()
+        chunks, unique, stored = self.connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM chunks'
+        ).fetchone()
+        return {
+            'blobs': blobs,
+            'chunks': chunks,
+            'logical_bytes': logical,
+            'unique_bytes': unique,
+            'stored_bytes': stored,
+        }
+
+
+def add_archive_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the archive options shared by the processing scripts."""
+    parser.add_argument(
+        '--archive',
+        help="Raw archive directory (default: archive/ next to the output)",
+    )
+    parser.add_argument('--no-archive', action='store_true', help="Neither archive inputs nor skip runs")
+    parser.add_argument('--force', action='store_true', help="Run even if the outputs are up to date")
+
+
+def open_archive(args: argparse.Namespace, output_dir: str) -> Optional[RawArchive]:
+    """Open the archive selected on the command line, or ``None``.
+
+    Without ``--archive`` the archive lives in ``archive/`` under ``output_dir``.
+    """
+    if args.no_archive:
+        return None
+    if zstandard is None:
+        print("⚠️  Raw archive disabled: pip install zstandard")
+        return None
+    return RawArchive(args.archive or os.path.join(output_dir or '.', 'archive'))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--root', default=DEFAULT_ROOT, help="Archive directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+    put = commands.add_parser('put', help="Archive raw files")
+    put.add_argument('paths', nargs='+')
+    cat = commands.add_parser('cat', help="Write a blob to stdout or a file")
+    cat.add_argument('blob')
+    cat.add_argument('--output')
+    lineage = commands.add_parser('lineage', help="Show which blobs produced an artifact")
+    lineage.add_argument('path')
+    verify = commands.add_parser('verify', help="Check blobs against their hashes")
+    verify.add_argument('blobs', nargs='*', help="Blobs to check (default: all)")
+    commands.add_parser('stats', help="Logical versus stored size")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main function for inspecting and filling the archive."""
+    args = parse_args(argv)
+    try:
+        archive = RawArchive(args.root)
+    except RuntimeError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    with archive:
+        if args.command == 'put':
+            for path in args.paths:
+                print(f"{archive.put_file(path)}  {path}")
+        elif args.command == 'cat':
+            if args.output:
+                archive.restore(args.blob, args.output)
+            else:
+                for data in archive.iter_blob(args.blob):
+                    sys.stdout.buffer.write(data)
+        elif args.command == 'lineage':
+            info = archive.lineage(args.path)
+            if info is None:
+                print(f"❌ No lineage recorded for {args.path}")
+                sys.exit(1)
+            print(json.dumps(info, indent=2))
+        elif args.command == 'verify':
+            blobs = args.blobs or [blob for (blob,) in archive.connection.execute('SELECT hash FROM blobs')]
+            bad = [blob for blob in blobs if not archive.verify(blob)]
+            for blob in bad:
+                print(f"❌ {blob}")
+            print(f"✅ {len(blobs) - len(bad)}/{len(blobs)} blobs intact")
+            if bad:
+                sys.exit(1)
+        else:
+            stats = archive.stats()
+            ratio = stats['logical_bytes'] / stats['stored_bytes'] if stats['stored_bytes'] else 0
+            print(f"📦 {stats['blobs']} blobs in {stats['chunks']} chunks")
+            print(f"   - Logical: {stats['logical_bytes']:,} bytes")
+            print(f"   - Unique: {stats['unique_bytes']:,} bytes")
+            print(f"   - Stored: {stats['stored_bytes']:,} bytes ({ratio:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,325 @@
-"""Resize product imagery prior to serving on web or ads surfaces.
+#!/usr/bin/env python3
+"""
+Resize product imagery prior to serving on web or ads surfaces.
+
+Every ``images[].src`` and ``variants[].variant_image`` of the converted
+catalog is processed against the profiles in ``config/resize_settings.yaml``.
+Each source image is downloaded (or read) and decoded once, and all of its
+profile x format outputs (AVIF/WebP/JPEG) come from that decode. Sources fan
+out over a process pool.
+
+Outputs are content-addressed (``utils.image_helpers.variant_path``)::
 
-Wire this script to read resize_settings.yaml and publish to your storage bucket.
+    <output-dir>/derived/<hash[:2]>/<source hash>/<profile>-<settings key>.<ext>
+    <output-dir>/originals/<url hash>            # downloaded sources
+    <output-dir>/manifest.json                   # src -> source hash and outputs
+
+A source whose manifest entry already points at every expected output is
+skipped without being downloaded or decoded; a changed profile or encoder
+setting only regenerates the outputs it affects.
+
+Usage:
+    python scripts/resize_images.py
+    python scripts/resize_images.py --catalog data/products.ndjson --workers 8 --profiles large small
 """
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+LOADER_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if LOADER_ROOT not in sys.path:
+    sys.path.insert(0, LOADER_ROOT)
+
+from utils.image_helpers import (  # noqa: E402
+    DEFAULT_SETTINGS,
+    Profile,
+    ResizeSettings,
+    load_settings,
+    render_variants,
+    require_pillow,
+    source_hash,
+    variant_path,
+)
+from validate_products_json import iter_json_document, iter_ndjson  # noqa: E402
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def catalog_sources(catalog_path: str) -> List[str]:
+    """Unique image sources of a converted catalog, in catalog order."""
+    sources: Dict[str, None] = {}
+    with open(catalog_path, 'r', encoding='utf-8') as f:
+        records = iter_ndjson(f) if catalog_path.endswith('.ndjson') else iter_json_document(f)
+        for kind, product in records:
+            if kind != 'product':
+                continue
+            for image in product.get('images', []):
+                if image.get('src'):
+                    sources[image['src']] = None
+            for variant in product.get('variants', []):
+                if variant.get('variant_image'):
+                    sources[variant['variant_image']] = None
+    return list(sources)
+
+
+def is_remote(src: str) -> bool:
+    return src.startswith(('http://', 'https://'))
+
+
+def source_stamp(src: str) -> Optional[List[int]]:
+    """Size and mtime of a local source, to notice it being replaced in place."""
+    if is_remote(src):
+        return None
+    stat = os.stat(src)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def fetch_source(src: str, output_dir: str, timeout: float = 30.0) -> bytes:
+    """Read a local source, or download a remote one once into ``originals/``.
+
+    Shopify CDN URLs change (``?v=...``) when an image is replaced, so a
+    download is cached by its URL.
+    """
+    if not is_remote(src):
+        with open(src, 'rb') as f:
+            return f.read()
+    cached = os.path.join(output_dir, 'originals', hashlib.blake2b(src.encode('utf-8'), digest_size=16).hexdigest())
+    if os.path.exists(cached):
+        with open(cached, 'rb') as f:
+            return f.read()
+    request = urllib.request.Request(src, headers={'User-Agent': 'minkowski-image-pipeline'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        data = response.read()
+    _write_atomic(cached, data)
+    return data
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def expected_outputs(
+    settings: ResizeSettings, profiles: List[Profile], src_hash: str, output_dir: str
+) -> Dict[str, Dict[str, str]]:
+    """Output path of every profile/format for a source, relative to ``output_dir``."""
+    return {
+        profile.name: {
+            fmt: os.path.relpath(
+                variant_path(output_dir, src_hash, profile, fmt, settings.variant_key(profile, fmt)),
+                output_dir,
+            )
+            for fmt in profile.formats
+        }
+        for profile in profiles
+    }
+
+
+def _all_exist(outputs: Dict[str, Dict[str, str]], output_dir: str) -> bool:
+    return all(
+        os.path.exists(os.path.join(output_dir, path))
+        for paths in outputs.values()
+        for path in paths.values()
+    )
+
+
+def process_image(
+    src: str,
+    *,
+    settings: ResizeSettings,
+    profiles: List[Profile],
+    output_dir: str,
+    force: bool = False,
+) -> Dict[str, Any]:
+    """Worker: produce every missing output of one source image."""
+    try:
+        stamp = source_stamp(src)
+        data = fetch_source(src, output_dir, settings.download_timeout)
+        src_hash = source_hash(data)
+        outputs = expected_outputs(settings, profiles, src_hash, output_dir)
+        missing = [
+            (profile, fmt)
+            for profile in profiles
+            for fmt in profile.formats
+            if force or not os.path.exists(os.path.join(output_dir, outputs[profile.name][fmt]))
+        ]
+        rendered = render_variants(data, settings, missing)
+        for (profile_name, fmt), encoded in rendered.items():
+            _write_atomic(os.path.join(output_dir, outputs[profile_name][fmt]), encoded)
+        return {
+            'src': src,
+            'source_hash': src_hash,
+            'stamp': stamp,
+            'outputs': outputs,
+            'rendered': len(rendered),
+            'bytes_in': len(data),
+            'bytes_out': sum(len(encoded) for encoded in rendered.values()),
+        }
+    except Exception as e:
+        return {'src': src, 'error': f"{type(e).__name__}: {e}"}
+
+
+def load_manifest(output_dir: str) -> Dict[str, Any]:
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir: str, manifest: Dict[str, Any]) -> None:
+    _write_atomic(
+        os.path.join(output_dir, MANIFEST_NAME),
+        json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'),
+    )
+
+
+def _up_to_date(
+    src: str,
+    entry: Optional[Dict[str, Any]],
+    settings: ResizeSettings,
+    profiles: List[Profile],
+    output_dir: str,
+) -> bool:
+    if not entry or 'source_hash' not in entry:
+        return False
+    try:
+        if entry.get('stamp') != source_stamp(src):
+            return False
+    except OSError:
+        return False
+    return _all_exist(expected_outputs(settings, profiles, entry['source_hash'], output_dir), output_dir)
+
+
+def process_images(
+    sources: Iterable[str],
+    settings: ResizeSettings,
+    profiles: List[Profile],
+    *,
+    output_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    force: bool = False,
+) -> Dict[str, Any]:
+    """Process ``sources`` into ``output_dir`` and return a run summary."""
+    require_pillow()
+    output_dir = output_dir or settings.output_dir
+    workers = workers or settings.workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    started = time.perf_counter()
+
+    sources = list(dict.fromkeys(sources))
+    todo = [
+        src
+        for src in sources
+        if force or not _up_to_date(src, manifest.get(src), settings, profiles, output_dir)
+    ]
+    summary: Dict[str, Any] = {
+        'sources': len(sources),
+        'skipped': len(sources) - len(todo),
+        'processed': 0,
+        'rendered': 0,
+        'failed': [],
+        'bytes_in': 0,
+        'bytes_out': 0,
+    }
+
+    worker = partial(process_image, settings=settings, profiles=profiles, output_dir=output_dir, force=force)
+    results: Iterator[Dict[str, Any]]
+    if workers > 1 and len(todo) > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(worker, todo, chunksize=max(1, min(16, len(todo) // (workers * 4))))
+    else:
+        executor = None
+        results = map(worker, todo)
+
+    try:
+        for result in results:
+            if 'error' in result:
+                summary['failed'].append(result)
+                continue
+            entry = manifest.setdefault(result['src'], {})
+            if entry.get('source_hash') != result['source_hash']:
+                entry['outputs'] = {}
+            entry['source_hash'] = result['source_hash']
+            entry['stamp'] = result['stamp']
+            entry.setdefault('outputs', {}).update(result['outputs'])
+            summary['processed'] += 1
+            summary['rendered'] += result['rendered']
+            summary['bytes_in'] += result['bytes_in']
+            summary['bytes_out'] += result['bytes_out']
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        save_manifest(output_dir, manifest)
+
+    summary['workers'] = workers
+    summary['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def parse_args(argv: Optional[List[str]] = None, description: Optional[str] = None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description=description or __doc__.strip().splitlines()[0])
+    parser.add_argument('--settings', default=DEFAULT_SETTINGS, help="Resize settings YAML")
+    parser.add_argument('--catalog', help="Converted catalog (default: from the settings file)")
+    parser.add_argument('--output-dir', help="Derived assets root (default: from the settings file)")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: settings, then CPU count)")
+    parser.add_argument('--profiles', nargs='+', help="Only these profiles")
+    parser.add_argument('--force', action='store_true', help="Re-render outputs that already exist")
+    return parser.parse_args(argv)
+
+
+def run(argv: Optional[List[str]] = None, *, thumbnails: Optional[bool] = None, description: Optional[str] = None):
+    """Shared entry point of ``resize_images.py`` and ``generate_thumbnails.py``."""
+    args = parse_args(argv, description)
+    try:
+        settings = load_settings(args.settings)
+        profiles = settings.select(args.profiles, thumbnails=thumbnails)
+        catalog = args.catalog or settings.catalog
+        if not os.path.exists(catalog):
+            print(f"❌ Error: Catalog not found: {catalog}")
+            sys.exit(1)
+        summary = process_images(
+            catalog_sources(catalog),
+            settings,
+            profiles,
+            output_dir=args.output_dir,
+            workers=args.workers,
+            force=args.force,
+        )
+    except (RuntimeError, ValueError, OSError) as e:
+        print(f"❌ Error during image processing: {str(e)}")
+        sys.exit(1)
+
+    print(f"✅ {summary['sources']} source image(s) for profiles: {', '.join(p.name for p in profiles)}")
+    print(f"📊 Summary:")
+    print(f"   - Processed: {summary['processed']} ({summary['rendered']} outputs)")
+    print(f"   - Up to date: {summary['skipped']}")
+    print(f"   - Failed: {len(summary['failed'])}")
+    print(f"⏱️  {summary['elapsed_seconds']}s with {summary['workers']} worker(s)")
+    for failure in summary['failed'][:10]:
+        print(f"   ⚠️  {failure['src']}: {failure['error']}")
+    if summary['failed']:
+        sys.exit(1)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None):
+    """Main function to run the resize pipeline."""
+    return run(argv)
+
+
+if __name__ == "__main__":
+    main()
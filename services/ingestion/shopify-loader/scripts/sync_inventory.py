@@ -1 +1,31 @@
-# Sync inventory from Shopify to datalake
\ No newline at end of file
+#!/usr/bin/env python3
+"""
+Sync inventory from Shopify to the data lake.
+
+Inventory levels have no id of their own, so records are keyed by
+``<inventory_item_id>:<location_id>``. Only levels updated since the last run
+are fetched; see ``incremental_sync``.
+"""
+
+from typing import Any, Dict, Iterator
+
+from incremental_sync import EntitySpec, run_cli
+
+def transform_inventory_level(level: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Map an API inventory level to the processed inventory layout."""
+    yield {
+        'id': f"{level['inventory_item_id']}:{level['location_id']}",
+        'inventory_item_id': level['inventory_item_id'],
+        'location_id': level['location_id'],
+        'available': level.get('available'),
+        'updated_at': level.get('updated_at'),
+    }
+
+SPEC = EntitySpec(
+    name='inventory',
+    resource='inventory_levels',
+    transform=transform_inventory_level,
+)
+
+if __name__ == "__main__":
+    run_cli(['inventory'])
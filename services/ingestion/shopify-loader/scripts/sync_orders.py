@@ -1 +1,47 @@
-# Sync orders from Shopify to datalake
\ No newline at end of file
+#!/usr/bin/env python3
+"""
+Sync orders from Shopify to the data lake.
+
+Only orders updated since the last run are fetched; see ``incremental_sync``.
+"""
+
+from typing import Any, Dict, Iterator
+
+from incremental_sync import EntitySpec, api_number, run_cli
+
+def transform_order(order: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Map an API order to the processed orders layout."""
+    customer = order.get('customer') or {}
+    yield {
+        'id': order['id'],
+        'name': order.get('name', ''),
+        'created_at': order.get('created_at'),
+        'processed_at': order.get('processed_at'),
+        'cancelled_at': order.get('cancelled_at'),
+        'updated_at': order.get('updated_at'),
+        'financial_status': order.get('financial_status') or '',
+        'fulfillment_status': order.get('fulfillment_status') or '',
+        'currency': order.get('currency') or '',
+        'subtotal_price': api_number(order.get('subtotal_price')),
+        'total_discounts': api_number(order.get('total_discounts')),
+        'total_tax': api_number(order.get('total_tax')),
+        'total_price': api_number(order.get('total_price')),
+        'customer_id': customer.get('id'),
+        'line_items': [
+            {
+                'id': item.get('id'),
+                'product_id': item.get('product_id'),
+                'variant_id': item.get('variant_id'),
+                'sku': item.get('sku') or '',
+                'title': item.get('title') or '',
+                'quantity': item.get('quantity', 0),
+                'price': api_number(item.get('price')),
+            }
+            for item in order.get('line_items', [])
+        ],
+    }
+
+SPEC = EntitySpec(name='orders', resource='orders', transform=transform_order)
+
+if __name__ == "__main__":
+    run_cli(['orders'])
@@ -1 +1,64 @@
-# Sync products from Shopify to datalake
\ No newline at end of file
+#!/usr/bin/env python3
+"""
+Sync products from Shopify to the data lake.
+
+Only products updated since the last run are fetched; see ``incremental_sync``.
+Records follow the converted CSV layout where the API carries the same data.
+"""
+
+from typing import Any, Dict, Iterator, List
+
+from convert_products_csv_to_json import clean_html_tags
+from incremental_sync import EntitySpec, api_number, run_cli
+
+def transform_product(product: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Map an API product to the processed products layout."""
+    option_names = {option.get('position'): option.get('name', '') for option in product.get('options', [])}
+    variants: List[Dict[str, Any]] = []
+    for variant in product.get('variants', []):
+        variants.append({
+            'id': variant.get('id'),
+            'sku': (variant.get('sku') or '').strip(),
+            'grams': api_number(variant.get('grams')),
+            'inventory_tracker': variant.get('inventory_management') or '',
+            'inventory_policy': variant.get('inventory_policy') or '',
+            'fulfillment_service': variant.get('fulfillment_service') or '',
+            'price': api_number(variant.get('price')),
+            'compare_at_price': api_number(variant.get('compare_at_price')),
+            'requires_shipping': bool(variant.get('requires_shipping')),
+            'taxable': bool(variant.get('taxable')),
+            'barcode': variant.get('barcode') or '',
+            'weight_unit': variant.get('weight_unit') or '',
+            'options': {
+                f'option{n}': {'name': option_names.get(n, ''), 'value': variant.get(f'option{n}') or ''}
+                for n in range(1, 4)
+            },
+        })
+
+    yield {
+        'id': product['id'],
+        'handle': product.get('handle', ''),
+        'title': (product.get('title') or '').strip(),
+        'body_html': clean_html_tags(product.get('body_html') or ''),
+        'vendor': product.get('vendor') or '',
+        'type': product.get('product_type') or '',
+        'tags': [tag.strip() for tag in (product.get('tags') or '').split(',') if tag.strip()],
+        'published': product.get('published_at') is not None,
+        'status': product.get('status') or '',
+        'updated_at': product.get('updated_at'),
+        'variants': variants,
+        'images': [
+            {
+                'src': image.get('src', ''),
+                'position': api_number(image.get('position')),
+                'alt_text': image.get('alt') or '',
+                'variant_ids': image.get('variant_ids', []),
+            }
+            for image in product.get('images', [])
+        ],
+    }
+
+SPEC = EntitySpec(name='products', resource='products', transform=transform_product)
+
+if __name__ == "__main__":
+    run_cli(['products'])
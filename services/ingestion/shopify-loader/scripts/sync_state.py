@@ -0,0 +1,159 @@
+"""
+Local SQLite state for incremental Shopify syncs.
+
+Per entity the store keeps:
+
+- a cursor: the newest ``updated_at`` (or the highest id, for ``since_id``
+  resources) that has been written out, so the next run only asks Shopify
+  for what changed after it;
+- a content hash per record, so records that come back without a material
+  change (overlapping cursor windows, ``updated_at`` bumps) are not
+  re-written downstream;
+- a history of runs.
+
+A run's hashes and its new cursor are committed in one transaction after its
+output is on disk. A crash in between only means the next run fetches the
+same window again.
+"""
+
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cursors (
+    entity TEXT PRIMARY KEY,
+    updated_at TEXT,
+    since_id INTEGER,
+    synced_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+    entity TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    synced_at TEXT NOT NULL,
+    PRIMARY KEY (entity, record_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT NOT NULL,
+    fetched INTEGER NOT NULL,
+    changed INTEGER NOT NULL,
+    output_path TEXT
+);
+"""
+
+# Stay well below SQLite's limit on bound parameters per statement.
+_LOOKUP_BATCH = 500
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Where the next fetch of an entity starts."""
+
+    updated_at: Optional[str] = None
+    since_id: Optional[int] = None
+
+
+def utc_now() -> str:
+    """Current time as an ISO-8601 UTC string."""
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+class SyncState:
+    """Cursor, hash and run bookkeeping backed by one SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> 'SyncState':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def cursor(self, entity: str) -> Cursor:
+        """Return the entity's cursor (empty on the first run)."""
+        row = self.connection.execute(
+            'SELECT updated_at, since_id FROM cursors WHERE entity = ?', (entity,)
+        ).fetchone()
+        return Cursor(*row) if row else Cursor()
+
+    def known_hashes(self, entity: str, record_ids: Iterable[str]) -> Dict[str, str]:
+        """Return the stored content hash of every id that has one."""
+        ids = list(record_ids)
+        found: Dict[str, str] = {}
+        for start in range(0, len(ids), _LOOKUP_BATCH):
+            batch = ids[start:start + _LOOKUP_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            found.update(
+                self.connection.execute(
+                    f'SELECT record_id, content_hash FROM records '
+                    f'WHERE entity = ? AND record_id IN ({placeholders})',
+                    [entity, *batch],
+                )
+            )
+        return found
+
+    def record_count(self, entity: str) -> int:
+        """Number of records tracked for an entity."""
+        (count,) = self.connection.execute(
+            'SELECT COUNT(*) FROM records WHERE entity = ?', (entity,)
+        ).fetchone()
+        return count
+
+    def commit(
+        self,
+        entity: str,
+        hashes: Dict[str, str],
+        cursor: Cursor,
+        *,
+        started_at: str,
+        fetched: int,
+        output_path: Optional[str],
+    ) -> None:
+        """Store a finished run's hashes, cursor and history in one transaction."""
+        now = utc_now()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO records (entity, record_id, content_hash, synced_at) '
+                'VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (entity, record_id) DO UPDATE SET '
+                'content_hash = excluded.content_hash, synced_at = excluded.synced_at',
+                [(entity, record_id, digest, now) for record_id, digest in hashes.items()],
+            )
+            self.connection.execute(
+                'INSERT INTO cursors (entity, updated_at, since_id, synced_at) '
+                'VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (entity) DO UPDATE SET updated_at = excluded.updated_at, '
+                'since_id = excluded.since_id, synced_at = excluded.synced_at',
+                (entity, cursor.updated_at, cursor.since_id, now),
+            )
+            self.connection.execute(
+                'INSERT INTO runs (entity, started_at, finished_at, fetched, changed, output_path) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (entity, started_at, now, fetched, len(hashes), output_path),
+            )
+
+    def reset(self, entity: str) -> None:
+        """Forget an entity's cursor and hashes, forcing a full resync."""
+        with self.connection:
+            self.connection.execute('DELETE FROM cursors WHERE entity = ?', (entity,))
+            self.connection.execute('DELETE FROM records WHERE entity = ?', (entity,))
+
+    def runs(self, entity: str, limit: int = 10) -> List[Tuple]:
+        """Most recent runs of an entity, newest first."""
+        return self.connection.execute(
+            'SELECT started_at, finished_at, fetched, changed, output_path FROM runs '
+            'WHERE entity = ? ORDER BY id DESC LIMIT ?',
+            (entity, limit),
+        ).fetchall()
@@ -4,28 +4,411 @@ Validate and analyze the converted products JSON file.
 
 This script provides insights about the data structure, validates the JSON format,
 and generates statistics about the products, variants, and images.
+
+Every statistic is gathered in a single traversal:
+
+- JSON documents are decoded incrementally, one product at a time, and
+  NDJSON is read line by line, so memory does not grow with the catalog.
+- Parquet tables written with ``--parquet-dir`` are aggregated column-wise
+  with Arrow compute kernels, reading only the columns the report needs.
+
+``--json`` prints the report as JSON, and ``--strict`` exits non-zero when a
+data-quality check fails, so the script can gate every ingest.
 """
 
+import argparse
 import json
 import os
-from typing import Dict, List, Any
+import re
+import sys
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
 from collections import Counter
 
-def analyze_products_json(json_file_path: str) -> None:
-    """Analyze the products JSON file and provide insights."""
-    
-    if not os.path.exists(json_file_path):
-        print(f"❌ Error: JSON file not found: {json_file_path}")
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pragma: no cover - only the Parquet path needs pyarrow
+    pa = None
+    pc = None
+
+TOP_TAGS = 10
+
+# Quality counters that make ``--strict`` fail when non-zero.
+QUALITY_CHECKS = (
+    'products_without_title',
+    'products_without_handle',
+    'products_without_variants',
+    'empty_variants',
+)
+
+_WHITESPACE = re.compile(r'\s*')
+_DECODER = json.JSONDecoder()
+
+class _JsonReader:
+    """Decode one JSON value at a time from a file read in chunks."""
+
+    def __init__(self, stream: TextIO, chunk_size: int = 1 << 16):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of file)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def take(self, expected: str) -> str:
+        """Consume the next character, which must be one of ``expected``."""
+        char = self.peek()
+        if not char or char not in expected:
+            raise ValueError(f"Malformed JSON: expected one of {expected!r}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decode the next complete value, reading more input as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number ending exactly at the buffer edge may continue in the
+            # next chunk.
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+def iter_json_document(stream: TextIO, chunk_size: int = 1 << 16) -> Iterator[Tuple[str, Any]]:
+    """Yield ``('product', product)`` per product and ``(key, value)`` for other top-level keys.
+
+    Works for both the pretty-printed document and the ``json-stream``
+    layout (metadata after the products) without loading either whole.
+    """
+    reader = _JsonReader(stream, chunk_size)
+    reader.take('{')
+    if reader.peek() == '}':
         return
-    
-    with open(json_file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
+    while True:
+        key = reader.value()
+        reader.take(':')
+        if key == 'products':
+            reader.take('[')
+            if reader.peek() == ']':
+                reader.take(']')
+            else:
+                while True:
+                    yield 'product', reader.value()
+                    if reader.take(',]') == ']':
+                        break
+        else:
+            yield key, reader.value()
+        if reader.take(',}') == '}':
+            return
+
+def iter_ndjson(stream: TextIO) -> Iterator[Tuple[str, Any]]:
+    """Yield ``('product', product)`` for every line of an NDJSON file."""
+    for line in stream:
+        if line.strip():
+            yield 'product', json.loads(line)
+
+class _Range:
+    """Running count, sum, minimum and maximum of a numeric field."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else None,
+        }
+
+def _ranked(counts: Dict[str, int], limit: Optional[int] = None) -> Dict[str, int]:
+    ordered = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+    return dict(ordered[:limit] if limit else ordered)
+
+class ProductStats:
+    """Accumulates every report statistic from one pass over the products."""
+
+    def __init__(self):
+        self.products = 0
+        self.published = 0
+        self.status = Counter()
+        self.vendors = Counter()
+        self.categories = Counter()
+        self.variants = 0
+        self.prices = _Range()
+        self.weights = _Range()
+        self.images = 0
+        self.products_with_images = 0
+        self.positions = _Range()
+        self.tags = Counter()
+        self.metafield_namespaces = set()
+        self.metafield_fields = set()
+        self.quality = dict.fromkeys(QUALITY_CHECKS, 0)
+
+    def add(self, product: Dict[str, Any]) -> None:
+        """Fold one product into the statistics."""
+        self.products += 1
+        self.status[product.get('status', 'unknown')] += 1
+        if product.get('published', False):
+            self.published += 1
+        self.vendors[product.get('vendor', 'Unknown')] += 1
+        self.categories[product.get('product_category', 'Unknown')] += 1
+        if not product.get('title'):
+            self.quality['products_without_title'] += 1
+        if not product.get('handle'):
+            self.quality['products_without_handle'] += 1
+
+        variants = product.get('variants', [])
+        if not variants:
+            self.quality['products_without_variants'] += 1
+        self.variants += len(variants)
+        for variant in variants:
+            price = variant.get('price')
+            if price is not None:
+                self.prices.add(price)
+            weight = variant.get('grams')
+            if weight is not None:
+                self.weights.add(weight)
+            if not variant.get('sku') and not price:
+                self.quality['empty_variants'] += 1
+
+        images = product.get('images', [])
+        self.images += len(images)
+        if images:
+            self.products_with_images += 1
+        for image in images:
+            position = image.get('position')
+            if position is not None:
+                self.positions.add(position)
+
+        self.tags.update(product.get('tags', []))
+
+        for namespace, fields in product.get('metafields', {}).items():
+            self.metafield_namespaces.add(namespace)
+            if isinstance(fields, dict):
+                for field_name in fields:
+                    self.metafield_fields.add(f"{namespace}.{field_name}")
+
+    def report(self, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Return the statistics as a JSON-serializable report."""
+        return build_report(
+            metadata=metadata or {},
+            products=self.products,
+            published=self.published,
+            status=self.status,
+            vendors=self.vendors,
+            categories=self.categories,
+            variants=self.variants,
+            prices=self.prices.as_dict(),
+            weights=self.weights.as_dict(),
+            images=self.images,
+            products_with_images=self.products_with_images,
+            positions=self.positions.as_dict(),
+            unique_tags=len(self.tags),
+            top_tags=_ranked(self.tags, TOP_TAGS),
+            metafield_namespaces=sorted(self.metafield_namespaces),
+            metafield_fields=len(self.metafield_fields),
+            quality=self.quality,
+        )
+
+def build_report(
+    *,
+    metadata: Dict[str, Any],
+    products: int,
+    published: int,
+    status: Dict[str, int],
+    vendors: Dict[str, int],
+    categories: Dict[str, int],
+    variants: int,
+    prices: Dict[str, Any],
+    weights: Dict[str, Any],
+    images: int,
+    products_with_images: int,
+    positions: Dict[str, Any],
+    unique_tags: int,
+    top_tags: Dict[str, int],
+    metafield_namespaces: List[str],
+    metafield_fields: int,
+    quality: Dict[str, int],
+) -> Dict[str, Any]:
+    """Assemble the report shared by the streaming and the columnar analyzers."""
+    return {
+        'metadata': metadata,
+        'products': {
+            'total': products,
+            'status': _ranked(status),
+            'published': published,
+            'unpublished': products - published,
+            'vendors': _ranked(vendors),
+            'categories': _ranked(categories),
+        },
+        'variants': {
+            'total': variants,
+            'per_product': variants / products if products else 0.0,
+            'price': prices,
+            'grams': weights,
+        },
+        'images': {
+            'total': images,
+            'products_with_images': products_with_images,
+            'products_without_images': products - products_with_images,
+            'per_product': images / products if products else 0.0,
+            'position': positions,
+        },
+        'tags': {'unique': unique_tags, 'most_common': top_tags},
+        'metafields': {'namespaces': metafield_namespaces, 'unique_fields': metafield_fields},
+        'quality': dict(quality),
+    }
+
+def analyze_records(records: Iterator[Tuple[str, Any]]) -> Dict[str, Any]:
+    """Build the report from ``iter_json_document`` / ``iter_ndjson`` records."""
+    stats = ProductStats()
+    metadata: Dict[str, Any] = {}
+    for key, value in records:
+        if key == 'product':
+            stats.add(value)
+        elif key == 'metadata':
+            metadata = value
+    return stats.report(metadata)
+
+def analyze_file(path: str) -> Dict[str, Any]:
+    """Build the report for a products ``.json`` document or ``.ndjson`` file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        records = iter_ndjson(f) if path.endswith('.ndjson') else iter_json_document(f)
+        return analyze_records(records)
+
+def _value_counts(column) -> Dict[str, int]:
+    counts = pc.value_counts(column.cast(pa.string()))
+    return dict(zip(counts.field('values').to_pylist(), counts.field('counts').to_pylist()))
+
+def _range(column) -> Dict[str, Any]:
+    column = pc.drop_null(column)
+    if not len(column):
+        return {'count': 0, 'min': None, 'max': None, 'mean': None}
+    bounds = pc.min_max(column)
+    return {
+        'count': len(column),
+        'min': bounds['min'].as_py(),
+        'max': bounds['max'].as_py(),
+        'mean': pc.mean(column).as_py(),
+    }
+
+def _blank(column):
+    return pc.fill_null(pc.equal(column.cast(pa.string()), ''), True)
+
+def _keys(table):
+    """Join ``source`` and ``handle`` into one key per row."""
+    return pc.binary_join_element_wise(
+        table.column('source').cast(pa.string()),
+        table.column('handle').cast(pa.string()),
+        '\x1f',
+    )
+
+def analyze_tables(parquet_dir: str) -> Dict[str, Any]:
+    """Build the report with vectorized aggregation over the Parquet tables."""
+    from products_columnar import read_product_tables
+
+    tables = read_product_tables(
+        parquet_dir,
+        columns={
+            'products': ['source', 'handle', 'title', 'status', 'published', 'vendor',
+                         'product_category', 'tags'],
+            'variants': ['source', 'handle', 'sku', 'price', 'grams'],
+            'images': ['source', 'handle', 'position'],
+            'metafields': ['namespace', 'key'],
+        },
+    )
+    products, variants = tables['products'], tables['variants']
+    images, metafields = tables['images'], tables['metafields']
+
+    product_keys = _keys(products)
+    variant_keys = pc.unique(_keys(variants))
+    price = variants.column('price')
+    empty_price = pc.fill_null(pc.equal(price, 0), True)
+    tags = _value_counts(pc.list_flatten(products.column('tags')))
+    namespaces = metafields.column('namespace').cast(pa.string())
+    fields = pc.binary_join_element_wise(namespaces, metafields.column('key').cast(pa.string()), '.')
+
+    return build_report(
+        metadata={
+            'source_file': ', '.join(sorted(_value_counts(products.column('source')))),
+            'total_products': products.num_rows,
+            'total_variants': variants.num_rows,
+            'total_images': images.num_rows,
+        },
+        products=products.num_rows,
+        published=pc.sum(pc.fill_null(products.column('published'), False)).as_py() or 0,
+        status=_value_counts(products.column('status')),
+        vendors=_value_counts(products.column('vendor')),
+        categories=_value_counts(products.column('product_category')),
+        variants=variants.num_rows,
+        prices=_range(price),
+        weights=_range(variants.column('grams')),
+        images=images.num_rows,
+        products_with_images=len(pc.unique(_keys(images))),
+        positions=_range(images.column('position')),
+        unique_tags=len(tags),
+        top_tags=_ranked(tags, TOP_TAGS),
+        metafield_namespaces=sorted(pc.unique(namespaces).to_pylist()),
+        metafield_fields=len(pc.unique(fields)),
+        quality={
+            'products_without_title': pc.sum(_blank(products.column('title'))).as_py() or 0,
+            'products_without_handle': pc.sum(_blank(products.column('handle'))).as_py() or 0,
+            'products_without_variants': pc.sum(
+                pc.invert(pc.is_in(product_keys, value_set=variant_keys))
+            ).as_py() or 0,
+            'empty_variants': pc.sum(
+                pc.and_(_blank(variants.column('sku')), empty_price)
+            ).as_py() or 0,
+        },
+    )
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print a report in the human-readable layout."""
+    metadata = report['metadata']
+    products = report['products']
+    variants = report['variants']
+    images = report['images']
+    tags = report['tags']
+    metafields = report['metafields']
+    quality = report['quality']
+
     print("🔍 Products JSON Analysis")
     print("=" * 50)
-    
+
     # Metadata analysis
-    metadata = data.get('metadata', {})
     print(f"📊 Metadata:")
     print(f"   - Conversion date: {metadata.get('conversion_date', 'N/A')}")
     print(f"   - Source file: {metadata.get('source_file', 'N/A')}")
@@ -33,177 +416,144 @@ def analyze_products_json(json_file_path: str) -> None:
     print(f"   - Total variants: {metadata.get('total_variants', 0)}")
     print(f"   - Total images: {metadata.get('total_images', 0)}")
     print()
-    
-    products = data.get('products', [])
-    if not products:
+
+    if not products['total']:
         print("❌ No products found in JSON file")
         return
-    
+
     # Product analysis
     print("📦 Product Analysis:")
-    print(f"   - Total products: {len(products)}")
-    
-    # Status distribution
-    status_counts = Counter(p.get('status', 'unknown') for p in products)
+    print(f"   - Total products: {products['total']}")
     print(f"   - Status distribution:")
-    for status, count in status_counts.most_common():
+    for status, count in products['status'].items():
         print(f"     • {status}: {count}")
-    
-    # Published vs unpublished
-    published_count = sum(1 for p in products if p.get('published', False))
-    unpublished_count = len(products) - published_count
-    print(f"   - Published: {published_count}, Unpublished: {unpublished_count}")
-    
-    # Vendor analysis
-    vendor_counts = Counter(p.get('vendor', 'Unknown') for p in products)
+    print(f"   - Published: {products['published']}, Unpublished: {products['unpublished']}")
     print(f"   - Vendors:")
-    for vendor, count in vendor_counts.most_common():
+    for vendor, count in products['vendors'].items():
         print(f"     • {vendor}: {count}")
-    
-    # Category analysis
-    category_counts = Counter(p.get('product_category', 'Unknown') for p in products)
     print(f"   - Top categories:")
-    for category, count in category_counts.most_common(5):
+    for category, count in list(products['categories'].items())[:5]:
         print(f"     • {category}: {count}")
-    
+
     print()
-    
+
     # Variant analysis
     print("🔄 Variant Analysis:")
-    total_variants = 0
-    variant_price_ranges = []
-    variant_weights = []
-    
-    for product in products:
-        variants = product.get('variants', [])
-        total_variants += len(variants)
-        
-        for variant in variants:
-            price = variant.get('price')
-            if price is not None:
-                variant_price_ranges.append(price)
-            
-            weight = variant.get('grams')
-            if weight is not None:
-                variant_weights.append(weight)
-    
-    print(f"   - Total variants: {total_variants}")
-    print(f"   - Average variants per product: {total_variants / len(products):.1f}")
-    
-    if variant_price_ranges:
-        print(f"   - Price range: ${min(variant_price_ranges):.2f} - ${max(variant_price_ranges):.2f}")
-        print(f"   - Average price: ${sum(variant_price_ranges) / len(variant_price_ranges):.2f}")
-    
-    if variant_weights:
-        print(f"   - Weight range: {min(variant_weights):.1f}g - {max(variant_weights):.1f}g")
-        print(f"   - Average weight: {sum(variant_weights) / len(variant_weights):.1f}g")
-    
+    print(f"   - Total variants: {variants['total']}")
+    print(f"   - Average variants per product: {variants['per_product']:.1f}")
+    price = variants['price']
+    if price['count']:
+        print(f"   - Price range: ${price['min']:.2f} - ${price['max']:.2f}")
+        print(f"   - Average price: ${price['mean']:.2f}")
+    weight = variants['grams']
+    if weight['count']:
+        print(f"   - Weight range: {weight['min']:.1f}g - {weight['max']:.1f}g")
+        print(f"   - Average weight: {weight['mean']:.1f}g")
+
     print()
-    
+
     # Image analysis
     print("🖼️  Image Analysis:")
-    total_images = 0
-    products_with_images = 0
-    
-    for product in products:
-        images = product.get('images', [])
-        total_images += len(images)
-        if images:
-            products_with_images += 1
-    
-    print(f"   - Total images: {total_images}")
-    print(f"   - Products with images: {products_with_images}")
-    print(f"   - Products without images: {len(products) - products_with_images}")
-    print(f"   - Average images per product: {total_images / len(products):.1f}")
-    
-    # Image position analysis
-    image_positions = []
-    for product in products:
-        for image in product.get('images', []):
-            position = image.get('position')
-            if position is not None:
-                image_positions.append(position)
-    
-    if image_positions:
-        print(f"   - Image positions range: {min(image_positions)} - {max(image_positions)}")
-    
+    print(f"   - Total images: {images['total']}")
+    print(f"   - Products with images: {images['products_with_images']}")
+    print(f"   - Products without images: {images['products_without_images']}")
+    print(f"   - Average images per product: {images['per_product']:.1f}")
+    position = images['position']
+    if position['count']:
+        print(f"   - Image positions range: {position['min']} - {position['max']}")
+
     print()
-    
+
     # Tag analysis
     print("🏷️  Tag Analysis:")
-    all_tags = []
-    for product in products:
-        tags = product.get('tags', [])
-        all_tags.extend(tags)
-    
-    tag_counts = Counter(all_tags)
-    print(f"   - Total unique tags: {len(tag_counts)}")
+    print(f"   - Total unique tags: {tags['unique']}")
     print(f"   - Most common tags:")
-    for tag, count in tag_counts.most_common(10):
+    for tag, count in tags['most_common'].items():
         print(f"     • {tag}: {count}")
-    
+
     print()
-    
+
     # Metafields analysis
     print("📋 Metafields Analysis:")
-    metafield_namespaces = set()
-    metafield_fields = set()
-    
-    for product in products:
-        metafields = product.get('metafields', {})
-        for namespace, fields in metafields.items():
-            metafield_namespaces.add(namespace)
-            if isinstance(fields, dict):
-                for field_name in fields.keys():
-                    metafield_fields.add(f"{namespace}.{field_name}")
-    
-    print(f"   - Unique metafield namespaces: {len(metafield_namespaces)}")
-    print(f"   - Unique metafield fields: {len(metafield_fields)}")
-    
-    if metafield_namespaces:
+    print(f"   - Unique metafield namespaces: {len(metafields['namespaces'])}")
+    print(f"   - Unique metafield fields: {metafields['unique_fields']}")
+    if metafields['namespaces']:
         print(f"   - Metafield namespaces:")
-        for namespace in sorted(metafield_namespaces):
+        for namespace in metafields['namespaces']:
             print(f"     • {namespace}")
-    
+
     print()
-    
+
     # Data quality check
     print("✅ Data Quality Check:")
-    
-    # Check for required fields
-    products_without_title = sum(1 for p in products if not p.get('title'))
-    products_without_handle = sum(1 for p in products if not p.get('handle'))
-    products_without_variants = sum(1 for p in products if not p.get('variants'))
-    
-    print(f"   - Products without title: {products_without_title}")
-    print(f"   - Products without handle: {products_without_handle}")
-    print(f"   - Products without variants: {products_without_variants}")
-    
-    # Check for empty variants
-    empty_variants = 0
-    for product in products:
-        for variant in product.get('variants', []):
-            if not variant.get('sku') and not variant.get('price'):
-                empty_variants += 1
-    
-    print(f"   - Empty variants: {empty_variants}")
-    
+    print(f"   - Products without title: {quality['products_without_title']}")
+    print(f"   - Products without handle: {quality['products_without_handle']}")
+    print(f"   - Products without variants: {quality['products_without_variants']}")
+    print(f"   - Empty variants: {quality['empty_variants']}")
+
     print()
     print("🎉 Analysis complete!")
 
-def main():
+def analyze_products_json(json_file_path: str) -> Dict[str, Any]:
+    """Analyze the products JSON file, print insights and return the report."""
+
+    if not os.path.exists(json_file_path):
+        print(f"❌ Error: JSON file not found: {json_file_path}")
+        return {}
+
+    report = analyze_file(json_file_path)
+    print_report(report)
+    return report
+
+def failed_checks(report: Dict[str, Any]) -> List[str]:
+    """Names of the quality checks with a non-zero count."""
+    return [name for name in QUALITY_CHECKS if report['quality'].get(name)]
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--input', default="data/products.json", help="Converted products .json or .ndjson"
+    )
+    parser.add_argument(
+        '--parquet-dir',
+        help="Analyze the Parquet tables under this directory instead of the JSON file",
+    )
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    parser.add_argument(
+        '--strict',
+        action='store_true',
+        help=f"Exit with status 1 when any of {', '.join(QUALITY_CHECKS)} is non-zero",
+    )
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
     """Main function to run the validation."""
-    json_file = "data/products.json"
-    
-    if not os.path.exists(json_file):
-        print(f"❌ Error: JSON file not found: {json_file}")
-        print("Please run the conversion script first: python scripts/convert_products_csv_to_json.py")
-        return
-    
+    args = parse_args(argv)
+    json_file = args.input
+
+    if not args.parquet_dir and not os.path.exists(json_file):
+        print(f"❌ Error: JSON file not found: {json_file}", file=sys.stderr)
+        print("Please run the conversion script first: python scripts/convert_products_csv_to_json.py",
+              file=sys.stderr)
+        sys.exit(1)
+
     try:
-        analyze_products_json(json_file)
+        report = analyze_tables(args.parquet_dir) if args.parquet_dir else analyze_file(json_file)
     except Exception as e:
-        print(f"❌ Error during analysis: {str(e)}")
+        print(f"❌ Error during analysis: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        print_report(report)
+
+    failures = failed_checks(report)
+    if args.strict and failures:
+        print(f"❌ Quality checks failed: {', '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,10 @@
+"""Make the loader's ``scripts`` and ``utils`` modules importable from tests."""
+
+import sys
+from pathlib import Path
+
+LOADER_ROOT = Path(__file__).resolve().parents[1]
+
+for directory in (LOADER_ROOT / "scripts", LOADER_ROOT):
+    if str(directory) not in sys.path:
+        sys.path.insert(0, str(directory))
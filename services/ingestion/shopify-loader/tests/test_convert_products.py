@@ -0,0 +1,90 @@
+import csv
+import json
+import os
+
+import pytest
+
+import convert_products_csv_to_json as convert
+
+HEADER = [
+    "Handle",
+    "Title",
+    "Vendor",
+    "Tags",
+    "Published",
+    "Status",
+    "Option1 Name",
+    "Option1 Value",
+    "Variant SKU",
+    "Variant Price",
+    "Image Src",
+    "Image Position",
+    "Fabric (product.metafields.custom.fabric)",
+    "product.metafields.shopify.color-pattern",
+]
+
+
+def write_export(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+GOLDEN = os.path.join(os.path.dirname(__file__), "fixtures", "products", "golden_sofa.json")
+
+
+ROWS = [
+    ["sofa", "Sofa", "Minkowski", "a, b", "true", "active", "Color", "Red", "S-1", "10",
+     "https://cdn/sofa-1.jpg", "1", "linen", "solid"],
+    ["sofa", "", "", "", "", "", "", "Blue", "S-2", "12", "https://cdn/sofa-2.jpg", "2", "", ""],
+    ["chair", "Chair", "Minkowski", "", "false", "draft", "Size", "M", "C-1", "5", "", "", "", ""],
+]
+
+
+def test_streamed_products_match_the_buffered_conversion(tmp_path):
+    source = tmp_path / "export.csv"
+    write_export(source, ROWS)
+
+    convert.process_csv_to_json(str(source), str(tmp_path / "products.json"))
+    convert.stream_csv_to_json(str(source), str(tmp_path / "products.ndjson"), "ndjson")
+    convert.stream_csv_to_json(str(source), str(tmp_path / "stream.json"), "json-stream")
+
+    buffered = json.loads((tmp_path / "products.json").read_text())
+    ndjson = [json.loads(line) for line in (tmp_path / "products.ndjson").read_text().splitlines()]
+    streamed = json.loads((tmp_path / "stream.json").read_text())
+
+    # Streaming keeps export order; the buffered document is sorted by handle.
+    assert [p["handle"] for p in ndjson] == ["sofa", "chair"]
+    assert sorted(ndjson, key=lambda p: p["handle"]) == buffered["products"]
+    assert streamed["products"] == ndjson
+    assert streamed["metadata"]["total_variants"] == buffered["metadata"]["total_variants"] == 3
+    assert ndjson[0]["metafields"] == {"custom": {"fabric": "linen"}, "shopify": {"color-pattern": "solid"}}
+
+
+def test_metafield_plan_matches_per_row_extraction():
+    row = dict(zip(HEADER, ROWS[0]))
+    plan = convert.build_metafield_plan(HEADER)
+    assert [column for column, _, _ in plan] == HEADER[-2:]
+    assert convert.extract_metafields(row, plan) == convert.extract_metafields(row)
+
+
+def test_streaming_rejects_ungrouped_exports(tmp_path):
+    source = tmp_path / "export.csv"
+    write_export(source, [ROWS[0], ROWS[2], ROWS[1]])
+    output = tmp_path / "products.ndjson"
+    output.write_text("previous run\n")
+
+    with pytest.raises(ValueError, match="not contiguous"):
+        convert.stream_csv_to_json(str(source), str(output), "ndjson")
+    assert output.read_text() == "previous run\n"
+
+
+def test_column_plan_builds_the_golden_product():
+    # Covers every field kind, nested specs, columns missing from the export
+    # and a short row; the expected product was recorded from an earlier build.
+    with open(GOLDEN, encoding="utf-8") as handle:
+        golden = json.load(handle)
+    plan = convert.ProductColumnPlan(golden["header"])
+    products = list(convert.group_products(iter([list(row) for row in golden["rows"]]), plan))
+    assert products == [golden["product"]]
@@ -0,0 +1,151 @@
+import json
+
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("yaml")
+
+from PIL import Image
+
+import resize_images
+from utils import image_helpers
+
+SETTINGS = {
+    "formats": {"webp": {"quality": 70}, "avif": {"quality": 50, "speed": 8}, "jpeg": {"quality": 80}},
+    "profiles": {
+        "large": {"width": 800, "height": 800, "fit": "contain", "formats": ["avif", "webp", "jpeg"]},
+        "small": {"width": 200, "height": 200, "fit": "contain", "formats": ["webp"]},
+        "thumbnail": {"width": 64, "height": 64, "fit": "cover", "formats": ["jpeg"], "thumbnail": True},
+    },
+}
+
+
+def make_image(path, size, mode="RGB", fmt="JPEG"):
+    image = Image.new(mode, size)
+    pixels = image.load()
+    for x in range(size[0]):
+        for y in range(0, size[1], 7):
+            pixels[x, y] = (x % 256, y % 256, 128) + ((200,) if mode == "RGBA" else ())
+    image.save(path, fmt)
+    return str(path)
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    photo = make_image(tmp_path / "photo.jpg", (1600, 1000))
+    logo = make_image(tmp_path / "logo.png", (120, 300), mode="RGBA", fmt="PNG")
+    path = tmp_path / "products.ndjson"
+    products = [
+        {"handle": "a", "images": [{"src": photo}, {"src": logo}], "variants": [{"variant_image": photo}]},
+        {"handle": "b", "images": [{"src": logo}], "variants": []},
+    ]
+    path.write_text("".join(json.dumps(p) + "\n" for p in products), encoding="utf-8")
+    return path, photo, logo
+
+
+def settings():
+    return image_helpers.parse_settings(SETTINGS)
+
+
+def run(catalog_path, output_dir, config=None, **options):
+    config = config or settings()
+    return resize_images.process_images(
+        resize_images.catalog_sources(str(catalog_path)),
+        config,
+        config.select(),
+        output_dir=str(output_dir),
+        workers=options.pop("workers", 1),
+        **options,
+    )
+
+
+def test_repo_settings_are_valid():
+    config = image_helpers.load_settings()
+    assert config.select(thumbnails=True)
+    assert {fmt for profile in config.select() for fmt in profile.formats} == {"avif", "webp", "jpeg"}
+
+
+def test_invalid_profile_is_rejected():
+    bad = {"profiles": {"x": {"width": 10, "height": 10, "fit": "stretch"}}}
+    with pytest.raises(ValueError, match="fit"):
+        image_helpers.parse_settings(bad)
+
+
+def test_fitted_size_never_upscales():
+    contain = image_helpers.Profile("c", 800, 800, "contain")
+    cover = image_helpers.Profile("t", 64, 64, "cover")
+    assert image_helpers.fitted_size((1600, 1000), contain) == ((800, 500), (0, 0, 1600, 1000))
+    assert image_helpers.fitted_size((120, 300), contain)[0] == (120, 300)
+    assert image_helpers.fitted_size((1600, 1000), cover) == ((64, 64), (300.0, 0, 1300.0, 1000))
+    assert image_helpers.fitted_size((40, 100), cover)[0] == (40, 40)
+
+
+def test_every_profile_and_format_from_one_decode(tmp_path, catalog, monkeypatch):
+    catalog_path, photo, logo = catalog
+    decodes = []
+    original_decode = image_helpers.decode
+    monkeypatch.setattr(image_helpers, "decode", lambda data, profiles=(): decodes.append(1) or original_decode(data, profiles))
+
+    summary = run(catalog_path, tmp_path / "images")
+    assert resize_images.catalog_sources(str(catalog_path)) == [photo, logo]
+    assert (summary["processed"], summary["rendered"], summary["failed"]) == (2, 10, [])
+    assert len(decodes) == 2
+
+    manifest = json.loads((tmp_path / "images" / "manifest.json").read_text())
+    outputs = manifest[photo]["outputs"]
+    with Image.open(tmp_path / "images" / outputs["large"]["avif"]) as image:
+        assert (image.format, image.size) == ("AVIF", (800, 500))
+    with Image.open(tmp_path / "images" / outputs["small"]["webp"]) as image:
+        assert (image.format, image.size) == ("WEBP", (200, 125))
+    with Image.open(tmp_path / "images" / outputs["thumbnail"]["jpeg"]) as image:
+        assert (image.format, image.size) == ("JPEG", (64, 64))
+    with Image.open(tmp_path / "images" / manifest[logo]["outputs"]["large"]["webp"]) as image:
+        assert (image.size, image.mode) == ((120, 300), "RGBA")
+
+
+def test_unchanged_images_are_never_reprocessed(tmp_path, catalog, monkeypatch):
+    catalog_path, photo, _ = catalog
+    run(catalog_path, tmp_path / "images")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("re-rendered an unchanged image")
+
+    monkeypatch.setattr(resize_images, "render_variants", fail)
+    summary = run(catalog_path, tmp_path / "images")
+    assert (summary["skipped"], summary["processed"]) == (2, 0)
+    monkeypatch.undo()
+
+    # Changing the AVIF settings re-renders just the AVIF output of each image.
+    changed = json.loads(json.dumps(SETTINGS))
+    changed["formats"]["avif"]["quality"] = 40
+    summary = run(catalog_path, tmp_path / "images", image_helpers.parse_settings(changed))
+    assert (summary["processed"], summary["rendered"]) == (2, 2)
+
+    # A source replaced in place is picked up again.
+    make_image(photo, (900, 900))
+    summary = run(catalog_path, tmp_path / "images")
+    assert (summary["processed"], summary["rendered"]) == (1, 5)
+
+
+def test_process_pool_matches_inline(tmp_path, catalog):
+    catalog_path, _, _ = catalog
+    run(catalog_path, tmp_path / "inline")
+    summary = run(catalog_path, tmp_path / "pool", workers=2)
+    assert summary["processed"] == 2
+    inline = json.loads((tmp_path / "inline" / "manifest.json").read_text())
+    pooled = json.loads((tmp_path / "pool" / "manifest.json").read_text())
+    assert {src: entry["outputs"] for src, entry in inline.items()} == {
+        src: entry["outputs"] for src, entry in pooled.items()
+    }
+
+
+def test_failures_are_reported_per_source(tmp_path, catalog):
+    catalog_path, _, _ = catalog
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+    config = settings()
+    summary = resize_images.process_images(
+        [str(broken)], config, config.select(), output_dir=str(tmp_path / "images"), workers=1
+    )
+    assert summary["processed"] == 0
+    assert summary["failed"][0]["src"] == str(broken)
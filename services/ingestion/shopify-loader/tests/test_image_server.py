@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("aiohttp")
+
+from aiohttp.test_utils import TestClient, TestServer
+from PIL import Image
+
+import image_server
+from utils import image_helpers
+
+SETTINGS = {
+    "formats": {"webp": {"quality": 70}, "avif": {"quality": 50, "speed": 8}, "jpeg": {"quality": 80}},
+    "profiles": {"large": {"width": 800, "height": 800}},
+}
+
+
+@pytest.fixture
+def public(tmp_path):
+    root = tmp_path / "public"
+    root.mkdir()
+    image = Image.new("RGB", (1600, 1000), (180, 120, 60))
+    image.save(root / "room.jpg", "JPEG", quality=95)
+    (root / "notes.txt").write_text("not an image")
+    (tmp_path / "secret.jpg").write_bytes((root / "room.jpg").read_bytes())
+    return root
+
+
+def make_server(root, cache_dir, **options):
+    cache = image_server.VariantCache(
+        str(cache_dir), options.pop("max_bytes", 10 * 1024 * 1024), options.pop("memory_bytes", 1024 * 1024)
+    )
+    return image_server.ImageServer(
+        [str(root)], image_helpers.parse_settings(SETTINGS), cache, widths=(320, 640, 1024), workers=2, **options
+    )
+
+
+def serve(server, test):
+    async def main():
+        client = TestClient(TestServer(image_server.create_app(server)))
+        await client.start_server()
+        try:
+            return await test(client)
+        finally:
+            await client.close()
+
+    return asyncio.run(main())
+
+
+def decoded(body):
+    with Image.open(io.BytesIO(body)) as image:
+        return image.format, image.size
+
+
+def test_resizes_to_the_next_allowed_width_and_negotiates_format(tmp_path, public):
+    server = make_server(public, tmp_path / "cache")
+    version = hashlib.sha256((public / "room.jpg").read_bytes()).hexdigest()
+
+    async def test(client):
+        avif = await client.get("/images/room.jpg?w=500", headers={"Accept": "image/avif,image/webp,*/*"})
+        webp = await client.get("/images/room.jpg?w=500", headers={"Accept": "image/webp,*/*"})
+        jpeg = await client.get(f"/images/room.jpg?w=5000&fmt=jpeg&q=40&v={version}")
+        return [(r.status, r.headers, await r.read()) for r in (avif, webp, jpeg)]
+
+    (_, avif_headers, avif), (_, webp_headers, webp), (status, jpeg_headers, jpeg) = serve(server, test)
+    assert decoded(avif) == ("AVIF", (640, 400))
+    assert avif_headers["Content-Type"] == "image/avif"
+    assert avif_headers["Vary"] == "Accept"
+    assert decoded(webp) == ("WEBP", (640, 400))
+    assert avif_headers["ETag"] != webp_headers["ETag"]
+
+    # Wider than the largest allowed width: capped there, never upscaled.
+    assert status == 200 and decoded(jpeg) == ("JPEG", (1024, 640))
+    assert jpeg_headers["Cache-Control"] == image_server.IMMUTABLE_CACHE_CONTROL
+    assert "Vary" not in jpeg_headers
+    assert avif_headers["Cache-Control"].startswith("public, max-age=86400")
+
+
+def test_immutable_only_for_the_current_content_hash(tmp_path, public):
+    server = make_server(public, tmp_path / "cache")
+    version = hashlib.sha256((public / "room.jpg").read_bytes()).hexdigest()
+
+    async def test(client):
+        suffixes = [version, version[:8], version[:7], "0" * 64, "abc"]
+        before = [(await client.get(f"/images/room.jpg?fmt=jpeg&v={v}")).headers["Cache-Control"] for v in suffixes]
+        Image.new("RGB", (800, 500), (10, 20, 30)).save(public / "room.jpg", "JPEG")
+        replaced = await client.get(f"/images/room.jpg?fmt=jpeg&v={version}")
+        return before, replaced.headers["Cache-Control"]
+
+    before, replaced = serve(server, test)
+    assert before[:2] == [image_server.IMMUTABLE_CACHE_CONTROL] * 2
+    assert all(value.startswith("public, max-age=86400") for value in before[2:])
+    # The old hash no longer names the source once it is replaced.
+    assert replaced.startswith("public, max-age=86400")
+
+
+def test_concurrent_requests_share_one_render_and_hit_the_cache(tmp_path, public, monkeypatch):
+    server = make_server(public, tmp_path / "cache")
+    calls = []
+    original = image_server.render_variant
+    monkeypatch.setattr(image_server, "render_variant", lambda *args: calls.append(args[1:3]) or original(*args))
+
+    async def test(client):
+        url = "/images/room.jpg?w=320&fmt=webp"
+        responses = await asyncio.gather(*(client.get(url) for _ in range(8)))
+        bodies = {await r.read() for r in responses}
+        etag = responses[0].headers["ETag"]
+        again = await client.get(url)
+        not_modified = await client.get(url, headers={"If-None-Match": etag})
+        return bodies, await again.read(), not_modified.status
+
+    bodies, again, not_modified = serve(server, test)
+    assert calls == [(320, "webp")]
+    assert len(bodies) == 1 and again in bodies
+    assert not_modified == 304
+    assert server.cache.stats()["memory_hits"] >= 1
+
+    # A restarted server finds the variant on disk instead of rendering it again.
+    restarted = make_server(public, tmp_path / "cache")
+    serve(restarted, lambda client: client.get("/images/room.jpg?w=320&fmt=webp"))
+    assert restarted.renders == 0 and restarted.cache.stats()["disk_hits"] == 1
+
+
+def test_rejects_bad_requests(tmp_path, public):
+    server = make_server(public, tmp_path / "cache")
+
+    async def test(client):
+        paths = [
+            "/images/room.jpg?w=abc",
+            "/images/room.jpg?q=101",
+            "/images/room.jpg?fmt=gif",
+            "/images/missing.jpg",
+            "/images/..%2Fsecret.jpg",
+            "/images/notes.txt",
+        ]
+        return [(await client.get(path)).status for path in paths]
+
+    assert serve(server, test) == [400, 400, 400, 404, 404, 415]
+
+
+def test_decompression_bomb_and_missing_encoder_are_client_errors(tmp_path, public, monkeypatch):
+    server = make_server(public, tmp_path / "cache")
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100_000)
+    monkeypatch.delitem(Image.SAVE, "WEBP", raising=False)
+
+    async def test(client):
+        bomb = await client.get("/images/room.jpg?fmt=jpeg")
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", None)
+        unsupported = await client.get("/images/room.jpg?fmt=webp")
+        return bomb.status, unsupported.status
+
+    assert serve(server, test) == (422, 406)
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = image_server.VariantCache(str(tmp_path / "cache"), max_bytes=250, memory_bytes=150)
+    cache.put("aa1.webp", b"a" * 100)
+    cache.put("bb2.webp", b"b" * 100)
+    assert cache.get("aa1.webp") == b"a" * 100  # now the most recently used
+    cache.put("cc3.webp", b"c" * 100)
+
+    stats = cache.stats()
+    assert (stats["disk_entries"], stats["disk_bytes"], stats["evictions"]) == (2, 200, 1)
+    assert stats["memory_bytes"] <= 150
+    assert cache.get("bb2.webp") is None
+    assert not (tmp_path / "cache" / "bb" / "bb2.webp").exists()
+
+    reopened = image_server.VariantCache(str(tmp_path / "cache"), max_bytes=150)
+    assert reopened.stats()["disk_entries"] == 1
+    assert reopened.get("cc3.webp") == b"c" * 100
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import shutil
+
+import pytest
+
+import incremental_sync as sync
+import sync_orders
+import sync_products
+import sync_shipments
+from sync_state import SyncState
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "shopify")
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    root = tmp_path / "fixtures"
+    shutil.copytree(FIXTURES, root)
+    return root
+
+
+@pytest.fixture
+def state(tmp_path):
+    with SyncState(str(tmp_path / "state.sqlite3")) as store:
+        yield store
+
+
+def run(spec, source, state, data_dir):
+    return asyncio.run(sync.sync_entity(spec, source, state, str(data_dir), page_size=1))
+
+
+def read_ndjson(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def edit_fixture(root, resource, record_id, **changes):
+    path = root / f"{resource}.json"
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    for record in payload[resource]:
+        if record["id"] == record_id:
+            record.update(changes)
+    path.write_text(json.dumps(payload), encoding="utf-8")
+
+
+def test_second_run_only_asks_for_and_writes_changes(tmp_path, fixtures, state):
+    source = sync.FixtureSource(str(fixtures))
+    data_dir = tmp_path / "data"
+
+    first = run(sync_products.SPEC, source, state, data_dir)
+    assert (first.fetched, first.changed) == (2, 2)
+    assert first.cursor.updated_at == "2026-03-02T12:30:00+00:00"
+    assert [r["handle"] for r in read_ndjson(first.output_path)] == ["linen-shirt", "canvas-tote"]
+    assert "updated_at_min" not in source.requests[0]["params"]
+
+    # The inclusive window re-fetches the newest product, which is unchanged.
+    second = run(sync_products.SPEC, source, state, data_dir)
+    assert source.requests[1]["params"]["updated_at_min"] == first.cursor.updated_at
+    assert (second.fetched, second.changed, second.output_path) == (1, 0, None)
+
+    edit_fixture(fixtures, "products", 1001, title="Linen Shirt v2", updated_at="2026-03-04T08:00:00Z")
+    third = run(sync_products.SPEC, source, state, data_dir)
+    assert third.changed == 1
+    assert [r["title"] for r in read_ndjson(third.output_path)] == ["Linen Shirt v2"]
+    assert state.record_count("products") == 2
+    assert [run_[3] for run_ in state.runs("products")] == [1, 0, 2]
+
+
+def test_timestamp_only_bump_is_not_a_change(tmp_path, fixtures, state):
+    source = sync.FixtureSource(str(fixtures))
+    run(sync_orders.SPEC, source, state, tmp_path / "data")
+
+    edit_fixture(fixtures, "orders", 7002, updated_at="2026-03-05T00:00:00Z")
+    result = run(sync_orders.SPEC, source, state, tmp_path / "data")
+    assert result.fetched == 2
+    assert result.changed == 0
+    assert result.cursor.updated_at == "2026-03-05T00:00:00+00:00"
+
+
+def test_since_id_cursor(tmp_path, fixtures, state):
+    spec = sync.EntitySpec(
+        name="order_ids", resource="orders", transform=sync_orders.transform_order, cursor="since_id"
+    )
+    source = sync.FixtureSource(str(fixtures))
+    first = run(spec, source, state, tmp_path / "data")
+    assert first.cursor.since_id == 7002
+
+    second = run(spec, source, state, tmp_path / "data")
+    assert source.requests[1]["params"]["since_id"] == 7002
+    assert (second.fetched, second.changed) == (0, 0)
+
+
+def test_shipments_explode_fulfillments_and_compact(tmp_path, fixtures, state):
+    source = sync.FixtureSource(str(fixtures))
+    data_dir = tmp_path / "data"
+    first = run(sync_shipments.SPEC, source, state, data_dir)
+    assert (first.fetched, first.changed) == (2, 2)
+
+    payload = json.loads((fixtures / "orders.json").read_text(encoding="utf-8"))
+    order = payload["orders"][0]
+    order["updated_at"] = "2026-03-06T10:00:00Z"
+    order["fulfillments"][1]["shipment_status"] = "delivered"
+    (fixtures / "orders.json").write_text(json.dumps(payload), encoding="utf-8")
+
+    second = run(sync_shipments.SPEC, source, state, data_dir)
+    assert [r["id"] for r in read_ndjson(second.output_path)] == [6002]
+
+    assert sync.compact_entity("shipments", str(data_dir)) == 2
+    snapshot = read_ndjson(data_dir / "shipments.ndjson")
+    assert [(r["id"], r["shipment_status"]) for r in snapshot] == [(6001, "delivered"), (6002, "delivered")]
+    assert os.listdir(data_dir / "sync" / "shipments") == []
+
+
+def test_cli_syncs_several_entities(tmp_path, capsys):
+    argv = [
+        "products", "orders", "inventory",
+        "--fixtures", FIXTURES,
+        "--state", str(tmp_path / "state.sqlite3"),
+        "--data-dir", str(tmp_path / "data"),
+        "--compact",
+    ]
+    results = sync.run_cli(argv=argv)
+    assert [(r.entity, r.changed) for r in results] == [("products", 2), ("orders", 2), ("inventory", 3)]
+    levels = read_ndjson(tmp_path / "data" / "inventory.ndjson")
+    assert {level["id"] for level in levels} == {"4001:301", "4002:301", "4001:302"}
+    assert "inventory: 3 fetched, 3 changed" in capsys.readouterr().out
@@ -0,0 +1,67 @@
+import csv
+import json
+
+import pytest
+
+import convert_products_csv_to_json as convert
+import ingest_product_exports as ingest
+
+HEADER = ["Handle", "Title", "Body (HTML)", "Variant SKU", "Variant Price", "Image Src"]
+
+
+def write_export(path, products, prefix="p"):
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(HEADER)
+        for n in range(products):
+            name = f"{prefix}-{n}"
+            # Multi-line, quote-escaped bodies must not confuse the shard scanner.
+            writer.writerow([name, f"Title {n}", f'<p>line\n"quoted" {n}</p>', f"{name}-a", "10", ""])
+            writer.writerow([name, "", "", f"{name}-b", "12", f"https://cdn/{name}.jpg"])
+
+
+def read_ndjson(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sharded_ingest_matches_serial_conversion(tmp_path, workers):
+    first, second = tmp_path / "export_1.csv", tmp_path / "export_2.csv"
+    write_export(first, 40, "a")
+    write_export(second, 25, "b")
+    output = tmp_path / "products.ndjson"
+
+    metadata = ingest.ingest_exports(
+        ingest.expand_inputs([str(tmp_path / "export_*.csv")]),
+        str(output),
+        workers=workers,
+        shard_bytes=512,
+    )
+
+    expected = list(convert.iter_products(str(first))) + list(convert.iter_products(str(second)))
+    assert read_ndjson(output) == expected
+    assert metadata["shards"] > 2
+    assert metadata["total_rows"] == 130
+    assert metadata["total_products"] == 65
+    assert metadata["total_variants"] == 130
+
+
+def test_keep_last_takes_each_handle_from_its_latest_export(tmp_path):
+    old, new = tmp_path / "2024.csv", tmp_path / "2025.csv"
+    write_export(old, 3, "p")
+    write_export(new, 2, "p")
+    output = tmp_path / "products.ndjson"
+
+    metadata = ingest.ingest_exports([str(old), str(new)], str(output), workers=1, keep="last")
+
+    assert [product["handle"] for product in read_ndjson(output)] == ["p-2", "p-0", "p-1"]
+    assert metadata["total_products"] == 3
+
+
+def test_scan_rejects_ungrouped_exports(tmp_path):
+    source = tmp_path / "export.csv"
+    with open(source, "w", encoding="utf-8", newline="") as handle:
+        csv.writer(handle).writerows([HEADER, ["a", "A"], ["b", "B"], ["a", ""]])
+
+    with pytest.raises(ValueError, match="not contiguous"):
+        ingest.scan_export(str(source), 1024)
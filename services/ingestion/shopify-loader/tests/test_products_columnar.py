@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import convert_products_csv_to_json as convert
+import products_columnar as columnar
+from test_convert_products import ROWS, write_export
+
+
+def test_tables_round_trip_to_the_json_products(tmp_path):
+    source = tmp_path / "products_export_2025.csv"
+    write_export(source, ROWS)
+    lake = tmp_path / "lake"
+
+    convert.stream_csv_to_json(str(source), str(tmp_path / "products.ndjson"), "ndjson", str(lake))
+    # Re-running replaces the export's partition instead of appending to it.
+    convert.stream_csv_to_json(str(source), str(tmp_path / "products.ndjson"), "ndjson", str(lake))
+
+    tables = columnar.read_product_tables(str(lake))
+    assert {name: table.num_rows for name, table in tables.items()} == {
+        "products": 2,
+        "variants": 3,
+        "images": 2,
+        "metafields": 2,
+    }
+    assert tables["variants"].schema.field("options_option1_name").type.value_type == "string"
+    assert set(tables["products"].column("source").to_pylist()) == {"products_export_2025"}
+
+    expected = [json.loads(line) for line in (tmp_path / "products.ndjson").read_text().splitlines()]
+    assert columnar.products_from_tables(tables) == expected
@@ -0,0 +1,169 @@
+import json
+import os
+import random
+
+import pytest
+
+pytest.importorskip("zstandard")
+
+import convert_products_csv_to_json as convert
+import incremental_sync as sync
+import raw_archive
+from test_convert_products import ROWS, write_export
+from test_incremental_sync import FIXTURES
+
+
+@pytest.fixture
+def archive(tmp_path):
+    with raw_archive.RawArchive(str(tmp_path / "archive")) as store:
+        yield store
+
+
+def write_lines(path, lines):
+    path.write_bytes("".join(lines).encode("utf-8"))
+
+
+def random_lines(count, seed=7):
+    rng = random.Random(seed)
+    return [f"{n},{rng.random():.12f},{'x' * rng.randint(20, 200)}\n" for n in range(count)]
+
+
+def test_round_trip_and_verify(tmp_path, archive):
+    source = tmp_path / "export.csv"
+    write_lines(source, random_lines(5000))
+    blob = archive.put_file(str(source))
+
+    assert blob == raw_archive.file_hash(str(source))
+    assert archive.read_blob(blob) == source.read_bytes()
+    assert archive.verify(blob)
+    assert archive.stats()["chunks"] > 1
+    assert archive.blob_paths(blob) == [str(source)]
+
+    archive.restore(blob, str(tmp_path / "restored.csv"))
+    assert (tmp_path / "restored.csv").read_bytes() == source.read_bytes()
+
+    chunk = archive.connection.execute("SELECT chunk FROM blob_chunks WHERE blob = ?", (blob,)).fetchone()[0]
+    with open(archive._object_path(chunk), "wb") as f:
+        f.write(b"not zstd")
+    assert not archive.verify(blob)
+
+
+def test_storage_grows_with_change_not_with_runs(tmp_path, archive):
+    source = tmp_path / "export.csv"
+    lines = random_lines(20000)
+    write_lines(source, lines)
+    first = archive.put_file(str(source))
+    stored = archive.stats()["stored_bytes"]
+
+    # Unchanged file: nothing is read or stored again.
+    assert archive.put_file(str(source)) == first
+    assert archive.stats()["stored_bytes"] == stored
+
+    # The same content under another name is deduplicated.
+    copy = tmp_path / "copy.csv"
+    copy.write_bytes(source.read_bytes())
+    assert archive.put_file(str(copy)) == first
+    assert archive.stats()["stored_bytes"] == stored
+
+    # An edit in the middle only adds the chunks around it.
+    lines[10000] = "10000,edited\n"
+    write_lines(source, lines)
+    second = archive.put_file(str(source))
+    assert second != first
+    stats = archive.stats()
+    size = source.stat().st_size
+    assert stats["blobs"] == 2
+    assert stats["logical_bytes"] > 2 * size - 100
+    assert stats["unique_bytes"] - size < 0.1 * size
+    assert archive.read_blob(first) != archive.read_blob(second)
+    assert archive.blob_paths(second) == [str(source)]
+
+
+def test_runs_are_fresh_until_inputs_params_or_outputs_change(tmp_path, archive):
+    output = tmp_path / "out.json"
+    output.write_text("{}", encoding="utf-8")
+    blob = archive.put_bytes(b"raw")
+    archive.record_run(str(output), "step", [blob], [str(output)], {"format": "json"})
+
+    assert archive.is_fresh(str(output), "step", [blob], {"format": "json"})
+    assert not archive.is_fresh(str(output), "step", [blob], {"format": "ndjson"})
+    assert not archive.is_fresh(str(output), "step", [archive.put_bytes(b"other")], {"format": "json"})
+    assert not archive.is_fresh(str(output), "other-step", [blob], {"format": "json"})
+
+    # Rewritten with the same content is still fresh; new content is not.
+    output.write_text("{}", encoding="utf-8")
+    os.utime(output, ns=(1, 1))
+    assert archive.is_fresh(str(output), "step", [blob], {"format": "json"})
+    output.write_text("{ }", encoding="utf-8")
+    assert not archive.is_fresh(str(output), "step", [blob], {"format": "json"})
+    output.unlink()
+    assert not archive.is_fresh(str(output), "step", [blob], {"format": "json"})
+
+
+def test_converter_skips_identical_reruns(tmp_path, capsys):
+    source = tmp_path / "export.csv"
+    write_export(source, ROWS)
+    output = tmp_path / "products.ndjson"
+    argv = ["--input", str(source), "--output", str(output), "--format", "ndjson"]
+
+    convert.main(argv)
+    first_mtime = output.stat().st_mtime_ns
+    capsys.readouterr()
+
+    convert.main(argv)
+    assert "up to date" in capsys.readouterr().out
+    assert output.stat().st_mtime_ns == first_mtime
+
+    convert.main(argv + ["--force"])
+    assert "up to date" not in capsys.readouterr().out
+
+    with raw_archive.RawArchive(str(tmp_path / "archive")) as archive:
+        lineage = archive.lineage(str(output))
+    assert lineage["step"] == "convert_products"
+    assert lineage["params"]["format"] == "ndjson"
+    assert lineage["inputs"] == [{"blob": raw_archive.file_hash(str(source)), "paths": [str(source)]}]
+
+
+def test_sync_archives_pages_and_records_lineage(tmp_path):
+    data_dir = tmp_path / "data"
+    argv = [
+        "products",
+        "--fixtures", FIXTURES,
+        "--state", str(tmp_path / "state.sqlite3"),
+        "--data-dir", str(data_dir),
+    ]
+    first = sync.run_cli(argv=argv)[0]
+    # A full resync fetches the very same page, which is stored only once.
+    sync.run_cli(argv=argv + ["--full"])
+
+    with raw_archive.RawArchive(str(data_dir / "archive")) as archive:
+        lineage = archive.lineage(first.output_path)
+        assert lineage["step"] == "sync_products"
+        pages = [archive.read_blob(entry["blob"]) for entry in lineage["inputs"]]
+        assert archive.stats()["blobs"] == 1
+    assert pages == [sync.page_bytes(sync.FixtureSource(FIXTURES)._load("products"))]
+
+
+def test_compaction_records_the_snapshot_lineage(tmp_path, capsys):
+    data_dir = tmp_path / "data"
+    argv = [
+        "products",
+        "--fixtures", FIXTURES,
+        "--state", str(tmp_path / "state.sqlite3"),
+        "--data-dir", str(data_dir),
+        "--compact",
+    ]
+    sync.run_cli(argv=argv)
+    # Nothing changed, so no delta: the new snapshot still credits the pages
+    # folded into the previous one.
+    assert sync.run_cli(argv=argv)[0].output_path is None
+    assert list((data_dir / "sync" / "products").iterdir()) == []
+    capsys.readouterr()
+
+    raw_archive.main(["--root", str(data_dir / "archive"), "lineage", str(data_dir / "products.ndjson")])
+    lineage = json.loads(capsys.readouterr().out)
+    assert lineage["step"] == "compact_products"
+    assert lineage["params"] == {"deltas": []}
+    with raw_archive.RawArchive(str(data_dir / "archive")) as archive:
+        pages = [archive.read_blob(entry["blob"]) for entry in lineage["inputs"]]
+    assert pages == [sync.page_bytes(sync.FixtureSource(FIXTURES)._load("products"))]
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import incremental_sync as sync
+import shopify_helpers as shopify
+import sync_inventory
+import sync_products
+from sync_state import Cursor, SyncState
+
+API = "/admin/api/2024-10"
+TOKEN = "shpat_test"
+
+PRODUCTS = [
+    {"id": n, "handle": f"product-{n}", "title": f"Product {n}", "updated_at": f"2026-03-0{n}T10:00:00Z"}
+    for n in range(1, 6)
+]
+
+BULK_LINES = [
+    {"id": "gid://shopify/Product/11", "handle": "linen-shirt", "title": "Linen Shirt",
+     "descriptionHtml": "<p>Linen</p>", "vendor": "Acme", "productType": "Shirts",
+     "tags": ["summer", "linen"], "publishedAt": "2026-01-02T10:00:00Z", "status": "ACTIVE",
+     "updatedAt": "2026-03-01T09:00:00Z", "options": [{"name": "Size", "position": 1}]},
+    {"id": "gid://shopify/ProductVariant/21", "sku": "LS-S", "price": "49.00", "compareAtPrice": None,
+     "taxable": True, "barcode": "", "inventoryPolicy": "DENY",
+     "selectedOptions": [{"name": "Size", "value": "S"}],
+     "inventoryItem": {"tracked": True, "requiresShipping": True,
+                       "measurement": {"weight": {"unit": "KILOGRAMS", "value": 0.2}}},
+     "__parentId": "gid://shopify/Product/11"},
+    {"id": "gid://shopify/ProductImage/31", "url": "https://cdn.example.com/ls.jpg", "altText": "Shirt",
+     "__parentId": "gid://shopify/Product/11"},
+    {"id": "gid://shopify/Product/12", "handle": "canvas-tote", "title": "Canvas Tote",
+     "descriptionHtml": "", "vendor": "Acme", "productType": "Bags", "tags": [], "publishedAt": None,
+     "status": "DRAFT", "updatedAt": "2026-03-02T12:30:00Z", "options": []},
+]
+
+
+class FakeShopify:
+    """Just enough of the Admin API to exercise the client."""
+
+    def __init__(self):
+        self.rest_requests = []
+        self.graphql_queries = []
+        self.bulk_downloads = []
+        self.throttle_next = 1
+        self.call_limit = "1/40"
+        self.bulk_polls = 0
+
+        app = web.Application()
+        app.router.add_get(f"{API}/products.json", self.products)
+        app.router.add_get(f"{API}/locations.json", self.locations)
+        app.router.add_get(f"{API}/inventory_levels.json", self.inventory_levels)
+        app.router.add_post(f"{API}/graphql.json", self.graphql)
+        app.router.add_get("/bulk/products.jsonl", self.bulk_file)
+        self.server = TestServer(app)
+
+    @property
+    def url(self):
+        return str(self.server.make_url("/"))
+
+    def _check_auth(self, request):
+        assert request.headers["X-Shopify-Access-Token"] == TOKEN
+
+    async def products(self, request):
+        self._check_auth(request)
+        self.rest_requests.append(dict(request.query))
+        if "page_info" in request.query and self.throttle_next:
+            self.throttle_next -= 1
+            return web.json_response({"errors": "Exceeded"}, status=429, headers={"Retry-After": "0"})
+
+        if "page_info" in request.query:
+            start, limit = int(request.query["page_info"]), int(request.query["limit"])
+        else:
+            floor = request.query.get("updated_at_min", "")
+            matching = [p for p in PRODUCTS if p["updated_at"].replace("Z", "+00:00") >= floor]
+            start, limit = PRODUCTS.index(matching[0]) if matching else len(PRODUCTS), int(request.query["limit"])
+        page = PRODUCTS[start:start + limit]
+        headers = {"X-Shopify-Shop-Api-Call-Limit": self.call_limit}
+        if start + limit < len(PRODUCTS):
+            next_url = self.server.make_url(f"{API}/products.json").with_query(
+                limit=limit, page_info=start + limit
+            )
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return web.json_response({"products": page}, headers=headers)
+
+    async def locations(self, request):
+        self._check_auth(request)
+        return web.json_response({"locations": [{"id": 301}, {"id": 302}]})
+
+    async def inventory_levels(self, request):
+        self._check_auth(request)
+        self.rest_requests.append(dict(request.query))
+        assert request.query["location_ids"] == "301,302"
+        return web.json_response({"inventory_levels": [
+            {"inventory_item_id": 4001, "location_id": 301, "available": 3, "updated_at": "2026-03-01T09:00:00Z"},
+        ]})
+
+    async def graphql(self, request):
+        self._check_auth(request)
+        body = await request.json()
+        self.graphql_queries.append(body)
+        extensions = {"cost": {"requestedQueryCost": 10, "actualQueryCost": 10, "throttleStatus": {
+            "maximumAvailable": 1000.0, "currentlyAvailable": 900, "restoreRate": 50.0}}}
+        if "bulkOperationRunQuery" in body["query"]:
+            data = {"bulkOperationRunQuery": {
+                "bulkOperation": {"id": "gid://shopify/BulkOperation/1", "status": "CREATED"},
+                "userErrors": []}}
+        else:
+            self.bulk_polls += 1
+            done = self.bulk_polls > 1
+            data = {"node": {
+                "id": body["variables"]["id"],
+                "status": "COMPLETED" if done else "RUNNING",
+                "errorCode": None,
+                "objectCount": str(len(BULK_LINES)),
+                "url": str(self.server.make_url("/bulk/products.jsonl")) if done else None,
+            }}
+        return web.json_response({"data": data, "extensions": extensions})
+
+    async def bulk_file(self, request):
+        self.bulk_downloads.append(request.headers.get("X-Shopify-Access-Token"))
+        response = web.StreamResponse()
+        await response.prepare(request)
+        payload = "".join(json.dumps(line) + "\n" for line in BULK_LINES).encode()
+        # Small chunks, so lines are split across reads.
+        for start in range(0, len(payload), 37):
+            await response.write(payload[start:start + 37])
+        await response.write_eof()
+        return response
+
+
+def with_server(test):
+    async def main():
+        fake = FakeShopify()
+        await fake.server.start_server()
+        client = shopify.ShopifyClient(
+            fake.url, TOKEN, backoff=0, rest_bucket=shopify.LeakyBucket(40, 400)
+        )
+        try:
+            return await test(fake, client)
+        finally:
+            await client.close()
+            await fake.server.close()
+
+    return asyncio.run(main())
+
+
+def test_leaky_bucket_waits_for_capacity():
+    async def main():
+        bucket = shopify.LeakyBucket(capacity=2, leak_rate=50)
+        start = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - start, bucket
+
+    elapsed, bucket = asyncio.run(main())
+    # Four requests had to wait for one call each to leak out.
+    assert elapsed >= 0.07
+    assert bucket.waited == pytest.approx(0.08, abs=0.02)
+
+
+def test_call_limit_header_parsing():
+    assert shopify.parse_call_limit("32/40") == (32, 40)
+    assert shopify.parse_call_limit("") is None
+    assert shopify.parse_call_limit("n/a") is None
+
+
+def test_paginates_with_cursor_links_and_retries_throttled_pages():
+    async def test(fake, client):
+        fake.call_limit = "39/40"
+        pages = [page async for page in client.paginate("products", {"limit": 2})]
+        return fake, client, pages
+
+    fake, client, pages = with_server(test)
+    assert [[p["id"] for p in page] for page in pages] == [[1, 2], [3, 4], [5]]
+    # One page came back 429 and was retried; cursor URLs replace the params.
+    assert len(fake.rest_requests) == 4
+    assert fake.rest_requests[1] == fake.rest_requests[2] == {"limit": "2", "page_info": "2"}
+    # The call-limit header raised the client's estimate of the bucket.
+    assert client.rest_bucket.level > 30
+
+
+def test_source_applies_cursor_and_location_ids(tmp_path):
+    async def test(fake, client):
+        source = shopify.ShopifySource(client)
+        with SyncState(str(tmp_path / "state.sqlite3")) as state:
+            first = await sync.sync_entity(sync_products.SPEC, source, state, str(tmp_path), page_size=2)
+            second = await sync.sync_entity(sync_products.SPEC, source, state, str(tmp_path), page_size=2)
+            inventory = await sync.sync_entity(sync_inventory.SPEC, source, state, str(tmp_path))
+        return fake, first, second, inventory
+
+    fake, first, second, inventory = with_server(test)
+    assert (first.fetched, first.changed) == (5, 5)
+    assert fake.rest_requests[-2]["updated_at_min"] == "2026-03-05T10:00:00+00:00"
+    assert (second.fetched, second.changed) == (1, 0)
+    assert inventory.changed == 1
+
+
+def test_bulk_operation_streams_into_the_products_transform(tmp_path):
+    async def test(fake, client):
+        source = shopify.ShopifySource(client, bulk=["products"], poll_interval=0.01)
+        cursor = Cursor(updated_at="2026-03-01T00:00:00+00:00")
+        pages = [page async for page in source._bulk_pages("products", cursor, 1)]
+        return fake, client, pages
+
+    fake, client, pages = with_server(test)
+    products = [page[0] for page in pages]
+    assert [p["id"] for p in products] == [11, 12]
+    assert "updated_at:>='2026-03-01T00:00:00+00:00'" in fake.graphql_queries[0]["variables"]["query"]
+    assert fake.bulk_downloads == [None]
+    assert client.graphql_bucket.level >= 100
+
+    shirt = next(sync_products.transform_product(products[0]))
+    assert shirt["tags"] == ["summer", "linen"]
+    assert shirt["status"] == "active"
+    assert shirt["variants"][0]["grams"] == 200
+    assert shirt["variants"][0]["options"]["option1"] == {"name": "Size", "value": "S"}
+    assert shirt["images"][0]["src"] == "https://cdn.example.com/ls.jpg"
+    assert next(sync_products.transform_product(products[1]))["variants"] == []
+
+
+def test_bulk_assembler_rejects_orphans():
+    assembler = shopify.BulkAssembler({"ProductVariant": "variants"})
+    with pytest.raises(shopify.ShopifyError):
+        assembler.feed({"id": "gid://shopify/ProductVariant/1", "__parentId": "gid://shopify/Product/9"})
+
+
+def test_missing_credentials_are_reported():
+    with pytest.raises(shopify.ShopifyError, match="SHOPIFY_ACCESS_TOKEN"):
+        shopify.ShopifyClient.from_env({"SHOPIFY_STORE_URL": "example.myshopify.com"})
@@ -0,0 +1,70 @@
+import io
+import json
+
+import pytest
+
+import convert_products_csv_to_json as convert
+import validate_products_json as validate
+from test_convert_products import ROWS, write_export
+
+
+@pytest.fixture
+def export(tmp_path):
+    source = tmp_path / "export.csv"
+    write_export(source, ROWS)
+    return source
+
+
+def test_every_input_layout_gives_the_same_report(tmp_path, export):
+    convert.process_csv_to_json(str(export), str(tmp_path / "products.json"))
+    convert.stream_csv_to_json(str(export), str(tmp_path / "stream.json"), "json-stream")
+    convert.stream_csv_to_json(str(export), str(tmp_path / "products.ndjson"), "ndjson")
+
+    pretty = validate.analyze_file(str(tmp_path / "products.json"))
+    streamed = validate.analyze_file(str(tmp_path / "stream.json"))
+    ndjson = validate.analyze_file(str(tmp_path / "products.ndjson"))
+
+    for report in (streamed, ndjson):
+        assert {k: v for k, v in report.items() if k != "metadata"} == {
+            k: v for k, v in pretty.items() if k != "metadata"
+        }
+    assert pretty["metadata"]["total_products"] == 2
+    assert pretty["products"]["status"] == {"active": 1, "draft": 1}
+    assert pretty["variants"]["price"] == {"count": 3, "min": 5.0, "max": 12.0, "mean": 9.0}
+    assert pretty["quality"]["products_without_variants"] == 0
+
+
+def test_document_reader_handles_values_split_across_chunks(tmp_path, export):
+    convert.process_csv_to_json(str(export), str(tmp_path / "products.json"))
+    text = (tmp_path / "products.json").read_text(encoding="utf-8")
+
+    records = list(validate.iter_json_document(io.StringIO(text), chunk_size=7))
+
+    document = json.loads(text)
+    assert [value for key, value in records if key == "product"] == document["products"]
+    assert dict(records)["metadata"] == document["metadata"]
+
+
+def test_columnar_report_matches_the_streaming_report(tmp_path, export):
+    pytest.importorskip("pyarrow")
+    lake = tmp_path / "lake"
+    convert.stream_csv_to_json(str(export), str(tmp_path / "products.ndjson"), "ndjson", str(lake))
+
+    streamed = validate.analyze_file(str(tmp_path / "products.ndjson"))
+    columnar = validate.analyze_tables(str(lake))
+
+    assert {k: v for k, v in columnar.items() if k != "metadata"} == {
+        k: v for k, v in streamed.items() if k != "metadata"
+    }
+
+
+def test_strict_mode_fails_the_gate_on_quality_issues(tmp_path, capsys):
+    path = tmp_path / "products.ndjson"
+    path.write_text(json.dumps({"handle": "no-title", "title": "", "variants": []}) + "\n")
+
+    with pytest.raises(SystemExit) as exit_info:
+        validate.main(["--input", str(path), "--json", "--strict"])
+
+    assert exit_info.value.code == 1
+    report = json.loads(capsys.readouterr().out)
+    assert validate.failed_checks(report) == ["products_without_title", "products_without_variants"]
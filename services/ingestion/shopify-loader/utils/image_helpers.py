@@ -1,4 +1,285 @@
 """Image helper utilities shared across ingestion scripts.
 
-Extend with resize, thumbnail, and format conversion helpers as needed.
+Resize profiles and encoder settings come from ``config/resize_settings.yaml``
+(see ``load_settings``). ``render_variants`` decodes a source image once and
+produces every requested profile x format from that single decode:
+
+- JPEG sources are decoded at a reduced DCT scale (``Image.draft``) when the
+  largest output is much smaller than the original;
+- profiles are rendered largest first, each from the previous result when
+  that still has enough pixels, instead of from the full-size image.
+
+Derived assets are content-addressed: ``variant_path`` combines the source's
+hash with ``ResizeSettings.variant_key``, a hash of everything that affects
+the output (box, fit, format and encoder options). A changed profile gets new
+paths, and an unchanged image maps to files that already exist.
+
+Requires Pillow (with WebP/AVIF support) and PyYAML for the settings file.
 """
+
+import hashlib
+import io
+import json
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - exercised only without Pillow
+    Image = None
+    ImageOps = None
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover - exercised only without PyYAML
+    yaml = None
+
+DEFAULT_SETTINGS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'resize_settings.yaml'
+)
+
+# Format name -> (Pillow format, file extension, content type).
+FORMATS = {
+    'avif': ('AVIF', 'avif', 'image/avif'),
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+}
+
+FITS = ('contain', 'cover')
+
+# (left, upper, right, lower) region of the source, in source pixels.
+Box = Tuple[float, float, float, float]
+
+
+def require_pillow() -> None:
+    """Raise a helpful error when Pillow is not installed."""
+    if Image is None:
+        raise RuntimeError("Image processing requires Pillow: pip install Pillow")
+
+
+@dataclass(frozen=True)
+class Profile:
+    """One target size: fit the image into ``width`` x ``height``."""
+
+    name: str
+    width: int
+    height: int
+    fit: str = 'contain'
+    formats: Tuple[str, ...] = ('webp', 'jpeg')
+    thumbnail: bool = False
+
+
+@dataclass
+class ResizeSettings:
+    """Parsed ``resize_settings.yaml``."""
+
+    profiles: Dict[str, Profile]
+    formats: Dict[str, Dict[str, Any]]
+    catalog: str = 'data/products.json'
+    output_dir: str = 'data/images'
+    workers: Optional[int] = None
+    download_timeout: float = 30.0
+    _keys: Dict[Tuple[str, str], str] = field(default_factory=dict, repr=False, compare=False)
+
+    def variant_key(self, profile: Profile, fmt: str) -> str:
+        """Short hash of everything that determines one profile/format output."""
+        cached = self._keys.get((profile.name, fmt))
+        if cached is None:
+            spec = {
+                'width': profile.width,
+                'height': profile.height,
+                'fit': profile.fit,
+                'format': fmt,
+                'options': self.formats.get(fmt, {}),
+            }
+            canonical = json.dumps(spec, sort_keys=True, separators=(',', ':'))
+            cached = self._keys[(profile.name, fmt)] = hashlib.blake2b(
+                canonical.encode('utf-8'), digest_size=6
+            ).hexdigest()
+        return cached
+
+    def select(self, names: Optional[Iterable[str]] = None, *, thumbnails: Optional[bool] = None) -> List[Profile]:
+        """Profiles by name (all by default), optionally only (non-)thumbnails."""
+        names = list(names) if names else list(self.profiles)
+        unknown = [name for name in names if name not in self.profiles]
+        if unknown:
+            raise ValueError(f"Unknown resize profile(s): {', '.join(unknown)}")
+        profiles = [self.profiles[name] for name in names]
+        if thumbnails is not None:
+            profiles = [profile for profile in profiles if profile.thumbnail == thumbnails]
+        return profiles
+
+
+def parse_settings(raw: Dict[str, Any]) -> ResizeSettings:
+    """Validate a settings mapping (as loaded from YAML)."""
+    formats = {name: dict(options or {}) for name, options in (raw.get('formats') or {}).items()}
+    unknown = [name for name in formats if name not in FORMATS]
+    if unknown:
+        raise ValueError(f"Unsupported image format(s): {', '.join(unknown)}")
+
+    profiles: Dict[str, Profile] = {}
+    for name, spec in (raw.get('profiles') or {}).items():
+        spec = spec or {}
+        profile = Profile(
+            name=name,
+            width=int(spec.get('width', 0)),
+            height=int(spec.get('height', 0)),
+            fit=spec.get('fit', 'contain'),
+            formats=tuple(spec.get('formats') or ('webp', 'jpeg')),
+            thumbnail=bool(spec.get('thumbnail', False)),
+        )
+        if profile.width <= 0 or profile.height <= 0:
+            raise ValueError(f"Profile '{name}' needs a positive width and height")
+        if profile.fit not in FITS:
+            raise ValueError(f"Profile '{name}' has fit '{profile.fit}'; expected one of {', '.join(FITS)}")
+        missing = [fmt for fmt in profile.formats if fmt not in FORMATS]
+        if missing:
+            raise ValueError(f"Profile '{name}' uses unsupported format(s): {', '.join(missing)}")
+        profiles[name] = profile
+    if not profiles:
+        raise ValueError("No resize profiles configured")
+
+    settings = ResizeSettings(profiles=profiles, formats=formats)
+    for key in ('catalog', 'output_dir', 'download_timeout'):
+        if raw.get(key) is not None:
+            setattr(settings, key, raw[key])
+    settings.workers = raw.get('workers')
+    return settings
+
+
+def load_settings(path: str = DEFAULT_SETTINGS) -> ResizeSettings:
+    """Read and validate ``resize_settings.yaml``."""
+    if yaml is None:
+        raise RuntimeError("Reading resize settings requires PyYAML: pip install pyyaml")
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_settings(yaml.safe_load(f) or {})
+
+
+def source_hash(data: bytes) -> str:
+    """Content hash identifying a source image."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def variant_path(root: str, src_hash: str, profile: Profile, fmt: str, key: str) -> str:
+    """Where one derived asset of a source lives under ``root``."""
+    return os.path.join(root, 'derived', src_hash[:2], src_hash, f"{profile.name}-{key}.{FORMATS[fmt][1]}")
+
+
+def fitted_size(size: Tuple[int, int], profile: Profile) -> Tuple[Tuple[int, int], Box]:
+    """Output size for ``profile`` and the source region it is taken from.
+
+    ``contain`` scales the whole image into the box; ``cover`` crops the
+    centre to the box's aspect ratio first. Neither ever upscales.
+    """
+    width, height = size
+    box: Box = (0, 0, width, height)
+    if profile.fit == 'cover':
+        target = profile.width / profile.height
+        if width / height > target:
+            crop = height * target
+            box = ((width - crop) / 2, 0, (width + crop) / 2, height)
+        else:
+            crop = width / target
+            box = (0, (height - crop) / 2, width, (height + crop) / 2)
+    region_width, region_height = box[2] - box[0], box[3] - box[1]
+    scale = min(1.0, profile.width / region_width, profile.height / region_height)
+    out = (max(1, round(region_width * scale)), max(1, round(region_height * scale)))
+    return out, box
+
+
+def _normalize_mode(image):
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def decode(data: bytes, profiles: Iterable[Profile] = ()):
+    """Decode a source image once, upright and in RGB(A).
+
+    For JPEG sources the decoder is asked for the smallest DCT scale that
+    still covers the largest output of ``profiles``.
+    """
+    require_pillow()
+    image = Image.open(io.BytesIO(data))
+    profiles = list(profiles)
+    if profiles and image.format == 'JPEG':
+        scale = 0.0
+        for profile in profiles:
+            out, box = fitted_size(image.size, profile)
+            scale = max(scale, out[0] / (box[2] - box[0]), out[1] / (box[3] - box[1]))
+        if scale < 0.5:
+            # Orientation does not matter: the requested size scales both axes alike.
+            image.draft('RGB', (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+    image = ImageOps.exif_transpose(image)
+    return _normalize_mode(image)
+
+
+def resize(image, profile: Profile, reference: Optional[Tuple[int, int]] = None):
+    """Render ``profile`` from ``image``.
+
+    ``reference`` is the size of the original when ``image`` is an already
+    reduced copy of it; the output size is always computed from the original.
+    """
+    out, _ = fitted_size(reference or image.size, profile)
+    _, box = fitted_size(image.size, profile)
+    if out == image.size and box == (0, 0, image.width, image.height):
+        return image
+    return image.resize(out, Image.LANCZOS, box=box, reducing_gap=3.0)
+
+
+def encode(image, fmt: str, options: Optional[Dict[str, Any]] = None) -> bytes:
+    """Encode an image as ``fmt`` with the configured encoder options."""
+    pillow_format = FORMATS[fmt][0]
+    if pillow_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if 'A' in image.mode:
+            background.paste(image, mask=image.getchannel('A'))
+        else:
+            background.paste(image.convert('RGB'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, format=pillow_format, **(options or {}))
+    return buffer.getvalue()
+
+
+def render_variants(
+    data: bytes,
+    settings: ResizeSettings,
+    wanted: Iterable[Tuple[Profile, str]],
+) -> Dict[Tuple[str, str], bytes]:
+    """Decode ``data`` once and encode every wanted (profile, format) pair.
+
+    Returns encoded bytes keyed by ``(profile name, format)``.
+    """
+    by_profile: Dict[str, Tuple[Profile, List[str]]] = {}
+    for profile, fmt in wanted:
+        by_profile.setdefault(profile.name, (profile, []))[1].append(fmt)
+    if not by_profile:
+        return {}
+
+    profiles = [profile for profile, _ in by_profile.values()]
+    original = decode(data, profiles)
+    reference = original.size
+    # Largest first; each later profile can start from the last output if it
+    # still has at least as many pixels as the profile needs.
+    profiles.sort(key=lambda profile: profile.width * profile.height, reverse=True)
+    working = original
+
+    outputs: Dict[Tuple[str, str], bytes] = {}
+    for profile in profiles:
+        needed, _ = fitted_size(reference, profile)
+        source = working if fitted_size(working.size, profile)[0] == needed else original
+        rendered = resize(source, profile, reference)
+        if profile.fit == 'contain':
+            working = rendered
+        for fmt in by_profile[profile.name][1]:
+            outputs[(profile.name, fmt)] = encode(rendered, fmt, settings.formats.get(fmt))
+    return outputs
+
+
+def content_type(fmt: str) -> str:
+    """HTTP content type of an output format."""
+    return FORMATS[fmt][2]